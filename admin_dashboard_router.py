@@ -3,6 +3,9 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, or_
 from database import get_db, User, Admin, Presenter, Manager, Mentor, Course, Module, Session as SessionModel, Enrollment, Cohort, UserCohort, CohortCourse, PresenterCohort, Resource, SessionContent
 from cohort_specific_models import CohortSpecificCourse, CohortCourseModule, CohortCourseSession
+from listing_counters import with_counts
+from dashboard_stats import get_global_stats, get_upcoming_sessions
+from staff_directory import list_staff
 from auth import get_current_admin_or_presenter
 from datetime import datetime
 from typing import Optional
@@ -33,131 +36,26 @@ async def get_all_members_comprehensive(
     search: str = "",
     role: str = "",
     college: str = "",
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_admin_or_presenter), 
     db: Session = Depends(get_db)
 ):
-    """Get only Admin, Presenter, Manager, and Mentor members"""
+    """Get only Admin, Presenter, Manager, and Mentor members (newest first).
+
+    Search matches username/email prefixes. Pass ``next_cursor`` from the previous
+    response as ``cursor`` to page without offsets; the total is only counted when
+    no cursor is given.
+    """
     try:
-        all_users = []
-        
-        # Get Admins
-        if not role or role == 'Admin':
-            admin_query = db.query(Admin)
-            if search:
-                admin_query = admin_query.filter(
-                    or_(
-                        Admin.username.contains(search),
-                        Admin.email.contains(search)
-                    )
-                )
-            admins = admin_query.all()
-            for admin in admins:
-                all_users.append({
-                    "id": admin.id,
-                    "username": admin.username,
-                    "email": admin.email,
-                    "role": "Admin",
-                    "college": None,
-                    "department": None,
-                    "year": None,
-                    "user_type": "Admin",
-                    "active": True,
-                    "created_at": admin.created_at
-                })
-        
-        # Get Presenters
-        if not role or role == 'Presenter':
-            presenter_query = db.query(Presenter)
-            if search:
-                presenter_query = presenter_query.filter(
-                    or_(
-                        Presenter.username.contains(search),
-                        Presenter.email.contains(search)
-                    )
-                )
-            presenters = presenter_query.all()
-            for presenter in presenters:
-                all_users.append({
-                    "id": presenter.id,
-                    "username": presenter.username,
-                    "email": presenter.email,
-                    "role": "Presenter",
-                    "college": None,
-                    "department": None,
-                    "year": None,
-                    "user_type": "Presenter",
-                    "active": True,
-                    "created_at": presenter.created_at
-                })
-        
-        # Get Managers
-        if not role or role == 'Manager':
-            manager_query = db.query(Manager)
-            if search:
-                manager_query = manager_query.filter(
-                    or_(
-                        Manager.username.contains(search),
-                        Manager.email.contains(search)
-                    )
-                )
-            managers = manager_query.all()
-            for manager in managers:
-                all_users.append({
-                    "id": manager.id,
-                    "username": manager.username,
-                    "email": manager.email,
-                    "role": "Manager",
-                    "college": None,
-                    "department": None,
-                    "year": None,
-                    "user_type": "Manager",
-                    "active": True,
-                    "created_at": manager.created_at
-                })
-        
-        # Get Mentors
-        if not role or role == 'Mentor':
-            mentor_query = db.query(Mentor)
-            if search:
-                mentor_query = mentor_query.filter(
-                    or_(
-                        Mentor.username.contains(search),
-                        Mentor.email.contains(search)
-                    )
-                )
-            mentors = mentor_query.all()
-            for mentor in mentors:
-                all_users.append({
-                    "id": mentor.id,
-                    "username": mentor.username,
-                    "email": mentor.email,
-                    "role": "Mentor",
-                    "college": None,
-                    "department": None,
-                    "year": None,
-                    "user_type": "Mentor",
-                    "active": True,
-                    "created_at": mentor.created_at
-                })
-        
-        # Sort by created_at (most recent first)
         try:
-            all_users.sort(key=lambda x: x['created_at'] if isinstance(x['created_at'], datetime) else datetime.now(), reverse=True)
-        except (TypeError, AttributeError):
-            all_users.sort(key=lambda x: x['username'])
-        
-        # Apply pagination
-        total = len(all_users)
-        start_idx = (page - 1) * limit
-        end_idx = start_idx + limit
-        paginated_users = all_users[start_idx:end_idx]
-        
-        return {
-            "users": paginated_users,
-            "total": total,
-            "page": page,
-            "limit": limit
-        }
+            return list_staff(
+                db, limit=limit, page=page, cursor=cursor, search=search, role=role,
+                with_total=cursor is None
+            )
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {str(e)}")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get all members error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch all members")
@@ -186,13 +84,12 @@ async def get_admin_courses(
             query = query.filter(Course.is_active == (is_active.lower() == 'true'))
         
         total = query.count()
-        courses = query.offset((page - 1) * limit).limit(limit).all()
+        rows = with_counts(
+            db, query.order_by(Course.id), Course.id, "course", ["enrollments", "modules"]
+        ).offset((page - 1) * limit).limit(limit).all()
         
         result = []
-        for course in courses:
-            enrolled_count = db.query(Enrollment).filter(Enrollment.course_id == course.id).count()
-            modules_count = db.query(Module).filter(Module.course_id == course.id).count()
-            
+        for course, enrolled_count, modules_count in rows:
             result.append({
                 "id": course.id,
                 "title": course.title,
@@ -330,44 +227,15 @@ async def get_admin_dashboard(
 ):
     """Admin dashboard with analytics and upcoming sessions"""
     try:
-        # Get basic analytics
-        total_students = db.query(User).filter(User.role == "Student").count()
-        total_courses = db.query(Course).count()
-        total_sessions = db.query(SessionModel).count()
-        total_enrollments = db.query(Enrollment).count()
-        
-        # Get upcoming sessions
-        current_time = datetime.now()
-        upcoming_sessions = db.query(SessionModel).join(Module, SessionModel.module_id == Module.id).join(Course, Module.course_id == Course.id).filter(
-            SessionModel.scheduled_time.isnot(None),
-            SessionModel.scheduled_time > current_time
-        ).order_by(SessionModel.scheduled_time).limit(10).all()
-        
-        sessions_data = []
-        for session in upcoming_sessions:
-            module = db.query(Module).filter(Module.id == session.module_id).first()
-            course = db.query(Course).filter(Course.id == module.course_id).first() if module else None
-            
-            sessions_data.append({
-                "id": session.id,
-                "title": session.title,
-                "course_title": course.title if course else "Unknown Course",
-                "module_title": module.title if module else "Unknown Module",
-                "scheduled_date": session.scheduled_time.strftime("%Y-%m-%d") if session.scheduled_time else None,
-                "scheduled_time": session.scheduled_time.strftime("%H:%M") if session.scheduled_time else None,
-                "scheduled_datetime": session.scheduled_time,
-                "duration_minutes": session.duration_minutes,
-                "zoom_link": session.zoom_link,
-                "session_number": session.session_number,
-                "week_number": module.week_number if module else None
-            })
+        stats = get_global_stats(db)
+        sessions_data = get_upcoming_sessions(db)
         
         return {
             "analytics": {
-                "total_students": total_students,
-                "total_courses": total_courses,
-                "total_sessions": total_sessions,
-                "total_enrollments": total_enrollments
+                "total_students": stats["total_students"],
+                "total_courses": stats["total_courses"],
+                "total_sessions": stats["total_sessions"],
+                "total_enrollments": stats["total_enrollments"]
             },
             "upcoming_sessions": sessions_data,
             "total_upcoming": len(sessions_data)
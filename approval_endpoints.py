@@ -264,45 +264,20 @@ async def get_pending_approvals(
         ApprovalRequest.status == ApprovalStatus.PENDING
     ).all()
     
+    # Requesters have no FK or role column; resolve them all with one query per role table
+    from identity_directory import identity_directory
+    requesters = identity_directory.find_roles(db, [req.requester_id for req in requests])
+    
     result = []
     for req in requests:
-        # Manually fetch requester information since there's no FK relationship
-        requester = None
-        requester_name = "Unknown"
-        requester_role = "Unknown"
-        
-        # Try to find the requester in different tables
-        from database import User, Admin, Presenter, Mentor, Manager
-        
-        # Check User table first
-        user_check = db.query(User).filter(User.id == req.requester_id).first()
-        if user_check:
-            requester_name = user_check.username
-            requester_role = user_check.role
+        requester = requesters.get(req.requester_id)
+        requester_name = requester.username if requester else "Unknown"
+        if not requester:
+            requester_role = "Unknown"
+        elif requester.role == "Student":
+            requester_role = requester.user_role
         else:
-            # Check Admin table
-            admin_check = db.query(Admin).filter(Admin.id == req.requester_id).first()
-            if admin_check:
-                requester_name = admin_check.username
-                requester_role = "Admin"
-            else:
-                # Check Presenter table
-                presenter_check = db.query(Presenter).filter(Presenter.id == req.requester_id).first()
-                if presenter_check:
-                    requester_name = presenter_check.username
-                    requester_role = "Presenter"
-                else:
-                    # Check Mentor table
-                    mentor_check = db.query(Mentor).filter(Mentor.id == req.requester_id).first()
-                    if mentor_check:
-                        requester_name = mentor_check.username
-                        requester_role = "Mentor"
-                    else:
-                        # Check Manager table
-                        manager_check = db.query(Manager).filter(Manager.id == req.requester_id).first()
-                        if manager_check:
-                            requester_name = manager_check.username
-                            requester_role = "Manager"
+            requester_role = requester.role
         
         # Get icon based on operation type
         icon = "request"
@@ -483,18 +458,15 @@ async def get_presenter_approval_requests(
         ApprovalRequest.requester_id == current_presenter.id
     ).order_by(ApprovalRequest.created_at.desc()).all()
     
+    # Approvers are admins or managers; resolve them all in one batch
+    from identity_directory import identity_directory
+    approvers = identity_directory.find_roles(db, [req.approved_by for req in requests], ("Admin", "Manager"))
+    
     result = []
     for req in requests:
         # Get approver name
-        approver_name = None
-        if req.approved_by:
-            admin_check = db.query(Admin).filter(Admin.id == req.approved_by).first()
-            if admin_check:
-                approver_name = admin_check.username
-            else:
-                manager_check = db.query(Manager).filter(Manager.id == req.approved_by).first()
-                if manager_check:
-                    approver_name = manager_check.username
+        approver = approvers.get(req.approved_by)
+        approver_name = approver.username if approver else None
         
         # Get icon based on status and operation type
         if req.status == ApprovalStatus.APPROVED:
@@ -536,18 +508,15 @@ async def get_mentor_approval_requests(
         ApprovalRequest.requester_id == current_mentor.id
     ).order_by(ApprovalRequest.created_at.desc()).all()
     
+    # Approvers are admins or managers; resolve them all in one batch
+    from identity_directory import identity_directory
+    approvers = identity_directory.find_roles(db, [req.approved_by for req in requests], ("Admin", "Manager"))
+    
     result = []
     for req in requests:
         # Get approver name
-        approver_name = None
-        if req.approved_by:
-            admin_check = db.query(Admin).filter(Admin.id == req.approved_by).first()
-            if admin_check:
-                approver_name = admin_check.username
-            else:
-                manager_check = db.query(Manager).filter(Manager.id == req.approved_by).first()
-                if manager_check:
-                    approver_name = manager_check.username
+        approver = approvers.get(req.approved_by)
+        approver_name = approver.username if approver else None
         
         # Get icon based on status and operation type
         if req.status == ApprovalStatus.APPROVED:
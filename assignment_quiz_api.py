@@ -24,6 +24,7 @@ except ImportError:
 from auth import get_current_admin, get_current_presenter, get_current_mentor, get_current_user, get_current_admin_or_presenter
 from logging_utils import log_student_action
 from email_utils import send_content_added_notification
+from quiz_grading import answer_keys, record_submission, regrade_quiz, touch_quiz
 
 router = APIRouter(prefix="/assignments-quizzes", tags=["Assignments & Quizzes"])
 
@@ -83,6 +84,12 @@ class QuizQuestionCreate(BaseModel):
     correct_answer: str
     marks: int = Field(default=1, ge=1, le=100)
 
+class QuizQuestionUpdate(BaseModel):
+    question_text: Optional[str] = Field(None, min_length=1)
+    options: Optional[List[str]] = None
+    correct_answer: Optional[str] = None
+    marks: Optional[int] = Field(None, ge=1, le=100)
+
 class QuizUpdate(BaseModel):
     title: Optional[str] = Field(None, min_length=1, max_length=200)
     description: Optional[str] = None
@@ -961,6 +968,7 @@ async def add_quiz_question(
         )
 
         db.add(question)
+        quiz.updated_at = datetime.utcnow()
         db.commit()
         db.refresh(question)
 
@@ -1092,6 +1100,7 @@ async def delete_quiz_question(
         if not question:
             raise HTTPException(status_code=404, detail="Question not found")
         
+        touch_quiz(db, question.quiz_id)
         db.delete(question)
         db.commit()
         
@@ -1102,6 +1111,75 @@ async def delete_quiz_question(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete question: {str(e)}")
 
+@router.put("/questions/{question_id}")
+async def update_quiz_question(
+    question_id: int,
+    question_data: QuizQuestionUpdate,
+    current_user = Depends(get_current_admin_or_presenter),
+    db: Session = Depends(get_db)
+):
+    """Update a quiz question, e.g. to correct its answer key (Admin/Presenter only).
+
+    Existing attempts keep their marks until the quiz is re-graded.
+    """
+    try:
+        question = db.query(QuizQuestion).filter(QuizQuestion.id == question_id).first()
+        if not question:
+            raise HTTPException(status_code=404, detail="Question not found")
+
+        if question_data.question_text is not None:
+            question.question_text = question_data.question_text
+        if question_data.options is not None:
+            question.options = question_data.options
+        if question_data.correct_answer is not None:
+            question.correct_answer = question_data.correct_answer
+        if question_data.marks is not None:
+            question.marks = question_data.marks
+
+        touch_quiz(db, question.quiz_id)
+        db.commit()
+        db.refresh(question)
+
+        return {
+            "message": "Question updated successfully",
+            "question": {
+                "id": question.id,
+                "question_text": question.question_text,
+                "question_type": question.question_type.value,
+                "options": question.options,
+                "correct_answer": question.correct_answer,
+                "marks": question.marks,
+                "order_index": question.order_index
+            }
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to update question: {str(e)}")
+
+@router.post("/quizzes/{quiz_id}/regrade")
+async def regrade_quiz_attempts(
+    quiz_id: int,
+    current_user = Depends(get_current_admin_or_presenter),
+    db: Session = Depends(get_db)
+):
+    """Re-grade every completed attempt of a quiz against its current answer key (Admin/Presenter only)"""
+    try:
+        quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+        if not quiz:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+
+        summary = regrade_quiz(db, quiz)
+        db.commit()
+
+        return {"message": "Quiz re-graded successfully", "quiz_id": quiz.id, **summary}
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to re-grade quiz: {str(e)}")
+
 @router.get("/quizzes/{quiz_id}/questions")
 async def get_quiz_questions(
     quiz_id: int,
@@ -1186,44 +1264,11 @@ async def submit_quiz_attempt(
         if not attempt:
             raise HTTPException(status_code=404, detail="No active quiz attempt found")
 
-        # Get quiz and questions
+        # Grade against the quiz's compiled answer key; answers are inserted in one statement
         quiz = db.query(Quiz).filter(Quiz.id == attempt_data.quiz_id).first()
-        questions = db.query(QuizQuestion).filter(QuizQuestion.quiz_id == quiz.id).all()
-        question_dict = {q.id: q for q in questions}
-
-        total_marks_obtained = 0
-
-        # Process answers
-        for answer_data in attempt_data.answers:
-            question = question_dict.get(answer_data.question_id)
-            if not question:
-                continue
-
-            is_correct = False
-            marks_obtained = 0
-
-            # Auto-evaluate objective questions
-            if question.question_type == QuestionType.MCQ:
-                if answer_data.selected_option is not None:
-                    correct_option = int(question.correct_answer)
-                    is_correct = answer_data.selected_option == correct_option
-                    marks_obtained = question.marks if is_correct else 0
-            elif question.question_type == QuestionType.TRUE_FALSE:
-                if answer_data.answer_text:
-                    is_correct = answer_data.answer_text.lower().strip() == question.correct_answer.lower().strip()
-                    marks_obtained = question.marks if is_correct else 0
-
-            # Create answer record
-            quiz_answer = QuizAnswer(
-                attempt_id=attempt.id,
-                question_id=question.id,
-                answer_text=answer_data.answer_text,
-                selected_option=answer_data.selected_option,
-                is_correct=is_correct,
-                marks_obtained=marks_obtained
-            )
-            db.add(quiz_answer)
-            total_marks_obtained += marks_obtained
+        if not quiz:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        key = answer_keys.get(db, quiz)
 
         # Update attempt
         attempt.status = QuizStatus.COMPLETED
@@ -1232,20 +1277,10 @@ async def submit_quiz_attempt(
         attempt.time_taken_minutes = int(time_taken)
 
         # Create result
-        percentage = (total_marks_obtained / quiz.total_marks) * 100
-        grade = "A+" if percentage >= 90 else "A" if percentage >= 80 else "B+" if percentage >= 70 else "B" if percentage >= 60 else "C" if percentage >= 50 else "F"
-
-        result = QuizResult(
-            quiz_id=quiz.id,
-            attempt_id=attempt.id,
-            student_id=current_user.id,
-            total_marks=quiz.total_marks,
-            marks_obtained=total_marks_obtained,
-            percentage=percentage,
-            grade=grade,
-            auto_evaluated=True
-        )
-        db.add(result)
+        result = record_submission(db, attempt, key, attempt_data.answers)
+        total_marks_obtained = result.marks_obtained
+        percentage = result.percentage
+        grade = result.grade
 
         db.commit()
 
@@ -1309,154 +1344,46 @@ async def get_student_assignments(
 ):
     """Get assignments for current student - only from enrolled courses"""
     try:
-        from database import CohortCourse, Course, Module, Enrollment
-        from cohort_specific_models import CohortSpecificCourse, CohortCourseModule, CohortCourseSession
-        
-        result = []
+        from entitlement_service import get_student_entitlements
+        from student_coursework import student_assignments
         
-        # Get student's enrollment status to get all cohort access
-        from student_dashboard_endpoints import get_student_enrollment_status
-        enrollment_status = get_student_enrollment_status(db, current_user.id)
-        
-        # Get all relevant cohort IDs
-        user_cohorts = enrollment_status.get("user_cohorts", [])
-        cohort_ids = [uc.cohort_id for uc in user_cohorts]
-        student = db.query(User).filter(User.id == current_user.id).first()
-        if student and student.cohort_id and student.cohort_id not in cohort_ids:
-            cohort_ids.append(student.cohort_id)
-            
-        if not cohort_ids:
+        # Cohort membership (UserCohort or User.cohort_id) is required to see any work
+        entitlements = get_student_entitlements(db, current_user.id)
+        if not entitlements["cohort_ids"]:
             return {"assignments": []}
         
-        # 1. Get assignments from global courses assigned to student's cohorts
-        active_course_ids = list(enrollment_status.get("enrolled_regular_course_ids", set()))
-        
-        if active_course_ids:
-            modules = db.query(Module).filter(Module.course_id.in_(active_course_ids)).all()
-            
-            if modules:
-                module_ids = [m.id for m in modules]
-                sessions = db.query(SessionModel).filter(SessionModel.module_id.in_(module_ids)).all()
-                
-                if sessions:
-                    session_ids = [s.id for s in sessions]
-                    assignments = db.query(Assignment).filter(
-                        Assignment.session_id.in_(session_ids),
-                        Assignment.session_type == "global",
-                        Assignment.is_active == True
-                    ).all()
-
-                    for assignment in assignments:
-                        submission = db.query(AssignmentSubmission).filter(
-                            AssignmentSubmission.assignment_id == assignment.id,
-                            AssignmentSubmission.student_id == current_user.id
-                        ).first()
-
-                        grade = None
-                        if submission:
-                            grade_record = db.query(AssignmentGrade).filter(
-                                AssignmentGrade.submission_id == submission.id
-                            ).first()
-                            if grade_record:
-                                grade = {
-                                    "marks_obtained": grade_record.marks_obtained,
-                                    "total_marks": grade_record.total_marks,
-                                    "percentage": grade_record.percentage,
-                                    "feedback": grade_record.feedback
-                                }
-                        
-                        session = db.query(SessionModel).filter(SessionModel.id == assignment.session_id).first()
-                        module = db.query(Module).filter(Module.id == session.module_id).first() if session else None
-                        course = db.query(Course).filter(Course.id == module.course_id).first() if module else None
-
-                        result.append({
-                            "id": assignment.id,
-                            "title": assignment.title,
-                            "description": assignment.description,
-                            "instructions": assignment.instructions,
-                            "file_path": assignment.file_path,  # Add file_path for assignment materials
-                            "due_date": assignment.due_date,
-                            "total_marks": assignment.total_marks,
-                            "submission_type": assignment.submission_type.value,
-                            "status": submission.status.value if submission else "PENDING",
-                            "submitted_at": submission.submitted_at if submission else None,
-                            "grade": grade,
-                            "session_title": session.title if session else "Unknown",
-                            "module_title": module.title if module else "Unknown",
-                            "course_title": course.title if course else "Unknown",
-                            "course_type": "regular"
-                        })
-        
-        # 2. Get assignments from cohort-specific courses assigned to student's cohorts
-        cohort_course_ids = list(enrollment_status.get("enrolled_cohort_course_ids", set()))
-        
-        if cohort_course_ids:
-            
-            if cohort_course_ids:
-                cohort_modules = db.query(CohortCourseModule).filter(
-                    CohortCourseModule.course_id.in_(cohort_course_ids)
-                ).all()
-            
-                if cohort_modules:
-                    cohort_module_ids = [m.id for m in cohort_modules]
-                    cohort_sessions = db.query(CohortCourseSession).filter(
-                        CohortCourseSession.module_id.in_(cohort_module_ids)
-                    ).all()
-                    
-                    if cohort_sessions:
-                        cohort_session_ids = [s.id for s in cohort_sessions]
-                        cohort_assignments = db.query(Assignment).filter(
-                            Assignment.session_id.in_(cohort_session_ids),
-                            Assignment.session_type == "cohort",
-                            Assignment.is_active == True
-                        ).all()
-
-                        for assignment in cohort_assignments:
-                            submission = db.query(AssignmentSubmission).filter(
-                                AssignmentSubmission.assignment_id == assignment.id,
-                                AssignmentSubmission.student_id == current_user.id
-                            ).first()
-
-                            grade = None
-                            if submission:
-                                grade_record = db.query(AssignmentGrade).filter(
-                                    AssignmentGrade.submission_id == submission.id
-                                ).first()
-                                if grade_record:
-                                    grade = {
-                                        "marks_obtained": grade_record.marks_obtained,
-                                        "total_marks": grade_record.total_marks,
-                                        "percentage": grade_record.percentage,
-                                        "feedback": grade_record.feedback
-                                    }
-                            
-                            cohort_session = db.query(CohortCourseSession).filter(
-                                CohortCourseSession.id == assignment.session_id
-                            ).first()
-                            cohort_module = db.query(CohortCourseModule).filter(
-                                CohortCourseModule.id == cohort_session.module_id
-                            ).first() if cohort_session else None
-                            cohort_course = db.query(CohortSpecificCourse).filter(
-                                CohortSpecificCourse.id == cohort_module.course_id
-                            ).first() if cohort_module else None
-
-                            result.append({
-                                "id": assignment.id,
-                                "title": assignment.title,
-                                "description": assignment.description,
-                                "instructions": assignment.instructions,
-                                "file_path": assignment.file_path,  # Add file_path for assignment materials
-                                "due_date": assignment.due_date,
-                                "total_marks": assignment.total_marks,
-                                "submission_type": assignment.submission_type.value,
-                                "status": submission.status.value if submission else "PENDING",
-                                "submitted_at": submission.submitted_at if submission else None,
-                                "grade": grade,
-                                "session_title": cohort_session.title if cohort_session else "Unknown",
-                                "module_title": cohort_module.title if cohort_module else "Unknown",
-                                "course_title": cohort_course.title if cohort_course else "Unknown",
-                                "course_type": "cohort_specific"
-                            })
+        result = []
+        for row in student_assignments(
+            db, current_user.id,
+            entitlements["enrolled_regular_course_ids"],
+            entitlements["cohort_specific_course_ids"]
+        ):
+            assignment, submission, grade_record = row.Assignment, row.AssignmentSubmission, row.AssignmentGrade
+            grade = None
+            if grade_record:
+                grade = {
+                    "marks_obtained": grade_record.marks_obtained,
+                    "total_marks": grade_record.total_marks,
+                    "percentage": grade_record.percentage,
+                    "feedback": grade_record.feedback
+                }
+            result.append({
+                "id": assignment.id,
+                "title": assignment.title,
+                "description": assignment.description,
+                "instructions": assignment.instructions,
+                "file_path": assignment.file_path,  # Add file_path for assignment materials
+                "due_date": assignment.due_date,
+                "total_marks": assignment.total_marks,
+                "submission_type": assignment.submission_type.value,
+                "status": submission.status.value if submission else "PENDING",
+                "submitted_at": submission.submitted_at if submission else None,
+                "grade": grade,
+                "session_title": row.session_title or "Unknown",
+                "module_title": row.module_title or "Unknown",
+                "course_title": row.course_title or "Unknown",
+                "course_type": row.course_type
+            })
 
         return {"assignments": result}
 
@@ -1473,149 +1400,42 @@ async def get_student_quizzes(
 ):
     """Get quizzes for current student - only from enrolled courses"""
     try:
-        from database import CohortCourse, Course, Module, Enrollment
-        from cohort_specific_models import CohortSpecificCourse, CohortCourseModule, CohortCourseSession
-        
-        result = []
-        
-        # Get student's enrollment status to get all cohort access
-        from student_dashboard_endpoints import get_student_enrollment_status
-        enrollment_status = get_student_enrollment_status(db, current_user.id)
+        from entitlement_service import get_student_entitlements
+        from student_coursework import student_quizzes
         
-        # Get all relevant cohort IDs
-        user_cohorts = enrollment_status.get("user_cohorts", [])
-        cohort_ids = [uc.cohort_id for uc in user_cohorts]
-        student = db.query(User).filter(User.id == current_user.id).first()
-        if student and student.cohort_id and student.cohort_id not in cohort_ids:
-            cohort_ids.append(student.cohort_id)
-            
-        if not cohort_ids:
+        # Cohort membership (UserCohort or User.cohort_id) is required to see any work
+        entitlements = get_student_entitlements(db, current_user.id)
+        if not entitlements["cohort_ids"]:
             return {"quizzes": []}
         
-        # 1. Get quizzes from global courses assigned to student's cohorts
-        active_course_ids = list(enrollment_status.get("enrolled_regular_course_ids", set()))
-        
-        if active_course_ids:
-            modules = db.query(Module).filter(Module.course_id.in_(active_course_ids)).all()
-            
-            if modules:
-                module_ids = [m.id for m in modules]
-                sessions = db.query(SessionModel).filter(SessionModel.module_id.in_(module_ids)).all()
-                
-                if sessions:
-                    session_ids = [s.id for s in sessions]
-                    quizzes = db.query(Quiz).filter(
-                        Quiz.session_id.in_(session_ids),
-                        Quiz.is_active == True
-                    ).all()
-
-                for quiz in quizzes:
-                    # Check attempt status
-                    attempt = db.query(QuizAttempt).filter(
-                        QuizAttempt.quiz_id == quiz.id,
-                        QuizAttempt.student_id == current_user.id
-                    ).first()
-
-                    # Get result if exists
-                    quiz_result = None
-                    if attempt and attempt.status == QuizStatus.COMPLETED:
-                        result_record = db.query(QuizResult).filter(
-                            QuizResult.attempt_id == attempt.id
-                        ).first()
-                        if result_record:
-                            quiz_result = {
-                                "marks_obtained": result_record.marks_obtained,
-                                "total_marks": result_record.total_marks,
-                                "percentage": result_record.percentage,
-                                "grade": result_record.grade,
-                                "time_taken_minutes": attempt.time_taken_minutes
-                            }
-                    
-                    # Get session and module info
-                    session = db.query(SessionModel).filter(SessionModel.id == quiz.session_id).first()
-                    module = db.query(Module).filter(Module.id == session.module_id).first() if session else None
-                    course = db.query(Course).filter(Course.id == module.course_id).first() if module else None
-
-                    result.append({
-                        "id": quiz.id,
-                        "title": quiz.title,
-                        "description": quiz.description,
-                        "time_limit_minutes": quiz.time_limit_minutes,
-                        "total_marks": quiz.total_marks,
-                        "status": attempt.status.value if attempt else "NOT_ATTEMPTED",
-                        "result": quiz_result,
-                        "session_title": session.title if session else "Unknown",
-                        "module_title": module.title if module else "Unknown",
-                        "course_title": course.title if course else "Unknown"
-                    })
-        
-        # 2. Get quizzes from cohort-specific courses assigned to student's cohorts
-        cohort_course_ids = list(enrollment_status.get("enrolled_cohort_course_ids", set()))
-        
-        if cohort_course_ids:
-            
-            if cohort_course_ids:
-                cohort_modules = db.query(CohortCourseModule).filter(
-                    CohortCourseModule.course_id.in_(cohort_course_ids)
-                ).all()
-            
-            if cohort_modules:
-                cohort_module_ids = [m.id for m in cohort_modules]
-                cohort_sessions = db.query(CohortCourseSession).filter(
-                    CohortCourseSession.module_id.in_(cohort_module_ids)
-                ).all()
-                
-                if cohort_sessions:
-                    cohort_session_ids = [s.id for s in cohort_sessions]
-                    cohort_quizzes = db.query(Quiz).filter(
-                        Quiz.session_id.in_(cohort_session_ids),
-                        Quiz.is_active == True
-                    ).all()
-
-                    for quiz in cohort_quizzes:
-                        # Check attempt status
-                        attempt = db.query(QuizAttempt).filter(
-                            QuizAttempt.quiz_id == quiz.id,
-                            QuizAttempt.student_id == current_user.id
-                        ).first()
-
-                        # Get result if exists
-                        quiz_result = None
-                        if attempt and attempt.status == QuizStatus.COMPLETED:
-                            result_record = db.query(QuizResult).filter(
-                                QuizResult.attempt_id == attempt.id
-                            ).first()
-                            if result_record:
-                                quiz_result = {
-                                    "marks_obtained": result_record.marks_obtained,
-                                    "total_marks": result_record.total_marks,
-                                    "percentage": result_record.percentage,
-                                    "grade": result_record.grade,
-                                    "time_taken_minutes": attempt.time_taken_minutes
-                                }
-                        
-                        cohort_session = db.query(CohortCourseSession).filter(
-                            CohortCourseSession.id == quiz.session_id
-                        ).first()
-                        cohort_module = db.query(CohortCourseModule).filter(
-                            CohortCourseModule.id == cohort_session.module_id
-                        ).first() if cohort_session else None
-                        cohort_course = db.query(CohortSpecificCourse).filter(
-                            CohortSpecificCourse.id == cohort_module.course_id
-                        ).first() if cohort_module else None
-
-                        result.append({
-                            "id": quiz.id,
-                            "title": quiz.title,
-                            "description": quiz.description,
-                            "time_limit_minutes": quiz.time_limit_minutes,
-                            "total_marks": quiz.total_marks,
-                            "status": attempt.status.value if attempt else "NOT_ATTEMPTED",
-                            "result": quiz_result,
-                            "session_title": cohort_session.title if cohort_session else "Unknown",
-                            "module_title": cohort_module.title if cohort_module else "Unknown",
-                            "course_title": cohort_course.title if cohort_course else "Unknown"
-                        })
+        result = []
+        for row in student_quizzes(
+            db, current_user.id,
+            entitlements["enrolled_regular_course_ids"],
+            entitlements["cohort_specific_course_ids"]
+        ):
+            quiz, attempt, result_record = row.Quiz, row.QuizAttempt, row.QuizResult
+            quiz_result = None
+            if attempt and attempt.status == QuizStatus.COMPLETED and result_record:
+                quiz_result = {
+                    "marks_obtained": result_record.marks_obtained,
+                    "total_marks": result_record.total_marks,
+                    "percentage": result_record.percentage,
+                    "grade": result_record.grade,
+                    "time_taken_minutes": attempt.time_taken_minutes
+                }
+            result.append({
+                "id": quiz.id,
+                "title": quiz.title,
+                "description": quiz.description,
+                "time_limit_minutes": quiz.time_limit_minutes,
+                "total_marks": quiz.total_marks,
+                "status": attempt.status.value if attempt else "NOT_ATTEMPTED",
+                "result": quiz_result,
+                "session_title": row.session_title or "Unknown",
+                "module_title": row.module_title or "Unknown",
+                "course_title": row.course_title or "Unknown"
+            })
 
         return {"quizzes": result}
 
@@ -0,0 +1,499 @@
+from __future__ import annotations
+
+import os
+import re
+import uuid
+import logging
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+from sqlalchemy import bindparam
+from sqlalchemy.orm import Session
+
+from database import User, Enrollment, UserCohort
+from cohort_specific_models import CohortCourseSession, CohortAttendance, CohortSpecificEnrollment
+from job_queue import job_handler, JobContext
+from lazy_imports import lazy_module
+
+logger = logging.getLogger(__name__)
+
+# The job workers import this module at startup; pandas is loaded by the first import run
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
+# Reports uploaded for a batch import wait here until the job has read them. Kept out of
+# uploads/, which is served publicly, since the reports list participants' emails
+ATTENDANCE_IMPORT_DIR = Path(os.getenv("ATTENDANCE_IMPORT_DIR", "attendance_imports"))
+
+# Report formats Teams/Zoom export; anything else is rejected before it is read or stored
+REPORT_EXTENSIONS = ("csv", "xlsx", "xls")
+
+DEFAULT_MIN_DURATION_MINUTES = 5
+REPORT_SAMPLE_LIMIT = 50
+
+_attendance = CohortAttendance.__table__
+
+
+def parse_duration_string(dur_str: str) -> float:
+    """Parse duration strings like '1h 27m 29s', '46m 5s', 'hh:mm:ss', 'mm:ss' to minutes."""
+    if not dur_str or not isinstance(dur_str, str):
+        if isinstance(dur_str, (int, float)):
+            return float(dur_str)
+        return 0.0
+
+    dur_str = dur_str.lower().strip()
+
+    # Handle '1h 27m 29s' format
+    if any(unit in dur_str for unit in ['h', 'm', 's']):
+        total_minutes = 0.0
+        # Hours
+        h_match = re.search(r'(\d+)\s*h', dur_str)
+        if h_match:
+            total_minutes += int(h_match.group(1)) * 60
+        # Minutes
+        m_match = re.search(r'(\d+)\s*m', dur_str)
+        if m_match:
+            total_minutes += int(m_match.group(1))
+        # Seconds
+        s_match = re.search(r'(\d+)\s*s', dur_str)
+        if s_match:
+            total_minutes += int(s_match.group(1)) / 60
+
+        if total_minutes > 0:
+            return total_minutes
+
+    # Handle 'hh:mm:ss' or 'mm:ss'
+    if ':' in dur_str:
+        parts = dur_str.split(':')
+        try:
+            if len(parts) == 3: # hh:mm:ss
+                return int(parts[0])*60 + int(parts[1]) + int(parts[2])/60
+            elif len(parts) == 2: # mm:ss
+                return int(parts[0]) + int(parts[1])/60
+        except ValueError:
+            pass
+
+    # Fallback: try removing common non-numeric chars if it's not a standard format
+    try:
+        clean_val = re.sub(r'[^\d.]', '', dur_str)
+        if clean_val:
+            return float(clean_val)
+    except ValueError:
+        pass
+
+    return 0.0
+
+
+def _row_texts(df: pd.DataFrame) -> List[Tuple[int, str]]:
+    """(non-empty cell count, lower-cased joined text) of each row"""
+    result = []
+    for values in df.to_numpy(dtype=object):
+        cells = [str(val).strip() for val in values if pd.notna(val)]
+        result.append((len(cells), " ".join(cells).lower()))
+    return result
+
+
+def report_extension(filename: Optional[str]) -> str:
+    """Lower-case extension of an uploaded report; raises ValueError for unsupported files"""
+    name = filename or ""
+    file_ext = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+    if file_ext not in REPORT_EXTENSIONS:
+        raise ValueError("Only CSV and Excel files are allowed")
+    return file_ext
+
+
+def read_attendance_report(contents: bytes, file_ext: str) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    """Parse a Teams/Zoom attendance report once into its summary and participant rows.
+
+    Raises ValueError when the file cannot be read as a spreadsheet.
+    """
+    try:
+        if file_ext == 'csv':
+            df_raw = pd.read_csv(BytesIO(contents), header=None)
+        else:
+            df_raw = pd.read_excel(BytesIO(contents), header=None)
+    except Exception as e:
+        raise ValueError(f"Could not read attendance report: {str(e)}")
+    # Cells holding only whitespace count as empty
+    df_raw = df_raw.replace(r'^\s*$', np.nan, regex=True)
+
+    # 1. SUMMARY EXTRACTION (Scan rows 0-15)
+    summary_data = {}
+    for values in df_raw.head(15).to_numpy(dtype=object):
+        row_vals = [str(val).strip() for val in values if pd.notna(val)]
+        row_str = " ".join(row_vals).lower()
+
+        if 'meeting title' in row_str and len(row_vals) >= 2:
+            summary_data['title'] = row_vals[1]
+        elif 'start time' in row_str and len(row_vals) >= 2:
+            summary_data['start_time'] = row_vals[1]
+        elif 'end time' in row_str and len(row_vals) >= 2:
+            summary_data['end_time'] = row_vals[1]
+        elif 'overall meeting duration' in row_str and len(row_vals) >= 2:
+            summary_data['duration_str'] = row_vals[1]
+            summary_data['duration_minutes'] = parse_duration_string(row_vals[1])
+
+    # 2. PARTICIPANT DATA START DETECTION
+    header_row = 0
+    participants_found = False
+    keywords = ['name', 'first join', 'last leave', 'duration', 'email', 'in-meeting duration']
+    for i, values in enumerate(df_raw.head(60).to_numpy(dtype=object)):
+        row_vals_raw = [str(val).lower().strip() for val in values if pd.notna(val)]
+        row_str = " ".join(row_vals_raw)
+        if not participants_found:
+            if '2. participants' in row_str or (len(row_vals_raw) == 1 and row_vals_raw[0] == 'participants'):
+                participants_found = True
+            continue
+        matches = sum(1 for val in row_vals_raw if any(key in val for key in keywords))
+        if matches >= 3:
+            header_row = i
+            break
+
+    df = df_raw.iloc[header_row + 1:].reset_index(drop=True)
+    df.columns = [str(col).strip() for col in df_raw.iloc[header_row]]
+
+    # Participants end at the first blank row or the "In-Meeting activities" section
+    for i, (cells, text) in enumerate(_row_texts(df)):
+        if not text or (cells == 1 and 'activities' in text):
+            df = df.iloc[:i]
+            break
+    return summary_data, df
+
+
+class StudentMatcher:
+    """Hash indexes over enrolled students for matching report participants.
+
+    Tiers, in order: email, exact username (also with spaces removed), then token overlap
+    for variations like "Aditi H Nayak" vs "Aditi Nayak". When several students qualify
+    the first one in enrollment order wins, as with a linear scan.
+    """
+
+    def __init__(self, students: Sequence[Tuple[int, Optional[str], str]]):
+        self.student_ids = [student_id for student_id, _, _ in students]
+        self._by_email: Dict[str, int] = {}
+        self._by_name: Dict[str, int] = {}
+        self._tokens: List[set] = []
+        self._by_token: Dict[str, List[int]] = {}
+        for position, (_, email, username) in enumerate(students):
+            if email:
+                self._by_email.setdefault(email.lower(), position)
+            name = (username or "").lower()
+            self._by_name.setdefault(name, position)
+            tokens = set(name.split())
+            self._tokens.append(tokens)
+            for token in tokens:
+                self._by_token.setdefault(token, []).append(position)
+
+    def match(self, email: Optional[str], report_name: str) -> Tuple[Optional[int], Optional[str], int]:
+        """(student id, tier, number of token candidates) for one participant"""
+        if email:
+            position = self._by_email.get(email)
+            if position is not None:
+                return self.student_ids[position], "email", 1
+        if not report_name:
+            return None, None, 0
+
+        # Tier 2: Exact Name Match
+        name = report_name.lower()
+        positions = [p for p in (self._by_name.get(name), self._by_name.get(name.replace(" ", ""))) if p is not None]
+        if positions:
+            return self.student_ids[min(positions)], "name", 1
+
+        # Tier 3: Smart Token Match, only over students sharing at least one token
+        report_tokens = set(name.split())
+        candidates = set()
+        for token in report_tokens:
+            candidates.update(self._by_token.get(token, ()))
+        hits = []
+        for position in sorted(candidates):
+            db_tokens = self._tokens[position]
+            if report_tokens.issubset(db_tokens) or db_tokens.issubset(report_tokens):
+                # Verify significant overlap (at least 2 tokens or the only token)
+                common = report_tokens & db_tokens
+                if len(common) >= 2 or (len(report_tokens) == 1 and len(common) == 1):
+                    hits.append(position)
+        if hits:
+            return self.student_ids[hits[0]], "token", len(hits)
+        return None, None, 0
+
+
+def _find_column(df: pd.DataFrame, keyword: str) -> Optional[int]:
+    return next((i for i, c in enumerate(df.columns) if keyword in c.lower()), None)
+
+
+def _to_datetimes(values: pd.Series) -> pd.Series:
+    try:
+        return pd.to_datetime(values, errors='coerce', format='mixed')
+    except (ValueError, TypeError):
+        # Mixed timezone-aware and naive values cannot share a column dtype
+        def parse(value):
+            try:
+                return pd.to_datetime(value)
+            except (ValueError, TypeError):
+                return pd.NaT
+        return values.map(parse)
+
+
+def consolidate_participants(df: pd.DataFrame, matcher: StudentMatcher) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Match report rows to students and merge each student's rows.
+
+    Returns one row per matched student (first join, last leave, total duration, report
+    name) indexed by student id, and a report on how the rows were matched.
+    """
+    email_col = _find_column(df, 'email')
+    name_col = _find_column(df, 'name')
+    join_col = _find_column(df, 'join')
+    leave_col = _find_column(df, 'leave')
+    duration_col = _find_column(df, 'duration')
+    empty = pd.Series([np.nan] * len(df), index=df.index, dtype=object)
+
+    def column(position):
+        return df.iloc[:, position] if position is not None else empty
+
+    names = column(name_col).map(lambda v: str(v).strip() if pd.notna(v) else "Unknown")
+    clean_names = names.str.replace(r'\s*\([^)]*\)', '', regex=True).str.strip()
+    emails = column(email_col).map(lambda v: str(v).strip().lower() if pd.notna(v) else None)
+
+    # Match each distinct (email, name) once
+    matches = {}
+    for key in set(zip(emails, clean_names)):
+        matches[key] = matcher.match(*key)
+    matched = [matches[key] for key in zip(emails, clean_names)]
+
+    frame = pd.DataFrame({
+        "student_id": [student_id for student_id, _, _ in matched],
+        "first_join": _to_datetimes(column(join_col)),
+        "last_leave": _to_datetimes(column(leave_col)),
+        "total_duration": column(duration_col).map(lambda v: parse_duration_string(str(v)) if pd.notna(v) else 0.0),
+        "report_name": names,
+    }, index=df.index)
+    frame = frame[frame["student_id"].notna()]
+    consolidated = frame.groupby("student_id", sort=False).agg(
+        first_join=("first_join", "min"),
+        last_leave=("last_leave", "max"),
+        total_duration=("total_duration", "sum"),
+        report_name=("report_name", "first"),
+    )
+
+    tiers = pd.Series([tier for _, tier, _ in matched], dtype=object)
+    unmatched = names[[student_id is None for student_id, _, _ in matched]]
+    ambiguous = sorted({
+        (names.iloc[i], count) for i, (_, tier, count) in enumerate(matched) if tier == "token" and count > 1
+    })
+    report = {
+        "rows": len(df),
+        "matched_rows": int(tiers.notna().sum()),
+        "matched_by": {tier: int((tiers == tier).sum()) for tier in ("email", "name", "token")},
+        "unmatched_rows": len(unmatched),
+        "unmatched_names": list(dict.fromkeys(unmatched))[:REPORT_SAMPLE_LIMIT],
+        "ambiguous_token_matches": [
+            {"report_name": name, "candidates": count} for name, count in ambiguous[:REPORT_SAMPLE_LIMIT]
+        ],
+        "students_matched": len(consolidated),
+    }
+    return consolidated, report
+
+
+def enrolled_students(db: Session, cohort_id: int, course_id: int) -> List[Tuple[int, Optional[str], str]]:
+    """(id, email, username) of the students an attendance report is matched against"""
+    columns = (User.id, User.email, User.username)
+    students = db.query(*columns).join(Enrollment, User.id == Enrollment.student_id).filter(
+        Enrollment.cohort_id == cohort_id, Enrollment.course_id == course_id
+    ).all()
+
+    if not students:
+        students = db.query(*columns).join(CohortSpecificEnrollment, User.id == CohortSpecificEnrollment.student_id).filter(
+            CohortSpecificEnrollment.course_id == course_id
+        ).all()
+
+    # Fallback: Get all students in this cohort if no specific course enrollment found
+    if not students:
+        students = db.query(*columns).join(
+            UserCohort, User.id == UserCohort.user_id
+        ).filter(
+            UserCohort.cohort_id == cohort_id,
+            UserCohort.is_active == True
+        ).all()
+    return list(dict.fromkeys((row.id, row.email, row.username) for row in students))
+
+
+def _py_datetime(value) -> Optional[datetime]:
+    return None if pd.isna(value) else value.to_pydatetime()
+
+
+def save_attendance(db: Session, session_id: int, student_ids: Sequence[int],
+                    consolidated: pd.DataFrame, min_duration: float) -> int:
+    """Upsert one attendance row per enrolled student; returns how many were in the report.
+
+    Students missing from the report are marked absent. Existing rows are updated with one
+    executemany UPDATE and new ones added with one executemany INSERT.
+    """
+    existing: Dict[int, int] = {}
+    for attendance_id, student_id in db.query(CohortAttendance.id, CohortAttendance.student_id).filter(
+        CohortAttendance.session_id == session_id
+    ).order_by(CohortAttendance.id):
+        existing.setdefault(student_id, attendance_id)
+
+    report = consolidated.to_dict("index")
+    now = datetime.utcnow()
+    updates, inserts = [], []
+    present = 0
+    for student_id in student_ids:
+        info = report.get(student_id)
+        if info:
+            # Student found in report - check duration
+            present += 1
+            values = {
+                "attended": bool(info["total_duration"] >= min_duration),
+                "first_join_time": _py_datetime(info["first_join"]),
+                "last_leave_time": _py_datetime(info["last_leave"]),
+                "total_duration_minutes": float(info["total_duration"]),
+            }
+        else:
+            # Student NOT in report - mark ABSENT
+            values = {"attended": False, "first_join_time": None, "last_leave_time": None, "total_duration_minutes": 0.0}
+
+        if student_id in existing:
+            updates.append({"b_id": existing[student_id], "b_updated_at": now,
+                            **{f"b_{key}": value for key, value in values.items()}})
+        else:
+            inserts.append({"session_id": session_id, "student_id": student_id, "created_at": now,
+                            "updated_at": now, **values})
+
+    if updates:
+        db.execute(
+            _attendance.update().where(_attendance.c.id == bindparam("b_id")).values(
+                attended=bindparam("b_attended"),
+                first_join_time=bindparam("b_first_join_time"),
+                last_leave_time=bindparam("b_last_leave_time"),
+                total_duration_minutes=bindparam("b_total_duration_minutes"),
+                updated_at=bindparam("b_updated_at"),
+            ),
+            updates
+        )
+    if inserts:
+        db.execute(_attendance.insert(), inserts)
+    return present
+
+
+def import_attendance_report(db: Session, cohort_id: int, course_id: int, session_id: int,
+                             contents: bytes, file_ext: str, start_time: Optional[str] = None,
+                             end_time: Optional[str] = None,
+                             min_duration_minutes: Optional[int] = None) -> Dict[str, Any]:
+    """Import one attendance report into a session and commit it.
+
+    Blocking: call it from a worker thread or a job. Raises LookupError for an unknown
+    session and ValueError for an unreadable file.
+    """
+    session = db.query(CohortCourseSession).filter(CohortCourseSession.id == session_id).first()
+    if not session:
+        raise LookupError("Session not found")
+
+    summary_data, df = read_attendance_report(contents, file_ext)
+
+    # Auto-update session metadata if found
+    if summary_data.get('title'):
+        session.title = summary_data['title']
+    if summary_data.get('duration_minutes'):
+        session.duration_minutes = int(summary_data['duration_minutes'])
+    if summary_data.get('start_time'):
+        try:
+            # Teams format often like '2/15/26, 6:12:42 PM'
+            session.scheduled_time = pd.to_datetime(summary_data['start_time'])
+        except (ValueError, TypeError):
+            pass
+
+    students = enrolled_students(db, cohort_id, course_id)
+    consolidated, match_report = consolidate_participants(df, StudentMatcher(students))
+
+    effective_min_duration = min_duration_minutes if min_duration_minutes is not None else DEFAULT_MIN_DURATION_MINUTES
+    student_ids = [student_id for student_id, _, _ in students]
+    success_count = save_attendance(db, session_id, student_ids, consolidated, effective_min_duration)
+    db.commit()
+
+    # Calculate overall duration for response if possible
+    overall_duration = None
+    if start_time and end_time:
+        try:
+            s_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+            e_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+            overall_duration = (e_dt - s_dt).total_seconds() / 60
+        except ValueError:
+            pass
+
+    match_report["students_absent"] = len(student_ids) - success_count
+    logger.info(
+        f"Attendance import for session {session_id}: {match_report['matched_rows']}/{match_report['rows']} rows matched, "
+        f"{success_count}/{len(student_ids)} students present in report"
+    )
+    return {
+        "message": "Consolidated import completed",
+        "success_count": success_count,
+        "failed_count": match_report["unmatched_rows"], # Unmatched report rows
+        "enrolled_count": len(student_ids),
+        "errors": [f"Unmatched: {name}" for name in match_report["unmatched_names"][:15]],
+        "overall_duration_minutes": overall_duration,
+        "summary_extracted": summary_data,
+        "match_report": match_report
+    }
+
+
+def store_batch_report(contents: bytes, file_ext: str) -> str:
+    """Keep an uploaded report on disk until the batch job reads it; returns its path"""
+    if file_ext not in REPORT_EXTENSIONS:
+        raise ValueError(f"Unsupported report format: {file_ext}")
+    ATTENDANCE_IMPORT_DIR.mkdir(parents=True, exist_ok=True)
+    path = ATTENDANCE_IMPORT_DIR / f"{uuid.uuid4().hex}.{file_ext}"
+    path.write_bytes(contents)
+    return str(path)
+
+
+class AttendanceBatchItem(BaseModel):
+    session_id: int
+    path: str
+    file_ext: str
+    filename: str
+
+
+class AttendanceBatchPayload(BaseModel):
+    cohort_id: int
+    course_id: int
+    items: List[AttendanceBatchItem]
+    min_duration_minutes: Optional[int] = None
+
+
+@job_handler("attendance_import_batch", payload_model=AttendanceBatchPayload, max_attempts=3)
+def run_attendance_import_batch(db: Session, payload: AttendanceBatchPayload, ctx: JobContext):
+    """Import several attendance reports; reports finished by an earlier attempt are skipped"""
+    results: Dict[str, Any] = dict(ctx.progress.get("results", {}))
+    for index, item in enumerate(payload.items):
+        key = str(index)
+        if key in results:
+            continue
+        path = Path(item.path)
+        try:
+            if not path.exists():
+                raise ValueError("Uploaded report is no longer available")
+            result = import_attendance_report(
+                db, payload.cohort_id, payload.course_id, item.session_id,
+                path.read_bytes(), item.file_ext, min_duration_minutes=payload.min_duration_minutes
+            )
+            outcome = {
+                "session_id": item.session_id,
+                "filename": item.filename,
+                "status": "imported",
+                "success_count": result["success_count"],
+                "failed_count": result["failed_count"],
+                "enrolled_count": result["enrolled_count"],
+                "match_report": result["match_report"],
+            }
+        except (LookupError, ValueError) as e:
+            # A bad report does not fail the rest of the batch
+            db.rollback()
+            outcome = {"session_id": item.session_id, "filename": item.filename, "status": "failed", "error": str(e)}
+        results[key] = outcome
+        ctx.checkpoint(results=results)
+        path.unlink(missing_ok=True)
@@ -1,115 +1,193 @@
+from __future__ import annotations
+
 import logging
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from datetime import datetime
 
 from badge_models import BadgeConfiguration, AwardedBadge, BadgeAuditLog
-from database import User, Attendance, Session as SessionModel, StudentSessionStatus, Enrollment, Module
+from database import User, Course, Attendance, Session as SessionModel, StudentSessionStatus, Enrollment, Module
 from assignment_quiz_models import Assignment, AssignmentSubmission, AssignmentGrade
 from cohort_specific_models import CohortCourseSession, CohortCourseModule, CohortAttendance, CohortSpecificCourse
 from email_service import send_notification_email, email_service
+from email_template_engine import email_template_engine
+from lazy_imports import lazy_module
 
 logger = logging.getLogger(__name__)
 
+# Only badge evaluation needs these; loaded on first use
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
+# Criteria keys mapped to the performance metric they are checked against
+CRITERIA_METRICS = {
+    "min_attendance": "attendance",
+    "min_assignments_completed": "submitted_count",
+    "min_progress": "progress"
+}
+
 class BadgeService:
     @staticmethod
-    def get_student_performance(db: Session, student_id: int, config: BadgeConfiguration) -> Dict[str, Any]:
+    def get_config_session_ids(db: Session, config: BadgeConfiguration) -> Tuple[List[int], bool]:
         """
-        Gathers performance metrics for a student within a specific session range and course.
+        Returns the session ids in the configuration's course and week range, and whether they are cohort sessions.
         """
-        # 1. Find sessions within the course and range
-        session_ids = []
-        is_cohort = False
-        
         if config.cohort_specific_course_id:
-            is_cohort = True
-            sessions = db.query(CohortCourseSession).join(CohortCourseSession.module).filter(
+            rows = db.query(CohortCourseSession.id).join(
+                CohortCourseModule, CohortCourseSession.module_id == CohortCourseModule.id
+            ).filter(
                 CohortCourseModule.course_id == config.cohort_specific_course_id,
                 CohortCourseModule.week_number >= config.week_start,
                 CohortCourseModule.week_number <= config.week_end
             ).all()
-            session_ids = [s.id for s in sessions]
-        elif config.course_id:
-            sessions = db.query(SessionModel).join(SessionModel.module).filter(
+            return [row.id for row in rows], True
+        if config.course_id:
+            rows = db.query(SessionModel.id).join(
+                Module, SessionModel.module_id == Module.id
+            ).filter(
                 Module.course_id == config.course_id,
                 Module.week_number >= config.week_start,
                 Module.week_number <= config.week_end
             ).all()
-            session_ids = [s.id for s in sessions]
-           
+            return [row.id for row in rows], False
+        return [], False
+
+    @staticmethod
+    def get_student_performance(db: Session, student_id: int, config: BadgeConfiguration) -> Dict[str, Any]:
+        """
+        Gathers performance metrics for a student within a specific session range and course.
+        """
+        return BadgeService.get_cohort_performance(db, [student_id], config).get(student_id)
+
+    @staticmethod
+    def get_performance_frame(db: Session, student_ids: List[int], config: BadgeConfiguration) -> Optional[pd.DataFrame]:
+        """
+        Performance metrics of many students as a DataFrame indexed by student id.
+        The session set is resolved once; attendance, submissions, grades and session statuses
+        are each fetched with one grouped query for all students.
+        Returns None when the configuration covers no sessions.
+        """
+        session_ids, is_cohort = BadgeService.get_config_session_ids(db, config)
         if not session_ids:
             return None
-            
-        total_sessions = len(session_ids)
-        
-        # 2. Attendance Metrics
-        if is_cohort:
-            attended_count = db.query(CohortAttendance).filter(
-                CohortAttendance.student_id == student_id,
-                CohortAttendance.session_id.in_(session_ids),
-                CohortAttendance.attended == True
-            ).count()
-        else:
-            attended_count = db.query(Attendance).filter(
-                Attendance.student_id == student_id,
-                Attendance.session_id.in_(session_ids),
-                Attendance.attended == True
-            ).count()
-        
-        attendance_percentage = (attended_count / total_sessions * 100) if total_sessions > 0 else 0
-        
-        # 3. Assignment Metrics
         session_type = "cohort" if is_cohort else "global"
-        assignments = db.query(Assignment).filter(
+        total_sessions = len(session_ids)
+        student_ids = list(dict.fromkeys(student_ids))
+        frame = pd.DataFrame(index=pd.Index(student_ids, name="student_id"))
+        if not student_ids:
+            return frame
+
+        def grouped(query):
+            # Per-student counts aligned with the frame, zero for students without rows
+            return pd.Series(dict(query.all()), dtype="float64").reindex(frame.index).fillna(0).to_numpy()
+
+        # Attendance Metrics
+        attendance_model = CohortAttendance if is_cohort else Attendance
+        attended = grouped(db.query(attendance_model.student_id, func.count(attendance_model.id)).filter(
+            attendance_model.student_id.in_(student_ids),
+            attendance_model.session_id.in_(session_ids),
+            attendance_model.attended == True
+        ).group_by(attendance_model.student_id))
+
+        # Assignment Metrics
+        assignment_ids = [row.id for row in db.query(Assignment.id).filter(
             Assignment.session_id.in_(session_ids),
             Assignment.session_type == session_type
-        ).all()
-        
-        total_assignments = len(assignments)
-        assignment_ids = [a.id for a in assignments]
-        
-        submitted_count = 0
-        avg_score = 0
-        
+        ).all()]
+        total_assignments = len(assignment_ids)
+        submitted = np.zeros(len(student_ids))
+        avg_score = np.zeros(len(student_ids))
         if total_assignments > 0:
-            submissions = db.query(AssignmentSubmission).filter(
-                AssignmentSubmission.student_id == student_id,
+            submitted = grouped(db.query(AssignmentSubmission.student_id, func.count(AssignmentSubmission.id)).filter(
+                AssignmentSubmission.student_id.in_(student_ids),
                 AssignmentSubmission.assignment_id.in_(assignment_ids)
-            ).all()
-            submitted_count = len(submissions)
-            
-            grades = db.query(AssignmentGrade).filter(
-                AssignmentGrade.student_id == student_id,
+            ).group_by(AssignmentSubmission.student_id))
+            grade_rows = db.query(
+                AssignmentGrade.student_id,
+                func.coalesce(func.sum(AssignmentGrade.percentage), 0),
+                func.count(AssignmentGrade.id)
+            ).filter(
+                AssignmentGrade.student_id.in_(student_ids),
                 AssignmentGrade.assignment_id.in_(assignment_ids)
-            ).all()
-            
-            if grades:
-                avg_score = sum([g.percentage for g in grades if g.percentage]) / len(grades)
-        
-        submission_status = submitted_count == total_assignments if total_assignments > 0 else True
-        
-        # 4. Session Progress
-        completed_sessions = db.query(StudentSessionStatus).filter(
-            StudentSessionStatus.student_id == student_id,
+            ).group_by(AssignmentGrade.student_id).all()
+            grade_sums = pd.Series({row[0]: float(row[1]) for row in grade_rows}, dtype="float64").reindex(frame.index).fillna(0).to_numpy()
+            grade_counts = pd.Series({row[0]: row[2] for row in grade_rows}, dtype="float64").reindex(frame.index).fillna(0).to_numpy()
+            avg_score = np.divide(grade_sums, grade_counts, out=np.zeros(len(student_ids)), where=grade_counts > 0)
+
+        # Session Progress
+        completed = grouped(db.query(StudentSessionStatus.student_id, func.count(StudentSessionStatus.id)).filter(
+            StudentSessionStatus.student_id.in_(student_ids),
             StudentSessionStatus.session_id.in_(session_ids),
             StudentSessionStatus.session_type == session_type,
             StudentSessionStatus.status == "Completed"
-        ).count()
-        
-        progress_percentage = (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0
-        
+        ).group_by(StudentSessionStatus.student_id))
+
+        frame["attendance"] = np.round(attended / total_sessions * 100, 2)
+        frame["avg_score"] = np.round(avg_score, 2)
+        frame["assignment_submission_status"] = submitted == total_assignments if total_assignments > 0 else True
+        frame["progress"] = np.round(completed / total_sessions * 100, 2)
+        frame["total_sessions"] = total_sessions
+        frame["attended_count"] = attended.astype(int)
+        frame["submitted_count"] = submitted.astype(int)
+        frame["total_assignments"] = total_assignments
+        return frame
+
+    @staticmethod
+    def get_cohort_performance(db: Session, student_ids: List[int], config: BadgeConfiguration) -> Dict[int, Dict[str, Any]]:
+        """
+        Performance metrics for many students at once, keyed by student id (empty if the configuration covers no sessions).
+        """
+        frame = BadgeService.get_performance_frame(db, student_ids, config)
+        if frame is None:
+            return {}
+        return {student_id: BadgeService._performance_dict(row) for student_id, row in zip(frame.index, frame.itertuples(index=False))}
+
+    @staticmethod
+    def _performance_dict(row) -> Dict[str, Any]:
+        # Plain Python types so the result can be stored in JSON columns
         return {
-            "attendance": round(attendance_percentage, 2),
-            "avg_score": round(avg_score, 2),
-            "assignment_submission_status": submission_status,
-            "progress": round(progress_percentage, 2),
-            "total_sessions": total_sessions,
-            "attended_count": attended_count,
-            "submitted_count": submitted_count,
-            "total_assignments": total_assignments
+            "attendance": float(row.attendance),
+            "avg_score": float(row.avg_score),
+            "assignment_submission_status": bool(row.assignment_submission_status),
+            "progress": float(row.progress),
+            "total_sessions": int(row.total_sessions),
+            "attended_count": int(row.attended_count),
+            "submitted_count": int(row.submitted_count),
+            "total_assignments": int(row.total_assignments)
         }
 
+    @staticmethod
+    def evaluate_eligibility_frame(frame: pd.DataFrame, config: BadgeConfiguration) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Vectorized evaluate_eligibility over a performance frame.
+        Returns the eligibility mask and the pass mask of every evaluated rule.
+        """
+        criteria = config.criteria
+        mandatory = config.mandatory_checks
+        count = len(frame)
+        passes: Dict[str, np.ndarray] = {}
+        for rule, threshold in criteria.items():
+            if rule in CRITERIA_METRICS:
+                actual = frame[CRITERIA_METRICS[rule]].to_numpy()
+                passes[rule] = actual == threshold if isinstance(threshold, bool) else actual >= threshold
+
+        # Assignments are STRICTLY mandatory
+        eligible = passes.get("min_assignments_completed", np.ones(count, dtype=bool)).copy()
+
+        # Flexible Attendance OR Progress logic: if both are mandatory, satisfying EITHER one is enough
+        att_pass = passes.get("min_attendance", np.zeros(count, dtype=bool))
+        prog_pass = passes.get("min_progress", np.zeros(count, dtype=bool))
+        att_is_mandatory = "min_attendance" in mandatory
+        prog_is_mandatory = "min_progress" in mandatory
+        if att_is_mandatory and prog_is_mandatory:
+            eligible &= att_pass | prog_pass
+        elif att_is_mandatory:
+            eligible &= att_pass
+        elif prog_is_mandatory:
+            eligible &= prog_pass
+        return eligible, passes
+
     @staticmethod
     def evaluate_eligibility(performance: Dict[str, Any], config: BadgeConfiguration) -> Tuple[bool, Dict[str, Any]]:
         """
@@ -192,7 +270,7 @@ class BadgeService:
             # If no cohort but global course is specified, find students enrolled in the course
             query = query.join(User.enrollments).filter(Enrollment.course_id == config.course_id)
            
-        students = query.all()
+        students = query.with_entities(User.id, User.username, User.email).all()
         
         # Get already issued badges for this config
         issued_user_ids = {
@@ -209,22 +287,54 @@ class BadgeService:
             "rejected": []
         }
         
+        # Evaluate the whole pool at once
+        frame = BadgeService.get_performance_frame(db, [student.id for student in students], config)
+        if frame is None or frame.empty:
+            return summary
+        eligible, passes = BadgeService.evaluate_eligibility_frame(frame, config)
+        rules = [rule for rule in config.criteria if rule in passes]
+        actuals = {rule: frame[CRITERIA_METRICS[rule]].tolist() for rule in rules}
+        rule_passes = {rule: passes[rule].tolist() for rule in rules}
+        eligible = eligible.tolist()
+        performances = [BadgeService._performance_dict(row) for row in frame.itertuples(index=False)]
+        position = {student_id: i for i, student_id in enumerate(frame.index)}
+        
+        # Existing audit rows for this config, one query
+        existing_audits = {}
+        for audit_id, user_id in db.query(BadgeAuditLog.id, BadgeAuditLog.user_id).filter(
+            BadgeAuditLog.badge_config_id == config.id,
+            BadgeAuditLog.user_id.in_(list(position.keys()))
+        ).order_by(BadgeAuditLog.id).all():
+            existing_audits.setdefault(user_id, audit_id)
+        
+        now = datetime.utcnow()
+        audit_updates = []
+        audit_inserts = []
+        seen = set()
         for student in students:
-            performance = BadgeService.get_student_performance(db, student.id, config)
-            if not performance:
+            if student.id in seen:
                 continue
-                
-            is_eligible, details = BadgeService.evaluate_eligibility(performance, config)
+            seen.add(student.id)
+            i = position[student.id]
+            performance = performances[i]
+            is_eligible = eligible[i]
+            details = {
+                rule: {
+                    "required": config.criteria[rule],
+                    "actual": actuals[rule][i],
+                    "pass": rule_passes[rule][i]
+                } for rule in rules
+            }
             
             # Categorize the student
             student_data = {
                 "userId": student.id,
-                "name": f"{student.first_name} {student.last_name}" if hasattr(student, 'first_name') else student.username,
+                "name": student.username,
                 "username": student.username,
                 "email": student.email,
-                "attendance_percentage": performance.get("attendance", 0),
-                "submitted_count": performance.get("submitted_count", 0),
-                "total_assignments": performance.get("total_assignments", 0),
+                "attendance_percentage": performance["attendance"],
+                "submitted_count": performance["submitted_count"],
+                "total_assignments": performance["total_assignments"],
                 "is_eligible": is_eligible,
                 "details": details
             }
@@ -239,25 +349,25 @@ class BadgeService:
             summary["total_evaluated"] += 1
 
             # Log/Update audit
-            existing_audit = db.query(BadgeAuditLog).filter(
-                BadgeAuditLog.user_id == student.id,
-                BadgeAuditLog.badge_config_id == config.id
-            ).first()
-            
-            if existing_audit:
-                existing_audit.status = "ELIGIBLE" if is_eligible else "REJECTED"
-                existing_audit.details = {"criteria_results": details, "performance": performance}
-                existing_audit.evaluated_at = datetime.utcnow()
+            audit = {
+                "status": "ELIGIBLE" if is_eligible else "REJECTED",
+                "details": {"criteria_results": details, "performance": performance},
+                "evaluated_at": now
+            }
+            if student.id in existing_audits:
+                audit_updates.append(dict(audit, id=existing_audits[student.id]))
             else:
-                audit = BadgeAuditLog(
+                audit_inserts.append(dict(
+                    audit,
                     user_id=student.id,
                     badge_config_id=config.id,
-                    status="ELIGIBLE" if is_eligible else "REJECTED",
-                    details={"criteria_results": details, "performance": performance},
                     remarks="Automated evaluation"
-                )
-                db.add(audit)
+                ))
         
+        if audit_updates:
+            db.bulk_update_mappings(BadgeAuditLog, audit_updates)
+        if audit_inserts:
+            db.bulk_insert_mappings(BadgeAuditLog, audit_inserts)
         db.commit()
         return summary
 
@@ -270,53 +380,45 @@ class BadgeService:
         if not config:
             return {"error": "Configuration not found"}
             
+        # Skip users who already have this badge (and duplicates in the request)
+        already_awarded = {
+            row.user_id for row in db.query(AwardedBadge.user_id).filter(
+                AwardedBadge.badge_config_id == config_id,
+                AwardedBadge.user_id.in_(user_ids)
+            ).all()
+        }
+        new_user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in already_awarded]
+        if not new_user_ids:
+            return {"issued_count": 0}
+        
+        # Performance snapshots, users and the email template are loaded once for the batch
+        performances = BadgeService.get_cohort_performance(db, new_user_ids, config)
+        users = {user.id: user for user in db.query(User.id, User.username, User.email).filter(User.id.in_(new_user_ids)).all()}
+        
+        # Try to get the template from database first (for UI-edited content). It only
+        # substitutes {badge_title} and {username}; other braces are left as written.
+        template = email_template_engine.get(db, "Badge Achievement", strict=False)
+        
         issued_count = 0
-        for user_id in user_ids:
-            # Check if already awarded
-            exists = db.query(AwardedBadge).filter(
-                AwardedBadge.user_id == user_id,
-                AwardedBadge.badge_config_id == config_id
-            ).first()
-            
-            if exists:
-                continue
-                
-            # Get performance for snapshot
-            performance = BadgeService.get_student_performance(db, user_id, config)
-            
+        for user_id in new_user_ids:
             # Award Badge with performance snapshot
             award = AwardedBadge(
                 user_id=user_id,
                 badge_config_id=config_id,
                 criteria_snapshot={
-                    "metrics": performance,
+                    "metrics": performances.get(user_id),
                     "rules": config.criteria
                 }
             )
             db.add(award)
             
             # Send Email
-            user = db.query(User).filter(User.id == user_id).first()
+            user = users.get(user_id)
             if user:
-                from database import EmailTemplate
-                # Try to get the template from database first (for UI-edited content)
-                template = db.query(EmailTemplate).filter(
-                    EmailTemplate.name == "Badge Achievement",
-                    EmailTemplate.is_active == True
-                ).first()
-                
                 subject = f"Congratulations! You've earned the '{config.title}' Badge"
                 if template:
-                    # Use template from database
-                    subject = template.subject.replace("{badge_title}", config.title).replace("{username}", user.username)
-                    body_content = template.body.replace("{badge_title}", config.title).replace("{username}", user.username)
-                    
-                    # Wrap in base layout and send
-                    from email_styling import wrap_in_base_layout
-                    html_message = wrap_in_base_layout(body_content, subject)
-                    
-                    # Import send_email or use email_service.send_email
-                    from email_service import send_notification_email
+                    # Use template from database, rendered with the base layout
+                    subject, html_message = template.render({"badge_title": config.title, "username": user.username})
                     send_notification_email([user.email], subject, html_message, "badge_award")
                 else:
                     # Fallback to hardcoded template in EmailService
@@ -335,6 +437,7 @@ class BadgeService:
             
         db.commit()
         return {"issued_count": issued_count}
+
     @staticmethod
     def get_available_badges_for_student(db: Session, student_id: int) -> List[Dict[str, Any]]:
         """
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
 from datetime import datetime, date, timedelta
-from typing import Optional
+from typing import Optional, List
 from pydantic import BaseModel
 from database import get_db
-from auth import get_current_admin_presenter_mentor_or_manager
+from auth import get_current_admin_presenter_mentor_or_manager, get_current_admin
 from calendar_blocking_service import CalendarBlockingService
 
 router = APIRouter(prefix="/calendar-blocking", tags=["Calendar Blocking"])
@@ -19,6 +19,13 @@ class ConflictCheckResponse(BaseModel):
     message: str
     conflicting_events: list = []
 
+class TimeSlot(BaseModel):
+    start_datetime: datetime
+    end_datetime: datetime
+
+class BatchConflictCheckRequest(BaseModel):
+    slots: List[TimeSlot]
+
 @router.post("/check-conflict", response_model=ConflictCheckResponse)
 async def check_time_conflict(
     request: ConflictCheckRequest,
@@ -49,6 +56,38 @@ async def check_time_conflict(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error checking conflict: {str(e)}")
 
+@router.post("/check-conflicts")
+async def check_batch_time_conflicts(
+    request: BatchConflictCheckRequest,
+    current_user = Depends(get_current_admin_presenter_mentor_or_manager),
+    db: Session = Depends(get_db)
+):
+    """Check many time slots at once, against existing bookings and against each other"""
+    try:
+        results = CalendarBlockingService.check_batch_conflicts(
+            db, [(slot.start_datetime, slot.end_datetime) for slot in request.slots]
+        )
+        return {
+            "results": results,
+            "total_slots": len(results),
+            "conflicting_slots": sum(1 for result in results if result["has_conflict"])
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error checking conflicts: {str(e)}")
+
+@router.post("/rebuild-index")
+async def rebuild_busy_interval_index(
+    current_user = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Recompute the busy interval table from calendar events, sessions and meetings"""
+    try:
+        total = CalendarBlockingService.rebuild_busy_intervals(db)
+        return {"message": "Busy interval index rebuilt", "total_intervals": total}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error rebuilding busy interval index: {str(e)}")
+
 @router.get("/blocked-slots")
 async def get_blocked_slots(
     start_date: date = Query(..., description="Start date for blocked slots"),
@@ -162,11 +201,16 @@ async def get_next_available_slot(
         search_end = preferred_start + timedelta(days=search_days)
         current_time = preferred_start
         
+        # Load the whole search window once and probe candidate slots in memory
+        busy_index = CalendarBlockingService.load_busy_index(
+            db, preferred_start, search_end + timedelta(minutes=duration_minutes)
+        )
+        
         # Search in 30-minute increments
         while current_time < search_end:
             end_time = current_time + timedelta(minutes=duration_minutes)
             
-            if not CalendarBlockingService.check_time_conflict(db, current_time, end_time):
+            if not busy_index.overlaps(current_time, end_time):
                 return {
                     "available_slot": {
                         "start_datetime": current_time,
@@ -1,77 +1,172 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, event, select, func
 from datetime import datetime, timedelta
-from database import CalendarEvent, Session as SessionModel, SessionMeeting
-from typing import List, Optional
+from database import CalendarEvent, Session as SessionModel, SessionMeeting, CalendarBusyInterval, SessionLocal
+from typing import List, Optional, Iterable, Tuple, Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
 
 class CalendarBlockingService:
     """Service to handle calendar blocking for sessions and meetings"""
     
     @staticmethod
-    def check_time_conflict(db: Session, start_time: datetime, end_time: datetime, exclude_id: Optional[int] = None) -> bool:
-        """Check if there's a time conflict with existing events/sessions/meetings"""
-        
-        # Check calendar events
-        calendar_conflicts = db.query(CalendarEvent).filter(
-            and_(
-                CalendarEvent.id != exclude_id if exclude_id else True,
-                or_(
-                    # New event starts during existing event
-                    and_(CalendarEvent.start_datetime <= start_time, CalendarEvent.end_datetime > start_time),
-                    # New event ends during existing event
-                    and_(CalendarEvent.start_datetime < end_time, CalendarEvent.end_datetime >= end_time),
-                    # New event completely contains existing event
-                    and_(CalendarEvent.start_datetime >= start_time, CalendarEvent.end_datetime <= end_time)
-                )
-            )
-        ).first()
-        
-        if calendar_conflicts:
-            return True
-            
-        # Check sessions
-        session_conflicts = db.query(SessionModel).filter(
-            SessionModel.scheduled_time.isnot(None),
-            or_(
-                # Session starts during new event
-                and_(SessionModel.scheduled_time >= start_time, SessionModel.scheduled_time < end_time),
-                # Session ends during new event (assuming 2 hour default duration)
-                and_(
-                    SessionModel.scheduled_time < start_time,
-                    SessionModel.scheduled_time + timedelta(minutes=SessionModel.duration_minutes or 120) > start_time
-                )
+    def check_time_conflict(db: Session, start_time: datetime, end_time: datetime, exclude_id: Optional[int] = None,
+                            exclude_sources: Iterable[Tuple[str, int]] = ()) -> bool:
+        """Check if there's a time conflict with existing events/sessions/meetings
+
+        ``exclude_id`` skips a calendar event; ``exclude_sources`` skips (source_type, source_id)
+        pairs such as ``("session", 12)`` so an item never conflicts with itself.
+        """
+        query = db.query(CalendarBusyInterval.id).filter(
+            CalendarBusyInterval.start_datetime < end_time,
+            CalendarBusyInterval.end_datetime > start_time
+        )
+        excluded = list(exclude_sources)
+        if exclude_id:
+            excluded.append(("event", exclude_id))
+        for source_type, source_id in excluded:
+            query = query.filter(~and_(
+                CalendarBusyInterval.source_type == source_type,
+                CalendarBusyInterval.source_id == source_id
+            ))
+        return query.first() is not None
+
+    @staticmethod
+    def check_batch_conflicts(db: Session, slots: List[Tuple[datetime, datetime]],
+                              exclude_sources: Iterable[Tuple[str, int]] = ()) -> List[dict]:
+        """Check many time slots at once with a single query.
+
+        Busy intervals covering the whole batch window are loaded once into a
+        ``BusyIntervalIndex``; slots are then checked against it and against each other.
+        Returns one result per slot, in input order.
+        """
+        results = [{
+            "index": i,
+            "start_datetime": start,
+            "end_datetime": end,
+            "has_conflict": False,
+            "conflicts": [],
+            "batch_conflicts": []
+        } for i, (start, end) in enumerate(slots)]
+        if not slots:
+            return results
+
+        index = CalendarBlockingService.load_busy_index(
+            db, min(start for start, _ in slots), max(end for _, end in slots), exclude_sources
+        )
+        for result in results:
+            for interval in index.overlapping(result["start_datetime"], result["end_datetime"]):
+                result["conflicts"].append(interval)
+
+        # Sweep the batch sorted by start to find slots that overlap each other
+        order = sorted(range(len(slots)), key=lambda i: slots[i][0])
+        active: List[int] = []
+        for i in order:
+            start, end = slots[i]
+            active = [j for j in active if slots[j][1] > start]
+            for j in active:
+                results[i]["batch_conflicts"].append(j)
+                results[j]["batch_conflicts"].append(i)
+            active.append(i)
+
+        for result in results:
+            result["batch_conflicts"].sort()
+            result["has_conflict"] = bool(result["conflicts"] or result["batch_conflicts"])
+        return results
+
+    @staticmethod
+    def load_busy_index(db: Session, window_start: datetime, window_end: datetime,
+                        exclude_sources: Iterable[Tuple[str, int]] = ()) -> "BusyIntervalIndex":
+        """Load every busy interval overlapping a window into an in-memory index"""
+        excluded = set(exclude_sources)
+        rows = db.query(CalendarBusyInterval).filter(
+            CalendarBusyInterval.start_datetime < window_end,
+            CalendarBusyInterval.end_datetime > window_start
+        ).all()
+        return BusyIntervalIndex([
+            (row.start_datetime, row.end_datetime, {
+                "id": f"{row.source_type}_{row.source_id}",
+                "type": row.source_type,
+                "title": row.title,
+                "start_datetime": row.start_datetime,
+                "end_datetime": row.end_datetime
+            })
+            for row in rows if (row.source_type, row.source_id) not in excluded
+        ])
+
+    @staticmethod
+    def rebuild_busy_intervals(db: Session) -> int:
+        """Recompute the busy interval table from events, sessions and meetings"""
+        total = 0
+        for source_type in _SOURCE_MODELS:
+            total += _sync_source(db, source_type)
+        db.commit()
+        logger.info(f"Rebuilt {total} calendar busy intervals")
+        return total
+
+    @staticmethod
+    def reconcile_busy_intervals(db: Session) -> List[str]:
+        """Resync the source types whose busy intervals drifted from their source rows.
+
+        A source type is rebuilt when its interval count differs from the number of rows
+        that block time, or when an interval starts at a different time than its row.
+        Returns the source types that were rebuilt.
+        """
+        rebuilt = []
+        for source_type, (model, start_column, _) in _SOURCE_MODELS.items():
+            start = getattr(model, start_column)
+            blocking = db.query(func.count(model.id)).filter(start.isnot(None))
+            if source_type == "event":
+                blocking = blocking.filter(model.end_datetime.isnot(None))
+            intervals = db.query(func.count(CalendarBusyInterval.id)).filter(
+                CalendarBusyInterval.source_type == source_type
             )
-        ).first()
-        
-        if session_conflicts:
-            return True
-            
-        # Check session meetings
-        meeting_conflicts = db.query(SessionMeeting).filter(
-            SessionMeeting.meeting_datetime.isnot(None),
-            or_(
-                # Meeting starts during new event
-                and_(SessionMeeting.meeting_datetime >= start_time, SessionMeeting.meeting_datetime < end_time),
-                # Meeting ends during new event
-                and_(
-                    SessionMeeting.meeting_datetime < start_time,
-                    SessionMeeting.meeting_datetime + timedelta(minutes=SessionMeeting.duration_minutes or 60) > start_time
-                )
+            moved = db.query(func.count(CalendarBusyInterval.id)).join(
+                model, model.id == CalendarBusyInterval.source_id
+            ).filter(
+                CalendarBusyInterval.source_type == source_type,
+                CalendarBusyInterval.start_datetime != start
             )
-        ).first()
-        
-        return meeting_conflicts is not None
-    
+            if blocking.scalar() != intervals.scalar() or moved.scalar():
+                _sync_source(db, source_type)
+                rebuilt.append(source_type)
+        if rebuilt:
+            db.commit()
+            logger.info(f"Resynced calendar busy intervals for: {', '.join(rebuilt)}")
+        return rebuilt
+
     @staticmethod
-    def create_session_block(db: Session, session: SessionModel, created_by_id: int, user_type: str) -> Optional[int]:
+    def sync_event_intervals(db: Session, event_ids: Iterable[int]):
+        """Refresh the busy intervals of calendar events written with raw SQL.
+
+        Mapper events don't fire for ``text()`` statements, so callers pass the ids they
+        inserted, updated or deleted; the change is made in the caller's transaction.
+        """
+        connection = db.connection()
+        for event_id in event_ids:
+            target = db.query(CalendarEvent).populate_existing().filter(CalendarEvent.id == event_id).first()
+            if target is None:
+                connection.execute(CalendarBusyInterval.__table__.delete().where(and_(
+                    CalendarBusyInterval.source_type == "event",
+                    CalendarBusyInterval.source_id == event_id
+                )))
+            else:
+                _write_busy_interval("event", connection, target)
+
+    @staticmethod
+    def create_session_block(db: Session, session: SessionModel, created_by_id: int, user_type: str,
+                             check_conflicts: bool = True) -> Optional[int]:
         """Automatically create calendar block when session is scheduled"""
         if not session.scheduled_time:
             return None
             
         end_time = session.scheduled_time + timedelta(minutes=session.duration_minutes or 120)
         
-        # Check for conflicts
-        if CalendarBlockingService.check_time_conflict(db, session.scheduled_time, end_time):
+        # Check for conflicts (skipped when the caller already checked the whole batch)
+        if check_conflicts and CalendarBlockingService.check_time_conflict(
+            db, session.scheduled_time, end_time, exclude_sources=[("session", session.id)]
+        ):
             raise ValueError(f"Time slot conflict: {session.scheduled_time} - {end_time}")
         
         # Create calendar event
@@ -102,7 +197,9 @@ class CalendarBlockingService:
         end_time = meeting.meeting_datetime + timedelta(minutes=meeting.duration_minutes or 60)
         
         # Check for conflicts
-        if CalendarBlockingService.check_time_conflict(db, meeting.meeting_datetime, end_time):
+        if CalendarBlockingService.check_time_conflict(
+            db, meeting.meeting_datetime, end_time, exclude_sources=[("meeting", meeting.id)]
+        ):
             raise ValueError(f"Time slot conflict: {meeting.meeting_datetime} - {end_time}")
         
         # Create calendar event
@@ -125,6 +222,15 @@ class CalendarBlockingService:
         
         return calendar_event.id
     
+    @staticmethod
+    def find_session_block(db: Session, scheduled_time: datetime) -> Optional[CalendarEvent]:
+        """The auto-generated block of a session scheduled at ``scheduled_time``"""
+        return db.query(CalendarEvent).filter(
+            CalendarEvent.event_type == "session_block",
+            CalendarEvent.start_datetime == scheduled_time,
+            CalendarEvent.is_auto_generated == True
+        ).first()
+
     @staticmethod
     def update_session_block(db: Session, session: SessionModel, original_time: datetime) -> bool:
         """Update calendar block when session is rescheduled"""
@@ -132,17 +238,15 @@ class CalendarBlockingService:
             return False
             
         # Find existing block
-        existing_block = db.query(CalendarEvent).filter(
-            CalendarEvent.event_type == "session_block",
-            CalendarEvent.start_datetime == original_time,
-            CalendarEvent.is_auto_generated == True
-        ).first()
+        existing_block = CalendarBlockingService.find_session_block(db, original_time)
         
         if existing_block:
             new_end_time = session.scheduled_time + timedelta(minutes=session.duration_minutes or 120)
             
             # Check for conflicts (excluding current block)
-            if CalendarBlockingService.check_time_conflict(db, session.scheduled_time, new_end_time, existing_block.id):
+            if CalendarBlockingService.check_time_conflict(
+                db, session.scheduled_time, new_end_time, existing_block.id, [("session", session.id)]
+            ):
                 raise ValueError(f"Time slot conflict: {session.scheduled_time} - {new_end_time}")
             
             # Update block
@@ -173,7 +277,9 @@ class CalendarBlockingService:
             new_end_time = meeting.meeting_datetime + timedelta(minutes=meeting.duration_minutes or 60)
             
             # Check for conflicts (excluding current block)
-            if CalendarBlockingService.check_time_conflict(db, meeting.meeting_datetime, new_end_time, existing_block.id):
+            if CalendarBlockingService.check_time_conflict(
+                db, meeting.meeting_datetime, new_end_time, existing_block.id, [("meeting", meeting.id)]
+            ):
                 raise ValueError(f"Time slot conflict: {meeting.meeting_datetime} - {new_end_time}")
             
             # Update block
@@ -224,59 +330,184 @@ class CalendarBlockingService:
     @staticmethod
     def get_blocked_slots(db: Session, start_date: datetime, end_date: datetime) -> List[dict]:
         """Get all blocked time slots in a date range"""
-        blocked_events = db.query(CalendarEvent).filter(
-            CalendarEvent.start_datetime >= start_date,
-            CalendarEvent.start_datetime <= end_date,
-            CalendarEvent.event_type.in_(["session_block", "meeting_block"])
-        ).all()
-        
-        blocked_sessions = db.query(SessionModel).filter(
-            SessionModel.scheduled_time >= start_date,
-            SessionModel.scheduled_time <= end_date,
-            SessionModel.scheduled_time.isnot(None)
-        ).all()
-        
-        blocked_meetings = db.query(SessionMeeting).filter(
-            SessionMeeting.meeting_datetime >= start_date,
-            SessionMeeting.meeting_datetime <= end_date,
-            SessionMeeting.meeting_datetime.isnot(None)
-        ).all()
-        
-        blocked_slots = []
-        
-        # Add calendar events
-        for event in blocked_events:
-            blocked_slots.append({
-                "id": f"event_{event.id}",
-                "type": "calendar_event",
-                "title": event.title,
-                "start_datetime": event.start_datetime,
-                "end_datetime": event.end_datetime,
-                "is_blocked": True
-            })
-        
-        # Add sessions
-        for session in blocked_sessions:
-            end_time = session.scheduled_time + timedelta(minutes=session.duration_minutes or 120)
-            blocked_slots.append({
-                "id": f"session_{session.id}",
-                "type": "session",
-                "title": f"Session: {session.title}",
-                "start_datetime": session.scheduled_time,
-                "end_datetime": end_time,
-                "is_blocked": True
-            })
-        
-        # Add meetings
-        for meeting in blocked_meetings:
-            end_time = meeting.meeting_datetime + timedelta(minutes=meeting.duration_minutes or 60)
-            blocked_slots.append({
-                "id": f"meeting_{meeting.id}",
-                "type": "meeting",
-                "title": f"Meeting: {meeting.title}",
-                "start_datetime": meeting.meeting_datetime,
-                "end_datetime": end_time,
-                "is_blocked": True
-            })
-        
-        return sorted(blocked_slots, key=lambda x: x["start_datetime"])
\ No newline at end of file
+        rows = db.query(CalendarBusyInterval).filter(
+            CalendarBusyInterval.start_datetime >= start_date,
+            CalendarBusyInterval.start_datetime <= end_date,
+            or_(
+                CalendarBusyInterval.source_type != "event",
+                CalendarBusyInterval.event_type.in_(["session_block", "meeting_block"])
+            )
+        ).order_by(CalendarBusyInterval.start_datetime).all()
+
+        return [{
+            "id": f"{row.source_type}_{row.source_id}",
+            "type": "calendar_event" if row.source_type == "event" else row.source_type,
+            "title": row.title,
+            "start_datetime": row.start_datetime,
+            "end_datetime": row.end_datetime,
+            "is_blocked": True
+        } for row in rows]
+
+
+class BusyIntervalIndex:
+    """Static interval tree over busy intervals for batch overlap queries.
+
+    Intervals are sorted by start and laid out as an implicit balanced tree (the middle
+    of every range is its root), each node keeping the largest end in its subtree, so an
+    overlap query costs O(log n + k).
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[datetime, datetime, Any]]):
+        items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self._starts = [item[0] for item in items]
+        self._ends = [item[1] for item in items]
+        self._payloads = [item[2] for item in items]
+        self._max_end: List[Optional[datetime]] = [None] * len(items)
+        if items:
+            self._build(0, len(items))
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def _build(self, lo: int, hi: int) -> datetime:
+        mid = (lo + hi) // 2
+        max_end = self._ends[mid]
+        if lo < mid:
+            max_end = max(max_end, self._build(lo, mid))
+        if mid + 1 < hi:
+            max_end = max(max_end, self._build(mid + 1, hi))
+        self._max_end[mid] = max_end
+        return max_end
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Any]:
+        """Payloads of all intervals overlapping [start, end), in start order"""
+        found: List[Any] = []
+        self._query(0, len(self._starts), start, end, found)
+        return found
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        return bool(self.overlapping(start, end))
+
+    def _query(self, lo: int, hi: int, start: datetime, end: datetime, found: List[Any]):
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] <= start:
+            return
+        self._query(lo, mid, start, end, found)
+        # Nothing at or right of a node starting after ``end`` can overlap
+        if self._starts[mid] >= end:
+            return
+        if self._ends[mid] > start:
+            found.append(self._payloads[mid])
+        self._query(mid + 1, hi, start, end, found)
+
+
+# How each source table maps onto a busy interval: (model, start column, default duration in minutes)
+_SOURCE_MODELS = {
+    "event": (CalendarEvent, "start_datetime", None),
+    "session": (SessionModel, "scheduled_time", 120),
+    "meeting": (SessionMeeting, "meeting_datetime", 60),
+}
+
+
+def _busy_values(source_type: str, target) -> Optional[Dict[str, Any]]:
+    """Column values of the busy interval for a row, or None if it blocks no time"""
+    if source_type == "event":
+        if not target.start_datetime or not target.end_datetime:
+            return None
+        return {
+            "event_type": target.event_type,
+            "title": target.title,
+            "start_datetime": target.start_datetime,
+            "end_datetime": target.end_datetime,
+        }
+    if source_type == "session":
+        if not target.scheduled_time:
+            return None
+        return {
+            "event_type": None,
+            "title": f"Session: {target.title}",
+            "start_datetime": target.scheduled_time,
+            "end_datetime": target.scheduled_time + timedelta(minutes=target.duration_minutes or 120),
+        }
+    if not target.meeting_datetime:
+        return None
+    return {
+        "event_type": None,
+        "title": f"Meeting: {target.title}",
+        "start_datetime": target.meeting_datetime,
+        "end_datetime": target.meeting_datetime + timedelta(minutes=target.duration_minutes or 60),
+    }
+
+
+def _sync_source(db: Session, source_type: str) -> int:
+    """Replace all busy intervals of one source type with freshly computed rows"""
+    model, start_column, _ = _SOURCE_MODELS[source_type]
+    db.query(CalendarBusyInterval).filter(
+        CalendarBusyInterval.source_type == source_type
+    ).delete(synchronize_session=False)
+    rows = []
+    for target in db.query(model).filter(getattr(model, start_column).isnot(None)).yield_per(1000):
+        values = _busy_values(source_type, target)
+        if values:
+            rows.append(dict(values, source_type=source_type, source_id=target.id))
+    if rows:
+        db.execute(CalendarBusyInterval.__table__.insert(), rows)
+    return len(rows)
+
+
+def _write_busy_interval(source_type: str, connection, target, deleted: bool = False):
+    table = CalendarBusyInterval.__table__
+    connection.execute(table.delete().where(and_(
+        table.c.source_type == source_type,
+        table.c.source_id == target.id
+    )))
+    values = None if deleted else _busy_values(source_type, target)
+    if values:
+        connection.execute(table.insert().values(source_type=source_type, source_id=target.id, **values))
+
+
+def _register_busy_listeners(source_type: str, model):
+    # Keep the busy interval in the same transaction as the row it mirrors
+    def after_write(mapper, connection, target):
+        _write_busy_interval(source_type, connection, target)
+
+    def after_delete(mapper, connection, target):
+        _write_busy_interval(source_type, connection, target, deleted=True)
+
+    event.listen(model, "after_insert", after_write)
+    event.listen(model, "after_update", after_write)
+    event.listen(model, "after_delete", after_delete)
+
+
+for _source_type, (_model, _, _) in _SOURCE_MODELS.items():
+    _register_busy_listeners(_source_type, _model)
+
+
+def _source_type_for(mapper) -> Optional[str]:
+    for source_type, (model, _, _) in _SOURCE_MODELS.items():
+        if mapper.class_ is model:
+            return source_type
+    return None
+
+
+@event.listens_for(SessionLocal, "after_bulk_update")
+def _sync_after_bulk_update(update_context):
+    """Query.update() skips mapper events, so recompute the affected source type"""
+    source_type = _source_type_for(update_context.mapper)
+    if source_type:
+        _sync_source(update_context.session, source_type)
+
+
+@event.listens_for(SessionLocal, "after_bulk_delete")
+def _prune_after_bulk_delete(delete_context):
+    """Query.delete() skips mapper events, so drop intervals whose source row is gone"""
+    source_type = _source_type_for(delete_context.mapper)
+    if not source_type:
+        return
+    model = _SOURCE_MODELS[source_type][0]
+    delete_context.session.query(CalendarBusyInterval).filter(
+        CalendarBusyInterval.source_type == source_type,
+        ~CalendarBusyInterval.source_id.in_(select(model.id))
+    ).delete(synchronize_session=False)
@@ -1,12 +1,14 @@
 import logging
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, date
 from typing import List, Optional
 from pydantic import BaseModel, Field
-from database import get_db, Session as SessionModel, Course, Module, CalendarEvent
-from assignment_quiz_models import Assignment, Quiz
+from database import get_db, CalendarEvent
 from auth import get_current_user, get_current_admin, get_current_admin_or_presenter, get_current_admin_presenter_mentor_or_manager, get_current_user_any_role
+from calendar_feed_service import calendar_feed
+from calendar_blocking_service import CalendarBlockingService
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -92,8 +94,11 @@ async def create_calendar_event(
             "created_by_mentor_id": created_by_mentor_id,
             "created_by_manager_id": created_by_manager_id
         })
+        # Raw SQL skips the mapper listeners that maintain the busy interval
+        CalendarBlockingService.sync_event_intervals(db, [result.lastrowid])
         
         db.commit()
+        calendar_feed.invalidate_all()
         
         return {
             "message": "Calendar event created successfully",
@@ -151,9 +156,6 @@ async def get_comprehensive_calendar(
 ):
     """Get comprehensive calendar data including events, sessions, assignments, and quizzes"""
     try:
-        from sqlalchemy import text
-        from database import Enrollment, Module, SessionMeeting
-        
         # Get user role and ID
         user_role = current_user_any.get("role")
         user_id = current_user_any.get("id")
@@ -167,324 +169,8 @@ async def get_comprehensive_calendar(
         start_datetime = datetime.combine(start_date, datetime.min.time())
         end_datetime = datetime.combine(end_date, datetime.max.time())
         
-        all_items = []
-        
-        # Get enrolled courses for students
-        enrolled_course_ids = set()
-        cohort_specific_course_ids = set()
-        
-        if user_role == "Student":
-            # 1. Direct Enrollments (Global Courses)
-            enrollments = db.query(Enrollment.course_id).filter(Enrollment.student_id == user_id).all()
-            enrolled_course_ids.update(e.course_id for e in enrollments)
-            
-            # 2. Cohort-based global course assignments
-            user_cohort_id = getattr(current_user_any, "cohort_id", current_user_any.get("cohort_id"))
-            if user_cohort_id:
-                cohort_courses = db.query(CohortCourse.course_id).filter(CohortCourse.cohort_id == user_cohort_id).all()
-                enrolled_course_ids.update(cc.course_id for cc in cohort_courses)
-            
-            # 3. CohortSpecificEnrollments (Cohort-Specific Courses)
-            from cohort_specific_models import CohortSpecificEnrollment, CohortSpecificCourse, CohortCourseModule, CohortCourseSession
-            cohort_enrollments = db.query(CohortSpecificEnrollment.course_id).filter(CohortSpecificEnrollment.student_id == user_id).all()
-            cohort_specific_course_ids.update(ce.course_id for ce in cohort_enrollments)
-            
-            # 4. CourseAssignment linkages
-            try:
-                from database import CourseAssignment
-                from sqlalchemy import or_, and_
-                
-                user_college = getattr(current_user_any, "college", current_user_any.get("college"))
-                
-                ca_filters = [
-                    CourseAssignment.assignment_type == 'all',
-                    and_(CourseAssignment.assignment_type == 'individual', CourseAssignment.user_id == user_id)
-                ]
-                
-                if user_cohort_id:
-                    ca_filters.append(and_(CourseAssignment.assignment_type == 'cohort', CourseAssignment.cohort_id == user_cohort_id))
-                
-                if user_college:
-                    ca_filters.append(and_(CourseAssignment.assignment_type == 'college', CourseAssignment.college == user_college))
-                
-                ca_course_ids = db.query(CourseAssignment.course_id).filter(or_(*ca_filters)).all()
-                enrolled_course_ids.update(c.course_id for c in ca_course_ids)
-            except Exception as e:
-                logger.error(f"Error fetching CourseAssignment course IDs: {e}")
-            
-            enrolled_course_ids = list(enrolled_course_ids)
-            cohort_specific_course_ids = list(cohort_specific_course_ids)
-        else:
-            enrolled_course_ids = []
-            cohort_specific_course_ids = []
-        
-        # Get calendar events
-        event_query = db.query(CalendarEvent).filter(
-            CalendarEvent.start_datetime >= start_datetime,
-            CalendarEvent.start_datetime <= end_datetime
-        )
-        
-        # For students, only show events for their courses or public events (course_id is NULL)
-        if user_role == "Student":
-            from sqlalchemy import or_
-            event_query = event_query.filter(
-                or_(
-                    CalendarEvent.course_id.in_(enrolled_course_ids),
-                    CalendarEvent.course_id.is_(None)
-                )
-            )
-            
-        events_result = event_query.order_by(CalendarEvent.start_datetime).all()
-        
-        for event in events_result:
-            all_items.append({
-                "id": f"event_{event.id}",
-                "title": event.title,
-                "description": event.description,
-                "start_datetime": event.start_datetime,
-                "end_datetime": event.end_datetime,
-                "type": "event",
-                "event_type": event.event_type,
-                "location": event.location,
-                "is_all_day": event.is_all_day,
-                "course_id": event.course_id,
-                "color": "#3498db"  # Blue for events
-            })
-        
-        # Get sessions (Global)
-        session_query = db.query(SessionModel).join(Module)
-        if user_role == "Student":
-            session_query = session_query.filter(Module.course_id.in_(enrolled_course_ids))
-            
-        sessions = session_query.filter(
-            SessionModel.scheduled_time >= start_datetime,
-            SessionModel.scheduled_time <= end_datetime
-        ).all()
-        
-        for session in sessions:
-            end_time = session.scheduled_time + timedelta(minutes=session.duration_minutes or 60)
-            all_items.append({
-                "id": f"session_{session.id}",
-                "title": f"Session: {session.title}",
-                "description": session.description,
-                "start_datetime": session.scheduled_time,
-                "end_datetime": end_time,
-                "type": "session",
-                "event_type": "session",
-                "location": "Online" if session.zoom_link else session.syllabus_content,
-                "is_all_day": False,
-                "course_id": session.module.course_id if session.module else None,
-                "course_title": session.module.course.title if session.module and session.module.course else None,
-                "module_title": session.module.title if session.module else None,
-                "zoom_link": session.zoom_link,
-                "color": "#e74c3c"  # Red for sessions
-            })
-
-        # Get sessions (Cohort-Specific)
-        from cohort_specific_models import CohortCourseSession, CohortCourseModule, CohortSpecificCourse
-        cohort_session_query = db.query(CohortCourseSession).join(CohortCourseModule)
-        if user_role == "Student":
-            cohort_session_query = cohort_session_query.filter(CohortCourseModule.course_id.in_(cohort_specific_course_ids))
-        
-        cohort_sessions = cohort_session_query.filter(
-            CohortCourseSession.scheduled_time >= start_datetime,
-            CohortCourseSession.scheduled_time <= end_datetime
-        ).all()
-
-        for session in cohort_sessions:
-            end_time = session.scheduled_time + timedelta(minutes=session.duration_minutes or 60)
-            all_items.append({
-                "id": f"cohort_session_{session.id}",
-                "title": f"Session: {session.title} (Cohort)",
-                "description": session.description,
-                "start_datetime": session.scheduled_time,
-                "end_datetime": end_time,
-                "type": "session",
-                "event_type": "session",
-                "location": "Online" if session.zoom_link else session.syllabus_content,
-                "is_all_day": False,
-                "course_id": session.module.course_id if session.module else None,
-                "course_title": session.module.course.title if session.module and session.module.course else None,
-                "module_title": session.module.title if session.module else None,
-                "zoom_link": session.zoom_link,
-                "color": "#e67e22"  # Distinct color for cohort sessions (Deep Orange)
-            })
-        
-        # Get session meetings
-        meeting_query = db.query(SessionMeeting).join(SessionModel).join(Module)
-        if user_role == "Student":
-            meeting_query = meeting_query.filter(Module.course_id.in_(enrolled_course_ids))
-            
-        session_meetings = meeting_query.filter(
-            SessionMeeting.meeting_datetime >= start_datetime,
-            SessionMeeting.meeting_datetime <= end_datetime,
-            SessionMeeting.meeting_datetime.isnot(None)
-        ).all()
-        
-        for meeting in session_meetings:
-            end_time = meeting.meeting_datetime + timedelta(minutes=meeting.duration_minutes or 60)
-            all_items.append({
-                "id": f"meeting_{meeting.id}",
-                "title": f"Meeting: {meeting.title}",
-                "description": meeting.description,
-                "start_datetime": meeting.meeting_datetime,
-                "end_datetime": end_time,
-                "type": "meeting",
-                "event_type": "meeting",
-                "location": meeting.meeting_url or meeting.location,
-                "is_all_day": False,
-                "course_id": None,
-                "session_id": meeting.session_id,
-                "meeting_url": meeting.meeting_url,
-                "color": "#27ae60"  # Green for meetings
-            })
-        
-        # Get assignment deadlines (Global and Cohort)
-        # 1. Global Assignments
-        assignment_query = db.query(Assignment, Module.course_id, Course.title).join(
-            SessionModel, Assignment.session_id == SessionModel.id
-        ).join(
-            Module, SessionModel.module_id == Module.id
-        ).outerjoin(
-            Course, Module.course_id == Course.id
-        ).filter(Assignment.session_type == "global")
-        
-        if user_role == "Student":
-            assignment_query = assignment_query.filter(Module.course_id.in_(enrolled_course_ids))
-            
-        assignments = assignment_query.filter(
-            Assignment.due_date >= start_datetime,
-            Assignment.due_date <= end_datetime
-        ).all()
-        
-        for assignment, course_id, course_title in assignments:
-            all_items.append({
-                "id": f"assignment_{assignment.id}",
-                "title": f"Assignment Due: {assignment.title}",
-                "description": assignment.description,
-                "start_datetime": assignment.due_date,
-                "end_datetime": assignment.due_date,
-                "type": "assignment",
-                "event_type": "deadline",
-                "location": "Online Submission",
-                "is_all_day": False,
-                "course_id": course_id,
-                "course_title": course_title,
-                "total_marks": assignment.total_marks,
-                "color": "#f39c12"  # Orange for global assignments
-            })
-
-        # 2. Cohort Assignments
-        cohort_assignment_query = db.query(Assignment, CohortCourseModule.course_id, CohortSpecificCourse.title).join(
-            CohortCourseSession, Assignment.session_id == CohortCourseSession.id
-        ).join(
-            CohortCourseModule, CohortCourseSession.module_id == CohortCourseModule.id
-        ).outerjoin(
-            CohortSpecificCourse, CohortCourseModule.course_id == CohortSpecificCourse.id
-        ).filter(Assignment.session_type == "cohort")
-
-        if user_role == "Student":
-            cohort_assignment_query = cohort_assignment_query.filter(CohortCourseModule.course_id.in_(cohort_specific_course_ids))
-        
-        cohort_assignments = cohort_assignment_query.filter(
-            Assignment.due_date >= start_datetime,
-            Assignment.due_date <= end_datetime
-        ).all()
-
-        for assignment, course_id, course_title in cohort_assignments:
-            all_items.append({
-                "id": f"cohort_assignment_{assignment.id}",
-                "title": f"Assignment Due: {assignment.title} (Cohort)",
-                "description": assignment.description,
-                "start_datetime": assignment.due_date,
-                "end_datetime": assignment.due_date,
-                "type": "assignment",
-                "event_type": "deadline",
-                "location": "Online Submission",
-                "is_all_day": False,
-                "course_id": course_id,
-                "course_title": course_title,
-                "total_marks": assignment.total_marks,
-                "color": "#d35400"  # Darker Orange for cohort assignments
-            })
-        
-        # Get quiz schedules (Global and Cohort)
-        # 1. Global Quizzes
-        quiz_query = db.query(Quiz, Module.course_id, Course.title).join(
-            SessionModel, Quiz.session_id == SessionModel.id
-        ).join(
-            Module, SessionModel.module_id == Module.id
-        ).outerjoin(
-            Course, Module.course_id == Course.id
-        ).filter(Quiz.session_type == "global")
-        
-        if user_role == "Student":
-            quiz_query = quiz_query.filter(Module.course_id.in_(enrolled_course_ids))
-            
-        quizzes = quiz_query.filter(
-            Quiz.created_at >= start_datetime,
-            Quiz.created_at <= end_datetime
-        ).all()
-        
-        for quiz, course_id, course_title in quizzes:
-            quiz_end = quiz.created_at + timedelta(minutes=quiz.time_limit_minutes or 60)
-            all_items.append({
-                "id": f"quiz_{quiz.id}",
-                "title": f"Quiz: {quiz.title}",
-                "description": quiz.description,
-                "start_datetime": quiz.created_at,
-                "end_datetime": quiz_end,
-                "type": "quiz",
-                "event_type": "exam",
-                "location": "Online",
-                "is_all_day": False,
-                "course_id": course_id,
-                "course_title": course_title,
-                "session_id": quiz.session_id,
-                "total_marks": quiz.total_marks,
-                "time_limit": quiz.time_limit_minutes,
-                "color": "#9b59b6"  # Purple for global quizzes
-            })
-
-        # 2. Cohort Quizzes
-        cohort_quiz_query = db.query(Quiz, CohortCourseModule.course_id, CohortSpecificCourse.title).join(
-            CohortCourseSession, Quiz.session_id == CohortCourseSession.id
-        ).join(
-            CohortCourseModule, CohortCourseSession.module_id == CohortCourseModule.id
-        ).outerjoin(
-            CohortSpecificCourse, CohortCourseModule.course_id == CohortSpecificCourse.id
-        ).filter(Quiz.session_type == "cohort")
-
-        if user_role == "Student":
-            cohort_quiz_query = cohort_quiz_query.filter(CohortCourseModule.course_id.in_(cohort_specific_course_ids))
-        
-        cohort_quizzes = cohort_quiz_query.filter(
-            Quiz.created_at >= start_datetime,
-            Quiz.created_at <= end_datetime
-        ).all()
-
-        for quiz, course_id, course_title in cohort_quizzes:
-            quiz_end = quiz.created_at + timedelta(minutes=quiz.time_limit_minutes or 60)
-            all_items.append({
-                "id": f"cohort_quiz_{quiz.id}",
-                "title": f"Quiz: {quiz.title} (Cohort)",
-                "description": quiz.description,
-                "start_datetime": quiz.created_at,
-                "end_datetime": quiz_end,
-                "type": "quiz",
-                "event_type": "exam",
-                "location": "Online",
-                "is_all_day": False,
-                "course_id": course_id,
-                "course_title": course_title,
-                "session_id": quiz.session_id,
-                "total_marks": quiz.total_marks,
-                "time_limit": quiz.time_limit_minutes,
-                "color": "#8e44ad"  # Darker Purple for cohort quizzes
-            })
-        
-        # Sort all items by start_datetime
-        all_items.sort(key=lambda x: x["start_datetime"])
+        # Events, sessions, meetings, assignments and quizzes come from the shared month-chunked feed
+        all_items = calendar_feed.get_items(db, user_role, user_id, start_datetime, end_datetime)
         
         return {
             "calendar_items": all_items,
@@ -575,7 +261,9 @@ async def update_calendar_event(
             update_fields.append("updated_at = NOW()")
             query = f"UPDATE calendar_events SET {', '.join(update_fields)} WHERE id = :event_id"
             db.execute(text(query), params)
+            CalendarBlockingService.sync_event_intervals(db, [event_id])
             db.commit()
+            calendar_feed.invalidate_all()
         
         return {"message": "Calendar event updated successfully"}
     except HTTPException:
@@ -602,7 +290,9 @@ async def delete_calendar_event(
         
         db.execute(text("DELETE FROM calendar_events WHERE id = :event_id"), 
                   {"event_id": event_id})
+        CalendarBlockingService.sync_event_intervals(db, [event_id])
         db.commit()
+        calendar_feed.invalidate_all()
         
         return {"message": "Calendar event deleted successfully"}
     except HTTPException:
@@ -623,17 +313,21 @@ async def delete_calendar_event_by_meeting(
         
         # Find and delete calendar events that match the meeting criteria
         # This looks for events with event_type='meeting' and checks if they're auto-generated
-        result = db.execute(text("""
-            DELETE FROM calendar_events 
+        criteria = """
             WHERE event_type = 'meeting' 
             AND is_auto_generated = true 
             AND (title LIKE :meeting_title OR description LIKE :meeting_desc)
-        """), {
+        """
+        params = {
             "meeting_title": f"%Meeting%{meeting_id}%",
             "meeting_desc": f"%meeting%{meeting_id}%"
-        })
+        }
+        event_ids = [row[0] for row in db.execute(text(f"SELECT id FROM calendar_events {criteria}"), params)]
+        db.execute(text(f"DELETE FROM calendar_events {criteria}"), params)
+        CalendarBlockingService.sync_event_intervals(db, event_ids)
         
         db.commit()
+        calendar_feed.invalidate_all()
         
         return {"message": "Calendar event for meeting deleted successfully"}
     except Exception as e:
@@ -707,3 +401,32 @@ async def get_today_events(
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch today's events: {str(e)}")
+
+@router.get("/feed.ics")
+async def get_calendar_ics_feed(
+    request: Request,
+    days_back: int = Query(30, ge=0, le=365),
+    days_ahead: int = Query(90, ge=1, le=365),
+    current_user = Depends(get_current_user_any_role),
+    db: Session = Depends(get_db)
+):
+    """Export the user's calendar as ICS; poll with If-None-Match to get 304 when nothing changed"""
+    try:
+        today = date.today()
+        start_datetime = datetime.combine(today - timedelta(days=days_back), datetime.min.time())
+        end_datetime = datetime.combine(today + timedelta(days=days_ahead), datetime.max.time())
+        
+        etag, render = calendar_feed.get_ics(db, current_user.get("role"), current_user.get("id"), start_datetime, end_datetime)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        
+        return Response(
+            content=render(),
+            media_type="text/calendar; charset=utf-8",
+            headers={**headers, "Content-Disposition": 'inline; filename="calendar.ics"'}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export calendar feed: {str(e)}")
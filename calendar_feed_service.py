@@ -0,0 +1,491 @@
+import os
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Tuple, Callable
+from datetime import datetime, timedelta, date
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session, attributes
+from database import SessionLocal, CalendarEvent, Session as SessionModel, SessionMeeting, Module, Course
+from cohort_specific_models import CohortCourseSession, CohortCourseModule, CohortSpecificCourse
+from assignment_quiz_models import Assignment, Quiz
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on cached (scope, month) chunks; the oldest chunks are evicted first
+CALENDAR_FEED_MAX_CHUNKS = int(os.getenv("CALENDAR_FEED_MAX_CHUNKS", "5000"))
+
+# Key under which pending invalidations are collected until the transaction commits
+_PENDING_KEY = "calendar_feed_invalidations"
+
+# Tables whose rows appear on the calendar, mapped to the column that places them in a month
+_FEED_TABLES = {
+    "calendar_events": "start_datetime",
+    "sessions": "scheduled_time",
+    "cohort_course_sessions": "scheduled_time",
+    "session_meetings": "meeting_datetime",
+    "assignments": "due_date",
+    "quizzes": "created_at",
+}
+# Tables that only contribute titles/course links to calendar items
+_STRUCTURE_TABLES = {"modules", "cohort_course_modules", "courses", "cohort_specific_courses"}
+
+Month = Tuple[int, int]
+
+
+def _month_of(value: datetime) -> Month:
+    return (value.year, value.month)
+
+
+def _month_bounds(month: Month) -> Tuple[datetime, datetime]:
+    year, month_number = month
+    start = datetime(year, month_number, 1)
+    end = datetime(year + 1, 1, 1) if month_number == 12 else datetime(year, month_number + 1, 1)
+    return start, end
+
+
+def _months_between(start: datetime, end: datetime) -> List[Month]:
+    months = []
+    year, month_number = start.year, start.month
+    while (year, month_number) <= (end.year, end.month):
+        months.append((year, month_number))
+        year, month_number = (year + 1, 1) if month_number == 12 else (year, month_number + 1)
+    return months
+
+
+class CalendarFeed:
+    """Builds calendar items for a user and caches them in month-sized chunks.
+
+    Every window (month view, upcoming, today, ICS export) is served from the chunks of
+    the months it spans, so overlapping windows share work. A chunk is loaded with a fixed
+    set of joined queries and stays cached until a write to an item in that month is
+    committed; students' chunks are also dropped when their course entitlements change.
+    """
+
+    def __init__(self):
+        self._chunks: Dict[Tuple[Any, Month], Dict[str, Any]] = {}
+        self._month_versions: Dict[Month, int] = {}
+        self._generation = 0  # Bumped by invalidate_all
+        self._cache_duration = timedelta(minutes=10)  # Safety net for writes made outside the ORM
+        self._lock = threading.Lock()
+
+    def get_items(self, db: Session, user_role: str, user_id: int,
+                  start_datetime: datetime, end_datetime: datetime) -> List[Dict[str, Any]]:
+        """Calendar items starting within [start_datetime, end_datetime], sorted by start.
+
+        Returned items are shared with the cache and must not be modified.
+        """
+        items = []
+        for chunk in self._get_chunks(db, user_role, user_id, start_datetime, end_datetime):
+            items.extend(
+                item for item in chunk["items"]
+                if start_datetime <= item["start_datetime"] <= end_datetime
+            )
+        return items
+
+    def get_ics(self, db: Session, user_role: str, user_id: int,
+                start_datetime: datetime, end_datetime: datetime) -> Tuple[str, Callable[[], str]]:
+        """ETag of the ICS export for a window plus a callable rendering its body.
+
+        The ETag is derived from per-chunk digests, so an unchanged feed can be answered
+        with 304 without assembling the document.
+        """
+        chunks = self._get_chunks(db, user_role, user_id, start_datetime, end_datetime)
+        digest = hashlib.sha1(f"{start_datetime.isoformat()}|{end_datetime.isoformat()}".encode())
+        for chunk in chunks:
+            digest.update(self._rendered(chunk, start_datetime, end_datetime)[1].encode())
+        etag = f'"{digest.hexdigest()}"'
+
+        def render() -> str:
+            body = [self._rendered(chunk, start_datetime, end_datetime)[0] for chunk in chunks]
+            return "\r\n".join(
+                ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Kambaa AI LMS//Calendar//EN",
+                 "CALSCALE:GREGORIAN", "X-WR-CALNAME:LMS Calendar"]
+                + [part for part in body if part]
+                + ["END:VCALENDAR"]
+            ) + "\r\n"
+
+        return etag, render
+
+    def _get_chunks(self, db: Session, user_role: str, user_id: int,
+                    start_datetime: datetime, end_datetime: datetime) -> List[Dict[str, Any]]:
+        scope, course_ids, cohort_course_ids = self._scope(db, user_role, user_id)
+        months = _months_between(start_datetime, end_datetime)
+        chunks: Dict[Month, Dict[str, Any]] = {}
+        with self._lock:
+            now = datetime.utcnow()
+            for month in months:
+                chunk = self._chunks.get((scope, month))
+                if (chunk is not None
+                        and now - chunk["timestamp"] < self._cache_duration
+                        and chunk["course_ids"] == course_ids
+                        and chunk["cohort_course_ids"] == cohort_course_ids):
+                    chunks[month] = chunk
+            missing = [month for month in months if month not in chunks]
+            versions = {month: (self._generation, self._month_versions.get(month, 0)) for month in missing}
+
+        if missing:
+            # Load all missing months in one pass and split the items per month
+            load_start, load_end = _month_bounds(missing[0])[0], _month_bounds(missing[-1])[1]
+            loaded = {month: [] for month in missing}
+            for item in self._load(db, load_start, load_end, course_ids, cohort_course_ids):
+                month_items = loaded.get(_month_of(item["start_datetime"]))
+                if month_items is not None:
+                    month_items.append(item)
+            timestamp = datetime.utcnow()
+            with self._lock:
+                for month in missing:
+                    chunk = {
+                        "items": loaded[month],
+                        "course_ids": course_ids,
+                        "cohort_course_ids": cohort_course_ids,
+                        "timestamp": timestamp,
+                        "ics": {},
+                    }
+                    chunks[month] = chunk
+                    # Discard the result if the month was invalidated while it was loading
+                    if (self._generation, self._month_versions.get(month, 0)) == versions[month]:
+                        self._store(scope, month, chunk)
+
+        return [chunks[month] for month in months]
+
+    def _store(self, scope, month: Month, chunk: Dict[str, Any]):
+        # Called with the lock held; dict order is insertion order, so re-inserting keeps it oldest-first
+        self._chunks.pop((scope, month), None)
+        self._chunks[(scope, month)] = chunk
+        while len(self._chunks) > CALENDAR_FEED_MAX_CHUNKS:
+            del self._chunks[next(iter(self._chunks))]
+
+    def _scope(self, db: Session, user_role: str, user_id: int):
+        # Students only see items of their courses; every other role sees the full calendar
+        if user_role != "Student":
+            return ("staff",), None, None
+        from entitlement_service import get_student_entitlements
+        entitlements = get_student_entitlements(db, user_id)
+        return (
+            ("student", user_id),
+            entitlements["accessible_regular_course_ids"],
+            entitlements["accessible_cohort_course_ids"],
+        )
+
+    def _load(self, db: Session, start: datetime, end: datetime, course_ids, cohort_course_ids) -> List[Dict[str, Any]]:
+        """Load every calendar item starting in [start, end) with one joined query per item kind"""
+        is_student = course_ids is not None
+        items: List[Dict[str, Any]] = []
+
+        # Calendar events: students see events of their courses and public events
+        event_query = db.query(CalendarEvent).filter(
+            CalendarEvent.start_datetime >= start,
+            CalendarEvent.start_datetime < end
+        )
+        if is_student:
+            event_query = event_query.filter(or_(
+                CalendarEvent.course_id.in_(course_ids),
+                CalendarEvent.course_id.is_(None)
+            ))
+        for calendar_event in event_query.order_by(CalendarEvent.start_datetime).all():
+            items.append({
+                "id": f"event_{calendar_event.id}",
+                "title": calendar_event.title,
+                "description": calendar_event.description,
+                "start_datetime": calendar_event.start_datetime,
+                "end_datetime": calendar_event.end_datetime,
+                "type": "event",
+                "event_type": calendar_event.event_type,
+                "location": calendar_event.location,
+                "is_all_day": calendar_event.is_all_day,
+                "course_id": calendar_event.course_id,
+                "color": "#3498db"  # Blue for events
+            })
+
+        if not is_student or course_ids:
+            session_query = db.query(SessionModel, Module.course_id, Module.title, Course.title).join(
+                Module, SessionModel.module_id == Module.id
+            ).outerjoin(
+                Course, Module.course_id == Course.id
+            ).filter(
+                SessionModel.scheduled_time >= start,
+                SessionModel.scheduled_time < end
+            )
+            if is_student:
+                session_query = session_query.filter(Module.course_id.in_(course_ids))
+            for session, course_id, module_title, course_title in session_query.all():
+                items.append(self._session_item(
+                    session, f"session_{session.id}", f"Session: {session.title}",
+                    course_id, course_title, module_title, "#e74c3c"  # Red for sessions
+                ))
+
+        if not is_student or cohort_course_ids:
+            cohort_session_query = db.query(
+                CohortCourseSession, CohortCourseModule.course_id, CohortCourseModule.title, CohortSpecificCourse.title
+            ).join(
+                CohortCourseModule, CohortCourseSession.module_id == CohortCourseModule.id
+            ).outerjoin(
+                CohortSpecificCourse, CohortCourseModule.course_id == CohortSpecificCourse.id
+            ).filter(
+                CohortCourseSession.scheduled_time >= start,
+                CohortCourseSession.scheduled_time < end
+            )
+            if is_student:
+                cohort_session_query = cohort_session_query.filter(CohortCourseModule.course_id.in_(cohort_course_ids))
+            for session, course_id, module_title, course_title in cohort_session_query.all():
+                items.append(self._session_item(
+                    session, f"cohort_session_{session.id}", f"Session: {session.title} (Cohort)",
+                    course_id, course_title, module_title, "#e67e22"  # Deep orange for cohort sessions
+                ))
+
+        if not is_student or course_ids:
+            meeting_query = db.query(SessionMeeting).join(
+                SessionModel, SessionMeeting.session_id == SessionModel.id
+            ).join(
+                Module, SessionModel.module_id == Module.id
+            ).filter(
+                SessionMeeting.meeting_datetime >= start,
+                SessionMeeting.meeting_datetime < end
+            )
+            if is_student:
+                meeting_query = meeting_query.filter(Module.course_id.in_(course_ids))
+            for meeting in meeting_query.all():
+                items.append({
+                    "id": f"meeting_{meeting.id}",
+                    "title": f"Meeting: {meeting.title}",
+                    "description": meeting.description,
+                    "start_datetime": meeting.meeting_datetime,
+                    "end_datetime": meeting.meeting_datetime + timedelta(minutes=meeting.duration_minutes or 60),
+                    "type": "meeting",
+                    "event_type": "meeting",
+                    "location": meeting.meeting_url or meeting.location,
+                    "is_all_day": False,
+                    "course_id": None,
+                    "session_id": meeting.session_id,
+                    "meeting_url": meeting.meeting_url,
+                    "color": "#27ae60"  # Green for meetings
+                })
+
+        for is_cohort in (False, True):
+            allowed = cohort_course_ids if is_cohort else course_ids
+            if is_student and not allowed:
+                continue
+            for assignment, course_id, course_title in self._content_query(db, Assignment, Assignment.due_date, is_cohort, allowed, start, end):
+                items.append({
+                    "id": f"{'cohort_' if is_cohort else ''}assignment_{assignment.id}",
+                    "title": f"Assignment Due: {assignment.title}{' (Cohort)' if is_cohort else ''}",
+                    "description": assignment.description,
+                    "start_datetime": assignment.due_date,
+                    "end_datetime": assignment.due_date,
+                    "type": "assignment",
+                    "event_type": "deadline",
+                    "location": "Online Submission",
+                    "is_all_day": False,
+                    "course_id": course_id,
+                    "course_title": course_title,
+                    "total_marks": assignment.total_marks,
+                    "color": "#d35400" if is_cohort else "#f39c12"  # Orange shades for assignments
+                })
+
+        for is_cohort in (False, True):
+            allowed = cohort_course_ids if is_cohort else course_ids
+            if is_student and not allowed:
+                continue
+            for quiz, course_id, course_title in self._content_query(db, Quiz, Quiz.created_at, is_cohort, allowed, start, end):
+                items.append({
+                    "id": f"{'cohort_' if is_cohort else ''}quiz_{quiz.id}",
+                    "title": f"Quiz: {quiz.title}{' (Cohort)' if is_cohort else ''}",
+                    "description": quiz.description,
+                    "start_datetime": quiz.created_at,
+                    "end_datetime": quiz.created_at + timedelta(minutes=quiz.time_limit_minutes or 60),
+                    "type": "quiz",
+                    "event_type": "exam",
+                    "location": "Online",
+                    "is_all_day": False,
+                    "course_id": course_id,
+                    "course_title": course_title,
+                    "session_id": quiz.session_id,
+                    "total_marks": quiz.total_marks,
+                    "time_limit": quiz.time_limit_minutes,
+                    "color": "#8e44ad" if is_cohort else "#9b59b6"  # Purple shades for quizzes
+                })
+
+        items.sort(key=lambda item: item["start_datetime"])
+        return items
+
+    @staticmethod
+    def _session_item(session, item_id: str, title: str, course_id, course_title, module_title, color: str) -> Dict[str, Any]:
+        return {
+            "id": item_id,
+            "title": title,
+            "description": session.description,
+            "start_datetime": session.scheduled_time,
+            "end_datetime": session.scheduled_time + timedelta(minutes=session.duration_minutes or 60),
+            "type": "session",
+            "event_type": "session",
+            "location": "Online" if session.zoom_link else session.syllabus_content,
+            "is_all_day": False,
+            "course_id": course_id,
+            "course_title": course_title,
+            "module_title": module_title,
+            "zoom_link": session.zoom_link,
+            "color": color
+        }
+
+    @staticmethod
+    def _content_query(db: Session, model, date_column, is_cohort: bool, allowed, start: datetime, end: datetime):
+        """Assignments/quizzes of one session type joined up to their course in a single query"""
+        if is_cohort:
+            session_model, module_model, course_model, session_type = CohortCourseSession, CohortCourseModule, CohortSpecificCourse, "cohort"
+        else:
+            session_model, module_model, course_model, session_type = SessionModel, Module, Course, "global"
+        query = db.query(model, module_model.course_id, course_model.title).join(
+            session_model, model.session_id == session_model.id
+        ).join(
+            module_model, session_model.module_id == module_model.id
+        ).outerjoin(
+            course_model, module_model.course_id == course_model.id
+        ).filter(
+            model.session_type == session_type,
+            date_column >= start,
+            date_column < end
+        )
+        if allowed is not None:
+            query = query.filter(module_model.course_id.in_(allowed))
+        return query.all()
+
+    def _rendered(self, chunk: Dict[str, Any], start_datetime: datetime, end_datetime: datetime) -> Tuple[str, str]:
+        """ICS text (and its digest) of the items of one chunk inside a window, rendered once per chunk.
+
+        The digest covers the item data only, not DTSTAMP, so a chunk that is reloaded without
+        changes (TTL expiry, invalidate_all) keeps its ETag.
+        """
+        key = (start_datetime, end_datetime)
+        rendered = chunk["ics"].get(key)
+        if rendered is None:
+            items = [item for item in chunk["items"] if start_datetime <= item["start_datetime"] <= end_datetime]
+            text = "\r\n".join(_ics_event(item, chunk["timestamp"]) for item in items)
+            digest = hashlib.sha1(repr([sorted(item.items()) for item in items]).encode()).hexdigest()
+            rendered = (text, digest)
+            chunk["ics"][key] = rendered
+        return rendered
+
+    def invalidate_months(self, months):
+        """Drop every cached chunk of the given months"""
+        months = set(months)
+        with self._lock:
+            for month in months:
+                self._month_versions[month] = self._month_versions.get(month, 0) + 1
+            for key in [key for key in self._chunks if key[1] in months]:
+                del self._chunks[key]
+
+    def invalidate_all(self):
+        """Drop every cached chunk"""
+        with self._lock:
+            self._generation += 1
+            self._chunks.clear()
+        logger.info("Calendar feed cache invalidated")
+
+
+# Global feed instance
+calendar_feed = CalendarFeed()
+
+
+def _ics_escape(value) -> str:
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _ics_fold(line: str) -> str:
+    # RFC 5545 limits content lines to 75 octets; continuation lines start with a space
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts, current = [], b""
+    for char in line:
+        char_bytes = char.encode("utf-8")
+        if len(current) + len(char_bytes) > (75 if not parts else 74):
+            parts.append(current.decode("utf-8"))
+            current = b""
+        current += char_bytes
+    parts.append(current.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def _ics_datetime(value) -> str:
+    if isinstance(value, datetime):
+        return value.strftime("%Y%m%dT%H%M%S")
+    return value.strftime("%Y%m%d") if isinstance(value, date) else str(value)
+
+
+def _ics_event(item: Dict[str, Any], generated_at: datetime) -> str:
+    """One VEVENT; DTSTAMP is the (UTC) time the chunk was generated, so it is stable while cached"""
+    start = item["start_datetime"]
+    end = item.get("end_datetime") or start
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{item['id']}@lms",
+        f"DTSTAMP:{generated_at.strftime('%Y%m%dT%H%M%SZ')}",
+        f"DTSTART:{_ics_datetime(start)}",
+        f"DTEND:{_ics_datetime(end)}",
+        f"SUMMARY:{_ics_escape(item['title'])}",
+        f"CATEGORIES:{_ics_escape(item['type'])}",
+    ]
+    if item.get("description"):
+        lines.append(f"DESCRIPTION:{_ics_escape(item['description'])}")
+    if item.get("location"):
+        lines.append(f"LOCATION:{_ics_escape(item['location'])}")
+    lines.append("END:VEVENT")
+    return "\r\n".join(_ics_fold(line) for line in lines)
+
+
+def _pending(session: Session) -> Dict[str, Any]:
+    return session.info.setdefault(_PENDING_KEY, {"months": set(), "all": False})
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_feed_changes(session, flush_context):
+    """Record which calendar months are touched by the rows written in this flush"""
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, "__tablename__", None)
+        if table in _STRUCTURE_TABLES and instance not in session.new:
+            _pending(session)["all"] = True
+            continue
+        column = _FEED_TABLES.get(table)
+        if not column:
+            continue
+        pending = _pending(session)
+        # Both the month an item moved out of and the month it moved into change
+        history = attributes.get_history(instance, column)
+        months = {
+            _month_of(value)
+            for value in list(history.added or ()) + list(history.deleted or ()) + list(history.unchanged or ())
+            if isinstance(value, datetime)
+        }
+        if months:
+            pending["months"].update(months)
+        else:
+            # Date not loaded on the instance (e.g. a server default); fall back to a full refresh
+            pending["all"] = True
+
+
+def _collect_bulk_change(context):
+    if context.mapper.local_table.name in _FEED_TABLES or context.mapper.local_table.name in _STRUCTURE_TABLES:
+        _pending(context.session)["all"] = True
+
+
+event.listen(SessionLocal, "after_bulk_update", _collect_bulk_change)
+event.listen(SessionLocal, "after_bulk_delete", _collect_bulk_change)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_feed_invalidations(session):
+    """Invalidate cached months once the change is visible to other sessions"""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if pending["all"]:
+        calendar_feed.invalidate_all()
+    elif pending["months"]:
+        calendar_feed.invalidate_months(pending["months"])
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_feed_invalidations(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -2,10 +2,15 @@ import asyncio
 import logging
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
+from pydantic import BaseModel
 from database import SessionLocal, EmailCampaign
+from job_queue import enqueue, job_handler, JobContext
 
 logger = logging.getLogger(__name__)
 
+# Recipients handled between progress checkpoints of a send job
+CHECKPOINT_EVERY = 50
+
 class CampaignScheduler:
     def __init__(self):
         self.running = False
@@ -35,11 +40,8 @@ class CampaignScheduler:
                 await asyncio.sleep(60)
 
     async def check_assignment_reminders(self, db: Session):
-        """Check for assignments due in ~24 hours and send reminders"""
-        from assignment_quiz_models import Assignment, AssignmentSubmission
-        from database import EmailTemplate, User, Enrollment, UserCohort, Session as SessionModel
-        from cohort_specific_models import CohortCourseSession, CohortCourseModule, CohortSpecificCourse
-        from notification_service import NotificationService
+        """Queue reminder jobs for assignments due in ~24 hours"""
+        from assignment_quiz_models import Assignment
         
         try:
             # Use local time since due_date is stored in local time
@@ -60,98 +62,22 @@ class CampaignScheduler:
                 
             logger.info(f"[SCHEDULER] Found {len(assignments)} assignments needing due reminders")
             
-            # Get the template
-            template = db.query(EmailTemplate).filter(
-                EmailTemplate.name == "Assignment Due Reminder",
-                EmailTemplate.is_active == True
-            ).first()
-            
-            if not template:
-                logger.warning("Assignment due reminder template not found or disabled")
-                return
-                
-            notification_service = NotificationService(db)
-            
             for assignment in assignments:
                 try:
-                    # Get students who HAVE submitted
-                    submitted_student_ids = [s.student_id for s in assignment.submissions]
-                    
-                    # Get all students who SHOULD submit
-                    target_students = []
-                    session_title = "Unknown Session"
-                    
-                    if assignment.session_type == "cohort":
-                        cohort_session = db.query(CohortCourseSession).filter(CohortCourseSession.id == assignment.session_id).first()
-                        if cohort_session:
-                            session_title = cohort_session.title
-                            cohort_module = db.query(CohortCourseModule).filter(CohortCourseModule.id == cohort_session.module_id).first()
-                            if cohort_module:
-                                cohort_course = db.query(CohortSpecificCourse).filter(CohortSpecificCourse.id == cohort_module.course_id).first()
-                                if cohort_course:
-                                    target_students = db.query(User).join(UserCohort).filter(
-                                        UserCohort.cohort_id == cohort_course.cohort_id,
-                                        User.role == "Student",
-                                        User.id.notin_(submitted_student_ids) if submitted_student_ids else True
-                                    ).all()
-                    else:
-                        regular_session = db.query(SessionModel).filter(SessionModel.id == assignment.session_id).first()
-                        if regular_session:
-                            session_title = regular_session.title
-                            from database import Module # Need to ensure Module is imported or available
-                            # Using database Module model
-                            from database import Module as GlobalModule
-                            regular_module = db.query(GlobalModule).filter(GlobalModule.id == regular_session.module_id).first()
-                            if regular_module:
-                                target_students = db.query(User).join(Enrollment).filter(
-                                    Enrollment.course_id == regular_module.course_id,
-                                    User.role == "Student",
-                                    User.id.notin_(submitted_student_ids) if submitted_student_ids else True
-                                ).all()
-                                
-                    if not target_students:
-                        logger.info(f"No pending students found for assignment {assignment.id}")
-                        assignment.due_reminder_sent = True
-                        db.commit()
-                        continue
-                        
-                    # Send reminders
-                    sent_count = 0
-                    for student in target_students:
-                        try:
-                            context = {
-                                "username": student.username or student.email,
-                                "assignment_title": assignment.title,
-                                "session_title": session_title,
-                                "due_date": assignment.due_date.strftime("%Y-%m-%d %H:%M")
-                            }
-                            
-                            subject = template.subject.format(**context)
-                            body_text = template.body.format(**context)
-                            
-                            notification_service.send_email_notification(
-                                user_id=student.id,
-                                email=student.email,
-                                subject=subject,
-                                body=body_text
-                            )
-                            sent_count += 1
-                        except Exception as e:
-                            logger.error(f"Failed to send reminder to {student.email}: {str(e)}")
-                            
-                    logger.info(f"Sent {sent_count} reminders for assignment '{assignment.title}' (ID: {assignment.id})")
+                    # The job owns the reminder from here on; the flag keeps it from being queued again
+                    enqueue(db, "assignment_due_reminder", {"assignment_id": assignment.id},
+                            idempotency_key=f"assignment-reminder:{assignment.id}")
                     assignment.due_reminder_sent = True
                     db.commit()
-                    
                 except Exception as e:
-                    logger.error(f"Error processing reminder for assignment {assignment.id}: {str(e)}")
+                    logger.error(f"Error queueing reminder for assignment {assignment.id}: {str(e)}")
                     db.rollback()
                     
         except Exception as e:
             logger.error(f"Error checking assignment reminders: {str(e)}")
     
     async def check_scheduled_campaigns(self):
-        """Check for campaigns that need to be sent"""
+        """Queue send jobs for campaigns whose scheduled time has come"""
         db = SessionLocal()
         try:
             now = datetime.now()
@@ -166,163 +92,25 @@ class CampaignScheduler:
             
             logger.info(f"[SCHEDULER] Found {len(scheduled_campaigns)} campaigns ready to send")
             
-            # Also log all scheduled campaigns for debugging
-            all_scheduled_campaigns = db.query(EmailCampaign).filter(
-                EmailCampaign.status == "scheduled",
-                EmailCampaign.scheduled_time.isnot(None)
-            ).all()
-            
-            logger.info(f"[SCHEDULER] Total scheduled campaigns: {len(all_scheduled_campaigns)}")
-            
-            for campaign in all_scheduled_campaigns:
-                time_diff = campaign.scheduled_time - now
-                is_ready = campaign.scheduled_time <= now
-                logger.info(f"[SCHEDULER] Campaign {campaign.id}: {campaign.name} scheduled for {campaign.scheduled_time} (diff: {time_diff}, ready: {is_ready})")
-            
             for campaign in scheduled_campaigns:
                 try:
-                    logger.info(f"[SCHEDULER] Sending scheduled campaign: {campaign.name} (ID: {campaign.id})")
+                    logger.info(f"[SCHEDULER] Queueing scheduled campaign: {campaign.name} (ID: {campaign.id})")
                     
-                    # Send the campaign (this will update status to sending/completed)
-                    await self.send_scheduled_campaign(campaign.id, db)
+                    # A campaign rescheduled after it was sent gets a new key and is sent again
+                    enqueue(db, "scheduled_campaign_send", {"campaign_id": campaign.id},
+                            idempotency_key=f"campaign-scheduled:{campaign.id}:{campaign.scheduled_time.isoformat()}")
+                    campaign.status = "queued"
+                    db.commit()
                     
                 except Exception as e:
-                    logger.error(f"[SCHEDULER] Failed to send scheduled campaign {campaign.id}: {str(e)}")
-                    campaign.status = "failed"
-                    db.commit()
+                    logger.error(f"[SCHEDULER] Failed to queue scheduled campaign {campaign.id}: {str(e)}")
+                    db.rollback()
                     
         except Exception as e:
             logger.error(f"[SCHEDULER] Error checking scheduled campaigns: {str(e)}")
         finally:
             db.close()
     
-    async def send_scheduled_campaign(self, campaign_id: int, db: Session):
-        """Send a scheduled campaign"""
-        from notification_service import NotificationService
-        from database import EmailTemplate, EmailRecipient, User, Admin, Presenter, Mentor, UserCohort
-        
-        try:
-            # Get campaign
-            campaign = db.query(EmailCampaign).filter(EmailCampaign.id == campaign_id).first()
-            if not campaign:
-                logger.error(f"Campaign {campaign_id} not found")
-                return
-            
-            # Get template
-            template = db.query(EmailTemplate).filter(EmailTemplate.id == campaign.template_id).first()
-            if not template:
-                logger.error(f"Template {campaign.template_id} not found for campaign {campaign_id}")
-                return
-            
-            # Get target users based on target_role
-            target_users = []
-            
-            # Check if target_role is a cohort (starts with "cohort_")
-            if campaign.target_role.startswith("cohort_"):
-                try:
-                    cohort_id = int(campaign.target_role.replace("cohort_", ""))
-                    # Get users in this specific cohort
-                    user_cohorts = db.query(UserCohort).filter(UserCohort.cohort_id == cohort_id).all()
-                    for uc in user_cohorts:
-                        user = db.query(User).filter(User.id == uc.user_id).first()
-                        if user:
-                            target_users.append(user)
-                    logger.info(f"Found {len(target_users)} users in cohort {cohort_id}")
-                except ValueError:
-                    logger.error(f"Invalid cohort ID in target_role: {campaign.target_role}")
-                    return
-            else:
-                # Regular role-based targeting
-                if campaign.target_role == "Student":
-                    target_users = db.query(User).filter(User.role == "Student").all()
-                elif campaign.target_role == "Admin":
-                    target_users = db.query(Admin).all()
-                elif campaign.target_role == "Presenter":
-                    target_users = db.query(Presenter).all()
-                elif campaign.target_role == "Mentor":
-                    target_users = db.query(Mentor).all()
-                elif campaign.target_role == "All":
-                    users = db.query(User).all()
-                    admins = db.query(Admin).all()
-                    presenters = db.query(Presenter).all()
-                    mentors = db.query(Mentor).all()
-                    target_users = users + admins + presenters + mentors
-            
-            if not target_users:
-                logger.warning(f"No target users found for campaign {campaign_id} with target_role {campaign.target_role}")
-                campaign.status = "completed"
-                campaign.sent_count = 0
-                campaign.completed_at = datetime.now()
-                db.commit()
-                return
-            
-            # Update campaign status to sending
-            campaign.status = "sending"
-            campaign.started_at = datetime.now()
-            db.commit()
-            
-            # Create recipients and send emails
-            service = NotificationService(db)
-            sent_count = 0
-            
-            for user in target_users:
-                if user.email:
-                    try:
-                        # Create recipient record
-                        recipient = EmailRecipient(
-                            campaign_id=campaign.id,
-                            user_id=getattr(user, 'id', None),
-                            email=user.email,
-                            status="pending"
-                        )
-                        db.add(recipient)
-                        
-                        # Send email
-                        body_content = template.body.replace("{username}", getattr(user, 'username', user.email))
-                        body_content = body_content.replace("{email}", user.email)
-                        
-                        # Send email using regular method
-                        email_log = service.send_email_notification(
-                            user_id=getattr(user, 'id', None),
-                            email=user.email,
-                            subject=template.subject,
-                            body=body_content
-                        )
-                        
-                        if email_log.status in ["sent", "queued"]:
-                            recipient.status = "sent"
-                            recipient.sent_at = datetime.now()
-                            sent_count += 1
-                        else:
-                            recipient.status = "failed"
-                            recipient.error_message = email_log.error_message
-                        
-                    except Exception as e:
-                        logger.error(f"Failed to send email to {user.email}: {str(e)}")
-                        if 'recipient' in locals():
-                            recipient.status = "failed"
-                            recipient.error_message = str(e)
-            
-            # Update campaign with final counts and mark as completed
-            campaign.sent_count = sent_count
-            campaign.status = "completed"
-            campaign.completed_at = datetime.now()
-            
-            db.commit()
-            
-            logger.info(f"Scheduled campaign {campaign_id} sent to {sent_count} recipients")
-            
-        except Exception as e:
-            logger.error(f"Error sending scheduled campaign {campaign_id}: {str(e)}")
-            # Mark campaign as failed
-            try:
-                campaign = db.query(EmailCampaign).filter(EmailCampaign.id == campaign_id).first()
-                if campaign:
-                    campaign.status = "failed"
-                    db.commit()
-            except:
-                pass
-    
     def stop_scheduler(self):
         """Stop the campaign scheduler"""
         self.running = False
@@ -341,4 +129,236 @@ def stop_campaign_scheduler():
 
 async def trigger_scheduler_check():
     """Manually trigger scheduler check for testing"""
-    await scheduler.check_scheduled_campaigns()
\ No newline at end of file
+    await scheduler.check_scheduled_campaigns()
+
+class AssignmentReminderPayload(BaseModel):
+    assignment_id: int
+
+
+class CampaignPayload(BaseModel):
+    campaign_id: int
+
+
+@job_handler("assignment_due_reminder", payload_model=AssignmentReminderPayload)
+def send_assignment_due_reminder(db: Session, payload: AssignmentReminderPayload, ctx: JobContext):
+    """Remind the students who have not submitted an assignment that it is due"""
+    from assignment_quiz_models import Assignment, AssignmentSubmission
+    from database import User, Enrollment, UserCohort, Module, Session as SessionModel
+    from cohort_specific_models import CohortCourseSession, CohortCourseModule, CohortSpecificCourse
+    from notification_service import NotificationService
+    from email_template_engine import email_template_engine
+    
+    assignment = db.query(Assignment).filter(Assignment.id == payload.assignment_id).first()
+    if not assignment or not assignment.is_active:
+        return
+    
+    # Get the template, compiled once per template version
+    template = email_template_engine.get(db, "Assignment Due Reminder")
+    
+    if not template:
+        logger.warning("Assignment due reminder template not found or disabled")
+        return
+    
+    # Get students who HAVE submitted
+    submitted_student_ids = [s.student_id for s in assignment.submissions]
+    
+    # Get all students who SHOULD submit
+    target_students = []
+    session_title = "Unknown Session"
+    
+    if assignment.session_type == "cohort":
+        cohort_session = db.query(CohortCourseSession).filter(CohortCourseSession.id == assignment.session_id).first()
+        if cohort_session:
+            session_title = cohort_session.title
+            cohort_module = db.query(CohortCourseModule).filter(CohortCourseModule.id == cohort_session.module_id).first()
+            if cohort_module:
+                cohort_course = db.query(CohortSpecificCourse).filter(CohortSpecificCourse.id == cohort_module.course_id).first()
+                if cohort_course:
+                    target_students = db.query(User).join(UserCohort).filter(
+                        UserCohort.cohort_id == cohort_course.cohort_id,
+                        User.role == "Student",
+                        User.id.notin_(submitted_student_ids) if submitted_student_ids else True
+                    ).all()
+    else:
+        regular_session = db.query(SessionModel).filter(SessionModel.id == assignment.session_id).first()
+        if regular_session:
+            session_title = regular_session.title
+            regular_module = db.query(Module).filter(Module.id == regular_session.module_id).first()
+            if regular_module:
+                target_students = db.query(User).join(Enrollment).filter(
+                    Enrollment.course_id == regular_module.course_id,
+                    User.role == "Student",
+                    User.id.notin_(submitted_student_ids) if submitted_student_ids else True
+                ).all()
+                
+    if not target_students:
+        logger.info(f"No pending students found for assignment {assignment.id}")
+        return
+        
+    # Send reminders in id order; a retry resumes after the last checkpointed student
+    notification_service = NotificationService(db)
+    target_students.sort(key=lambda student: student.id)
+    after_id = ctx.progress.get("after_id", 0)
+    sent_count = 0
+    handled = 0
+    for student in target_students:
+        if student.id <= after_id:
+            continue
+        try:
+            context = {
+                "username": student.username or student.email,
+                "assignment_title": assignment.title,
+                "session_title": session_title,
+                "due_date": assignment.due_date.strftime("%Y-%m-%d %H:%M")
+            }
+            
+            subject, body_html = template.render(context)
+            
+            notification_service.send_email_notification(
+                user_id=student.id,
+                email=student.email,
+                subject=subject,
+                body=body_html
+            )
+            sent_count += 1
+        except Exception as e:
+            logger.error(f"Failed to send reminder to {student.email}: {str(e)}")
+        handled += 1
+        if handled % CHECKPOINT_EVERY == 0:
+            ctx.checkpoint(after_id=student.id)
+            
+    logger.info(f"Sent {sent_count} reminders for assignment '{assignment.title}' (ID: {assignment.id})")
+
+
+def _recipient_key(user):
+    """Stable position of a campaign recipient; users, admins, presenters and mentors share ids"""
+    return (type(user).__tablename__, user.id)
+
+
+def _mark_campaign_failed(db: Session, payload: CampaignPayload, error: Exception):
+    campaign = db.query(EmailCampaign).filter(EmailCampaign.id == payload.campaign_id).first()
+    if campaign:
+        campaign.status = "failed"
+
+
+@job_handler("scheduled_campaign_send", payload_model=CampaignPayload, on_failure=_mark_campaign_failed)
+def send_scheduled_campaign(db: Session, payload: CampaignPayload, ctx: JobContext):
+    """Send a scheduled campaign; recipients emailed by an earlier attempt are skipped"""
+    from notification_service import NotificationService
+    from database import EmailTemplate, EmailRecipient, User, Admin, Presenter, Mentor, UserCohort
+    
+    campaign_id = payload.campaign_id
+    # Get campaign
+    campaign = db.query(EmailCampaign).filter(EmailCampaign.id == campaign_id).first()
+    if not campaign:
+        logger.error(f"Campaign {campaign_id} not found")
+        return
+    
+    # Get template
+    template = db.query(EmailTemplate).filter(EmailTemplate.id == campaign.template_id).first()
+    if not template:
+        logger.error(f"Template {campaign.template_id} not found for campaign {campaign_id}")
+        campaign.status = "failed"
+        return
+    
+    # Get target users based on target_role
+    target_users = []
+    
+    # Check if target_role is a cohort (starts with "cohort_")
+    if campaign.target_role.startswith("cohort_"):
+        try:
+            cohort_id = int(campaign.target_role.replace("cohort_", ""))
+        except ValueError:
+            logger.error(f"Invalid cohort ID in target_role: {campaign.target_role}")
+            campaign.status = "failed"
+            return
+        # Get users in this specific cohort
+        target_users = db.query(User).join(UserCohort, UserCohort.user_id == User.id).filter(
+            UserCohort.cohort_id == cohort_id
+        ).all()
+        logger.info(f"Found {len(target_users)} users in cohort {cohort_id}")
+    else:
+        # Regular role-based targeting
+        if campaign.target_role == "Student":
+            target_users = db.query(User).filter(User.role == "Student").all()
+        elif campaign.target_role == "Admin":
+            target_users = db.query(Admin).all()
+        elif campaign.target_role == "Presenter":
+            target_users = db.query(Presenter).all()
+        elif campaign.target_role == "Mentor":
+            target_users = db.query(Mentor).all()
+        elif campaign.target_role == "All":
+            users = db.query(User).all()
+            admins = db.query(Admin).all()
+            presenters = db.query(Presenter).all()
+            mentors = db.query(Mentor).all()
+            target_users = users + admins + presenters + mentors
+    
+    if not target_users:
+        logger.warning(f"No target users found for campaign {campaign_id} with target_role {campaign.target_role}")
+        campaign.status = "completed"
+        campaign.sent_count = 0
+        campaign.completed_at = datetime.now()
+        return
+    
+    # Update campaign status to sending
+    campaign.status = "sending"
+    campaign.started_at = campaign.started_at or datetime.now()
+    db.commit()
+    
+    # Create recipients and send emails in (table, id) order; a retry resumes after the last checkpointed recipient
+    service = NotificationService(db)
+    target_users.sort(key=_recipient_key)
+    after = tuple(ctx.progress.get("after") or ())
+    sent_count = ctx.progress.get("sent_count", 0)
+    handled = 0
+    emailed = set()
+    
+    for user in target_users:
+        key = _recipient_key(user)
+        if not user.email or user.email in emailed or (after and key <= after):
+            continue
+        # Create recipient record
+        recipient = EmailRecipient(
+            campaign_id=campaign.id,
+            user_id=getattr(user, 'id', None),
+            email=user.email,
+            status="pending"
+        )
+        db.add(recipient)
+        try:
+            # Send email
+            body_content = template.body.replace("{username}", getattr(user, 'username', user.email))
+            body_content = body_content.replace("{email}", user.email)
+            
+            # Send email using regular method
+            email_log = service.send_email_notification(
+                user_id=getattr(user, 'id', None),
+                email=user.email,
+                subject=template.subject,
+                body=body_content
+            )
+            
+            if email_log.status in ["sent", "queued"]:
+                recipient.status = "sent"
+                recipient.sent_at = datetime.now()
+                sent_count += 1
+            else:
+                recipient.status = "failed"
+                recipient.error_message = email_log.error_message
+            
+        except Exception as e:
+            logger.error(f"Failed to send email to {user.email}: {str(e)}")
+            recipient.status = "failed"
+            recipient.error_message = str(e)
+        emailed.add(user.email)
+        handled += 1
+        if handled % CHECKPOINT_EVERY == 0:
+            ctx.checkpoint(after=list(key), sent_count=sent_count)
+    
+    # Update campaign with final counts and mark as completed
+    campaign.sent_count = sent_count
+    campaign.status = "completed"
+    campaign.completed_at = datetime.now()
+    
+    logger.info(f"Scheduled campaign {campaign_id} sent to {sent_count} recipients")
@@ -10,6 +10,8 @@ from pathlib import Path
 
 from database import get_db, User, Admin, Presenter, Mentor, Manager
 from auth import verify_token
+from identity_directory import identity_directory
+from search_index import search_index
 from chat_models import Chat, ChatParticipant, Message, ChatType, MessageType
 from chat_schemas import (
     ChatCreate, ChatResponse, MessageCreate, MessageResponse, 
@@ -53,18 +55,16 @@ def get_current_user_info_chat(token_data: dict = Depends(verify_token), db: Ses
     }
 
 def get_user_by_id_and_type(user_id: int, user_type: str, db: Session):
-    """Get user by ID and type"""
-    if user_type == "Admin":
-        return db.query(Admin).filter(Admin.id == user_id).first()
-    elif user_type == "Presenter":
-        return db.query(Presenter).filter(Presenter.id == user_id).first()
-    elif user_type == "Mentor":
-        return db.query(Mentor).filter(Mentor.id == user_id).first()
-    elif user_type == "Manager":
-        return db.query(Manager).filter(Manager.id == user_id).first()
-    elif user_type == "Student":
-        return db.query(User).filter(User.id == user_id).first()
-    return None
+    """Get user identity (id, username, email) by ID and type"""
+    return identity_directory.resolve(db, user_id, user_type)
+
+def _name_or_email_match(kind: str, model, search: str):
+    """Username/email filter served from the search index once it is built"""
+    return search_index.filter_clause(
+        kind, model.id, search,
+        or_(model.username.contains(search), model.email.contains(search)),
+        fields=("username", "email")
+    )
 
 def can_access_chat(user_info: dict, chat: Chat, db: Session) -> bool:
     """Check if user can access a specific chat"""
@@ -293,10 +293,11 @@ async def create_chat(
         
         # Add other participants (if any)
         if chat_data.participant_ids and chat_data.participant_types:
-            for user_id, user_type in zip(chat_data.participant_ids, chat_data.participant_types):
+            pairs = list(zip(chat_data.participant_ids, chat_data.participant_types))
+            identities = identity_directory.resolve_many(db, pairs)
+            for user_id, user_type in pairs:
                 # Verify user exists
-                user = get_user_by_id_and_type(user_id, user_type, db)
-                if not user:
+                if (user_id, user_type) not in identities:
                     raise HTTPException(status_code=404, detail=f"User {user_id} of type {user_type} not found")
                 
                 participant = ChatParticipant(
@@ -342,14 +343,21 @@ async def get_user_chats(
             query = query.filter(Chat.chat_type == chat_type)
         
         if search:
+            # Only the user's own chats can match, so the message index is probed for those alone
+            member_chat_ids = [chat_id for chat_id, in query.with_entities(Chat.id).all()]
+            message_chat_ids = search_index.message_chat_ids(search, member_chat_ids)
+            if message_chat_ids is None:
+                message_match = Chat.id.in_(
+                    db.query(Message.chat_id).filter(
+                        Message.content.contains(search)
+                    )
+                )
+            else:
+                message_match = Chat.id.in_(message_chat_ids)
             query = query.filter(
                 or_(
-                    Chat.name.contains(search),
-                    Chat.id.in_(
-                        db.query(Message.chat_id).filter(
-                            Message.content.contains(search)
-                        )
-                    )
+                    search_index.filter_clause("chat", Chat.id, search, Chat.name.contains(search)),
+                    message_match
                 )
             )
         
@@ -417,9 +425,13 @@ async def get_unread_notifications(
             unread_messages = unread_query.order_by(desc(Message.created_at)).all()
             
             if unread_messages:
+                # Resolve every sender of this chat in one batch
+                senders = identity_directory.resolve_many(
+                    db, [(msg.sender_id, msg.sender_type) for msg in unread_messages]
+                )
                 # Add unread messages to notifications list
                 for msg in unread_messages:
-                    sender = get_user_by_id_and_type(msg.sender_id, msg.sender_type, db)
+                    sender = senders.get((msg.sender_id, msg.sender_type))
                     sender_name = sender.username if sender else "Unknown"
                     
                     # Determine chat name
@@ -510,8 +522,9 @@ async def get_chat_response(chat_id: int, current_user: dict, db: Session) -> Ch
         ChatParticipant.is_active == True
     ).all()
     
+    identities = identity_directory.resolve_many(db, [(p.user_id, p.user_type) for p in participants])
     for participant in participants:
-        user = get_user_by_id_and_type(participant.user_id, participant.user_type, db)
+        user = identities.get((participant.user_id, participant.user_type))
         if user:
             participants_data.append(ChatParticipantResponse(
                 id=participant.id,
@@ -587,8 +600,9 @@ async def get_chat_messages(
         
         # Build response
         message_responses = []
+        senders = identity_directory.resolve_many(db, [(m.sender_id, m.sender_type) for m in messages])
         for message in messages:
-            sender = get_user_by_id_and_type(message.sender_id, message.sender_type, db)
+            sender = senders.get((message.sender_id, message.sender_type))
             sender_name = sender.username if sender else "Unknown User"
             
             message_responses.append(MessageResponse(
@@ -810,12 +824,7 @@ async def search_users(
         if not user_type or user_type == "Student":
             student_query = db.query(User).filter(User.role == "Student")
             if search:
-                student_query = student_query.filter(
-                    or_(
-                        User.username.contains(search),
-                        User.email.contains(search)
-                    )
-                )
+                student_query = student_query.filter(_name_or_email_match("user", User, search))
             students = student_query.limit(limit).all()
             for student in students:
                 users.append(UserSearchResponse(
@@ -830,12 +839,7 @@ async def search_users(
         if not user_type or user_type == "Admin":
             admin_query = db.query(Admin)
             if search:
-                admin_query = admin_query.filter(
-                    or_(
-                        Admin.username.contains(search),
-                        Admin.email.contains(search)
-                    )
-                )
+                admin_query = admin_query.filter(_name_or_email_match("admin", Admin, search))
             admins = admin_query.limit(limit).all()
             for admin in admins:
                 if admin.id != current_user["id"]:  # Exclude current user
@@ -849,12 +853,7 @@ async def search_users(
         if not user_type or user_type == "Presenter":
             presenter_query = db.query(Presenter)
             if search:
-                presenter_query = presenter_query.filter(
-                    or_(
-                        Presenter.username.contains(search),
-                        Presenter.email.contains(search)
-                    )
-                )
+                presenter_query = presenter_query.filter(_name_or_email_match("presenter", Presenter, search))
             presenters = presenter_query.limit(limit).all()
             for presenter in presenters:
                 if presenter.id != current_user["id"]:  # Exclude current user
@@ -868,12 +867,7 @@ async def search_users(
         if not user_type or user_type == "Mentor":
             mentor_query = db.query(Mentor)
             if search:
-                mentor_query = mentor_query.filter(
-                    or_(
-                        Mentor.username.contains(search),
-                        Mentor.email.contains(search)
-                    )
-                )
+                mentor_query = mentor_query.filter(_name_or_email_match("mentor", Mentor, search))
             mentors = mentor_query.limit(limit).all()
             for mentor in mentors:
                 if mentor.id != current_user["id"]:  # Exclude current user
@@ -887,12 +881,7 @@ async def search_users(
         if not user_type or user_type == "Manager":
             manager_query = db.query(Manager)
             if search:
-                manager_query = manager_query.filter(
-                    or_(
-                        Manager.username.contains(search),
-                        Manager.email.contains(search)
-                    )
-                )
+                manager_query = manager_query.filter(_name_or_email_match("manager", Manager, search))
             managers = manager_query.limit(limit).all()
             for manager in managers:
                 if manager.id != current_user["id"] or current_user["role"] != "Manager":
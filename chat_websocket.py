@@ -1,25 +1,44 @@
 from fastapi import WebSocket, WebSocketDisconnect, Depends, HTTPException, Query
 from fastapi.routing import APIRouter
+from sqlalchemy import and_, bindparam
 from sqlalchemy.orm import Session
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
 import json
+import asyncio
 import logging
 from datetime import datetime
 
 from database import get_db
-from auth import get_current_user_info
-from chat_models import Chat, Message, ChatParticipant
+from auth import get_current_user_info, get_current_admin
+from chat_models import Chat, Message, ChatParticipant, ChatType, MessageType
 from chat_schemas import MessageCreate
+from websocket_db import run_in_session, authenticate_websocket_token
+from websocket_outbound import SocketChannel, websocket_metrics
+from presence_service import PresenceService, load_presence_scope
+from live_stats import live_stats
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Read receipts are broadcast at once but written to the database in batches this often
+WS_READ_FLUSH_SECONDS = float(os.getenv("WS_READ_FLUSH_SECONDS", "2"))
+
+_participants = ChatParticipant.__table__
+
 @router.get("/api/chat/online-users")
-async def get_online_users():
-    """Get list of currently online users"""
+async def get_online_users(cohort_id: Optional[int] = None):
+    """Get list of currently online users, optionally only the members of one cohort"""
+    if cohort_id is not None:
+        return {"online_users": manager.presence.online_in_cohort(cohort_id)}
     return {"online_users": list(manager.online_users)}
 
+@router.get("/api/admin/websocket-metrics")
+async def get_websocket_metrics(current_admin = Depends(get_current_admin)):
+    """Connections, send queue depth and dropped/evicted counts per WebSocket channel (Admin only)"""
+    return websocket_metrics()
+
 class ConnectionManager:
     def __init__(self):
         # Store active connections: {user_id: [websocket1, websocket2, ...]}
@@ -28,116 +47,133 @@ class ConnectionManager:
         self.user_chats: Dict[int, List[int]] = {}
         # Store online users
         self.online_users: set = set()
+        # Role and username of each connected user, taken from their token
+        self.user_roles: Dict[int, str] = {}
+        self.user_names: Dict[int, str] = {}
+        # Chats each connected user is verified to participate in
+        self.participant_chats: Dict[int, set] = {}
+        # Chat type and cohort of chats that had messages, used for the broadcast payload
+        self.chat_meta: Dict[int, dict] = {}
+        # Read receipts waiting to be written: {(chat_id, user_id, role): read_at}
+        self.pending_reads: Dict[Tuple[int, int, str], datetime] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # Outbound queues of every socket; sends never await the network
+        self.channel = SocketChannel("chat", on_evict=self._on_evict)
+        # Online status, scoped to users sharing a chat or cohort and sent as periodic diffs
+        self.presence = PresenceService(self.send_to_users)
 
-    async def connect(self, websocket: WebSocket, user_id: int, db: Session):
+    async def connect(self, websocket: WebSocket, user_id: int, role: str, username: str):
         await websocket.accept()
         
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
         self.active_connections[user_id].append(websocket)
+        self.channel.attach(websocket, user_id)
+        self.user_roles[user_id] = role
+        self.user_names[user_id] = username
+        live_stats.socket_opened(role, user_id)
+        self._ensure_flush_task()
         
         # Mark user as online
-        was_offline = user_id not in self.online_users
         self.online_users.add(user_id)
         
-        # Load user's chat rooms based on their role and permissions
+        # Load user's chat rooms and cohorts based on their role
         try:
-            # Get user info to determine role
-            from database import Admin, Presenter, Mentor, User, Manager
-            user_role = None
-            
-            if db.query(Admin).filter(Admin.id == user_id).first():
-                user_role = "Admin"
-            elif db.query(Presenter).filter(Presenter.id == user_id).first():
-                user_role = "Presenter"
-            elif db.query(Mentor).filter(Mentor.id == user_id).first():
-                user_role = "Mentor"
-            elif db.query(Manager).filter(Manager.id == user_id).first():
-                user_role = "Manager"
-            elif db.query(User).filter(User.id == user_id).first():
-                user_role = "Student"
+            chat_ids, cohort_ids = await run_in_session(load_presence_scope, user_id, role)
+            self.user_chats[user_id] = chat_ids
+            self.participant_chats[user_id] = set(chat_ids)
             
-            # Load user's accessible chats
-            user_chats = db.query(ChatParticipant).filter(
-                ChatParticipant.user_id == user_id,
-                ChatParticipant.user_type == user_role,
-                ChatParticipant.is_active == True
-            ).all()
+            logger.info(f"User {user_id} ({role}) connected to WebSocket with {len(self.user_chats[user_id])} chats")
             
-            self.user_chats[user_id] = [cp.chat_id for cp in user_chats]
-            
-            logger.info(f"User {user_id} ({user_role}) connected to WebSocket with {len(self.user_chats[user_id])} chats")
-            
-            # Notify others that user came online (if they were offline)
-            if was_offline:
-                await self.broadcast_user_status(user_id, True)
+            # Users sharing a chat or cohort learn about it in the next presence diff
+            if user_id in self.active_connections:
+                self.presence.user_online(user_id, chat_ids, cohort_ids)
                 
         except Exception as e:
             logger.error(f"Error loading user chats for {user_id}: {str(e)}")
             self.user_chats[user_id] = []
+            self.participant_chats[user_id] = set()
+
+    def _ensure_flush_task(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_reads_periodically())
+
+    async def _flush_reads_periodically(self):
+        while True:
+            await asyncio.sleep(WS_READ_FLUSH_SECONDS)
+            await self.flush_reads()
+            if not self.active_connections and not self.pending_reads:
+                self._flush_task = None
+                return
+
+    async def flush_reads(self):
+        """Write the collected read receipts with one UPDATE statement"""
+        if not self.pending_reads:
+            return
+        pending, self.pending_reads = self.pending_reads, {}
+        try:
+            await run_in_session(_write_read_receipts, [
+                {"b_chat_id": chat_id, "b_user_id": user_id, "b_user_type": role, "b_read_at": read_at}
+                for (chat_id, user_id, role), read_at in pending.items()
+            ])
+        except Exception as e:
+            logger.error(f"Error writing read receipts: {str(e)}")
+            # Keep them for the next flush unless newer receipts arrived meanwhile
+            for key, read_at in pending.items():
+                self.pending_reads.setdefault(key, read_at)
 
     def disconnect(self, websocket: WebSocket, user_id: int):
+        self.channel.detach(websocket)
         if user_id in self.active_connections:
             if websocket in self.active_connections[user_id]:
                 self.active_connections[user_id].remove(websocket)
+                live_stats.socket_closed(self.user_roles.get(user_id), user_id)
             
             # If no more connections for this user, mark as offline
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
                 if user_id in self.user_chats:
                     del self.user_chats[user_id]
+                self.participant_chats.pop(user_id, None)
+                self.user_roles.pop(user_id, None)
+                self.user_names.pop(user_id, None)
                 
-                # Mark user as offline and notify others
+                # Mark user as offline; others see it in the next presence diff
                 if user_id in self.online_users:
                     self.online_users.remove(user_id)
-                    # Note: We can't await here since this is not async
-                    # The offline notification will be handled by the websocket endpoint
+                self.presence.user_offline(user_id)
         
         logger.info(f"User {user_id} disconnected from WebSocket")
 
-    async def broadcast_user_status(self, user_id: int, is_online: bool):
-        """Broadcast user online/offline status to all connected users"""
-        status_message = {
-            "type": "user_online" if is_online else "user_offline",
-            "user_id": user_id
-        }
-        
-        # Send to all connected users
-        for connected_user_id in list(self.active_connections.keys()):
-            if connected_user_id != user_id:
-                await self.send_personal_message(status_message, connected_user_id)
+    async def _on_evict(self, websocket: WebSocket, user_id: int):
+        self.disconnect(websocket, user_id)
+
+    def send_to_users(self, user_ids: Iterable[int], message: dict):
+        """Queue one message on every socket of the given users"""
+        self.channel.send(
+            (websocket for user_id in user_ids for websocket in self.active_connections.get(user_id, ())),
+            message
+        )
 
     async def send_online_users_list(self, user_id: int):
-        """Send current online users list to a specific user"""
+        """Send the online users that share a chat or cohort with a specific user"""
         online_message = {
             "type": "online_users",
-            "users": list(self.online_users)
+            "users": self.presence.visible_online(user_id)
         }
         await self.send_personal_message(online_message, user_id)
 
     async def send_personal_message(self, message: dict, user_id: int):
-        if user_id in self.active_connections:
-            disconnected_sockets = []
-            for websocket in self.active_connections[user_id]:
-                try:
-                    await websocket.send_text(json.dumps(message))
-                except:
-                    disconnected_sockets.append(websocket)
-            
-            # Clean up disconnected sockets
-            for socket in disconnected_sockets:
-                self.active_connections[user_id].remove(socket)
+        self.channel.send(self.active_connections.get(user_id, ()), message)
 
     async def broadcast_to_chat(self, message: dict, chat_id: int, exclude_user_id: int = None):
-        # Get all participants of the chat
-        participants = []
-        for user_id, chat_ids in self.user_chats.items():
-            if chat_id in chat_ids and user_id != exclude_user_id:
-                participants.append(user_id)
-        
-        # Send message to all participants
-        for user_id in participants:
-            await self.send_personal_message(message, user_id)
+        # Queue the message on every socket of the chat's connected participants
+        self.channel.send(
+            (websocket for user_id, chat_ids in self.user_chats.items()
+             if chat_id in chat_ids and user_id != exclude_user_id
+             for websocket in self.active_connections.get(user_id, ())),
+            message
+        )
     
     async def notify_new_message_to_user(self, user_id: int, chat_id: int, message_data: dict):
         """Notify specific user about new message in a chat"""
@@ -150,43 +186,13 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
-async def get_current_user_websocket(websocket: WebSocket, token: str = Query(...), db: Session = Depends(get_db)):
+async def get_current_user_websocket(websocket: WebSocket, token: str = Query(...)):
     try:
-        from auth import verify_token
-        token_data = verify_token(token)
-        username = token_data.get("sub")
-        role = token_data.get("role")
-        user_id = token_data.get("user_id")
-        
-        if role == "Admin":
-            from database import Admin
-            user = db.query(Admin).filter(Admin.username == username).first()
-        elif role == "Presenter":
-            from database import Presenter
-            user = db.query(Presenter).filter(Presenter.username == username).first()
-        elif role == "Mentor":
-            from database import Mentor
-            user = db.query(Mentor).filter(Mentor.username == username).first()
-        elif role == "Manager":
-            from database import Manager
-            user = db.query(Manager).filter(Manager.username == username).first()
-        elif role == "Student":
-            from database import User
-            user = db.query(User).filter(User.username == username).first()
-        else:
-            await websocket.close(code=4001, reason="Invalid user role")
-            return None
-        
+        user = await authenticate_websocket_token(token)
         if not user:
-            await websocket.close(code=4001, reason="User not found")
+            await websocket.close(code=4001, reason="Authentication failed")
             return None
-            
-        return {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "role": role
-        }
+        return user
     except Exception as e:
         logger.error(f"WebSocket auth error: {str(e)}")
         await websocket.close(code=4001, reason="Authentication failed")
@@ -196,15 +202,15 @@ async def get_current_user_websocket(websocket: WebSocket, token: str = Query(..
 async def websocket_endpoint(
     websocket: WebSocket,
     user_id: int,
-    token: str = Query(...),
-    db: Session = Depends(get_db)
+    token: str = Query(...)
 ):
-    # Authenticate user first
-    current_user = await get_current_user_websocket(websocket, token, db)
+    # No session is held for the connection; each message that needs the database
+    # runs its own short unit of work (see websocket_db)
+    current_user = await get_current_user_websocket(websocket, token)
     if not current_user or current_user["id"] != user_id:
         return
 
-    await manager.connect(websocket, user_id, db)
+    await manager.connect(websocket, user_id, current_user["role"], current_user["username"])
     
     # Send current online users list to the newly connected user
     await manager.send_online_users_list(user_id)
@@ -212,198 +218,174 @@ async def websocket_endpoint(
     try:
         while True:
             data = await websocket.receive_text()
+            manager.channel.touch(websocket)
             message_data = json.loads(data)
             
-            await handle_websocket_message(message_data, user_id, db)
+            await handle_websocket_message(message_data, user_id)
             
     except WebSocketDisconnect:
         manager.disconnect(websocket, user_id)
-        # Notify others that user went offline
-        if user_id not in manager.active_connections:
-            await manager.broadcast_user_status(user_id, False)
     except Exception as e:
         logger.error(f"WebSocket error for user {user_id}: {str(e)}")
         manager.disconnect(websocket, user_id)
-        # Notify others that user went offline
-        if user_id not in manager.active_connections:
-            await manager.broadcast_user_status(user_id, False)
 
-async def handle_websocket_message(message_data: dict, user_id: int, db: Session):
+async def handle_websocket_message(message_data: dict, user_id: int):
     message_type = message_data.get("type")
     
     if message_type == "send_message":
-        await handle_send_message(message_data, user_id, db)
+        await handle_send_message(message_data, user_id)
     elif message_type == "mark_read":
-        await handle_mark_as_read(message_data, user_id, db)
+        await handle_mark_as_read(message_data, user_id)
     elif message_type == "typing_start":
         await handle_typing(message_data, user_id, True)
     elif message_type == "typing_stop":
         await handle_typing(message_data, user_id, False)
     elif message_type == "join_chat":
-        await handle_join_chat(message_data, user_id, db)
+        await handle_join_chat(message_data, user_id)
     elif message_type == "leave_chat":
-        await handle_leave_chat(message_data, user_id, db)
+        await handle_leave_chat(message_data, user_id)
 
-async def handle_send_message(message_data: dict, user_id: int, db: Session):
+def _is_participant(db: Session, chat_id: int, user_id: int, role: str) -> bool:
+    return db.query(ChatParticipant.id).filter(
+        ChatParticipant.chat_id == chat_id,
+        ChatParticipant.user_id == user_id,
+        ChatParticipant.user_type == role
+    ).first() is not None
+
+def _write_read_receipts(db: Session, receipts: List[dict]):
+    db.execute(
+        _participants.update().where(and_(
+            _participants.c.chat_id == bindparam("b_chat_id"),
+            _participants.c.user_id == bindparam("b_user_id"),
+            _participants.c.user_type == bindparam("b_user_type")
+        )).values(last_read_at=bindparam("b_read_at")),
+        receipts
+    )
+
+def _chat_meta(db: Session, chat: Chat) -> dict:
+    """Chat type and the cohort the chat belongs to, for navigation on the client"""
+    cohort_id = None
+    if chat.chat_type == ChatType.GROUP:
+        from database import Cohort
+        all_cohorts = db.query(Cohort).filter(Cohort.is_active == True).all()
+        for c in all_cohorts:
+            if c.name in chat.name:
+                cohort_id = c.id
+                break
+    
+    if not cohort_id:
+        from database import UserCohort
+        student_p = db.query(ChatParticipant).filter(
+            ChatParticipant.chat_id == chat.id,
+            ChatParticipant.user_type == "Student"
+        ).first()
+        if student_p:
+            uc = db.query(UserCohort).filter(UserCohort.user_id == student_p.user_id).first()
+            if uc:
+                cohort_id = uc.cohort_id
+    return {"chat_type": chat.chat_type.value, "cohort_id": cohort_id}
+
+def _store_message(db: Session, chat_id: int, user_id: int, sender_type: str, content: str,
+                   message_type: str, need_meta: bool) -> Optional[dict]:
+    """Save a message from a verified participant; None when the sender is not one"""
+    if not _is_participant(db, chat_id, user_id, sender_type):
+        return None
+    
+    message = Message(
+        chat_id=chat_id,
+        sender_id=user_id,
+        sender_type=sender_type,
+        message_type=MessageType.TEXT if message_type == "TEXT" else MessageType.FILE,
+        content=content,
+        created_at=datetime.utcnow()
+    )
+    db.add(message)
+    
+    # Update chat's last message
+    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    if chat:
+        chat.updated_at = datetime.utcnow()
+    db.flush()
+    
+    return {
+        "message": {
+            "id": message.id,
+            "content": message.content,
+            "sender_id": message.sender_id,
+            "sender_type": message.sender_type,
+            "created_at": message.created_at.isoformat()
+        },
+        "meta": _chat_meta(db, chat) if chat and need_meta else None
+    }
+
+async def handle_send_message(message_data: dict, user_id: int):
     try:
         chat_id = message_data.get("chat_id")
         content = message_data.get("content")
         message_type = message_data.get("message_type", "TEXT")
         
-        # Get user info to determine sender type
-        from chat_endpoints import get_current_user_info_chat
-        from database import Admin, Presenter, Mentor, User, Manager
-        
-        # Determine user type
-        sender_type = None
-        if db.query(Admin).filter(Admin.id == user_id).first():
-            sender_type = "Admin"
-        elif db.query(Presenter).filter(Presenter.id == user_id).first():
-            sender_type = "Presenter"
-        elif db.query(Mentor).filter(Mentor.id == user_id).first():
-            sender_type = "Mentor"
-        elif db.query(Manager).filter(Manager.id == user_id).first():
-            sender_type = "Manager"
-        elif db.query(User).filter(User.id == user_id).first():
-            sender_type = "Student"
-        
+        # Role and name come from the token the connection was opened with
+        sender_type = manager.user_roles.get(user_id)
         if not sender_type:
             return
         
-        # Verify user is participant in chat
-        participant = db.query(ChatParticipant).filter(
-            ChatParticipant.chat_id == chat_id,
-            ChatParticipant.user_id == user_id,
-            ChatParticipant.user_type == sender_type
-        ).first()
-        
-        if not participant:
-            return
-        
-        # Create message
-        from chat_models import MessageType
-        message = Message(
-            chat_id=chat_id,
-            sender_id=user_id,
-            sender_type=sender_type,
-            message_type=MessageType.TEXT if message_type == "TEXT" else MessageType.FILE,
-            content=content,
-            created_at=datetime.utcnow()
+        stored = await run_in_session(
+            _store_message, chat_id, user_id, sender_type, content, message_type, chat_id not in manager.chat_meta
         )
+        if not stored:
+            return
+        manager.participant_chats.setdefault(user_id, set()).add(chat_id)
+        if stored["meta"]:
+            manager.chat_meta[chat_id] = stored["meta"]
+        meta = manager.chat_meta.get(chat_id, {})
         
-        db.add(message)
-        db.commit()
-        db.refresh(message)
-        
-        # Update chat's last message
-        chat = db.query(Chat).filter(Chat.id == chat_id).first()
-        if chat:
-            chat.updated_at = datetime.utcnow()
-            db.commit()
-        
-        # Get sender name
-        sender_name = "Unknown User"
-        if sender_type == "Admin":
-            sender = db.query(Admin).filter(Admin.id == user_id).first()
-        elif sender_type == "Presenter":
-            sender = db.query(Presenter).filter(Presenter.id == user_id).first()
-        elif sender_type == "Mentor":
-            sender = db.query(Mentor).filter(Mentor.id == user_id).first()
-        elif sender_type == "Manager":
-            sender = db.query(Manager).filter(Manager.id == user_id).first()
-        elif sender_type == "Student":
-            sender = db.query(User).filter(User.id == user_id).first()
-        
-        if sender:
-            sender_name = sender.username
-        
-        # Find cohort_id for navigation
-        cohort_id = None
-        chat = db.query(Chat).filter(Chat.id == chat_id).first()
-        if chat:
-            if chat.chat_type == ChatType.GROUP:
-                from database import Cohort
-                all_cohorts = db.query(Cohort).filter(Cohort.is_active == True).all()
-                for c in all_cohorts:
-                    if c.name in chat.name:
-                        cohort_id = c.id
-                        break
-            
-            if not cohort_id:
-                from database import UserCohort
-                student_p = db.query(ChatParticipant).filter(
-                    ChatParticipant.chat_id == chat.id,
-                    ChatParticipant.user_type == "Student"
-                ).first()
-                if student_p:
-                    uc = db.query(UserCohort).filter(UserCohort.user_id == student_p.user_id).first()
-                    if uc:
-                        cohort_id = uc.cohort_id
+        message = stored["message"]
+        message["sender_name"] = manager.user_names.get(user_id)
 
         # Broadcast to all chat participants
         broadcast_message = {
             "type": "message",
             "chat_id": chat_id,
-            "cohort_id": cohort_id,
-            "chat_type": chat.chat_type.value if chat else "SINGLE",
-            "message": {
-                "id": message.id,
-                "content": message.content,
-                "sender_id": message.sender_id,
-                "sender_name": sender_name,
-                "sender_type": message.sender_type,
-                "created_at": message.created_at.isoformat()
-            }
+            "cohort_id": meta.get("cohort_id"),
+            "chat_type": meta.get("chat_type", "SINGLE"),
+            "message": message
         }
         
         await manager.broadcast_to_chat(broadcast_message, chat_id)
         
-        logger.info(f"Message {message.id} sent to chat {chat_id} by user {user_id}")
+        logger.info(f"Message {message['id']} sent to chat {chat_id} by user {user_id}")
         
     except Exception as e:
         logger.error(f"Error handling send_message: {str(e)}")
 
-async def handle_mark_as_read(message_data: dict, user_id: int, db: Session):
+async def handle_mark_as_read(message_data: dict, user_id: int):
     try:
         chat_id = message_data.get("chat_id")
         
-        # Determine user type
-        from database import Admin, Presenter, Mentor, User, Manager
-        sender_type = None
-        if db.query(Admin).filter(Admin.id == user_id).first():
-            sender_type = "Admin"
-        elif db.query(Presenter).filter(Presenter.id == user_id).first():
-            sender_type = "Presenter"
-        elif db.query(Mentor).filter(Mentor.id == user_id).first():
-            sender_type = "Mentor"
-        elif db.query(Manager).filter(Manager.id == user_id).first():
-            sender_type = "Manager"
-        elif db.query(User).filter(User.id == user_id).first():
-            sender_type = "Student"
-        
+        sender_type = manager.user_roles.get(user_id)
         if not sender_type:
             return
         
-        # Update read status for user
-        participant = db.query(ChatParticipant).filter(
-            ChatParticipant.chat_id == chat_id,
-            ChatParticipant.user_id == user_id,
-            ChatParticipant.user_type == sender_type
-        ).first()
+        # Participation is checked against the database once per chat and connection
+        participant_chats = manager.participant_chats.setdefault(user_id, set())
+        if chat_id not in participant_chats:
+            if not await run_in_session(_is_participant, chat_id, user_id, sender_type):
+                return
+            participant_chats.add(chat_id)
         
-        if participant:
-            participant.last_read_at = datetime.utcnow()
-            db.commit()
-            
-            # Notify other participants
-            read_message = {
-                "type": "message_read",
-                "chat_id": chat_id,
-                "user_id": user_id,
-                "read_at": participant.last_read_at.isoformat()
-            }
-            
-            await manager.broadcast_to_chat(read_message, chat_id, exclude_user_id=user_id)
+        # The receipt is written by the next batch flush
+        read_at = datetime.utcnow()
+        manager.pending_reads[(chat_id, user_id, sender_type)] = read_at
+        
+        # Notify other participants
+        read_message = {
+            "type": "message_read",
+            "chat_id": chat_id,
+            "user_id": user_id,
+            "read_at": read_at.isoformat()
+        }
+        
+        await manager.broadcast_to_chat(read_message, chat_id, exclude_user_id=user_id)
             
     except Exception as e:
         logger.error(f"Error handling mark_as_read: {str(e)}")
@@ -423,7 +405,7 @@ async def handle_typing(message_data: dict, user_id: int, is_typing: bool):
     except Exception as e:
         logger.error(f"Error handling typing: {str(e)}")
 
-async def handle_join_chat(message_data: dict, user_id: int, db: Session):
+async def handle_join_chat(message_data: dict, user_id: int):
     """Handle user joining a chat room"""
     try:
         chat_id = message_data.get("chat_id")
@@ -440,7 +422,7 @@ async def handle_join_chat(message_data: dict, user_id: int, db: Session):
     except Exception as e:
         logger.error(f"Error handling join_chat: {str(e)}")
 
-async def handle_leave_chat(message_data: dict, user_id: int, db: Session):
+async def handle_leave_chat(message_data: dict, user_id: int):
     """Handle user leaving a chat room"""
     try:
         chat_id = message_data.get("chat_id")
@@ -1,6 +1,6 @@
 # Cohort Management Endpoints for Admin Dashboard
 
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, BackgroundTasks
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 from database import get_db, Cohort, UserCohort, CohortCourse, User, Course, Admin, PresenterCohort, Presenter, Enrollment, MentorCohort, MentorCourse, MentorSession
@@ -8,6 +8,9 @@ from auth import get_current_admin_or_presenter
 from datetime import datetime
 from typing import List, Optional
 from email_utils import send_course_added_notification
+import cohort_membership_service
+from listing_counters import with_counts
+from search_index import search_index
 import csv
 import io
 import os
@@ -36,6 +39,14 @@ class CohortUpdate(BaseModel):
 class CohortUserAdd(BaseModel):
     user_ids: List[int]
 
+class CohortUserRemove(BaseModel):
+    user_ids: List[int]
+
+class CohortUserMove(BaseModel):
+    user_ids: List[int]
+    target_cohort_id: int
+    send_welcome_email: bool = True
+
 class CohortCourseAssign(BaseModel):
     course_ids: List[int]
 
@@ -78,33 +89,23 @@ async def get_cohorts(
         query = db.query(Cohort)
         
         if search:
-            query = query.filter(
+            query = query.filter(search_index.filter_clause(
+                "cohort", Cohort.id, search,
                 or_(
                     Cohort.name.contains(search),
                     Cohort.description.contains(search),
                     Cohort.instructor_name.contains(search)
                 )
-            )
+            ))
         
         total = query.count()
-        cohorts = query.offset((page - 1) * limit).limit(limit).all()
+        rows = with_counts(
+            db, query.order_by(Cohort.id), Cohort.id, "cohort", ["users", "global_courses", "specific_courses"]
+        ).offset((page - 1) * limit).limit(limit).all()
         
         result = []
-        for cohort in cohorts:
-            user_count = db.query(UserCohort).filter(UserCohort.cohort_id == cohort.id).count()
-            
+        for cohort, user_count, global_course_count, cohort_specific_count in rows:
             # Count both global courses assigned to cohort and cohort-specific courses
-            global_course_count = db.query(CohortCourse).filter(CohortCourse.cohort_id == cohort.id).count()
-            
-            # Import and count cohort-specific courses
-            try:
-                from cohort_specific_models import CohortSpecificCourse
-                cohort_specific_count = db.query(CohortSpecificCourse).filter(
-                    CohortSpecificCourse.cohort_id == cohort.id
-                ).count()
-            except ImportError:
-                cohort_specific_count = 0
-            
             total_course_count = global_course_count + cohort_specific_count
             
             result.append({
@@ -303,123 +304,22 @@ async def add_users_to_cohort(
     cohort_id: int,
     user_data: CohortUserAdd,
     current_admin = Depends(get_current_admin_or_presenter),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks = None
 ):
     try:
         cohort = db.query(Cohort).filter(Cohort.id == cohort_id).first()
         if not cohort:
             raise HTTPException(status_code=404, detail="Cohort not found")
         
-        added_users = []
-        errors = []
-        
-        for user_id in user_data.user_ids:
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user:
-                errors.append(f"User ID {user_id} not found")
-                continue
-            
-            # Check if user is already in a cohort
-            existing_cohort = db.query(UserCohort).filter(UserCohort.user_id == user_id).first()
-            if existing_cohort:
-                errors.append(f"User {user.username} is already in cohort {existing_cohort.cohort.name}")
-                continue
-            
-            # Add user to cohort
-            user_cohort = UserCohort(
-                user_id=user_id,
-                cohort_id=cohort_id,
-                assigned_by=current_admin.id
-            )
-            db.add(user_cohort)
-            
-            # Update user's current cohort
-            user.cohort_id = cohort_id
-            
-            added_users.append(user.username)
-            
-            # Send welcome email using NotificationService (same as campaigns)
-            try:
-                from notification_service import NotificationService
-                
-                service = NotificationService(db)
-                
-                # Get template from database if available
-                template_subject = "Welcome to Kamba LMS - Your Learning Journey Begins!"
-                template_body = f"""
-<p>Dear {user.username},</p>
-<p>Welcome to Kamba LMS! We're excited to have you join our learning community.</p>
-<p><strong>Your cohort details:</strong></p>
-<ul>
-    <li>Cohort Name: {cohort.name}</li>
-    <li>Start Date: {cohort.start_date.strftime('%Y-%m-%d') if cohort.start_date else 'TBD'}</li>
-    <li>Instructor: {cohort.instructor_name or 'TBD'}</li>
-</ul>
-<p><strong>What's next:</strong></p>
-<ol>
-    <li>Complete your profile setup</li>
-    <li>Explore your course materials</li>
-    <li>Join your first session</li>
-    <li>Connect with your peers</li>
-</ol>
-<p>If you have any questions, don't hesitate to reach out to our support team.</p>
-<p>Best regards,<br>The Kamba LMS Team</p>
-<hr>
-<p><small>This is an automated message. Please do not reply to this email.</small></p>
-                """
-                
-                # Try to get custom template from database
-                try:
-                    from database import EmailTemplate
-                    template = db.query(EmailTemplate).filter(
-                        EmailTemplate.name == "Cohort Welcome Email",
-                        EmailTemplate.is_active == True
-                    ).first()
-                    
-                    if template:
-                        template_subject = template.subject.format(
-                            username=user.username,
-                            cohort_name=cohort.name,
-                            start_date=cohort.start_date.strftime('%Y-%m-%d') if cohort.start_date else 'TBD',
-                            instructor_name=cohort.instructor_name or 'TBD'
-                        )
-                        # Convert plain text template to HTML with proper line breaks
-                        template_body_raw = template.body.format(
-                            username=user.username,
-                            cohort_name=cohort.name,
-                            start_date=cohort.start_date.strftime('%Y-%m-%d') if cohort.start_date else 'TBD',
-                            instructor_name=cohort.instructor_name or 'TBD',
-                            email=user.email
-                        )
-                        # Convert to HTML format
-                        template_body = template_body_raw.replace('\n', '<br>').replace('\n\n', '<br><br>')
-                except Exception as template_error:
-                    print(f"Template formatting error, using default: {str(template_error)}")
-                
-                # Send using the same method as campaigns (this will retry on auth failure)
-                email_log = service.send_email_notification(
-                    user_id=user.id,
-                    email=user.email,
-                    subject=template_subject,
-                    body=template_body
-                )
-                
-                if email_log.status == "sent":
-                    print(f"Cohort welcome email sent successfully to {user.email}")
-                elif email_log.status == "queued":
-                    print(f"Cohort welcome email queued for {user.email}")
-                else:
-                    print(f"Cohort welcome email failed for {user.email}: {email_log.error_message}")
-                
-            except Exception as e:
-                print(f"Email send failed: {str(e)}")
-                # Don't fail the user addition if email sending fails
+        added, errors = cohort_membership_service.add_users(db, cohort, user_data.user_ids, current_admin.id)
         
-        db.commit()
+        # Welcome emails are sent after the response so large batches don't block the request
+        _queue_welcome_emails(background_tasks, cohort_id, [user.id for user in added])
         
         return {
-            "message": f"Added {len(added_users)} users to cohort",
-            "added_users": added_users,
+            "message": f"Added {len(added)} users to cohort",
+            "added_users": [user.username for user in added],
             "errors": errors
         }
     except HTTPException:
@@ -428,6 +328,14 @@ async def add_users_to_cohort(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to add users to cohort: {str(e)}")
 
+def _queue_welcome_emails(background_tasks: Optional[BackgroundTasks], cohort_id: int, user_ids: List[int]):
+    if not user_ids:
+        return
+    if background_tasks is not None:
+        background_tasks.add_task(cohort_membership_service.send_cohort_welcome_emails, cohort_id, user_ids)
+    else:
+        cohort_membership_service.send_cohort_welcome_emails(cohort_id, user_ids)
+
 async def remove_user_from_cohort(
     cohort_id: int,
     user_id: int,
@@ -459,6 +367,64 @@ async def remove_user_from_cohort(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to remove user from cohort: {str(e)}")
 
+async def bulk_remove_users_from_cohort(
+    cohort_id: int,
+    user_data: CohortUserRemove,
+    current_admin = Depends(get_current_admin_or_presenter),
+    db: Session = Depends(get_db)
+):
+    try:
+        cohort = db.query(Cohort).filter(Cohort.id == cohort_id).first()
+        if not cohort:
+            raise HTTPException(status_code=404, detail="Cohort not found")
+        
+        removed, errors = cohort_membership_service.remove_users(db, cohort_id, user_data.user_ids)
+        
+        return {
+            "message": f"Removed {len(removed)} users from cohort",
+            "removed_user_ids": removed,
+            "errors": errors
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to remove users from cohort: {str(e)}")
+
+async def move_users_to_cohort(
+    cohort_id: int,
+    move_data: CohortUserMove,
+    current_admin = Depends(get_current_admin_or_presenter),
+    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks = None
+):
+    try:
+        if move_data.target_cohort_id == cohort_id:
+            raise HTTPException(status_code=400, detail="Source and target cohort are the same")
+        
+        source = db.query(Cohort).filter(Cohort.id == cohort_id).first()
+        target = db.query(Cohort).filter(Cohort.id == move_data.target_cohort_id).first()
+        if not source or not target:
+            raise HTTPException(status_code=404, detail="Cohort not found")
+        
+        moved, errors = cohort_membership_service.move_users(
+            db, cohort_id, target, move_data.user_ids, current_admin.id
+        )
+        
+        if move_data.send_welcome_email:
+            _queue_welcome_emails(background_tasks, target.id, [user.id for user in moved])
+        
+        return {
+            "message": f"Moved {len(moved)} users to cohort {target.name}",
+            "moved_users": [user.username for user in moved],
+            "errors": errors
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to move users between cohorts: {str(e)}")
+
 # Course assignment endpoints
 async def assign_courses_to_cohort(
     cohort_id: int,
@@ -6,6 +6,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 from database import get_db, Cohort, UserCohort, CohortCourse, User, Course, Admin, Enrollment
 from auth import get_current_admin, require_role
+from entitlement_service import get_student_entitlements
+from course_tree_cache import course_tree_cache
 from datetime import datetime
 from typing import List, Optional
 import csv
@@ -135,32 +137,24 @@ async def get_student_courses_with_cohort_access(
         # Get all courses
         all_courses = db.query(Course).all()
         
-        # Get enrolled courses
-        enrolled_courses = db.query(Enrollment.course_id).filter(
-            Enrollment.student_id == current_user.id
-        ).all()
-        enrolled_ids = [e[0] for e in enrolled_courses]
+        # Get enrolled and cohort-assigned courses from the shared entitlement resolver
+        entitlements = get_student_entitlements(db, current_user.id)
+        enrolled_ids = entitlements["enrolled_regular_course_ids"]
+        cohort_course_ids = entitlements["assigned_regular_course_ids"]
         
         # Get user's cohort information
         user_cohort = None
-        cohort_course_ids = []
-        
         if current_user.cohort_id:
             user_cohort = db.query(Cohort).filter(Cohort.id == current_user.cohort_id).first()
-            # Get courses assigned to user's cohort
-            cohort_courses = db.query(CohortCourse.course_id).filter(
-                CohortCourse.cohort_id == current_user.cohort_id
-            ).all()
-            cohort_course_ids = [cc[0] for cc in cohort_courses]
         
         result = []
         for course in all_courses:
-            # Get course statistics
-            max_week = db.query(func.max(Module.week_number)).filter(Module.course_id == course.id).scalar()
-            duration_weeks = max_week if max_week else 0
+            # Get course statistics from the course tree cache
+            tree = course_tree_cache.get_tree(db, course.id, "regular")
+            duration_weeks = max((m["week_number"] or 0 for m in tree["modules"]), default=0)
             
-            total_modules = db.query(Module).filter(Module.course_id == course.id).count()
-            total_sessions = db.query(SessionModel).join(Module).filter(Module.course_id == course.id).count()
+            total_modules = len(tree["modules"])
+            total_sessions = sum(len(m["sessions"]) for m in tree["modules"])
             
             # Determine access level
             is_enrolled = course.id in enrolled_ids
@@ -0,0 +1,228 @@
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, Cohort, User, UserCohort
+import listing_counters
+
+logger = logging.getLogger(__name__)
+
+WELCOME_TEMPLATE_NAME = "Cohort Welcome Email"
+
+DEFAULT_WELCOME_SUBJECT = "Welcome to Kamba LMS - Your Learning Journey Begins!"
+DEFAULT_WELCOME_BODY = """
+<p>Dear {username},</p>
+<p>Welcome to Kamba LMS! We're excited to have you join our learning community.</p>
+<p><strong>Your cohort details:</strong></p>
+<ul>
+    <li>Cohort Name: {cohort_name}</li>
+    <li>Start Date: {start_date}</li>
+    <li>Instructor: {instructor_name}</li>
+</ul>
+<p><strong>What's next:</strong></p>
+<ol>
+    <li>Complete your profile setup</li>
+    <li>Explore your course materials</li>
+    <li>Join your first session</li>
+    <li>Connect with your peers</li>
+</ol>
+<p>If you have any questions, don't hesitate to reach out to our support team.</p>
+<p>Best regards,<br>The Kamba LMS Team</p>
+<hr>
+<p><small>This is an automated message. Please do not reply to this email.</small></p>
+                """
+
+_CHUNK_SIZE = 1000
+
+
+def _chunks(ids: List[int]) -> Iterable[List[int]]:
+    for start in range(0, len(ids), _CHUNK_SIZE):
+        yield ids[start:start + _CHUNK_SIZE]
+
+
+def _unique(ids: Iterable[int]) -> List[int]:
+    # Keep request order so error messages and results read in the order ids were sent
+    return list(dict.fromkeys(ids))
+
+
+def _load_users(db: Session, user_ids: List[int]) -> Dict[int, Any]:
+    users = {}
+    for chunk in _chunks(user_ids):
+        for row in db.query(User.id, User.username, User.email).filter(User.id.in_(chunk)).all():
+            users[row.id] = row
+    return users
+
+
+def _load_memberships(db: Session, user_ids: List[int]) -> Dict[int, Tuple[int, str]]:
+    """Current cohort (id, name) of each user that has one"""
+    memberships = {}
+    for chunk in _chunks(user_ids):
+        for user_id, cohort_id, cohort_name in db.query(
+            UserCohort.user_id, UserCohort.cohort_id, Cohort.name
+        ).join(Cohort, Cohort.id == UserCohort.cohort_id).filter(UserCohort.user_id.in_(chunk)).all():
+            memberships.setdefault(user_id, (cohort_id, cohort_name))
+    return memberships
+
+
+def add_users(db: Session, cohort: Cohort, user_ids: List[int],
+              assigned_by: Optional[int]) -> Tuple[List[Any], List[str]]:
+    """Add users to a cohort with set-based validation and writes.
+
+    Returns the added users (id, username, email rows) and per-user error messages.
+    The caller is responsible for notifying the added users.
+    """
+    user_ids = _unique(user_ids)
+    users = _load_users(db, user_ids)
+    memberships = _load_memberships(db, list(users))
+
+    added, errors = [], []
+    for user_id in user_ids:
+        user = users.get(user_id)
+        if not user:
+            errors.append(f"User ID {user_id} not found")
+        elif user_id in memberships:
+            # A user belongs to a single cohort at a time
+            errors.append(f"User {user.username} is already in cohort {memberships[user_id][1]}")
+        else:
+            added.append(user)
+
+    if added:
+        now = datetime.utcnow()
+        db.bulk_insert_mappings(UserCohort, [{
+            "user_id": user.id,
+            "cohort_id": cohort.id,
+            "is_active": True,
+            "assigned_at": now,
+            "assigned_by": assigned_by,
+        } for user in added])
+        for chunk in _chunks([user.id for user in added]):
+            db.query(User).filter(User.id.in_(chunk)).update(
+                {User.cohort_id: cohort.id}, synchronize_session=False
+            )
+        # Bulk inserts bypass the flush listeners that keep list counters current
+        listing_counters.refresh(db, "cohort", [cohort.id], ["users"])
+    db.commit()
+    return added, errors
+
+
+def remove_users(db: Session, cohort_id: int, user_ids: List[int]) -> Tuple[List[int], List[str]]:
+    """Remove users from a cohort with one delete and one update per id chunk"""
+    user_ids = _unique(user_ids)
+    members = set()
+    for chunk in _chunks(user_ids):
+        members.update(user_id for user_id, in db.query(UserCohort.user_id).filter(
+            UserCohort.cohort_id == cohort_id,
+            UserCohort.user_id.in_(chunk)
+        ).all())
+
+    removed = [user_id for user_id in user_ids if user_id in members]
+    errors = [f"User ID {user_id} not found in cohort" for user_id in user_ids if user_id not in members]
+
+    for chunk in _chunks(removed):
+        db.query(UserCohort).filter(
+            UserCohort.cohort_id == cohort_id,
+            UserCohort.user_id.in_(chunk)
+        ).delete(synchronize_session=False)
+        db.query(User).filter(
+            User.id.in_(chunk),
+            User.cohort_id == cohort_id
+        ).update({User.cohort_id: None}, synchronize_session=False)
+    db.commit()
+    return removed, errors
+
+
+def move_users(db: Session, source_cohort_id: int, target_cohort: Cohort, user_ids: List[int],
+               assigned_by: Optional[int]) -> Tuple[List[Any], List[str]]:
+    """Move members of one cohort to another, reusing their membership rows"""
+    user_ids = _unique(user_ids)
+    users = _load_users(db, user_ids)
+    memberships = _load_memberships(db, list(users))
+
+    moved, errors = [], []
+    for user_id in user_ids:
+        user = users.get(user_id)
+        if not user:
+            errors.append(f"User ID {user_id} not found")
+        elif memberships.get(user_id, (None,))[0] != source_cohort_id:
+            errors.append(f"User {user.username} is not in the source cohort")
+        else:
+            moved.append(user)
+
+    now = datetime.utcnow()
+    for chunk in _chunks([user.id for user in moved]):
+        db.query(UserCohort).filter(
+            UserCohort.cohort_id == source_cohort_id,
+            UserCohort.user_id.in_(chunk)
+        ).update({
+            UserCohort.cohort_id: target_cohort.id,
+            UserCohort.assigned_at: now,
+            UserCohort.assigned_by: assigned_by,
+        }, synchronize_session=False)
+        db.query(User).filter(User.id.in_(chunk)).update(
+            {User.cohort_id: target_cohort.id}, synchronize_session=False
+        )
+    db.commit()
+    return moved, errors
+
+
+def _format_welcome(template, cohort: Cohort, user) -> Tuple[str, str]:
+    context = {
+        "username": user.username,
+        "email": user.email,
+        "cohort_name": cohort.name,
+        "start_date": cohort.start_date.strftime('%Y-%m-%d') if cohort.start_date else 'TBD',
+        "instructor_name": cohort.instructor_name or 'TBD',
+    }
+    if template:
+        try:
+            # Compiled template, renders the full HTML email with the base layout
+            return template.render(context)
+        except Exception as template_error:
+            logger.warning(f"Cohort welcome template formatting error, using default: {str(template_error)}")
+    return DEFAULT_WELCOME_SUBJECT, DEFAULT_WELCOME_BODY.format(**context)
+
+
+def send_cohort_welcome_emails(cohort_id: int, user_ids: List[int]):
+    """Background task: send the cohort welcome email to each user in its own session"""
+    if not user_ids:
+        return
+    from notification_service import NotificationService
+    from email_template_engine import email_template_engine
+
+    db = SessionLocal()
+    try:
+        cohort = db.query(Cohort).filter(Cohort.id == cohort_id).first()
+        if not cohort:
+            return
+        template = email_template_engine.get(db, WELCOME_TEMPLATE_NAME)
+        users = _load_users(db, _unique(user_ids))
+
+        service = NotificationService(db)
+        sent = failed = 0
+        for user_id in user_ids:
+            user = users.get(user_id)
+            if not user:
+                continue
+            try:
+                subject, body = _format_welcome(template, cohort, user)
+                email_log = service.send_email_notification(
+                    user_id=user.id,
+                    email=user.email,
+                    subject=subject,
+                    body=body
+                )
+                if email_log.status == "failed":
+                    failed += 1
+                    logger.warning(f"Cohort welcome email failed for {user.email}: {email_log.error_message}")
+                else:
+                    sent += 1
+            except Exception as e:
+                # One bad address must not stop the rest of the batch
+                db.rollback()
+                failed += 1
+                logger.warning(f"Cohort welcome email failed for {user.email}: {str(e)}")
+        logger.info(f"Cohort {cohort_id} welcome emails: {sent} sent, {failed} failed")
+    finally:
+        db.close()
@@ -15,6 +15,8 @@ from cohort_endpoints import (
     delete_cohort,
     add_users_to_cohort,
     remove_user_from_cohort,
+    bulk_remove_users_from_cohort,
+    move_users_to_cohort,
     assign_courses_to_cohort,
     remove_course_from_cohort,
     get_available_users,
@@ -32,6 +34,8 @@ router.put("/admin/cohorts/{cohort_id}")(update_cohort)
 router.delete("/admin/cohorts/{cohort_id}")(delete_cohort)
 router.post("/admin/cohorts/{cohort_id}/users")(add_users_to_cohort)
 router.delete("/admin/cohorts/{cohort_id}/users/{user_id}")(remove_user_from_cohort)
+router.post("/admin/cohorts/{cohort_id}/users/bulk-remove")(bulk_remove_users_from_cohort)
+router.post("/admin/cohorts/{cohort_id}/users/move")(move_users_to_cohort)
 router.post("/admin/cohorts/{cohort_id}/courses")(assign_courses_to_cohort)
 router.delete("/admin/cohorts/{cohort_id}/courses/{course_id}")(remove_course_from_cohort)
 router.get("/admin/available-users")(get_available_users)
@@ -0,0 +1,269 @@
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import SessionLocal, Module, Session as SessionModel, Resource, SessionContent
+from cohort_specific_models import CohortCourseModule, CohortCourseSession, CohortCourseResource, CohortSessionContent
+from assignment_quiz_models import Assignment, Quiz
+
+logger = logging.getLogger(__name__)
+
+# Key under which pending invalidations are collected until the transaction commits
+_PENDING_KEY = "course_tree_invalidations"
+
+# Tables that make up a course tree, mapped to how a written row locates its course:
+# (session/course type, column holding the parent id, level of the parent)
+_TREE_TABLES = {
+    "modules": ("regular", "course_id", "course"),
+    "cohort_course_modules": ("cohort_specific", "course_id", "course"),
+    "sessions": ("global", "module_id", "module"),
+    "cohort_course_sessions": ("cohort", "module_id", "module"),
+    "resources": ("global", "session_id", "session"),
+    "session_contents": ("global", "session_id", "session"),
+    "cohort_course_resources": ("cohort", "session_id", "session"),
+    "cohort_session_contents": ("cohort", "session_id", "session"),
+    "quizzes": (None, "session_id", "session"),
+    "assignments": (None, "session_id", "session"),
+}
+
+# Course type <-> session type naming used across the codebase
+_SESSION_TYPES = {"regular": "global", "cohort_specific": "cohort"}
+_COURSE_TYPES = {"global": "regular", "cohort": "cohort_specific"}
+
+
+class CourseTreeCache:
+    """Versioned in-memory cache of course structure (modules -> sessions -> content ids).
+
+    A tree is loaded with a handful of set-based queries per course and shared by every
+    request until a write to one of its modules, sessions, resources, contents, quizzes
+    or assignments is committed. Trees are read-only; per-student data is computed on top.
+    """
+
+    def __init__(self):
+        self._trees: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._timestamps: Dict[Tuple[str, int], datetime] = {}
+        self._versions: Dict[Tuple[str, int], int] = {}
+        # Reverse indexes so a written child row can find the cached course it belongs to
+        self._module_index: Dict[Tuple[str, int], Tuple[str, int]] = {}
+        self._session_index: Dict[Tuple[str, int], Tuple[str, int]] = {}
+        self._cache_duration = timedelta(minutes=30)  # Safety net for writes made outside the ORM
+        self._lock = threading.Lock()
+
+    def get_tree(self, db: Session, course_id: int, course_type: str = "regular") -> Dict[str, Any]:
+        """Get the cached structure of a course, loading it on first use"""
+        key = (course_type, course_id)
+        with self._lock:
+            tree = self._trees.get(key)
+            timestamp = self._timestamps.get(key)
+            if tree is not None and timestamp is not None and datetime.utcnow() - timestamp < self._cache_duration:
+                return tree
+            version = self._versions.get(key, 0)
+
+        tree = self._load(db, course_id, course_type)
+        with self._lock:
+            # Discard the result if the course was invalidated while it was loading
+            if self._versions.get(key, 0) != version:
+                return tree
+            tree["version"] = version
+            self._trees[key] = tree
+            self._timestamps[key] = datetime.utcnow()
+            session_type = _SESSION_TYPES[course_type]
+            for module in tree["modules"]:
+                self._module_index[(session_type, module["id"])] = key
+                for session in module["sessions"]:
+                    self._session_index[(session_type, session["id"])] = key
+        return tree
+
+    def _load(self, db: Session, course_id: int, course_type: str) -> Dict[str, Any]:
+        """Load the full structure of one course with one query per level"""
+        if course_type == "cohort_specific":
+            module_model, session_model = CohortCourseModule, CohortCourseSession
+            resource_model, content_model = CohortCourseResource, CohortSessionContent
+        else:
+            module_model, session_model = Module, SessionModel
+            resource_model, content_model = Resource, SessionContent
+        session_type = _SESSION_TYPES[course_type]
+
+        modules = db.query(module_model).filter(
+            module_model.course_id == course_id
+        ).order_by(module_model.week_number).all()
+        module_ids = [m.id for m in modules]
+
+        sessions = []
+        if module_ids:
+            sessions = db.query(session_model).filter(
+                session_model.module_id.in_(module_ids)
+            ).order_by(session_model.session_number).all()
+        session_ids = [s.id for s in sessions]
+
+        resources_by_session: Dict[int, List[int]] = {}
+        contents_by_session: Dict[int, List[Dict[str, Any]]] = {}
+        quizzes_by_session: Dict[int, List[int]] = {}
+        assignments_by_session: Dict[int, List[int]] = {}
+        if session_ids:
+            for row in db.query(resource_model.id, resource_model.session_id).filter(
+                resource_model.session_id.in_(session_ids)
+            ).all():
+                resources_by_session.setdefault(row.session_id, []).append(row.id)
+            for row in db.query(content_model.id, content_model.session_id, content_model.content_type).filter(
+                content_model.session_id.in_(session_ids)
+            ).all():
+                contents_by_session.setdefault(row.session_id, []).append({"id": row.id, "content_type": row.content_type})
+            for row in db.query(Quiz.id, Quiz.session_id).filter(
+                Quiz.session_id.in_(session_ids),
+                Quiz.session_type == session_type
+            ).all():
+                quizzes_by_session.setdefault(row.session_id, []).append(row.id)
+            for row in db.query(Assignment.id, Assignment.session_id).filter(
+                Assignment.session_id.in_(session_ids),
+                Assignment.session_type == session_type
+            ).all():
+                assignments_by_session.setdefault(row.session_id, []).append(row.id)
+
+        sessions_by_module: Dict[int, List[Dict[str, Any]]] = {}
+        for s in sessions:
+            sessions_by_module.setdefault(s.module_id, []).append({
+                "id": s.id,
+                "module_id": s.module_id,
+                "session_number": s.session_number,
+                "title": s.title,
+                "description": s.description,
+                "scheduled_time": s.scheduled_time,
+                "duration_minutes": s.duration_minutes,
+                "zoom_link": s.zoom_link,
+                "recording_url": s.recording_url,
+                "syllabus_content": s.syllabus_content,
+                "created_at": s.created_at,
+                "resource_ids": resources_by_session.get(s.id, []),
+                "contents": contents_by_session.get(s.id, []),
+                "quiz_ids": quizzes_by_session.get(s.id, []),
+                "assignment_ids": assignments_by_session.get(s.id, []),
+            })
+
+        return {
+            "course_id": course_id,
+            "course_type": course_type,
+            "session_type": session_type,
+            "modules": [{
+                "id": m.id,
+                "week_number": m.week_number,
+                "title": m.title,
+                "description": m.description,
+                "start_date": m.start_date,
+                "end_date": m.end_date,
+                "created_at": m.created_at,
+                "sessions": sessions_by_module.get(m.id, []),
+            } for m in modules],
+        }
+
+    def invalidate_course(self, course_id: int, course_type: str = "regular"):
+        """Drop one course tree and bump its version"""
+        with self._lock:
+            self._drop((course_type, course_id))
+
+    def invalidate_module(self, module_id: int, session_type: str = "global"):
+        with self._lock:
+            key = self._module_index.get((session_type, module_id))
+            if key:
+                self._drop(key)
+
+    def invalidate_session(self, session_id: int, session_type: str = "global"):
+        with self._lock:
+            key = self._session_index.get((session_type, session_id))
+            if key:
+                self._drop(key)
+
+    def invalidate_all(self):
+        """Drop every cached course tree"""
+        with self._lock:
+            for key in list(self._trees.keys()):
+                self._drop(key)
+        logger.info("Course tree cache invalidated")
+
+    def _drop(self, key: Tuple[str, int]):
+        # Caller must hold the lock
+        self._versions[key] = self._versions.get(key, 0) + 1
+        tree = self._trees.pop(key, None)
+        self._timestamps.pop(key, None)
+        if tree:
+            session_type = tree["session_type"]
+            for module in tree["modules"]:
+                self._module_index.pop((session_type, module["id"]), None)
+                for session in module["sessions"]:
+                    self._session_index.pop((session_type, session["id"]), None)
+
+
+# Global cache instance
+course_tree_cache = CourseTreeCache()
+
+
+def iter_tree_sessions(tree: Dict[str, Any]):
+    """Yield (module, session) pairs of a course tree in display order"""
+    for module in tree["modules"]:
+        for session in module["sessions"]:
+            yield module, session
+
+
+def _pending(session: Session) -> set:
+    return session.info.setdefault(_PENDING_KEY, set())
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_tree_changes(session, flush_context):
+    """Record which cached courses are touched by the rows written in this flush"""
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, "__tablename__", None)
+        spec = _TREE_TABLES.get(table)
+        if not spec:
+            continue
+        type_name, parent_column, level = spec
+        if type_name is None:
+            type_name = getattr(instance, "session_type", None) or "global"
+        parent_id = getattr(instance, parent_column, None)
+        pending = _pending(session)
+        if level == "course":
+            pending.add(("course", _COURSE_TYPES.get(type_name, type_name), parent_id))
+        else:
+            pending.add((level, type_name, parent_id))
+        if level == "module":
+            # A session moved to another module must also refresh its old course
+            pending.add(("session", type_name, instance.id))
+        elif level == "course":
+            pending.add(("module", _SESSION_TYPES.get(type_name, type_name), instance.id))
+
+
+def _collect_bulk_change(context):
+    if context.mapper.local_table.name in _TREE_TABLES:
+        _pending(context.session).add(("all", None, None))
+
+
+event.listen(SessionLocal, "after_bulk_update", _collect_bulk_change)
+event.listen(SessionLocal, "after_bulk_delete", _collect_bulk_change)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_tree_invalidations(session):
+    """Invalidate cached trees once the change is visible to other sessions"""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for level, type_name, target_id in pending:
+        if level == "all":
+            course_tree_cache.invalidate_all()
+            return
+    for level, type_name, target_id in pending:
+        if target_id is None:
+            continue
+        if level == "course":
+            course_tree_cache.invalidate_course(target_id, type_name)
+        elif level == "module":
+            course_tree_cache.invalidate_module(target_id, type_name)
+        else:
+            course_tree_cache.invalidate_session(target_id, type_name)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_tree_invalidations(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,207 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from database import (
+    SessionLocal, User, Admin, Course, Module, Session as SessionModel, Enrollment, Cohort,
+    MentorSession
+)
+from cohort_specific_models import CohortSpecificCourse, CohortCourseModule, CohortCourseSession
+
+logger = logging.getLogger(__name__)
+
+# Dashboard aggregates are recomputed at most this often; relevant commits invalidate sooner
+DASHBOARD_CACHE_SECONDS = float(os.getenv("DASHBOARD_CACHE_SECONDS", "30"))
+UPCOMING_SESSION_LIMIT = 10
+
+# Key under which a pending invalidation is recorded until the transaction commits
+_PENDING_KEY = "dashboard_invalidation"
+
+# Tables whose rows feed the dashboard counts and upcoming-session lists. Progress and
+# attendance tables are written on every student action, so the averages built from them
+# are only refreshed by the TTL.
+_DASHBOARD_TABLES = {
+    "users", "admins", "courses", "modules", "sessions", "resources", "enrollments",
+    "cohorts", "user_cohorts", "cohort_courses", "presenter_cohorts",
+    "mentor_cohorts", "mentor_courses", "mentor_sessions", "quizzes",
+    "cohort_specific_courses", "cohort_course_modules", "cohort_course_sessions",
+    "cohort_course_resources",
+}
+
+
+class DashboardCache:
+    """Per-scope dashboard aggregates shared by every staff member polling the same scope.
+
+    Keys name a scope, e.g. ``("global",)``, ``("presenter", id)`` or ``("mentor", id)``.
+    An entry is computed once and served from memory until DASHBOARD_CACHE_SECONDS pass or
+    a write to one of the dashboard tables is committed.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple, Tuple[float, Any]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < DASHBOARD_CACHE_SECONDS:
+                return entry[1]
+            generation = self._generation
+
+        value = loader()
+        with self._lock:
+            # Don't store a result computed from data that changed while it was loading
+            if self._generation == generation:
+                self._entries[key] = (now, value)
+        return value
+
+    def invalidate_all(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+# Global cache instance
+dashboard_cache = DashboardCache()
+
+
+def _count(model, *criteria):
+    query = select(func.count()).select_from(model)
+    if criteria:
+        query = query.where(*criteria)
+    return query.scalar_subquery()
+
+
+def _load_global_stats(db: Session) -> Dict[str, int]:
+    row = db.query(
+        _count(User, User.role == "Student").label("total_students"),
+        _count(User, User.role == "Student", User.github_link.isnot(None), User.github_link != "").label("students_with_github"),
+        _count(Admin).label("total_admins"),
+        _count(Course).label("total_courses"),
+        _count(Module).label("total_modules"),
+        _count(SessionModel).label("total_sessions"),
+        _count(Enrollment).label("total_enrollments"),
+        _count(Enrollment, Enrollment.progress > 0).label("active_enrollments"),
+        _count(Cohort).label("total_cohorts"),
+    ).one()
+    return dict(row._mapping)
+
+
+def get_global_stats(db: Session) -> Dict[str, int]:
+    """System-wide counts, computed with a single statement"""
+    return dashboard_cache.get(("global",), lambda: _load_global_stats(db))
+
+
+def session_row(session, module_title, week_number, course_title, **extra) -> Dict[str, Any]:
+    """Upcoming-session entry in the shape every dashboard returns"""
+    return {
+        "id": session.id,
+        "title": session.title,
+        "course_title": course_title or "Unknown Course",
+        "module_title": module_title or "Unknown Module",
+        "scheduled_date": session.scheduled_time.strftime("%Y-%m-%d") if session.scheduled_time else None,
+        "scheduled_time": session.scheduled_time.strftime("%H:%M") if session.scheduled_time else None,
+        "scheduled_datetime": session.scheduled_time,
+        "duration_minutes": session.duration_minutes,
+        "zoom_link": getattr(session, "zoom_link", None),
+        "session_number": session.session_number,
+        "week_number": week_number,
+        **extra
+    }
+
+
+def query_upcoming_sessions(db: Session, course_ids: Optional[List[int]] = None, mentor_id: Optional[int] = None,
+                            limit: int = UPCOMING_SESSION_LIMIT, **extra) -> List[Dict[str, Any]]:
+    """Next scheduled global sessions with their module and course, in one joined query"""
+    query = db.query(SessionModel, Module.title, Module.week_number, Course.title).join(
+        Module, SessionModel.module_id == Module.id
+    ).join(
+        Course, Module.course_id == Course.id
+    )
+    if mentor_id is not None:
+        query = query.join(MentorSession, MentorSession.session_id == SessionModel.id).filter(
+            MentorSession.mentor_id == mentor_id
+        )
+    if course_ids is not None:
+        if not course_ids:
+            return []
+        query = query.filter(Module.course_id.in_(course_ids))
+    rows = query.filter(
+        SessionModel.scheduled_time.isnot(None),
+        SessionModel.scheduled_time > datetime.now()
+    ).order_by(SessionModel.scheduled_time).limit(limit).all()
+    return [session_row(*row, **extra) for row in rows]
+
+
+def query_upcoming_cohort_sessions(db: Session, cohort_ids: List[int], limit: int = UPCOMING_SESSION_LIMIT,
+                                   **extra) -> List[Dict[str, Any]]:
+    """Next scheduled sessions of the cohort-specific courses of the given cohorts"""
+    if not cohort_ids:
+        return []
+    rows = db.query(
+        CohortCourseSession, CohortCourseModule.title, CohortCourseModule.week_number, CohortSpecificCourse.title
+    ).join(
+        CohortCourseModule, CohortCourseSession.module_id == CohortCourseModule.id
+    ).join(
+        CohortSpecificCourse, CohortCourseModule.course_id == CohortSpecificCourse.id
+    ).filter(
+        CohortSpecificCourse.cohort_id.in_(cohort_ids),
+        CohortCourseSession.scheduled_time.isnot(None),
+        CohortCourseSession.scheduled_time > datetime.now()
+    ).order_by(CohortCourseSession.scheduled_time).limit(limit).all()
+    return [session_row(*row, **extra) for row in rows]
+
+
+def get_upcoming_sessions(db: Session) -> List[Dict[str, Any]]:
+    """Next scheduled global sessions across all courses"""
+    return still_upcoming(dashboard_cache.get(("global", "upcoming"), lambda: query_upcoming_sessions(db)))
+
+
+def still_upcoming(sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop cached sessions that have started since the list was computed"""
+    now = datetime.now()
+    return [s for s in sessions if s["scheduled_datetime"] and s["scheduled_datetime"] > now]
+
+
+def _pending(session: Session) -> Dict[str, bool]:
+    return session.info.setdefault(_PENDING_KEY, {})
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_dashboard_changes(session, flush_context):
+    """Note whether this transaction wrote to any table the dashboards are built from"""
+    if session.info.get(_PENDING_KEY):
+        return
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if getattr(instance, "__tablename__", None) in _DASHBOARD_TABLES:
+            _pending(session)["changed"] = True
+            return
+
+
+def _collect_bulk_change(context):
+    if context.mapper.local_table.name in _DASHBOARD_TABLES:
+        _pending(context.session)["changed"] = True
+
+
+event.listen(SessionLocal, "after_bulk_update", _collect_bulk_change)
+event.listen(SessionLocal, "after_bulk_delete", _collect_bulk_change)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_dashboard_invalidation(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        dashboard_cache.invalidate_all()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_dashboard_invalidation(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float, JSON, Enum
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float, JSON, Enum, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -23,6 +23,9 @@ class Admin(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    # Newest-first keyset pagination of the staff directory
+    __table_args__ = (Index("ix_admins_created_at_id", "created_at", "id"),)
+
 class Presenter(Base):
     __tablename__ = "presenters"
     
@@ -32,6 +35,9 @@ class Presenter(Base):
     password_hash = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Newest-first keyset pagination of the staff directory
+    __table_args__ = (Index("ix_presenters_created_at_id", "created_at", "id"),)
     
     presenter_cohorts = relationship("PresenterCohort", back_populates="presenter")
 
@@ -45,6 +51,9 @@ class Manager(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    # Newest-first keyset pagination of the staff directory
+    __table_args__ = (Index("ix_managers_created_at_id", "created_at", "id"),)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -369,6 +378,7 @@ class CohortCourse(Base):
 
 class AdminLog(Base):
     __tablename__ = "admin_logs"
+    __table_args__ = (Index("ix_admin_logs_timestamp_id", "timestamp", "id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     admin_id = Column(Integer, ForeignKey("admins.id"))
@@ -384,6 +394,7 @@ class AdminLog(Base):
 
 class PresenterLog(Base):
     __tablename__ = "presenter_logs"
+    __table_args__ = (Index("ix_presenter_logs_timestamp_id", "timestamp", "id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     presenter_id = Column(Integer, ForeignKey("presenters.id"))
@@ -408,6 +419,9 @@ class Mentor(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    # Newest-first keyset pagination of the staff directory
+    __table_args__ = (Index("ix_mentors_created_at_id", "created_at", "id"),)
+
 class MentorCohort(Base):
     __tablename__ = "mentor_cohorts"
     
@@ -455,6 +469,7 @@ class MentorSession(Base):
 
 class MentorLog(Base):
     __tablename__ = "mentor_logs"
+    __table_args__ = (Index("ix_mentor_logs_timestamp_id", "timestamp", "id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     mentor_id = Column(Integer, ForeignKey("mentors.id", ondelete="CASCADE"))
@@ -483,6 +498,7 @@ class PresenterCohort(Base):
 
 class StudentLog(Base):
     __tablename__ = "student_logs"
+    __table_args__ = (Index("ix_student_logs_timestamp_id", "timestamp", "id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id"))
@@ -673,7 +689,7 @@ class SessionMeeting(Base):
     duration_minutes = Column(Integer, default=60)
     meeting_url = Column(String(500), nullable=True)
     location = Column(String(500), nullable=True)
-    status = Column(String(20), default="scheduled")  # scheduled, completed, cancelled
+    status = Column(String(20), default="scheduled")  # draft, scheduled, queued, sending, completed, failed, cancelled
     
     created_by = Column(Integer, ForeignKey("admins.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -715,6 +731,62 @@ class CalendarEvent(Base):
     # Relationships
     session_meeting = relationship("SessionMeeting", back_populates="calendar_event")
 
+# Busy intervals with precomputed end times (maintained from calendar events, sessions and meetings)
+class CalendarBusyInterval(Base):
+    __tablename__ = "calendar_busy_intervals"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_type = Column(String(20), nullable=False)  # event, session, meeting
+    source_id = Column(Integer, nullable=False)
+    event_type = Column(String(50), nullable=True)  # CalendarEvent.event_type for events
+    title = Column(String(300), nullable=True)
+    start_datetime = Column(DateTime, nullable=False, index=True)
+    end_datetime = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("source_type", "source_id", name="uq_busy_interval_source"),
+        Index("ix_busy_interval_range", "start_datetime", "end_datetime"),
+    )
+
+# Cached child counts shown on admin list pages (maintained by listing_counters)
+class EntityCounter(Base):
+    __tablename__ = "entity_counters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_type = Column(String(20), nullable=False)  # cohort, course, mentor
+    entity_id = Column(Integer, nullable=False)
+    counter = Column(String(30), nullable=False)  # users, global_courses, enrollments, ...
+    value = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_id", "counter", name="uq_entity_counter"),
+    )
+
+# Durable queue of background work such as notification fan-out (processed by job_queue)
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, completed, failed
+    idempotency_key = Column(String(255), nullable=True, unique=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = Column(String(100), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    progress = Column(JSON, nullable=True)  # Handler checkpoints, kept across retries
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_background_jobs_status_run_after", "status", "run_after"),
+        Index("ix_background_jobs_type_status", "job_type", "status"),
+    )
+
 class PasswordResetOTP(Base):
     __tablename__ = "password_reset_otps"
     
@@ -9,6 +9,7 @@ from database import (
 )
 from auth import get_current_admin_or_presenter
 from notification_service import NotificationService
+from job_queue import enqueue, job_handler, job_id_for_key, JobContext
 from datetime import datetime, timedelta
 from sqlalchemy import func
 import logging
@@ -21,6 +22,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/campaigns", tags=["campaigns"])
 
+# Recipients handled between progress checkpoints of a send job
+CHECKPOINT_EVERY = 50
+
 class CampaignTemplate(BaseModel):
     name: str
     subject: str
@@ -148,142 +152,151 @@ async def create_campaign(
         logger.error(f"Create campaign error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to create campaign")
 
-async def send_campaign_immediately(campaign_id: int, db: Session, base_url: Optional[str] = None):
-    """Send campaign immediately without background tasks"""
-    from notification_service import NotificationService
-    from database import EmailTemplate, EmailRecipient, User, Admin, Presenter, Mentor, UserCohort, Cohort
+class CampaignSendPayload(BaseModel):
+    campaign_id: int
+    base_url: Optional[str] = None
+
+
+def _recipient_key(user):
+    """Stable position of a campaign recipient; users, admins, presenters and mentors share ids"""
+    return (type(user).__tablename__, user.id)
+
+
+def _mark_campaign_failed(db: Session, payload: CampaignSendPayload, error: Exception):
+    campaign = db.query(EmailCampaign).filter(EmailCampaign.id == payload.campaign_id).first()
+    if campaign:
+        campaign.status = "failed"
+
+
+@job_handler("campaign_send", payload_model=CampaignSendPayload, on_failure=_mark_campaign_failed)
+def send_campaign_job(db: Session, payload: CampaignSendPayload, ctx: JobContext):
+    """Send a campaign with open/click tracking; recipients emailed by an earlier attempt are skipped"""
+    from database import EmailTemplate, EmailRecipient, User, Admin, Presenter, Mentor, UserCohort
     
-    try:
-        # Get campaign
-        campaign = db.query(EmailCampaign).filter(EmailCampaign.id == campaign_id).first()
-        if not campaign:
-            logger.error(f"Campaign {campaign_id} not found")
-            return
-        
-        # Get template
-        template = db.query(EmailTemplate).filter(EmailTemplate.id == campaign.template_id).first()
-        if not template:
-            logger.error(f"Template {campaign.template_id} not found for campaign {campaign_id}")
-            return
-        
-        # Get target users based on target_role
-        target_users = []
-        
-        # Check if target_role is a cohort (starts with "cohort_")
-        if campaign.target_role.startswith("cohort_"):
-            try:
-                cohort_id = int(campaign.target_role.replace("cohort_", ""))
-                # Get users in this specific cohort
-                user_cohorts = db.query(UserCohort).filter(UserCohort.cohort_id == cohort_id).all()
-                for uc in user_cohorts:
-                    user = db.query(User).filter(User.id == uc.user_id).first()
-                    if user:
-                        target_users.append(user)
-                logger.info(f"Found {len(target_users)} users in cohort {cohort_id}")
-            except ValueError:
-                logger.error(f"Invalid cohort ID in target_role: {campaign.target_role}")
-                return
-        else:
-            # Regular role-based targeting
-            if campaign.target_role == "Student":
-                target_users = db.query(User).filter(User.role == "Student").all()
-            elif campaign.target_role == "Admin":
-                target_users = db.query(Admin).all()
-            elif campaign.target_role == "Presenter":
-                target_users = db.query(Presenter).all()
-            elif campaign.target_role == "Mentor":
-                target_users = db.query(Mentor).all()
-            elif campaign.target_role == "All":
-                users = db.query(User).all()
-                admins = db.query(Admin).all()
-                presenters = db.query(Presenter).all()
-                mentors = db.query(Mentor).all()
-                target_users = users + admins + presenters + mentors
-        
-        if not target_users:
-            logger.warning(f"No target users found for campaign {campaign_id} with target_role {campaign.target_role}")
-            campaign.status = "completed"
-            campaign.sent_count = 0
-            campaign.completed_at = datetime.utcnow()
-            db.commit()
+    campaign_id = payload.campaign_id
+    # Get campaign
+    campaign = db.query(EmailCampaign).filter(EmailCampaign.id == campaign_id).first()
+    if not campaign:
+        logger.error(f"Campaign {campaign_id} not found")
+        return
+    
+    # Get template
+    template = db.query(EmailTemplate).filter(EmailTemplate.id == campaign.template_id).first()
+    if not template:
+        logger.error(f"Template {campaign.template_id} not found for campaign {campaign_id}")
+        campaign.status = "failed"
+        return
+    
+    # Get target users based on target_role
+    target_users = []
+    
+    # Check if target_role is a cohort (starts with "cohort_")
+    if campaign.target_role.startswith("cohort_"):
+        try:
+            cohort_id = int(campaign.target_role.replace("cohort_", ""))
+        except ValueError:
+            logger.error(f"Invalid cohort ID in target_role: {campaign.target_role}")
+            campaign.status = "failed"
             return
-        
-        # Update campaign status to sending
-        campaign.status = "sending"
-        campaign.started_at = datetime.utcnow()
-        db.commit()
-        
-        # Create recipients and send emails
-        service = NotificationService(db)
-        sent_count = 0
-        
-        for user in target_users:
-            if user.email:
-                try:
-                    # Create recipient record
-                    recipient = EmailRecipient(
-                        campaign_id=campaign.id,
-                        user_id=getattr(user, 'id', None),
-                        email=user.email,
-                        status="pending"
-                    )
-                    db.add(recipient)
-                    
-                    # Use provided base_url or fallback to environment/default
-                    if not base_url:
-                        base_url = os.getenv("BASE_URL", "http://localhost:8000")
-                    
-                    if base_url.endswith("/"):
-                        base_url = base_url[:-1]
-
-                    # Send email
-                    email_body = template.body.replace("{username}", getattr(user, 'username', user.email))
-                    email_body = email_body.replace("{email}", user.email)
-                    
-                    # Process body for tracking
-                    tracked_body = process_email_body(email_body, recipient.id, base_url)
-                    
-                    # Send email synchronously
-                    email_log = service.send_email_notification(
-                        user_id=getattr(user, 'id', None),
-                        email=user.email,
-                        subject=template.subject,
-                        body=tracked_body
-                    )
-                    
-                    if email_log.status in ["sent", "queued"]:
-                        recipient.status = "sent"
-                        recipient.sent_at = datetime.utcnow()
-                        sent_count += 1
-                    else:
-                        recipient.status = "failed"
-                        recipient.error_message = email_log.error_message
-                        
-                except Exception as e:
-                    logger.error(f"Failed to send email to {user.email}: {str(e)}")
-                    if 'recipient' in locals():
-                        recipient.status = "failed"
-                        recipient.error_message = str(e)
-        
-        # Update campaign with final counts and mark as completed
-        campaign.sent_count = sent_count
+        # Get users in this specific cohort
+        target_users = db.query(User).join(UserCohort, UserCohort.user_id == User.id).filter(
+            UserCohort.cohort_id == cohort_id
+        ).all()
+        logger.info(f"Found {len(target_users)} users in cohort {cohort_id}")
+    else:
+        # Regular role-based targeting
+        if campaign.target_role == "Student":
+            target_users = db.query(User).filter(User.role == "Student").all()
+        elif campaign.target_role == "Admin":
+            target_users = db.query(Admin).all()
+        elif campaign.target_role == "Presenter":
+            target_users = db.query(Presenter).all()
+        elif campaign.target_role == "Mentor":
+            target_users = db.query(Mentor).all()
+        elif campaign.target_role == "All":
+            users = db.query(User).all()
+            admins = db.query(Admin).all()
+            presenters = db.query(Presenter).all()
+            mentors = db.query(Mentor).all()
+            target_users = users + admins + presenters + mentors
+    
+    if not target_users:
+        logger.warning(f"No target users found for campaign {campaign_id} with target_role {campaign.target_role}")
         campaign.status = "completed"
+        campaign.sent_count = 0
         campaign.completed_at = datetime.utcnow()
-        
-        db.commit()
-        
-        logger.info(f"Campaign {campaign_id} sent immediately to {sent_count} recipients")
-        
-    except Exception as e:
-        logger.error(f"Error sending campaign {campaign_id} immediately: {str(e)}")
-        # Mark campaign as failed
+        return
+    
+    # Update campaign status to sending
+    campaign.status = "sending"
+    campaign.started_at = campaign.started_at or datetime.utcnow()
+    db.commit()
+    
+    # Use provided base_url or fallback to environment/default
+    base_url = payload.base_url or os.getenv("BASE_URL", "http://localhost:8000")
+    if base_url.endswith("/"):
+        base_url = base_url[:-1]
+    
+    # Create recipients and send emails in (table, id) order; a retry resumes after the last checkpointed recipient
+    service = NotificationService(db)
+    target_users.sort(key=_recipient_key)
+    after = tuple(ctx.progress.get("after") or ())
+    sent_count = ctx.progress.get("sent_count", 0)
+    handled = 0
+    emailed = set()
+    
+    for user in target_users:
+        key = _recipient_key(user)
+        if not user.email or user.email in emailed or (after and key <= after):
+            continue
+        # Create recipient record; flushed so its id can go into the tracking links
+        recipient = EmailRecipient(
+            campaign_id=campaign.id,
+            user_id=getattr(user, 'id', None),
+            email=user.email,
+            status="pending"
+        )
+        db.add(recipient)
+        db.flush()
         try:
-            campaign = db.query(EmailCampaign).filter(EmailCampaign.id == campaign_id).first()
-            if campaign:
-                campaign.status = "failed"
-                db.commit()
-        except:
-            pass
+            # Send email
+            email_body = template.body.replace("{username}", getattr(user, 'username', user.email))
+            email_body = email_body.replace("{email}", user.email)
+            
+            # Process body for tracking
+            tracked_body = process_email_body(email_body, recipient.id, base_url)
+            
+            # Send email synchronously
+            email_log = service.send_email_notification(
+                user_id=getattr(user, 'id', None),
+                email=user.email,
+                subject=template.subject,
+                body=tracked_body
+            )
+            
+            if email_log.status in ["sent", "queued"]:
+                recipient.status = "sent"
+                recipient.sent_at = datetime.utcnow()
+                sent_count += 1
+            else:
+                recipient.status = "failed"
+                recipient.error_message = email_log.error_message
+                
+        except Exception as e:
+            logger.error(f"Failed to send email to {user.email}: {str(e)}")
+            recipient.status = "failed"
+            recipient.error_message = str(e)
+        emailed.add(user.email)
+        handled += 1
+        if handled % CHECKPOINT_EVERY == 0:
+            ctx.checkpoint(after=list(key), sent_count=sent_count)
+    
+    # Update campaign with final counts and mark as completed
+    campaign.sent_count = sent_count
+    campaign.status = "completed"
+    campaign.completed_at = datetime.utcnow()
+    
+    logger.info(f"Campaign {campaign_id} sent to {sent_count} recipients")
 
 def process_email_body(body: str, recipient_id: int, base_url: str) -> str:
     """Inject tracking pixel and wrap links for tracking"""
@@ -371,39 +384,47 @@ async def track_click(recipient_id: int, url: str, db: Session = Depends(get_db)
 async def send_campaign(
     campaign_id: int,
     request: Request,
-    background_tasks: BackgroundTasks,
     current_admin = Depends(get_current_admin_or_presenter),
     db: Session = Depends(get_db)
 ):
-    """Send email campaign"""
+    """Queue an email campaign for sending.
+
+    The emails go out from the job queue workers; the returned ``job_id`` can be followed
+    under ``/api/admin/jobs``. Repeating a request with the same ``Idempotency-Key``
+    header returns the job queued by the first one.
+    """
     try:
-        # Get base URL from request for tracking
-        base_url = str(request.base_url)
-        
-        # Use the immediate send function
-        await send_campaign_immediately(campaign_id, db, base_url=base_url)
-        
-        # Get updated campaign status
         campaign = db.query(EmailCampaign).filter(EmailCampaign.id == campaign_id).first()
         if not campaign:
             raise HTTPException(status_code=404, detail="Campaign not found")
         
+        client_key = request.headers.get("Idempotency-Key")
+        idempotency_key = f"campaign-send:{campaign.id}:{client_key}" if client_key else None
+        job_id = job_id_for_key(db, idempotency_key) if idempotency_key else None
+        
+        if job_id is None:
+            if campaign.status in ("queued", "sending"):
+                raise HTTPException(status_code=409, detail="Campaign is already being sent")
+            
+            # Get base URL from request for tracking
+            base_url = str(request.base_url)
+            job_id = enqueue(db, "campaign_send", {"campaign_id": campaign.id, "base_url": base_url},
+                             idempotency_key=idempotency_key)
+            campaign.status = "queued"
+            db.commit()
+        
         return {
-            "message": f"Campaign sent to {campaign.sent_count or 0} recipients",
+            "message": "Campaign queued for sending",
             "campaign_id": campaign.id,
+            "job_id": job_id,
             "sent_count": campaign.sent_count or 0,
             "status": campaign.status
         }
+    except HTTPException:
+        raise
     except Exception as e:
+        db.rollback()
         logger.error(f"Send campaign error: {str(e)}")
-        # Mark campaign as failed if error occurs
-        try:
-            campaign = db.query(EmailCampaign).filter(EmailCampaign.id == campaign_id).first()
-            if campaign:
-                campaign.status = "failed"
-                db.commit()
-        except:
-            pass
         raise HTTPException(status_code=500, detail="Failed to send campaign")
 
 @router.get("/list")
@@ -715,7 +736,7 @@ async def get_campaign_stats(
         total_users = student_count + admin_count + presenter_count + mentor_count
         
         total_campaigns = db.query(EmailCampaign).count()
-        active_campaigns = db.query(EmailCampaign).filter(EmailCampaign.status.in_(["sending", "scheduled"])).count()
+        active_campaigns = db.query(EmailCampaign).filter(EmailCampaign.status.in_(["queued", "sending", "scheduled"])).count()
         
         total_sent = db.query(EmailRecipient).filter(EmailRecipient.status == "sent").count()
         total_delivered = db.query(EmailRecipient).filter(EmailRecipient.status == "delivered").count()
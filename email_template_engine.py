@@ -0,0 +1,256 @@
+import re
+import logging
+import threading
+from collections import OrderedDict
+from string import Formatter
+from typing import Optional, Dict, Any, List, Iterable, Tuple, NamedTuple
+
+from jinja2 import Environment, StrictUndefined, Undefined
+from sqlalchemy.orm import Session
+
+from database import EmailTemplate
+from email_styling import BASE_HTML_LAYOUT
+
+logger = logging.getLogger(__name__)
+
+_SUBJECT_MARKER = "{{subject}}"
+_BODY_MARKER = "{{body_content}}"
+# Plain {name} placeholders, the only ones substituted in lenient mode
+_SIMPLE_FIELD_RE = re.compile(r"\{([A-Za-z_]\w*)\}")
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_]\w*$")
+_JINJA_CHARS_RE = re.compile(r"[{}%#]")
+
+
+class RenderedEmail(NamedTuple):
+    subject: str
+    body: str  # Complete HTML document, already wrapped in the base layout
+
+
+class _KeepPlaceholder(Undefined):
+    """Renders an unknown placeholder back as ``{name}``, like ``str.replace`` substitution"""
+
+    def __str__(self):
+        return "{%s}" % self._undefined_name
+
+
+def _format_value(value, format_spec: str = "", conversion: Optional[str] = None):
+    if isinstance(value, Undefined):
+        return str(value)  # Raises for strict templates, keeps the placeholder otherwise
+    if conversion == "r":
+        value = repr(value)
+    elif conversion == "s":
+        value = str(value)
+    elif conversion == "a":
+        value = ascii(value)
+    return format(value, format_spec)
+
+
+def _html_breaks(value: str) -> str:
+    return value.replace("\n", "<br>")
+
+
+def _make_environment(undefined) -> Environment:
+    # No autoescaping: template bodies are HTML fragments written by admins, and the values
+    # were substituted verbatim by str.format before
+    env = Environment(autoescape=False, undefined=undefined, keep_trailing_newline=True)
+    env.filters["fmt"] = _format_value
+    env.filters["br"] = _html_breaks
+    return env
+
+
+_ENVIRONMENTS = {
+    True: _make_environment(StrictUndefined),
+    False: _make_environment(_KeepPlaceholder),
+}
+
+
+def _tokens(source: str, strict: bool) -> List[Tuple]:
+    """Split a template into ('text', value) and ('field', name, spec, conversion) tokens.
+
+    Strict templates follow ``str.format`` (``{{``/``}}`` escapes, format specs, errors on
+    unbalanced braces); lenient ones only substitute plain ``{name}`` placeholders.
+    """
+    tokens = []
+    if strict:
+        for literal_text, field_name, format_spec, conversion in Formatter().parse(source):
+            if literal_text:
+                tokens.append(("text", literal_text))
+            if field_name is not None:
+                if not _IDENTIFIER_RE.match(field_name) or (format_spec and "{" in format_spec):
+                    raise ValueError(f"Unsupported placeholder {{{field_name}}}")
+                tokens.append(("field", field_name, format_spec or "", conversion))
+    else:
+        position = 0
+        for match in _SIMPLE_FIELD_RE.finditer(source):
+            if match.start() > position:
+                tokens.append(("text", source[position:match.start()]))
+            tokens.append(("field", match.group(1), "", None))
+            position = match.end()
+        if position < len(source):
+            tokens.append(("text", source[position:]))
+    return tokens
+
+
+class _SourceBuilder:
+    """Assembles Jinja2 source from literal text and placeholders.
+
+    Literal text that contains braces is kept out of the source and emitted from the
+    ``_literals`` global instead, so no template text can be read as Jinja syntax.
+    """
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.literals: List[str] = []
+
+    def text(self, value: str, html_breaks: bool = False):
+        if html_breaks:
+            value = _html_breaks(value)
+        if not value:
+            return
+        if _JINJA_CHARS_RE.search(value):
+            self.literals.append(value)
+            self.parts.append("{{ _literals[%d] }}" % (len(self.literals) - 1))
+        else:
+            self.parts.append(value)
+
+    def expression(self, expression: str):
+        self.parts.append("{{ " + expression + " }}")
+
+    def tokens(self, tokens: List[Tuple], html_breaks: bool):
+        pending = []
+        for token in tokens + [("end",)]:
+            if token[0] == "text":
+                pending.append(token[1])
+                continue
+            # Adjacent pieces of text (split around {{ and }} escapes) are emitted together
+            self.text("".join(pending), html_breaks)
+            pending = []
+            if token[0] == "field":
+                _, name, format_spec, conversion = token
+                expression = f"{name}|fmt({format_spec!r}, {conversion!r})"
+                self.expression(expression + "|br" if html_breaks else expression)
+
+    def build(self, env: Environment) -> "_CompiledPart":
+        return _CompiledPart(env.from_string("".join(self.parts)), tuple(self.literals))
+
+
+class _CompiledPart:
+    """A compiled subject or body that renders straight from its root render function.
+
+    The context is created as ``shared`` so Jinja2 does not merge its environment globals
+    (unused here) into every recipient's context, which dominates the cost of small renders.
+    """
+
+    def __init__(self, template, literals: Tuple[str, ...]):
+        self._template = template
+        self._literals = literals
+
+    def render(self, variables: Dict[str, Any]) -> str:
+        variables = dict(variables, _literals=self._literals)
+        template = self._template
+        return "".join(template.root_render_func(template.new_context(variables, shared=True)))
+
+
+def _is_html_document(body: str) -> bool:
+    stripped = body.strip()
+    return stripped.startswith("<!DOCTYPE html>") or stripped.startswith("<html>")
+
+
+class CompiledEmailTemplate:
+    """An ``EmailTemplate`` compiled once into Jinja2 templates for its subject and its
+    layout-wrapped body. Rendering produces exactly what formatting the template and
+    passing it through ``wrap_in_base_layout`` produced before.
+    """
+
+    def __init__(self, template_id: Optional[int], name: str, subject: str, body: str, strict: bool = True):
+        self.id = template_id
+        self.name = name
+        self.strict = strict
+        env = _ENVIRONMENTS[strict]
+        subject_source = _SourceBuilder()
+        subject_source.tokens(_tokens(subject, strict), html_breaks=False)
+        self._subject = subject_source.build(env)
+
+        body_source = _SourceBuilder()
+        if _is_html_document(body):
+            # Full documents are sent as they are
+            body_source.tokens(_tokens(body, strict), html_breaks=False)
+        else:
+            layout_head, layout_tail = BASE_HTML_LAYOUT.split(_BODY_MARKER)
+            title_head, title_tail = layout_head.split(_SUBJECT_MARKER)
+            body_source.text(title_head)
+            body_source.expression("_subject")
+            body_source.text(title_tail)
+            body_source.tokens(_tokens(body.strip(), strict), html_breaks=True)
+            body_source.text(layout_tail)
+        self._body = body_source.build(env)
+
+    def render(self, context: Dict[str, Any]) -> RenderedEmail:
+        subject = self._subject.render(context)
+        return RenderedEmail(subject, self._body.render(dict(context, _subject=subject)))
+
+    def render_many(self, contexts: Iterable[Dict[str, Any]],
+                    shared: Optional[Dict[str, Any]] = None) -> List[RenderedEmail]:
+        """Render one email per recipient context; ``shared`` values apply to all of them"""
+        shared = shared or {}
+        return [self.render({**shared, **context}) for context in contexts]
+
+
+class EmailTemplateEngine:
+    """Compiles email templates once and caches them by (template id, updated_at).
+
+    An edit through the ORM bumps ``updated_at``, so a changed template gets a new key
+    and is recompiled on its next use; stale entries age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self._compiled: "OrderedDict[Tuple, CompiledEmailTemplate]" = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, name: str, strict: bool = True) -> Optional[CompiledEmailTemplate]:
+        """Compiled active template with this name, or None. Only the row's id and
+        updated_at are read when the compiled template is already cached.
+        """
+        row = db.query(EmailTemplate.id, EmailTemplate.updated_at).filter(
+            EmailTemplate.name == name,
+            EmailTemplate.is_active == True
+        ).first()
+        if not row:
+            return None
+        key = (row.id, row.updated_at, strict)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self._compiled.move_to_end(key)
+                return compiled
+        source = db.query(EmailTemplate.subject, EmailTemplate.body).filter(EmailTemplate.id == row.id).first()
+        if not source:
+            return None
+        return self._store(key, CompiledEmailTemplate(row.id, name, source.subject, source.body, strict))
+
+    def compile(self, template, strict: bool = True) -> CompiledEmailTemplate:
+        """Compiled form of an already loaded ``EmailTemplate`` row"""
+        key = (template.id, template.updated_at, strict)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self._compiled.move_to_end(key)
+                return compiled
+        return self._store(key, CompiledEmailTemplate(template.id, template.name, template.subject, template.body, strict))
+
+    def _store(self, key: Tuple, compiled: CompiledEmailTemplate) -> CompiledEmailTemplate:
+        with self._lock:
+            self._compiled[key] = compiled
+            self._compiled.move_to_end(key)
+            while len(self._compiled) > self._max_entries:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._compiled.clear()
+
+
+# Global template engine instance
+email_template_engine = EmailTemplateEngine()
@@ -2,10 +2,16 @@ from database import EmailTemplate, User, UserCohort, Cohort, Enrollment, Module
 from cohort_specific_models import CohortSpecificCourse, CohortCourseModule, CohortCourseSession
 from datetime import datetime
 from notification_service import NotificationService
+from email_template_engine import email_template_engine
+from job_queue import enqueue, job_handler, JobContext
+from pydantic import BaseModel
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Recipients handled between progress checkpoints of a fan-out job
+CHECKPOINT_EVERY = 50
+
 async def send_course_added_notification(
     db: Session,
     cohort_id: int,
@@ -147,6 +153,15 @@ async def send_course_enrollment_confirmation(
     except Exception as e:
         logger.error(f"Failed to send course enrollment confirmation: {str(e)}")
 
+class ContentAddedPayload(BaseModel):
+    session_id: int
+    content_title: str
+    content_type: str
+    session_type: str = "global"
+    description: str = ""
+    added_date: str
+
+
 async def send_content_added_notification(
     db: Session,
     session_id: int,
@@ -156,7 +171,8 @@ async def send_content_added_notification(
     description: str = ""
 ):
     """
-    Send email notification to all students when new content (resource, assignment, quiz) is added.
+    Queue an email notification to all students when new content (resource, assignment, quiz) is added.
+    The emails are sent by the job queue workers, so the caller returns without waiting for them.
     
     Args:
         db: Database session
@@ -167,115 +183,124 @@ async def send_content_added_notification(
         description: Description of the content
     """
     try:
-            
-        # 1. Get the template
-        template = db.query(EmailTemplate).filter(
-            EmailTemplate.name == "New Resource Added Notification",
-            EmailTemplate.is_active == True
-        ).first()
-        
-        if not template:
-            logger.warning("Resource added template not found or disabled")
-            return
+        enqueue(db, "content_added_notification", {
+            "session_id": session_id,
+            "content_title": content_title,
+            "content_type": content_type,
+            "session_type": session_type,
+            "description": description or "",
+            "added_date": datetime.now().strftime("%B %d, %Y")
+        })
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to queue content added notifications: {str(e)}")
 
-        # 2. Get session, module, and course details
-        course_title = "Unknown Course"
-        module_title = "Unknown Module"
-        session_title = "Unknown Session"
-        target_students = []
-        course_id = None
 
-        if session_type == "cohort":
-            cohort_session = db.query(CohortCourseSession).filter(CohortCourseSession.id == session_id).first()
-            if cohort_session:
-                session_title = cohort_session.title
-                cohort_module = db.query(CohortCourseModule).filter(CohortCourseModule.id == cohort_session.module_id).first()
-                if cohort_module:
-                    module_title = cohort_module.title
-                    cohort_course = db.query(CohortSpecificCourse).filter(CohortSpecificCourse.id == cohort_module.course_id).first()
-                    if cohort_course:
-                        course_title = cohort_course.title
-                        # For cohort courses, notify all students in the cohort
-                        target_students = db.query(User).join(UserCohort).filter(
-                            UserCohort.cohort_id == cohort_course.cohort_id,
-                            User.user_type == "Student",
-                            User.role == "Student"
-                        ).all()
-                        logger.info(f"Cohort {cohort_course.cohort_id} has {len(target_students)} eligible students")
-        else:
-            regular_session = db.query(Session).filter(Session.id == session_id).first()
-            if regular_session:
-                session_title = regular_session.title
-                regular_module = db.query(Module).filter(Module.id == regular_session.module_id).first()
-                if regular_module:
-                    module_title = regular_module.title
-                    from database import Course
-                    regular_course = db.query(Course).filter(Course.id == regular_module.course_id).first()
-                    if regular_course:
-                        course_title = regular_course.title
-                        course_id = regular_course.id
-                        # For global courses, notify enrolled students
-                        target_students = db.query(User).join(Enrollment).filter(
-                            Enrollment.course_id == course_id,
-                            User.user_type == "Student",
-                            User.role == "Student"
-                        ).all()
-                        logger.info(f"Global Course {course_id} has {len(target_students)} eligible students")
-                        logger.info(f"Global course {course_id} has {len(target_students)} eligible students")
+@job_handler("content_added_notification", payload_model=ContentAddedPayload)
+def _send_content_added_emails(db: Session, payload: ContentAddedPayload, ctx: JobContext):
+    """Email every student of the content's course; students already emailed by an earlier attempt are skipped"""
+    session_id = payload.session_id
+    # 1. Get the template, compiled once per template version
+    template = email_template_engine.get(db, "New Resource Added Notification")
+    
+    if not template:
+        logger.warning("Resource added template not found or disabled")
+        return
 
-        if not target_students:
-            with open("notification_debug.log", "a") as f:
-                f.write(f"[{datetime.now()}] NO STUDENTS FOUND\n")
-            logger.info(f"No students found to notify for session {session_id}")
-            return
+    # 2. Get session, module, and course details
+    course_title = "Unknown Course"
+    module_title = "Unknown Module"
+    session_title = "Unknown Session"
+    target_students = []
+    course_id = None
+
+    if payload.session_type == "cohort":
+        cohort_session = db.query(CohortCourseSession).filter(CohortCourseSession.id == session_id).first()
+        if cohort_session:
+            session_title = cohort_session.title
+            cohort_module = db.query(CohortCourseModule).filter(CohortCourseModule.id == cohort_session.module_id).first()
+            if cohort_module:
+                module_title = cohort_module.title
+                cohort_course = db.query(CohortSpecificCourse).filter(CohortSpecificCourse.id == cohort_module.course_id).first()
+                if cohort_course:
+                    course_title = cohort_course.title
+                    # For cohort courses, notify all students in the cohort
+                    target_students = db.query(User).join(UserCohort).filter(
+                        UserCohort.cohort_id == cohort_course.cohort_id,
+                        User.user_type == "Student",
+                        User.role == "Student"
+                    ).all()
+                    logger.info(f"Cohort {cohort_course.cohort_id} has {len(target_students)} eligible students")
+    else:
+        regular_session = db.query(Session).filter(Session.id == session_id).first()
+        if regular_session:
+            session_title = regular_session.title
+            regular_module = db.query(Module).filter(Module.id == regular_session.module_id).first()
+            if regular_module:
+                module_title = regular_module.title
+                from database import Course
+                regular_course = db.query(Course).filter(Course.id == regular_module.course_id).first()
+                if regular_course:
+                    course_title = regular_course.title
+                    course_id = regular_course.id
+                    # For global courses, notify enrolled students
+                    target_students = db.query(User).join(Enrollment).filter(
+                        Enrollment.course_id == course_id,
+                        User.user_type == "Student",
+                        User.role == "Student"
+                    ).all()
+                    logger.info(f"Global course {course_id} has {len(target_students)} eligible students")
+
+    if not target_students:
+        logger.info(f"No students found to notify for session {session_id}")
+        return
+
+    # 3. Initialize notification service
+    notification_service = NotificationService(db)
+    
+    # 4. Send emails
+    target_students.sort(key=lambda student: student.id)
+    after_id = ctx.progress.get("after_id", 0)
+    handled = 0
+    success_count = 0
+    
+    for student in target_students:
+        if student.id <= after_id:
+            continue
+        try:
+            # Format placeholders
+            context = {
+                "username": student.username,
+                "resource_title": payload.content_title,
+                "course_title": course_title,
+                "module_title": module_title,
+                "session_title": session_title,
+                "resource_type": payload.content_type,
+                "resource_description": payload.description or "No description provided",
+                "added_date": payload.added_date
+            }
+            
+            # Renders the full HTML email, base layout included
+            subject, body_html = template.render(context)
+            
+            # Send email
+            notification_service.send_email_notification(
+                user_id=student.id,
+                email=student.email,
+                subject=subject,
+                body=body_html
+            )
+            success_count += 1
+            
+        except Exception as e:
+            logger.error(f"Failed to send resource notification to {student.email}: {str(e)}")
+        handled += 1
+        if handled % CHECKPOINT_EVERY == 0:
+            ctx.checkpoint(after_id=student.id)
+            
+    logger.info(f"Content notification sent to {success_count}/{len(target_students)} students")
 
-        # 3. Initialize notification service
-        notification_service = NotificationService(db)
-        
-        # 4. Send emails
-        added_date = datetime.now().strftime("%B %d, %Y")
-        success_count = 0
-        
-        for student in target_students:
-            try:
-                # Format placeholders
-                context = {
-                    "username": student.username,
-                    "resource_title": content_title,
-                    "course_title": course_title,
-                    "module_title": module_title,
-                    "session_title": session_title,
-                    "resource_type": content_type,
-                    "resource_description": description or "No description provided",
-                    "added_date": added_date
-                }
-                
-                subject = template.subject.format(**context)
-                body_text = template.body.format(**context)
-                
-                # Convert plain text to HTML format
-                body_html = body_text.replace('\n', '<br>').replace('\n\n', '<br><br>')
-                
-                # Send email
-                notification_service.send_email_notification(
-                    user_id=student.id,
-                    email=student.email,
-                    subject=subject,
-                    body=body_html
-                )
-                success_count += 1
-                logger.info(f"Successfully sent notification to {student.email}")
-                
-            except Exception as e:
-                logger.error(f"Failed to send resource notification to {student.email}: {str(e)}")
-                import traceback
-                logger.error(traceback.format_exc())
-                continue
-                
-        logger.info(f"Content notification sent to {success_count}/{len(target_students)} students")
-        
-    except Exception as e:
-        logger.error(f"Failed to send content added notifications: {str(e)}")
 
 async def send_feedback_submission_confirmation(
     db: Session,
@@ -355,6 +380,12 @@ async def send_feedback_submission_confirmation(
     except Exception as e:
         logger.error(f"Failed to send feedback submission confirmation: {str(e)}")
 
+class FeedbackRequestPayload(BaseModel):
+    feedback_title: str
+    session_id: int
+    session_type: str = "global"
+
+
 async def send_feedback_request_to_students(
     db: Session,
     feedback_title: str,
@@ -362,7 +393,8 @@ async def send_feedback_request_to_students(
     session_type: str = "global"
 ):
     """
-    Send email notification to all students when a new feedback form is created.
+    Queue an email notification to all students when a new feedback form is created.
+    The emails are sent by the job queue workers.
     
     Args:
         db: Database session
@@ -371,81 +403,96 @@ async def send_feedback_request_to_students(
         session_type: "global" or "cohort"
     """
     try:
-        # 1. Get the template
-        template = db.query(EmailTemplate).filter(
-            EmailTemplate.name == "Feedback Request Notification",
-            EmailTemplate.is_active == True
-        ).first()
-        
-        if not template:
-            logger.warning("Feedback request template not found or disabled")
-            return
+        enqueue(db, "feedback_request_notification", {
+            "feedback_title": feedback_title,
+            "session_id": session_id,
+            "session_type": session_type
+        })
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to queue feedback request notifications: {str(e)}")
 
-        # 2. Get session and target students
-        session_title = "Unknown Session"
-        target_students = []
 
-        if session_type == "cohort":
-            cohort_session = db.query(CohortCourseSession).filter(CohortCourseSession.id == session_id).first()
-            if cohort_session:
-                session_title = cohort_session.title
-                cohort_module = db.query(CohortCourseModule).filter(CohortCourseModule.id == cohort_session.module_id).first()
-                if cohort_module:
-                    cohort_course = db.query(CohortSpecificCourse).filter(CohortSpecificCourse.id == cohort_module.course_id).first()
-                    if cohort_course:
-                        # For cohort courses, notify all students in the cohort
-                        target_students = db.query(User).join(UserCohort).filter(
-                            UserCohort.cohort_id == cohort_course.cohort_id,
-                            User.user_type == "Student",
-                            User.role == "Student"
-                        ).all()
-        else:
-            regular_session = db.query(Session).filter(Session.id == session_id).first()
-            if regular_session:
-                session_title = regular_session.title
-                regular_module = db.query(Module).filter(Module.id == regular_session.module_id).first()
-                if regular_module:
-                    # For global courses, notify enrolled students
-                    target_students = db.query(User).join(Enrollment).filter(
-                        Enrollment.course_id == regular_module.course_id,
+@job_handler("feedback_request_notification", payload_model=FeedbackRequestPayload)
+def _send_feedback_request_emails(db: Session, payload: FeedbackRequestPayload, ctx: JobContext):
+    """Email every student of the feedback form's course; students already emailed are skipped"""
+    session_id = payload.session_id
+    # 1. Get the template
+    template = email_template_engine.get(db, "Feedback Request Notification")
+    
+    if not template:
+        logger.warning("Feedback request template not found or disabled")
+        return
+
+    # 2. Get session and target students
+    session_title = "Unknown Session"
+    target_students = []
+
+    if payload.session_type == "cohort":
+        cohort_session = db.query(CohortCourseSession).filter(CohortCourseSession.id == session_id).first()
+        if cohort_session:
+            session_title = cohort_session.title
+            cohort_module = db.query(CohortCourseModule).filter(CohortCourseModule.id == cohort_session.module_id).first()
+            if cohort_module:
+                cohort_course = db.query(CohortSpecificCourse).filter(CohortSpecificCourse.id == cohort_module.course_id).first()
+                if cohort_course:
+                    # For cohort courses, notify all students in the cohort
+                    target_students = db.query(User).join(UserCohort).filter(
+                        UserCohort.cohort_id == cohort_course.cohort_id,
                         User.user_type == "Student",
                         User.role == "Student"
                     ).all()
+    else:
+        regular_session = db.query(Session).filter(Session.id == session_id).first()
+        if regular_session:
+            session_title = regular_session.title
+            regular_module = db.query(Module).filter(Module.id == regular_session.module_id).first()
+            if regular_module:
+                # For global courses, notify enrolled students
+                target_students = db.query(User).join(Enrollment).filter(
+                    Enrollment.course_id == regular_module.course_id,
+                    User.user_type == "Student",
+                    User.role == "Student"
+                ).all()
 
-        if not target_students:
-            logger.info(f"No students found to notify for feedback on session {session_id}")
-            return
+    if not target_students:
+        logger.info(f"No students found to notify for feedback on session {session_id}")
+        return
 
-        # 3. Initialize notification service
-        notification_service = NotificationService(db)
-        
-        # 4. Send emails
-        success_count = 0
-        for student in target_students:
-            try:
-                context = {
-                    "username": student.username,
-                    "feedback_title": feedback_title,
-                    "session_title": session_title
-                }
-                
-                subject = template.subject.format(**context)
-                body_text = template.body.format(**context)
-                
-                # Send email
-                notification_service.send_email_notification(
-                    user_id=student.id,
-                    email=student.email,
-                    subject=subject,
-                    body=body_text
-                )
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to send feedback request to {student.email}: {str(e)}")
-                continue
-                
-        logger.info(f"Feedback request notification sent to {success_count}/{len(target_students)} students")
-        
-    except Exception as e:
-        logger.error(f"Failed to send feedback request notifications: {str(e)}")
\ No newline at end of file
+    # 3. Initialize notification service
+    notification_service = NotificationService(db)
+    
+    # 4. Send emails
+    target_students.sort(key=lambda student: student.id)
+    after_id = ctx.progress.get("after_id", 0)
+    handled = 0
+    success_count = 0
+    for student in target_students:
+        if student.id <= after_id:
+            continue
+        try:
+            context = {
+                "username": student.username,
+                "feedback_title": payload.feedback_title,
+                "session_title": session_title
+            }
+            
+            subject, body_html = template.render(context)
+            
+            # Send email
+            notification_service.send_email_notification(
+                user_id=student.id,
+                email=student.email,
+                subject=subject,
+                body=body_html
+            )
+            success_count += 1
+            
+        except Exception as e:
+            logger.error(f"Failed to send feedback request to {student.email}: {str(e)}")
+        handled += 1
+        if handled % CHECKPOINT_EVERY == 0:
+            ctx.checkpoint(after_id=student.id)
+            
+    logger.info(f"Feedback request notification sent to {success_count}/{len(target_students)} students")
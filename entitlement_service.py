@@ -0,0 +1,246 @@
+import logging
+import threading
+from typing import Optional, Dict, Any, Set
+from datetime import datetime, timedelta
+from sqlalchemy import event, or_, and_
+from sqlalchemy.orm import Session
+from database import (
+    SessionLocal, User, Course, Enrollment, CourseAssignment, UserCohort, CohortCourse,
+    Module, Session as SessionModel
+)
+from cohort_specific_models import (
+    CohortSpecificCourse, CohortSpecificEnrollment, CohortCourseModule, CohortCourseSession
+)
+
+logger = logging.getLogger(__name__)
+
+# Key under which the per-request memo lives in ``Session.info``
+_REQUEST_CACHE_KEY = "student_entitlements"
+# Key under which pending invalidations are collected until the transaction commits
+_PENDING_KEY = "entitlement_invalidations"
+
+# Models whose writes can change what a student is entitled to see
+_MEMBERSHIP_MODELS = (Enrollment, CohortSpecificEnrollment, UserCohort)
+_COHORT_MODELS = (CohortCourse, CohortSpecificCourse)
+_GLOBAL_MODELS = (CourseAssignment, Course, Module, SessionModel, CohortCourseModule, CohortCourseSession)
+
+
+class EntitlementResolver:
+    """Resolves which regular and cohort-specific courses/sessions a student can see.
+
+    Results are memoized per request (on the SQLAlchemy session) and cached per user
+    across requests until an enrollment, cohort or assignment change invalidates them.
+    """
+
+    def __init__(self):
+        self._cache: Dict[int, Dict[str, Any]] = {}
+        self._cache_timestamps: Dict[int, datetime] = {}
+        self._cache_duration = timedelta(minutes=10)  # Safety net for writes made outside the ORM
+        self._lock = threading.Lock()
+
+    def resolve(self, db: Session, user_id: int) -> Dict[str, Any]:
+        """Get the entitlement sets for a student, loading them at most once per request"""
+        request_cache = db.info.setdefault(_REQUEST_CACHE_KEY, {})
+        if user_id in request_cache:
+            return request_cache[user_id]
+
+        entitlements = self._get_cached(user_id)
+        if entitlements is None:
+            entitlements = self._load(db, user_id)
+            with self._lock:
+                self._cache[user_id] = entitlements
+                self._cache_timestamps[user_id] = datetime.utcnow()
+
+        request_cache[user_id] = entitlements
+        return entitlements
+
+    def _get_cached(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            cached = self._cache.get(user_id)
+            timestamp = self._cache_timestamps.get(user_id)
+            if cached is not None and timestamp is not None and datetime.utcnow() - timestamp < self._cache_duration:
+                return cached
+            return None
+
+    def _load(self, db: Session, user_id: int) -> Dict[str, Any]:
+        """Derive all entitlement sets for a student with a fixed number of queries"""
+        user = db.query(User.cohort_id, User.college).filter(User.id == user_id).first()
+        primary_cohort_id = user.cohort_id if user else None
+        college = user.college if user else None
+
+        cohort_ids = {row.cohort_id for row in db.query(UserCohort.cohort_id).filter(
+            UserCohort.user_id == user_id,
+            UserCohort.is_active == True
+        ).all()}
+        if primary_cohort_id:
+            cohort_ids.add(primary_cohort_id)
+
+        enrolled_regular_course_ids = {row.course_id for row in db.query(Enrollment.course_id).filter(
+            Enrollment.student_id == user_id
+        ).all()}
+
+        enrolled_cohort_specific_course_ids = {row.course_id for row in db.query(CohortSpecificEnrollment.course_id).filter(
+            CohortSpecificEnrollment.student_id == user_id
+        ).all()}
+
+        # Regular courses assigned through the legacy CohortCourse table and the unified CourseAssignment table
+        assigned_regular_course_ids: Set[int] = set()
+        cohort_course_ids: Set[int] = set()
+        if cohort_ids:
+            cohort_course_ids = {row.course_id for row in db.query(CohortCourse.course_id).join(
+                Course, Course.id == CohortCourse.course_id
+            ).filter(
+                CohortCourse.cohort_id.in_(cohort_ids),
+                Course.approval_status == 'approved'
+            ).all()}
+            assigned_regular_course_ids.update(cohort_course_ids)
+
+        ca_filters = [
+            CourseAssignment.assignment_type == 'all',
+            and_(CourseAssignment.assignment_type == 'individual', CourseAssignment.user_id == user_id)
+        ]
+        if cohort_ids:
+            ca_filters.append(and_(CourseAssignment.assignment_type == 'cohort', CourseAssignment.cohort_id.in_(cohort_ids)))
+        if college:
+            ca_filters.append(and_(CourseAssignment.assignment_type == 'college', CourseAssignment.college == college))
+
+        course_assignment_course_ids = {row.course_id for row in db.query(CourseAssignment.course_id).join(
+            Course, Course.id == CourseAssignment.course_id
+        ).filter(
+            Course.approval_status == 'approved',
+            or_(*ca_filters)
+        ).all()}
+        assigned_regular_course_ids.update(course_assignment_course_ids)
+
+        cohort_specific_course_ids: Set[int] = set()
+        if cohort_ids:
+            cohort_specific_course_ids = {row.id for row in db.query(CohortSpecificCourse.id).filter(
+                CohortSpecificCourse.cohort_id.in_(cohort_ids),
+                CohortSpecificCourse.is_active == True
+            ).all()}
+
+        accessible_regular_course_ids = enrolled_regular_course_ids | assigned_regular_course_ids
+        accessible_cohort_course_ids = cohort_specific_course_ids | enrolled_cohort_specific_course_ids
+
+        regular_session_ids: Set[int] = set()
+        if accessible_regular_course_ids:
+            regular_session_ids = {row.id for row in db.query(SessionModel.id).join(
+                Module, Module.id == SessionModel.module_id
+            ).filter(Module.course_id.in_(accessible_regular_course_ids)).all()}
+
+        cohort_session_ids: Set[int] = set()
+        if accessible_cohort_course_ids:
+            cohort_session_ids = {row.id for row in db.query(CohortCourseSession.id).join(
+                CohortCourseModule, CohortCourseModule.id == CohortCourseSession.module_id
+            ).filter(CohortCourseModule.course_id.in_(accessible_cohort_course_ids)).all()}
+
+        return {
+            "user_id": user_id,
+            "primary_cohort_id": primary_cohort_id,
+            "college": college,
+            "cohort_ids": frozenset(cohort_ids),
+            "enrolled_regular_course_ids": frozenset(enrolled_regular_course_ids),
+            "cohort_course_ids": frozenset(cohort_course_ids),
+            "course_assignment_course_ids": frozenset(course_assignment_course_ids),
+            "assigned_regular_course_ids": frozenset(assigned_regular_course_ids),
+            "accessible_regular_course_ids": frozenset(accessible_regular_course_ids),
+            "cohort_specific_course_ids": frozenset(cohort_specific_course_ids),
+            "enrolled_cohort_specific_course_ids": frozenset(enrolled_cohort_specific_course_ids),
+            "accessible_cohort_course_ids": frozenset(accessible_cohort_course_ids),
+            "regular_session_ids": frozenset(regular_session_ids),
+            "cohort_session_ids": frozenset(cohort_session_ids),
+        }
+
+    def invalidate_user(self, user_id: int):
+        """Drop the cached entitlements of a single student"""
+        with self._lock:
+            self._cache.pop(user_id, None)
+            self._cache_timestamps.pop(user_id, None)
+
+    def invalidate_cohort(self, cohort_id: int):
+        """Drop the cached entitlements of every student in a cohort"""
+        with self._lock:
+            stale = [uid for uid, ent in self._cache.items() if cohort_id in ent["cohort_ids"]]
+            for uid in stale:
+                self._cache.pop(uid, None)
+                self._cache_timestamps.pop(uid, None)
+
+    def invalidate_all(self):
+        """Drop every cached entitlement, e.g. after an 'all'/'college' assignment change"""
+        with self._lock:
+            self._cache.clear()
+            self._cache_timestamps.clear()
+        logger.info("Student entitlement cache invalidated")
+
+
+# Global resolver instance
+entitlement_resolver = EntitlementResolver()
+
+
+def get_student_entitlements(db: Session, user_id: int) -> Dict[str, Any]:
+    """Shortcut for ``entitlement_resolver.resolve``"""
+    return entitlement_resolver.resolve(db, user_id)
+
+
+def _pending(session: Session) -> Dict[str, Any]:
+    return session.info.setdefault(_PENDING_KEY, {"users": set(), "cohorts": set(), "all": False})
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_entitlement_changes(session, flush_context):
+    """Record which students are affected by the rows written in this flush"""
+    pending = None
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, _MEMBERSHIP_MODELS):
+            pending = pending or _pending(session)
+            pending["users"].add(getattr(instance, "user_id", None) or getattr(instance, "student_id", None))
+        elif isinstance(instance, _COHORT_MODELS):
+            pending = pending or _pending(session)
+            pending["cohorts"].add(instance.cohort_id)
+        elif isinstance(instance, _GLOBAL_MODELS):
+            pending = pending or _pending(session)
+            pending["all"] = True
+        elif isinstance(instance, User) and instance not in session.new:
+            pending = pending or _pending(session)
+            pending["users"].add(instance.id)
+
+    if pending is not None:
+        # Later reads in the same request must see the new state
+        session.info.pop(_REQUEST_CACHE_KEY, None)
+
+
+@event.listens_for(SessionLocal, "after_bulk_update")
+def _collect_bulk_update(update_context):
+    if issubclass(update_context.mapper.class_, _MEMBERSHIP_MODELS + _COHORT_MODELS + _GLOBAL_MODELS + (User,)):
+        _pending(update_context.session)["all"] = True
+        update_context.session.info.pop(_REQUEST_CACHE_KEY, None)
+
+
+@event.listens_for(SessionLocal, "after_bulk_delete")
+def _collect_bulk_delete(delete_context):
+    if issubclass(delete_context.mapper.class_, _MEMBERSHIP_MODELS + _COHORT_MODELS + _GLOBAL_MODELS + (User,)):
+        _pending(delete_context.session)["all"] = True
+        delete_context.session.info.pop(_REQUEST_CACHE_KEY, None)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_entitlement_invalidations(session):
+    """Invalidate cross-request entries only once the change is visible to other sessions"""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if pending["all"]:
+        entitlement_resolver.invalidate_all()
+        return
+    for user_id in pending["users"]:
+        if user_id:
+            entitlement_resolver.invalidate_user(user_id)
+    for cohort_id in pending["cohorts"]:
+        if cohort_id:
+            entitlement_resolver.invalidate_cohort(cohort_id)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_entitlement_invalidations(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_REQUEST_CACHE_KEY, None)
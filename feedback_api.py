@@ -62,7 +62,6 @@ def is_staff(user_info) -> bool:
 @router.post("/forms", status_code=status.HTTP_201_CREATED)
 async def create_feedback_form(
     form_data: FeedbackFormCreate,
-    background_tasks: BackgroundTasks,
     current_user = Depends(get_current_user_any_role),
     db: Session = Depends(get_db)
 ):
@@ -104,8 +103,7 @@ async def create_feedback_form(
         logger.info(f"Feedback form created: {new_form.id} by user {user_id}")
         
         # Trigger feedback request notification to all eligible students
-        background_tasks.add_task(
-            send_feedback_request_to_students,
+        await send_feedback_request_to_students(
             db=db,
             feedback_title=new_form.title,
             session_id=new_form.session_id,
@@ -169,7 +167,6 @@ async def get_feedback_form(
 async def update_feedback_form(
     form_id: int,
     form_data: FeedbackFormUpdate,
-    background_tasks: BackgroundTasks,
     current_user = Depends(get_current_user_any_role),
     db: Session = Depends(get_db)
 ):
@@ -217,8 +214,7 @@ async def update_feedback_form(
         logger.info(f"Feedback form {form_id} updated by user {current_user.get('id') if isinstance(current_user, dict) else current_user.id}")
         
         # Trigger feedback request notification to all eligible students
-        background_tasks.add_task(
-            send_feedback_request_to_students,
+        await send_feedback_request_to_students(
             db=db,
             feedback_title=form.title,
             session_id=form.session_id,
@@ -420,63 +416,16 @@ async def get_student_available_feedback_forms(
     try:
         logger.info(f"Fetching feedback forms for student ID: {current_user.id}")
         
-        # 1. Get all cohorts the student is in
-        from database import UserCohort, CohortCourse
-        user_cohorts = db.query(UserCohort).filter(
-            UserCohort.user_id == current_user.id,
-            UserCohort.is_active == True
-        ).all()
-        cohort_ids = [uc.cohort_id for uc in user_cohorts]
-        # Also include cohort_id from User table if not in UserCohort
-        if current_user.cohort_id and current_user.cohort_id not in cohort_ids:
-            cohort_ids.append(current_user.cohort_id)
-        
-        logger.info(f"Student is in cohorts: {cohort_ids}")
-        
-        # 2. Collect all regular course IDs (Direct enrollment + Cohort assigned)
-        enrollments = db.query(Enrollment).filter(Enrollment.student_id == current_user.id).all()
-        course_ids = [e.course_id for e in enrollments]
-        
-        if cohort_ids:
-            # Regular courses assigned to cohorts (Legacy)
-            cc_assignments = db.query(CohortCourse).filter(CohortCourse.cohort_id.in_(cohort_ids)).all()
-            for cc in cc_assignments:
-                if cc.course_id not in course_ids:
-                    course_ids.append(cc.course_id)
-            
-            # Regular courses assigned to cohorts (Unified)
-            try:
-                from database import CourseAssignment
-                unified_assignments = db.query(CourseAssignment).filter(
-                    CourseAssignment.cohort_id.in_(cohort_ids),
-                    CourseAssignment.assignment_type == 'cohort'
-                ).all()
-                for ua in unified_assignments:
-                    if ua.course_id not in course_ids:
-                        course_ids.append(ua.course_id)
-            except ImportError:
-                pass
-                
-        logger.info(f"Total regular course IDs for student: {course_ids}")
+        # 1-3. Cohorts, regular course IDs (direct + cohort/unified assignments) and
+        # cohort-specific course IDs come from the shared entitlement resolver
+        from entitlement_service import get_student_entitlements
+        entitlements = get_student_entitlements(db, current_user.id)
+        logger.info(f"Student is in cohorts: {sorted(entitlements['cohort_ids'])}")
         
-        # 3. Collect all cohort-specific course IDs
-        cohort_specific_course_ids = []
-        # Direct enrollments
-        cs_enrollments = db.query(CohortSpecificEnrollment).filter(
-            CohortSpecificEnrollment.student_id == current_user.id
-        ).all()
-        cohort_specific_course_ids = [e.course_id for e in cs_enrollments]
+        course_ids = list(entitlements["accessible_regular_course_ids"])
+        logger.info(f"Total regular course IDs for student: {course_ids}")
         
-        # All courses in student's cohorts
-        if cohort_ids:
-            cs_courses = db.query(CohortSpecificCourse).filter(
-                CohortSpecificCourse.cohort_id.in_(cohort_ids),
-                CohortSpecificCourse.is_active == True
-            ).all()
-            for c in cs_courses:
-                if c.id not in cohort_specific_course_ids:
-                    cohort_specific_course_ids.append(c.id)
-                    
+        cohort_specific_course_ids = list(entitlements["accessible_cohort_course_ids"])
         logger.info(f"Total cohort-specific course IDs for student: {cohort_specific_course_ids}")
         
         available_forms = []
@@ -3,8 +3,7 @@ from sqlalchemy.orm import Session
 from database import get_db, Resource, Session as SessionModel
 from auth import get_current_admin_or_presenter
 from email_utils import send_content_added_notification
-import requests
-import aiohttp
+from lazy_imports import lazy_module
 import aiofiles
 import uuid
 import os
@@ -15,6 +14,9 @@ import mimetypes
 
 logger = logging.getLogger(__name__)
 
+# Only link downloads need aiohttp
+aiohttp = lazy_module("aiohttp")
+
 router = APIRouter(prefix="/admin/resources", tags=["File Link Resources"])
 
 # Upload directory setup
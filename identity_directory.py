@@ -0,0 +1,202 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple, Iterable, NamedTuple
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import SessionLocal, User, Admin, Presenter, Mentor, Manager
+
+logger = logging.getLogger(__name__)
+
+# Key under which pending invalidations are collected until the transaction commits
+_PENDING_KEY = "identity_directory_invalidations"
+
+# Role names used in tokens, chat participants and messages, mapped to their table
+ROLE_MODELS = {
+    "Admin": Admin,
+    "Presenter": Presenter,
+    "Mentor": Mentor,
+    "Manager": Manager,
+    "Student": User,
+}
+
+_TABLE_ROLES = {model.__tablename__: role for role, model in ROLE_MODELS.items()}
+
+# Order used when only an id is known (same precedence as the approval workflow)
+REQUESTER_PROBE_ORDER = ("Student", "Admin", "Presenter", "Mentor", "Manager")
+# Order used when a connected account's role has to be detected from its id
+STAFF_FIRST_PROBE_ORDER = ("Admin", "Presenter", "Mentor", "Manager", "Student")
+
+
+class Identity(NamedTuple):
+    """Display identity of an account in one of the role tables"""
+    id: int
+    role: str
+    username: str
+    email: str
+    full_name: Optional[str] = None
+    user_role: Optional[str] = None  # users.role for students (Student/Faculty/...)
+
+
+class IdentityDirectory:
+    """LRU cache of (user_id, role) -> Identity shared by every endpoint that shows user names.
+
+    Lookups are batched: resolving any number of pairs costs at most one IN query per
+    role table for the entries that are not cached. Entries are dropped when a profile
+    write is committed, with a TTL as safety net for writes made outside the ORM.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[Optional[Identity], datetime]]" = OrderedDict()
+        self._versions: Dict[str, int] = {role: 0 for role in ROLE_MODELS}
+        self._max_entries = max_entries
+        self._cache_duration = timedelta(minutes=10)
+        self._lock = threading.Lock()
+
+    def resolve_many(self, db: Session, pairs: Iterable[Tuple[int, str]]) -> Dict[Tuple[int, str], Identity]:
+        """Resolve (user_id, role) pairs; pairs that do not exist are left out of the result"""
+        result: Dict[Tuple[int, str], Identity] = {}
+        missing: Dict[str, set] = {}
+        now = datetime.utcnow()
+        with self._lock:
+            versions = dict(self._versions)
+            for user_id, role in set(pairs):
+                if user_id is None or role not in ROLE_MODELS:
+                    continue
+                key = (user_id, role)
+                cached = self._entries.get(key)
+                if cached is not None and now - cached[1] < self._cache_duration:
+                    self._entries.move_to_end(key)
+                    if cached[0] is not None:
+                        result[key] = cached[0]
+                    continue
+                missing.setdefault(role, set()).add(user_id)
+
+        for role, ids in missing.items():
+            loaded = self._load(db, role, ids)
+            result.update(loaded)
+            with self._lock:
+                # Discard the result if the table was written while it was loading
+                if self._versions[role] != versions[role]:
+                    continue
+                stamp = datetime.utcnow()
+                for user_id in ids:
+                    # Misses are cached too so unknown ids do not hit the database every time
+                    self._store((user_id, role), loaded.get((user_id, role)), stamp)
+        return result
+
+    def resolve(self, db: Session, user_id: int, role: str) -> Optional[Identity]:
+        """Resolve a single (user_id, role) pair"""
+        return self.resolve_many(db, [(user_id, role)]).get((user_id, role))
+
+    def find_roles(self, db: Session, user_ids: Iterable[int],
+                   order: Tuple[str, ...] = REQUESTER_PROBE_ORDER) -> Dict[int, Identity]:
+        """Resolve ids whose role is unknown, taking the first role in `order` that has the id.
+
+        Each role table is queried at most once, and only for ids not found in an earlier one.
+        """
+        remaining = {user_id for user_id in user_ids if user_id is not None}
+        found: Dict[int, Identity] = {}
+        for role in order:
+            if not remaining:
+                break
+            resolved = self.resolve_many(db, [(user_id, role) for user_id in remaining])
+            for (user_id, _), identity in resolved.items():
+                found[user_id] = identity
+            remaining -= {user_id for user_id, _ in resolved}
+        return found
+
+    def _load(self, db: Session, role: str, ids: set) -> Dict[Tuple[int, str], Identity]:
+        model = ROLE_MODELS[role]
+        columns = [model.id, model.username, model.email]
+        columns.append(model.full_name if hasattr(model, "full_name") else None)
+        columns.append(model.role if role == "Student" else None)
+        loaded: Dict[Tuple[int, str], Identity] = {}
+        ids = list(ids)
+        for start in range(0, len(ids), 1000):
+            rows = db.query(*[c for c in columns if c is not None]).filter(
+                model.id.in_(ids[start:start + 1000])
+            ).all()
+            for row in rows:
+                loaded[(row.id, role)] = Identity(
+                    id=row.id,
+                    role=role,
+                    username=row.username,
+                    email=row.email,
+                    full_name=getattr(row, "full_name", None),
+                    user_role=getattr(row, "role", None),
+                )
+        return loaded
+
+    def _store(self, key: Tuple[int, str], identity: Optional[Identity], stamp: datetime):
+        # Caller must hold the lock
+        self._entries[key] = (identity, stamp)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int, role: str):
+        """Drop one cached identity"""
+        with self._lock:
+            self._versions[role] = self._versions.get(role, 0) + 1
+            self._entries.pop((user_id, role), None)
+
+    def invalidate_role(self, role: str):
+        """Drop every cached identity of one role"""
+        with self._lock:
+            self._versions[role] = self._versions.get(role, 0) + 1
+            for key in [key for key in self._entries if key[1] == role]:
+                del self._entries[key]
+
+    def invalidate_all(self):
+        with self._lock:
+            for role in self._versions:
+                self._versions[role] += 1
+            self._entries.clear()
+        logger.info("Identity directory invalidated")
+
+
+# Global directory instance
+identity_directory = IdentityDirectory()
+
+
+def _pending(session: Session) -> set:
+    return session.info.setdefault(_PENDING_KEY, set())
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_identity_changes(session, flush_context):
+    """Record which accounts were written in this flush"""
+    # New accounts are included so a cached miss for their id is dropped
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        role = _TABLE_ROLES.get(getattr(instance, "__tablename__", None))
+        if role and instance.id is not None:
+            _pending(session).add((instance.id, role))
+
+
+def _collect_bulk_change(context):
+    role = _TABLE_ROLES.get(context.mapper.local_table.name)
+    if role:
+        _pending(context.session).add((None, role))
+
+
+event.listen(SessionLocal, "after_bulk_update", _collect_bulk_change)
+event.listen(SessionLocal, "after_bulk_delete", _collect_bulk_change)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_identity_invalidations(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for user_id, role in pending:
+        if user_id is None:
+            identity_directory.invalidate_role(role)
+        else:
+            identity_directory.invalidate(user_id, role)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_identity_invalidations(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,447 @@
+import os
+import random
+import socket
+import asyncio
+import inspect
+import logging
+import importlib
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Callable, List, NamedTuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy import event, func, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+# A running job whose worker has not finished or checkpointed it within this time is assumed lost
+JOB_LOCK_TIMEOUT_SECONDS = int(os.getenv("JOB_LOCK_TIMEOUT_SECONDS", "900"))
+JOB_RETRY_BASE_SECONDS = int(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+JOB_RETRY_MAX_SECONDS = 3600
+
+STATUSES = ("queued", "running", "completed", "failed")
+
+# Modules that register handlers; imported when the workers start
+HANDLER_MODULES = ("email_utils", "campaign_scheduler", "email_campaigns", "quiz_grading", "attendance_import")
+
+# Session flag set by enqueue() so the workers are woken once the job is committed
+_WAKE_KEY = "job_queue_wake"
+
+_jobs = BackgroundJob.__table__
+
+
+class JobType(NamedTuple):
+    name: str
+    handler: Callable
+    payload_model: Optional[Type[BaseModel]]
+    max_attempts: int
+    on_failure: Optional[Callable]
+
+
+_REGISTRY: Dict[str, JobType] = {}
+
+
+def job_handler(name: str, payload_model: Optional[Type[BaseModel]] = None, max_attempts: int = 5,
+                on_failure: Optional[Callable] = None):
+    """Register a function as the handler of a job type.
+
+    Handlers are called as ``handler(db, payload, ctx)`` with a fresh session, the payload
+    parsed into ``payload_model`` (a plain dict without one) and a ``JobContext``. The
+    session is committed when the handler returns; raising retries the job with backoff.
+    ``on_failure(db, payload, error)`` runs once the job has used up its attempts.
+    """
+    def register(handler: Callable) -> Callable:
+        _REGISTRY[name] = JobType(name, handler, payload_model, max_attempts, on_failure)
+        return handler
+    return register
+
+
+class JobLockLost(Exception):
+    """The job was recovered as stale and may be running elsewhere; its worker must stop"""
+
+
+class JobContext:
+    """Handed to a handler to report progress that survives a retry"""
+
+    def __init__(self, db: Session, job_id: int, attempt: int, progress: Optional[Dict[str, Any]],
+                 locked_by: Optional[str] = None):
+        self.db = db
+        self.job_id = job_id
+        self.attempt = attempt
+        self.locked_by = locked_by
+        self.progress: Dict[str, Any] = dict(progress or {})
+
+    def checkpoint(self, **values):
+        """Store progress values and commit the handler's work done so far with them.
+
+        Also renews the job's lock, so long handlers must checkpoint more often than
+        JOB_LOCK_TIMEOUT_SECONDS. Raises JobLockLost (and rolls back the uncommitted work)
+        if the job no longer belongs to this worker.
+        """
+        self.progress.update(values)
+        now = datetime.utcnow()
+        updated = self.db.execute(
+            _jobs.update().where(
+                _jobs.c.id == self.job_id, _jobs.c.status == "running", _jobs.c.locked_by == self.locked_by
+            ).values(progress=dict(self.progress), locked_at=now, updated_at=now)
+        )
+        if updated.rowcount != 1:
+            self.db.rollback()
+            raise JobLockLost(f"Job {self.job_id} is no longer locked by {self.locked_by}")
+        self.db.commit()
+
+
+def _parse_payload(job_type: JobType, payload: Dict[str, Any]):
+    if job_type.payload_model is None:
+        return dict(payload)
+    return job_type.payload_model.parse_obj(payload)
+
+
+def job_id_for_key(db: Session, idempotency_key: str) -> Optional[int]:
+    """Id of the job enqueued under an idempotency key, if any"""
+    row = db.query(BackgroundJob.id).filter(BackgroundJob.idempotency_key == idempotency_key).first()
+    return row.id if row else None
+
+
+def enqueue(db: Session, job_type: str, payload: Dict[str, Any], idempotency_key: Optional[str] = None,
+            delay_seconds: int = 0, max_attempts: Optional[int] = None) -> int:
+    """Add a job in the caller's transaction and return its id.
+
+    The job runs once the caller commits. With an ``idempotency_key`` a job that was
+    already enqueued under that key is returned instead of adding another one.
+    """
+    registered = _REGISTRY.get(job_type)
+    if registered is None:
+        raise ValueError(f"Unknown job type: {job_type}")
+    if registered.payload_model is not None:
+        payload = registered.payload_model.parse_obj(payload).dict()
+
+    if idempotency_key:
+        existing_id = job_id_for_key(db, idempotency_key)
+        if existing_id is not None:
+            return existing_id
+
+    job = BackgroundJob(
+        job_type=job_type,
+        payload=payload,
+        status="queued",
+        idempotency_key=idempotency_key,
+        attempts=0,
+        max_attempts=max_attempts or registered.max_attempts,
+        run_after=datetime.utcnow() + timedelta(seconds=delay_seconds),
+    )
+    try:
+        with db.begin_nested():
+            db.add(job)
+    except IntegrityError:
+        # Another request enqueued the same key between the check and the insert
+        existing_id = job_id_for_key(db, idempotency_key)
+        if existing_id is None:
+            raise
+        return existing_id
+    db.info[_WAKE_KEY] = True
+    return job.id
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_workers(session):
+    if session.info.pop(_WAKE_KEY, False):
+        job_queue.wake()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_wake(session):
+    session.info.pop(_WAKE_KEY, None)
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for a job that has failed ``attempts`` times"""
+    delay = min(JOB_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class JobQueue:
+    """Pool of worker threads processing the ``background_jobs`` table.
+
+    Jobs are claimed with a conditional UPDATE on their status, so several workers and
+    several API processes can share the table without a broker or row locks.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._threads: List[threading.Thread] = []
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._last_recovery = None
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self, workers: Optional[int] = None):
+        """Load the handler modules and start the worker threads"""
+        workers = JOB_WORKERS if workers is None else workers
+        with self._lock:
+            if self.running or workers <= 0:
+                return
+            for module in HANDLER_MODULES:
+                importlib.import_module(module)
+            self._stopping.clear()
+            self.recover_stale_jobs()
+            self._threads = [
+                threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+                for number in range(workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        logger.info(f"Job queue started with {workers} workers ({', '.join(sorted(_REGISTRY))})")
+
+    def stop(self, timeout: float = 10):
+        """Stop taking new jobs and wait for the running ones to finish"""
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        logger.info("Job queue stopped")
+
+    def wake(self):
+        self._wake.set()
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                self._maybe_recover()
+                job = self._claim()
+            except Exception as e:
+                logger.error(f"Job queue poll failed: {str(e)}")
+                job = None
+            if job is None:
+                self._wake.wait(JOB_POLL_SECONDS)
+                self._wake.clear()
+                continue
+            self.run_job(job)
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Take the next due job, or None when there is nothing to do"""
+        # Per thread, so a job recovered from one worker thread and claimed by another is told apart
+        owner = f"{self.worker_id}:{threading.current_thread().name}"
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            candidates = db.query(BackgroundJob.id).filter(
+                BackgroundJob.status == "queued",
+                BackgroundJob.run_after <= now
+            ).order_by(BackgroundJob.run_after, BackgroundJob.id).limit(10).all()
+            for candidate in candidates:
+                claimed = db.execute(
+                    _jobs.update().where(
+                        _jobs.c.id == candidate.id, _jobs.c.status == "queued"
+                    ).values(
+                        status="running",
+                        attempts=_jobs.c.attempts + 1,
+                        locked_by=owner,
+                        locked_at=now,
+                        updated_at=now,
+                    )
+                )
+                db.commit()
+                if claimed.rowcount == 1:
+                    row = db.execute(_jobs.select().where(_jobs.c.id == candidate.id)).first()
+                    return dict(row._mapping)
+            return None
+        finally:
+            db.close()
+
+    def run_job(self, job: Dict[str, Any]):
+        """Run a claimed job and record its outcome"""
+        job_type = _REGISTRY.get(job["job_type"])
+        error = None
+        db = SessionLocal()
+        try:
+            if job_type is None:
+                raise LookupError(f"No handler registered for job type {job['job_type']}")
+            context = JobContext(db, job["id"], job["attempts"], job["progress"], job["locked_by"])
+            result = job_type.handler(db, _parse_payload(job_type, job["payload"]), context)
+            if inspect.iscoroutine(result):
+                asyncio.run(result)
+            db.commit()
+        except JobLockLost as e:
+            db.rollback()
+            logger.warning(f"Job {job['id']} ({job['job_type']}) stopped: {str(e)}")
+            return
+        except Exception as e:
+            db.rollback()
+            error = e
+        finally:
+            db.close()
+        if error is not None:
+            self._record_failure(job, job_type, error)
+            return
+        if self._finish(job, status="completed", last_error=None):
+            logger.info(f"Job {job['id']} ({job['job_type']}) completed on attempt {job['attempts']}")
+
+    def _record_failure(self, job: Dict[str, Any], job_type: Optional[JobType], error: Exception):
+        error_text = f"{type(error).__name__}: {str(error)}"
+        if job_type is not None and job["attempts"] < job["max_attempts"]:
+            run_after = datetime.utcnow() + timedelta(seconds=retry_delay(job["attempts"]))
+            if self._finish(job, status="queued", last_error=error_text, run_after=run_after):
+                logger.warning(f"Job {job['id']} ({job['job_type']}) failed on attempt {job['attempts']}, "
+                               f"retrying after {run_after}: {error_text}")
+            return
+        if not self._finish(job, status="failed", last_error=error_text):
+            return
+        logger.error(f"Job {job['id']} ({job['job_type']}) failed permanently: {error_text}")
+        if job_type is not None and job_type.on_failure is not None:
+            self._call_on_failure(job, job_type, error)
+
+    def _call_on_failure(self, job: Dict[str, Any], job_type: JobType, error: Exception):
+        db = SessionLocal()
+        try:
+            job_type.on_failure(db, _parse_payload(job_type, job["payload"]), error)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failure handler of job {job['id']} raised: {str(e)}")
+        finally:
+            db.close()
+
+    def _finish(self, job: Dict[str, Any], status: str, last_error: Optional[str],
+                run_after: Optional[datetime] = None) -> bool:
+        """Record a job's outcome; False if it was recovered as stale meanwhile and left as is"""
+        now = datetime.utcnow()
+        values = {
+            "status": status,
+            "last_error": last_error,
+            "locked_by": None,
+            "locked_at": None,
+            "updated_at": now,
+        }
+        if status in ("completed", "failed"):
+            values["finished_at"] = now
+        if run_after is not None:
+            values["run_after"] = run_after
+        db = SessionLocal()
+        try:
+            updated = db.execute(_jobs.update().where(
+                _jobs.c.id == job["id"], _jobs.c.status == "running", _jobs.c.locked_by == job["locked_by"]
+            ).values(**values))
+            db.commit()
+        finally:
+            db.close()
+        if updated.rowcount != 1:
+            logger.warning(f"Job {job['id']} ({job['job_type']}) lost its lock before finishing; "
+                           f"outcome {status} not recorded")
+            return False
+        return True
+
+    def _maybe_recover(self):
+        now = datetime.utcnow()
+        with self._lock:
+            if self._last_recovery and (now - self._last_recovery).total_seconds() < JOB_LOCK_TIMEOUT_SECONDS / 2:
+                return
+            self._last_recovery = now
+        self.recover_stale_jobs()
+
+    def recover_stale_jobs(self) -> int:
+        """Requeue running jobs whose worker died (e.g. a restart mid-job).
+
+        Jobs that have no attempts left are marked failed instead.
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            stale = and_(
+                _jobs.c.status == "running",
+                or_(_jobs.c.locked_at.is_(None),
+                    _jobs.c.locked_at < now - timedelta(seconds=JOB_LOCK_TIMEOUT_SECONDS))
+            )
+            lost = "Worker stopped before the job finished"
+            failed = db.execute(_jobs.update().where(stale, _jobs.c.attempts >= _jobs.c.max_attempts).values(
+                status="failed", last_error=lost, locked_by=None, locked_at=None, updated_at=now, finished_at=now
+            )).rowcount
+            requeued = db.execute(_jobs.update().where(stale).values(
+                status="queued", last_error=lost, locked_by=None, locked_at=None, updated_at=now, run_after=now
+            )).rowcount
+            db.commit()
+            if failed or requeued:
+                logger.warning(f"Recovered stale jobs: {requeued} requeued, {failed} failed")
+            return requeued
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to recover stale jobs: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+
+def job_stats(db: Session) -> Dict[str, Any]:
+    """Job counts per type and status plus the age of the oldest due job"""
+    rows = db.query(
+        BackgroundJob.job_type, BackgroundJob.status, func.count(BackgroundJob.id)
+    ).group_by(BackgroundJob.job_type, BackgroundJob.status).all()
+    by_status = {status: 0 for status in STATUSES}
+    by_type: Dict[str, Dict[str, int]] = {}
+    for job_type, status, count in rows:
+        by_status[status] = by_status.get(status, 0) + count
+        by_type.setdefault(job_type, {})[status] = count
+    oldest_due = db.query(func.min(BackgroundJob.run_after)).filter(
+        BackgroundJob.status == "queued",
+        BackgroundJob.run_after <= datetime.utcnow()
+    ).scalar()
+    return {
+        "by_status": by_status,
+        "by_type": by_type,
+        "oldest_due_seconds": (datetime.utcnow() - oldest_due).total_seconds() if oldest_due else 0,
+        "workers": len([thread for thread in job_queue._threads if thread.is_alive()]),
+        "worker_id": job_queue.worker_id,
+        "registered_types": sorted(_REGISTRY),
+    }
+
+
+def serialize_job(job: BackgroundJob) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "payload": job.payload,
+        "idempotency_key": job.idempotency_key,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_after": job.run_after,
+        "locked_by": job.locked_by,
+        "progress": job.progress,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def retry_job(db: Session, job_id: int) -> Optional[BackgroundJob]:
+    """Queue a failed job again with a fresh set of attempts; None if it does not exist.
+
+    Raises ValueError for a job that is not in the failed state.
+    """
+    job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+    if not job:
+        return None
+    if job.status != "failed":
+        raise ValueError(f"Only failed jobs can be retried (job is {job.status})")
+    job.status = "queued"
+    job.attempts = 0
+    job.run_after = datetime.utcnow()
+    job.finished_at = None
+    db.info[_WAKE_KEY] = True
+    return job
+
+
+# Global job queue instance
+job_queue = JobQueue()
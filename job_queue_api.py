@@ -0,0 +1,68 @@
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from database import get_db, BackgroundJob
+from auth import get_current_admin
+from job_queue import job_stats, serialize_job, retry_job, STATUSES
+
+router = APIRouter(prefix="/admin/jobs", tags=["Background Jobs"])
+logger = logging.getLogger(__name__)
+
+
+@router.get("/stats")
+async def get_job_stats(current_admin = Depends(get_current_admin), db: Session = Depends(get_db)):
+    """Queue depth per job type and status (Admin only)"""
+    return job_stats(db)
+
+
+@router.get("")
+async def list_jobs(
+    status: Optional[str] = None,
+    job_type: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    current_admin = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Most recent background jobs, optionally filtered by status and type (Admin only)"""
+    if status and status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"Unknown status: {status}")
+    query = db.query(BackgroundJob)
+    if status:
+        query = query.filter(BackgroundJob.status == status)
+    if job_type:
+        query = query.filter(BackgroundJob.job_type == job_type)
+    total = query.count()
+    jobs = query.order_by(BackgroundJob.id.desc()).offset(offset).limit(limit).all()
+    return {
+        "jobs": [serialize_job(job) for job in jobs],
+        "total": total,
+        "limit": limit,
+        "offset": offset
+    }
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: int, current_admin = Depends(get_current_admin), db: Session = Depends(get_db)):
+    """One background job with its progress and last error (Admin only)"""
+    job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return serialize_job(job)
+
+
+@router.post("/{job_id}/retry")
+async def retry_failed_job(job_id: int, current_admin = Depends(get_current_admin), db: Session = Depends(get_db)):
+    """Queue a failed job again (Admin only)"""
+    try:
+        job = retry_job(db, job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    db.commit()
+    logger.info(f"Job {job_id} requeued by admin {current_admin.id}")
+    return {"message": "Job queued for retry", "job": serialize_job(job)}
@@ -0,0 +1,40 @@
+import importlib
+import threading
+from types import ModuleType
+from typing import Optional
+
+from startup_profiler import startup_profiler
+
+
+class LazyModule:
+    """Stands in for a heavy module and imports it on first attribute access.
+
+    Modules that only need pandas, numpy, requests or aiohttp inside a few endpoints bind
+    ``pd = lazy_module("pandas")`` instead of importing it, so the dependency is loaded by
+    the first request that uses it rather than by every worker at boot. Annotations that
+    name the module must not be evaluated at import time (``from __future__ import annotations``).
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        with self._lock:
+            if self._module is None:
+                with startup_profiler.measure(f"lazy import {self._name}"):
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute: str):
+        module = self._module or self._load()
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
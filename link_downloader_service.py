@@ -1,4 +1,3 @@
-import requests
 import re
 import os
 import logging
@@ -8,8 +7,12 @@ import mimetypes
 import uuid
 import shutil
 
+from lazy_imports import lazy_module
+
 logger = logging.getLogger(__name__)
 
+requests = lazy_module("requests")
+
 def get_filename_from_cd(cd):
     """Get filename from content-disposition"""
     if not cd:
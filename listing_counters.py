@@ -0,0 +1,133 @@
+import os
+import logging
+from typing import Dict, Tuple, Iterable, List, Optional
+
+from sqlalchemy import event, func, and_, inspect
+from sqlalchemy.orm import Session, Query, aliased
+
+from database import (
+    SessionLocal, EntityCounter, UserCohort, CohortCourse, Enrollment, Module,
+    MentorCohort, MentorCourse, MentorSession
+)
+from cohort_specific_models import CohortSpecificCourse
+
+logger = logging.getLogger(__name__)
+
+# When enabled, list pages read child counts from the entity_counters table, which is kept
+# in step with membership writes inside the same transaction. Otherwise counts are computed
+# with grouped subqueries joined into the listing statement.
+COUNTERS_ENABLED = os.getenv("LISTING_COUNTERS_ENABLED", "false").lower() == "true"
+
+# (entity type, counter name) -> (child model, child column holding the entity id)
+COUNTERS = {
+    ("cohort", "users"): (UserCohort, UserCohort.cohort_id),
+    ("cohort", "global_courses"): (CohortCourse, CohortCourse.cohort_id),
+    ("cohort", "specific_courses"): (CohortSpecificCourse, CohortSpecificCourse.cohort_id),
+    ("course", "enrollments"): (Enrollment, Enrollment.course_id),
+    ("course", "modules"): (Module, Module.course_id),
+    ("mentor", "cohorts"): (MentorCohort, MentorCohort.mentor_id),
+    ("mentor", "courses"): (MentorCourse, MentorCourse.mentor_id),
+    ("mentor", "sessions"): (MentorSession, MentorSession.mentor_id),
+}
+
+# Child model -> counters it feeds
+_MODEL_COUNTERS: Dict[type, List[Tuple[str, str]]] = {}
+for _key, (_model, _column) in COUNTERS.items():
+    _MODEL_COUNTERS.setdefault(_model, []).append(_key)
+
+
+def with_counts(db: Session, query: Query, entity_id_column, entity_type: str, names: Iterable[str]) -> Query:
+    """Add one count column per counter name to a listing query.
+
+    The counts are outer-joined into the same statement, so a page costs one query
+    regardless of its size. Apply filters and take ``count()`` before calling this.
+    """
+    columns = []
+    for name in names:
+        if COUNTERS_ENABLED:
+            counter = aliased(EntityCounter)
+            query = query.outerjoin(counter, and_(
+                counter.entity_type == entity_type,
+                counter.entity_id == entity_id_column,
+                counter.counter == name
+            ))
+            columns.append(func.coalesce(counter.value, 0).label(name))
+        else:
+            _, column = COUNTERS[(entity_type, name)]
+            grouped = db.query(
+                column.label("entity_id"), func.count().label("value")
+            ).group_by(column).subquery()
+            query = query.outerjoin(grouped, grouped.c.entity_id == entity_id_column)
+            columns.append(func.coalesce(grouped.c.value, 0).label(name))
+    return query.add_columns(*columns)
+
+
+def refresh(db: Session, entity_type: str, entity_ids: Iterable[int], names: Optional[Iterable[str]] = None):
+    """Recompute counters of some entities in the current transaction"""
+    if not COUNTERS_ENABLED:
+        return
+    entity_ids = {entity_id for entity_id in entity_ids if entity_id is not None}
+    if not entity_ids:
+        return
+    names = list(names) if names is not None else [name for kind, name in COUNTERS if kind == entity_type]
+    _recompute(db.connection(), [((entity_type, name), entity_ids) for name in names])
+
+
+def rebuild(db: Session, keys: Optional[Iterable[Tuple[str, str]]] = None):
+    """Recompute whole counters from the child tables, e.g. at startup or after bulk writes"""
+    _recompute(db.connection(), [(key, None) for key in (keys if keys is not None else COUNTERS)])
+
+
+def _recompute(connection, targets: List[Tuple[Tuple[str, str], Optional[set]]]):
+    table = EntityCounter.__table__
+    for (entity_type, name), entity_ids in targets:
+        model, column = COUNTERS[(entity_type, name)]
+        delete = table.delete().where(and_(table.c.entity_type == entity_type, table.c.counter == name))
+        count = model.__table__.select().with_only_columns(
+            column.expression, func.count()
+        ).group_by(column.expression)
+        if entity_ids is not None:
+            ids = list(entity_ids)
+            delete = delete.where(table.c.entity_id.in_(ids))
+            count = count.where(column.expression.in_(ids))
+        connection.execute(delete)
+        rows = [{"entity_type": entity_type, "entity_id": entity_id, "counter": name, "value": value}
+                for entity_id, value in connection.execute(count) if entity_id is not None]
+        if rows:
+            connection.execute(table.insert(), rows)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _refresh_flushed_counters(session, flush_context):
+    """Recompute the counters of every entity whose children were written in this flush"""
+    if not COUNTERS_ENABLED:
+        return
+    targets: Dict[Tuple[str, str], Optional[set]] = {}
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        keys = _MODEL_COUNTERS.get(type(instance))
+        if not keys:
+            continue
+        state = inspect(instance)
+        for key in keys:
+            history = state.attrs[COUNTERS[key][1].key].history
+            # Both the old and the new parent of a moved row change
+            ids = {entity_id for entity_id in history.sum() if entity_id is not None}
+            if not ids or targets.get(key, set()) is None:
+                # Parent not loaded on the instance; recompute the whole counter
+                targets[key] = None
+            else:
+                targets.setdefault(key, set()).update(ids)
+    if targets:
+        _recompute(session.connection(), list(targets.items()))
+
+
+def _rebuild_bulk_counters(context):
+    if not COUNTERS_ENABLED:
+        return
+    keys = _MODEL_COUNTERS.get(context.mapper.class_)
+    if keys:
+        _recompute(context.session.connection(), [(key, None) for key in keys])
+
+
+event.listen(SessionLocal, "after_bulk_update", _rebuild_bulk_counters)
+event.listen(SessionLocal, "after_bulk_delete", _rebuild_bulk_counters)
@@ -0,0 +1,286 @@
+import os
+import bisect
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, Session as SessionModel
+from cohort_specific_models import CohortCourseSession
+from session_models import UserSession
+from approval_models import ApprovalRequest, ApprovalStatus
+from assignment_quiz_models import AssignmentSubmission, AssignmentStatus
+from websocket_db import run_in_session
+from websocket_outbound import websocket_connections
+
+logger = logging.getLogger(__name__)
+
+# Sessions without a duration are treated as live for this long after they start
+LIVE_SESSION_DEFAULT_MINUTES = int(os.getenv("LIVE_SESSION_DEFAULT_MINUTES", "60"))
+# The schedule of sessions starting within this many hours of now is kept in memory
+LIVE_SCHEDULE_HORIZON_HOURS = int(os.getenv("LIVE_SCHEDULE_HORIZON_HOURS", "24"))
+
+# Key under which counter changes are collected until the transaction commits
+_PENDING_KEY = "live_stats_changes"
+
+
+class TrackedCount(NamedTuple):
+    """Number of rows of ``model`` whose ``attribute`` equals ``value``, per ``group_by`` value"""
+    model: type
+    attribute: str
+    value: Any
+    group_by: Optional[str] = None
+
+
+TRACKED_COUNTS = {
+    "active_sessions": TrackedCount(UserSession, "is_active", True, "user_type"),
+    "pending_approvals": TrackedCount(ApprovalRequest, "status", ApprovalStatus.PENDING),
+    "pending_grading": TrackedCount(AssignmentSubmission, "status", AssignmentStatus.SUBMITTED),
+}
+
+_TABLE_COUNTS: Dict[str, List[str]] = {}
+for _name, _spec in TRACKED_COUNTS.items():
+    _TABLE_COUNTS.setdefault(_spec.model.__tablename__, []).append(_name)
+
+_SCHEDULE_TABLES = {"sessions", "cohort_course_sessions"}
+
+# Previous value of an attribute that was overwritten without being loaded first
+_UNKNOWN = object()
+
+
+def _matches(spec: TrackedCount, value) -> bool:
+    # Enum columns may be assigned either the member or its raw value
+    return getattr(value, "value", value) == getattr(spec.value, "value", spec.value)
+
+
+def _contribution(spec: TrackedCount, instance, previous: bool) -> Optional[Any]:
+    """Group the row counted under, before or after this flush; None if it is not counted"""
+    state = inspect(instance)
+
+    def read(attribute):
+        if previous:
+            history = state.attrs[attribute].history
+            if history.deleted:
+                return history.deleted[0]
+            if history.added:
+                return _UNKNOWN
+        return getattr(instance, attribute)
+
+    value = read(spec.attribute)
+    if value is _UNKNOWN:
+        return _UNKNOWN
+    if not _matches(spec, value):
+        return None
+    return read(spec.group_by) if spec.group_by else ""
+
+
+class LiveStats:
+    """Operational counters kept in memory and updated as things happen.
+
+    Row counts (active logins, pending approvals, submissions awaiting grading) are loaded
+    once and then adjusted from committed ORM writes. Bulk statements mark a count stale so
+    it is reloaded on the next read. Online users are counted as WebSocket connections open
+    and close. Live sessions are read from an in-memory schedule that is refreshed when a
+    session is written or the loaded horizon runs out. Reading a snapshot normally runs no
+    queries at all.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Counter] = {}
+        self._stale = set(TRACKED_COUNTS)
+        # Bumped on every applied change, to detect writes that raced with a reload
+        self._changes: Dict[str, int] = {name: 0 for name in TRACKED_COUNTS}
+        # Open sockets per (role, user id) across both WebSocket managers, and users per role
+        self._sockets: Counter = Counter()
+        self._online: Counter = Counter()
+        # (start, end) of scheduled sessions, sorted by start
+        self._schedule: List[Tuple[datetime, datetime]] = []
+        self._schedule_until: Optional[datetime] = None
+        self._schedule_stale = True
+
+    # ---- WebSocket presence ----
+
+    def socket_opened(self, role: Optional[str], user_id: int):
+        with self._lock:
+            self._sockets[(role, user_id)] += 1
+            if self._sockets[(role, user_id)] == 1:
+                self._online[role] += 1
+
+    def socket_closed(self, role: Optional[str], user_id: int):
+        with self._lock:
+            key = (role, user_id)
+            if self._sockets[key] <= 0:
+                return
+            self._sockets[key] -= 1
+            if self._sockets[key] == 0:
+                del self._sockets[key]
+                self._online[role] -= 1
+
+    # ---- Row counts ----
+
+    def apply(self, deltas: Dict[Tuple[str, Any], int]):
+        with self._lock:
+            for (name, group), delta in deltas.items():
+                self._changes[name] += 1
+                if name in self._counts:
+                    self._counts[name][group] += delta
+
+    def mark_stale(self, names):
+        with self._lock:
+            self._stale.update(names)
+
+    def _load_counts(self, db: Session, names) -> Dict[str, Counter]:
+        counts = {}
+        for name in names:
+            spec = TRACKED_COUNTS[name]
+            column = getattr(spec.model, spec.attribute)
+            if spec.group_by:
+                group = getattr(spec.model, spec.group_by)
+                rows = db.query(group, func.count()).filter(column == spec.value).group_by(group).all()
+                counts[name] = Counter({key: total for key, total in rows})
+            else:
+                counts[name] = Counter({"": db.query(func.count()).select_from(spec.model).filter(column == spec.value).scalar() or 0})
+        return counts
+
+    async def _refresh_counts(self):
+        with self._lock:
+            names = sorted(self._stale)
+            self._stale.difference_update(names)
+            changes = {name: self._changes[name] for name in names}
+        counts = await run_in_session(self._load_counts, names)
+        with self._lock:
+            for name, counter in counts.items():
+                self._counts[name] = counter
+                # A commit landed while the count was loading; it may or may not be included
+                if self._changes[name] != changes[name]:
+                    self._stale.add(name)
+
+    def _total(self, name: str) -> int:
+        return sum(self._counts.get(name, Counter()).values())
+
+    # ---- Session schedule ----
+
+    def mark_schedule_stale(self):
+        self._schedule_stale = True
+
+    @staticmethod
+    def _load_schedule(db: Session, since: datetime, until: datetime) -> List[Tuple[datetime, datetime]]:
+        schedule = []
+        for model in (SessionModel, CohortCourseSession):
+            rows = db.query(model.scheduled_time, model.duration_minutes).filter(
+                model.scheduled_time.isnot(None),
+                model.scheduled_time >= since,
+                model.scheduled_time < until
+            ).all()
+            for start, minutes in rows:
+                schedule.append((start, start + timedelta(minutes=minutes or LIVE_SESSION_DEFAULT_MINUTES)))
+        schedule.sort()
+        return schedule
+
+    async def _refresh_schedule(self, now: datetime):
+        self._schedule_stale = False
+        horizon = timedelta(hours=LIVE_SCHEDULE_HORIZON_HOURS)
+        self._schedule = await run_in_session(self._load_schedule, now - horizon, now + horizon)
+        self._schedule_until = now + horizon
+
+    def _live_sessions(self, now: datetime) -> int:
+        # Only sessions that already started can be live; check which have not ended yet
+        started = bisect.bisect_right(self._schedule, (now, datetime.max))
+        return sum(1 for start, end in self._schedule[:started] if end > now)
+
+    # ---- Snapshot ----
+
+    async def snapshot(self) -> Dict[str, Any]:
+        now = datetime.now()
+        if self._stale:
+            await self._refresh_counts()
+        if self._schedule_stale or self._schedule_until is None or now >= self._schedule_until:
+            await self._refresh_schedule(now)
+
+        with self._lock:
+            online = {role: total for role, total in self._online.items() if role and total > 0}
+            active_sessions = {key: total for key, total in self._counts.get("active_sessions", Counter()).items() if total > 0}
+            pending_approvals = self._total("pending_approvals")
+            pending_grading = self._total("pending_grading")
+        live_sessions = self._live_sessions(now)
+
+        return {
+            "studentsOnline": online.get("Student", 0),
+            "activeMentors": online.get("Mentor", 0),
+            "liveSessions": live_sessions,
+            "pendingReviews": pending_approvals + pending_grading,
+            "pendingApprovals": pending_approvals,
+            "pendingGrading": pending_grading,
+            "onlineByRole": online,
+            "activeUserSessions": sum(active_sessions.values()),
+            "activeUserSessionsByType": active_sessions,
+            "websocketConnections": websocket_connections(),
+            "timestamp": now.isoformat()
+        }
+
+
+# Global instance
+live_stats = LiveStats()
+
+
+def _pending(session: Session) -> Dict:
+    return session.info.setdefault(_PENDING_KEY, {"deltas": Counter(), "stale": set(), "schedule": False})
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_live_changes(session, flush_context):
+    """Turn the rows written in this flush into counter deltas"""
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, "__tablename__", None)
+        if table in _SCHEDULE_TABLES:
+            _pending(session)["schedule"] = True
+            continue
+        for name in _TABLE_COUNTS.get(table, ()):
+            spec = TRACKED_COUNTS[name]
+            before = None if instance in session.new else _contribution(spec, instance, previous=True)
+            after = None if instance in session.deleted else _contribution(spec, instance, previous=False)
+            if before is _UNKNOWN or after is _UNKNOWN:
+                _pending(session)["stale"].add(name)
+                continue
+            if before == after:
+                continue
+            deltas = _pending(session)["deltas"]
+            if before is not None:
+                deltas[(name, before)] -= 1
+            if after is not None:
+                deltas[(name, after)] += 1
+
+
+def _collect_bulk_change(context):
+    table = context.mapper.local_table.name
+    if table in _SCHEDULE_TABLES:
+        _pending(context.session)["schedule"] = True
+    if table in _TABLE_COUNTS:
+        _pending(context.session)["stale"].update(_TABLE_COUNTS[table])
+
+
+event.listen(SessionLocal, "after_bulk_update", _collect_bulk_change)
+event.listen(SessionLocal, "after_bulk_delete", _collect_bulk_change)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_live_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if pending["deltas"]:
+        live_stats.apply(pending["deltas"])
+    if pending["stale"]:
+        live_stats.mark_stale(pending["stale"])
+    if pending["schedule"]:
+        live_stats.mark_schedule_stale()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_live_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -1,19 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
-from database import get_db, User, Admin, Presenter, Mentor, Manager, SessionModel, Enrollment                                                      
-from datetime import datetime, timedelta
+from auth import get_current_admin_presenter_mentor_or_manager
+from live_stats import live_stats
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.get("/api/stats/live")
-async def get_live_stats(db: Session = Depends(get_db)):
-    """Get live statistics for the dashboard"""
-    return {
-        "studentsOnline": 25,
-        "activeMentors": 8,
-        "liveSessions": 3,
-        "pendingReviews": 12
-    }
\ No newline at end of file
+@router.get("/stats/live")
+async def get_live_stats(current_user = Depends(get_current_admin_presenter_mentor_or_manager)):
+    """Get live statistics for the dashboard, served from in-memory counters"""
+    try:
+        return await live_stats.snapshot()
+    except Exception as e:
+        logger.error(f"Live stats error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch live statistics")
@@ -0,0 +1,128 @@
+import csv
+import heapq
+import io
+import zlib
+import logging
+from datetime import datetime
+from typing import Iterator, List, NamedTuple, Optional
+
+from sqlalchemy import or_
+
+from database import SessionLocal, AdminLog, PresenterLog, MentorLog, StudentLog
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip from each server-side cursor
+EXPORT_BATCH_SIZE = 2000
+# CSV text is buffered up to this size before a chunk is sent
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+CSV_HEADER = ['Timestamp', 'User Type', 'Username', 'Action', 'Resource Type', 'Resource ID', 'Details']
+
+
+class LogSource(NamedTuple):
+    user_type: str
+    model: type
+    user_id_column: str
+    username_column: str
+
+
+LOG_SOURCES = (
+    LogSource("Admin", AdminLog, "admin_id", "admin_username"),
+    LogSource("Presenter", PresenterLog, "presenter_id", "presenter_username"),
+    LogSource("Mentor", MentorLog, "mentor_id", "mentor_username"),
+    LogSource("Student", StudentLog, "student_id", "student_username"),
+)
+
+
+class LogFilters(NamedTuple):
+    action_type: Optional[str] = None
+    resource_type: Optional[str] = None
+    user_type: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    search: Optional[str] = None
+
+
+def _source_rows(db, source: LogSource, filters: LogFilters):
+    """Rows of one log table, newest first, read through a server-side cursor"""
+    model = source.model
+    username = getattr(model, source.username_column)
+    query = db.query(
+        model.id, model.timestamp, username.label("username"), model.action_type,
+        model.resource_type, model.resource_id, model.details
+    )
+    if filters.action_type:
+        query = query.filter(model.action_type == filters.action_type)
+    if filters.resource_type:
+        query = query.filter(model.resource_type == filters.resource_type)
+    if filters.date_from:
+        query = query.filter(model.timestamp >= filters.date_from)
+    if filters.date_to:
+        query = query.filter(model.timestamp <= filters.date_to)
+    if filters.search:
+        query = query.filter(or_(username.contains(filters.search), model.details.contains(filters.search)))
+    # yield_per streams the result instead of buffering it client-side
+    for row in query.order_by(model.timestamp.desc(), model.id.desc()).yield_per(EXPORT_BATCH_SIZE):
+        yield (row.timestamp or datetime.min, source.user_type, row)
+
+
+def iter_logs(filters: LogFilters) -> Iterator[tuple]:
+    """All matching log rows across the role tables, newest first.
+
+    Each table is read in timestamp order through its own session, since a MySQL connection
+    can only stream one result at a time, and the streams are k-way merged. Memory use is
+    bounded by the cursor batch size no matter how many rows match.
+    """
+    sessions = []
+    try:
+        streams = []
+        for source in LOG_SOURCES:
+            if filters.user_type and filters.user_type != source.user_type:
+                continue
+            db = SessionLocal()
+            sessions.append(db)
+            streams.append(_source_rows(db, source, filters))
+        for timestamp, user_type, row in heapq.merge(*streams, key=lambda item: item[0], reverse=True):
+            yield user_type, row
+    finally:
+        for db in sessions:
+            db.close()
+
+
+def stream_logs_csv(filters: LogFilters, compress: bool = False) -> Iterator[bytes]:
+    """CSV export of the merged logs in chunks, optionally gzip-compressed as it is produced"""
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return gzip.compress(data) if gzip else data
+
+    writer.writerow(CSV_HEADER)
+    rows = 0
+    for user_type, row in iter_logs(filters):
+        writer.writerow([
+            row.timestamp.isoformat() + "Z" if row.timestamp else None,
+            user_type,
+            row.username,
+            row.action_type,
+            row.resource_type,
+            row.resource_id,
+            row.details
+        ])
+        rows += 1
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            chunk = drain()
+            if chunk:
+                yield chunk
+
+    tail = drain()
+    if gzip:
+        tail += gzip.flush()
+    if tail:
+        yield tail
+    logger.info(f"Exported {rows} log rows")
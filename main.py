@@ -1,3 +1,6 @@
+# Imported first so boot time and RSS are measured from the start of the import
+from startup_profiler import startup_profiler
+
 from fastapi import FastAPI, HTTPException, Depends, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
@@ -16,6 +19,7 @@ from schemas import UserCreate
 
 # Admin and Activity Logging
 from logging_utils import log_admin_action, log_presenter_action, log_student_action, log_mentor_action
+from router_registry import include_routers
 
 # Initialize FastAPI app
 app = FastAPI(title="LMS API - Kambaa AI Learning Management System")
@@ -56,441 +60,25 @@ from single_device_middleware import SingleDeviceMiddleware
 # Enable for all roles: Student, Faculty, Admin, Presenter, Mentor, Manager
 app.add_middleware(SingleDeviceMiddleware, enforce_for_roles=["Student", "Faculty", "Admin", "Presenter", "Mentor", "Manager"])
 
+# Per-route latency and SQL statement counts; added last so it wraps every other middleware
+from request_metrics import RequestMetricsMiddleware
+app.add_middleware(RequestMetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create upload directories
 UPLOAD_BASE_DIR = Path("uploads")
-
-# Include calendar router at the top
-try:
-    from calendar_events_api import router as calendar_router
-    app.include_router(calendar_router, prefix="/api/calendar")
-except Exception as e:
-    logger.error(f"Failed to load calendar events router: {e}")
 UPLOAD_BASE_DIR.mkdir(exist_ok=True)
 (UPLOAD_BASE_DIR / "resources").mkdir(exist_ok=True)
 (UPLOAD_BASE_DIR / "recordings").mkdir(exist_ok=True)
 (UPLOAD_BASE_DIR / "certificates").mkdir(exist_ok=True)
 (UPLOAD_BASE_DIR / "badge_icons").mkdir(exist_ok=True)
-# Import and include new modular routers
-try:
-    from migration_endpoint import router as migration_router
-    app.include_router(migration_router, prefix="/api")
-    logger.info("Migration router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load migration router: {e}")
-
-try:
-    from routers.user_router import router as user_router
-    app.include_router(user_router, prefix="/api")
-    logger.info("User router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load user router: {e}")
-
-# Secure Video Router (Force-load to debug 404, no try-catch)
-from routers.video_stream_router import router as video_router_instance
-app.include_router(video_router_instance)
-
-try:
-    from routers.analytics_router import router as analytics_router
-    app.include_router(analytics_router, prefix="/api")
-    logger.info("Analytics router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load analytics router: {e}")
-
-try:
-    from routers.admin_router import router as admin_router
-    app.include_router(admin_router, prefix="/api")
-    logger.info("Admin router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load admin router: {e}")
-
-try:
-    from global_course_api import router as global_course_router
-    app.include_router(global_course_router, prefix="/api")
-    logger.info("Global course router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load global course router: {e}")
-
-try:
-    from cohort_specific_course_api import router as cohort_specific_course_router
-    app.include_router(cohort_specific_course_router, prefix="/api")
-    logger.info("Cohort-specific course router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load cohort-specific course router: {e}")
-
-try:
-    from cohort_course_modules_api import router as cohort_course_modules_router
-    app.include_router(cohort_course_modules_router, prefix="/api")
-    logger.info("Cohort course modules router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load cohort course modules router: {e}")
-
-try:
-    from cohort_attendance_api import router as cohort_attendance_router
-    app.include_router(cohort_attendance_router, prefix="/api")
-    logger.info("Cohort attendance router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load cohort attendance router: {e}")
-
-try:
-    from routers.course_router import router as course_router
-    app.include_router(course_router, prefix="/api")
-    logger.info("Course router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load course router: {e}")
-
-try:
-    from routers.module_router import router as module_router
-    app.include_router(module_router, prefix="/api")
-    logger.info("Module router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load module router: {e}")
-
-try:
-    from routers.session_router import router as session_router
-    app.include_router(session_router, prefix="/api")
-    logger.info("Session router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load session router: {e}")
-
-try:
-    from routers.resource_router import router as resource_router
-    app.include_router(resource_router, prefix="/api")
-    logger.info("Resource router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load resource router: {e}")
-
-try:
-    from routers.auth_router import router as auth_router
-    app.include_router(auth_router, prefix="/api")
-    logger.info("Auth router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load auth router: {e}")
-
-try:
-    from routers.password_reset_router import router as password_reset_router
-    app.include_router(password_reset_router, prefix="/api")
-    logger.info("Password reset router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load password reset router: {e}")
-
-try:
-    from secure_auth_router import router as secure_auth_router
-    app.include_router(secure_auth_router)
-    logger.info("Secure auth router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load secure auth router: {e}")
-
-try:
-    from routers.dashboard_router import router as dashboard_router
-    app.include_router(dashboard_router, prefix="/api")
-    logger.info("Dashboard router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load dashboard router: {e}")
-
-# Import existing external routers with error handling (these are the ones that work)
-try:
-    from role_login_endpoints import router as role_login_router
-    app.include_router(role_login_router, prefix="/api")
-    logger.info("Role login router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load role login router: {e}")
-
-try:
-    from email_endpoints import router as email_router
-    app.include_router(email_router, prefix="/api")
-    logger.info("Email router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load email router: {e}")
-
-try:
-    from mentor_endpoints import router as mentor_router
-    app.include_router(mentor_router, prefix="/api")
-    logger.info("Mentor router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load mentor router: {e}")
-
-try:
-    from email_campaigns import router as campaigns_router
-    app.include_router(campaigns_router, prefix="/api")
-    logger.info("Email campaigns router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load email campaigns router: {e}")
-
-try:
-    from user_reports_router import router as user_reports_router
-    app.include_router(user_reports_router, prefix="/api/admin/user-reports")
-    logger.info("User reports router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load user reports router: {e}")
-
-try:
-    from notifications_endpoints import router as notifications_router
-    app.include_router(notifications_router, prefix="/api")
-    logger.info("Notifications router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load notifications router: {e}")
-
-try:
-    from session_blocking_api import router as session_blocking_router
-    app.include_router(session_blocking_router, prefix="/api")
-    logger.info("Session blocking router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load session blocking router: {e}")
-
-try:
-    from calendar_blocking_api import router as calendar_blocking_router
-    app.include_router(calendar_blocking_router, prefix="/api")
-    logger.info("Calendar blocking router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load calendar blocking router: {e}")
-
-
-
-try:
-    from smtp_endpoints import router as smtp_router
-    app.include_router(smtp_router, prefix="/api")
-    logger.info("SMTP router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load SMTP router: {e}")
-
-try:
-    from presenter_users_endpoints import router as presenter_users_router
-    app.include_router(presenter_users_router, prefix="/api")
-    logger.info("Presenter users router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load presenter users router: {e}")
-
-try:
-    from presenter_cohort_assignment import router as presenter_cohort_router
-    app.include_router(presenter_cohort_router, prefix="/api")
-    logger.info("Presenter cohort assignment router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load presenter cohort assignment router: {e}")
-
-try:
-    from email_template_endpoints import router as email_template_router
-    app.include_router(email_template_router, prefix="/api")
-    logger.info("Email template router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load email template router: {e}")
-
-try:
-    from default_email_templates import router as default_templates_router
-    app.include_router(default_templates_router, prefix="/api")
-    logger.info("Default email templates router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load default email templates router: {e}")
-
-try:
-    from cohort_router import router as cohort_router
-    app.include_router(cohort_router, prefix="/api")
-    logger.info("Cohort router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load cohort router: {e}")
-
-try:
-    from cohort_course_router import router as cohort_course_router
-    app.include_router(cohort_course_router, prefix="/api")
-    logger.info("Cohort course router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load cohort course router: {e}")
-
-try:
-    from cohort_chat_endpoints import router as cohort_chat_router
-    app.include_router(cohort_chat_router)  # Remove prefix since router already has /api/cohort-chat
-    logger.info("Cohort chat router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load cohort chat router: {e}")
-
-try:
-    from chat_endpoints import router as chat_router
-    from chat_websocket import router as websocket_router
-    from notification_websocket import router as notification_ws_router
-    app.include_router(chat_router)  # Remove prefix since router already has /api/chat
-    app.include_router(websocket_router)  # Remove prefix since router already has /api/ws
-    app.include_router(notification_ws_router)  # Remove prefix since router already has /api/ws
-    logger.info("Chat and websocket routers loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load chat/websocket routers: {e}")
-
-try:
-    from system_settings_endpoints import router as system_settings_router
-    app.include_router(system_settings_router, prefix="/api")
-    logger.info("System settings router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load system settings router: {e}")
-
-try:
-    from approval_endpoints import router as approval_router
-    app.include_router(approval_router, prefix="/api")
-    logger.info("Approval router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load approval router: {e}")
-
-try:
-    from live_stats_endpoints import router as live_stats_router
-    app.include_router(live_stats_router, prefix="/api")
-    logger.info("Live stats router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load live stats router: {e}")
-
-try:
-    from enhanced_session_content_api import router as enhanced_content_router
-    app.include_router(enhanced_content_router)
-    logger.info("Enhanced session content router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load enhanced session content router: {e}")
-
-try:
-    from session_meeting_api import router as session_meeting_router
-    app.include_router(session_meeting_router, prefix="/api")
-    logger.info("Session meeting router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load session meeting router: {e}")
-
-try:
-    from meeting_session_api import router as meeting_router
-    app.include_router(meeting_router, prefix="/api")
-    logger.info("Meeting session router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load meeting session router: {e}")
-
-try:
-    from simple_session_content import router as simple_content_router
-    app.include_router(simple_content_router, prefix="/api")
-    logger.info("Simple session content router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load simple session content router: {e}")
-
-try:
-    from assignment_quiz_api import router as assignment_quiz_router
-    app.include_router(assignment_quiz_router, prefix="/api")
-    logger.info("Assignment quiz router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load assignment quiz router: {e}")
-
-try:
-    from student_dashboard_endpoints import router as student_dashboard_router
-    app.include_router(student_dashboard_router)
-    logger.info("Student dashboard router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load student dashboard router: {e}")
-
-try:
-    from enhanced_analytics_endpoints import router as enhanced_analytics_router
-    app.include_router(enhanced_analytics_router, prefix="/api")
-    logger.info("Enhanced analytics router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load enhanced analytics router: {e}")
-
-try:
-    from routers.file_router import router as file_server_router
-    app.include_router(file_server_router)
-    logger.info("File server router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load file server router: {e}")
-
-try:
-    from file_link_api import router as file_link_router
-    app.include_router(file_link_router, prefix="/api")
-    logger.info("File link router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load file link router: {e}")
-
-try:
-    from file_link_session_content import router as file_link_session_router
-    app.include_router(file_link_session_router, prefix="/api")
-    logger.info("File link session content router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load file link session content router: {e}")
-
-try:
-    from resource_analytics_endpoints import router as resource_analytics_router
-    app.include_router(resource_analytics_router)
-    logger.info("Resource analytics router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load resource analytics router: {e}")
-
-try:
-    from debug_session_content import router as debug_router
-    app.include_router(debug_router)
-    logger.info("Debug router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load debug router: {e}")
-
-try:
-    from debug_meeting_content import router as debug_meeting_router
-    app.include_router(debug_meeting_router, prefix="/api")
-    logger.info("Debug meeting content router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load debug meeting content router: {e}")
-
-try:
-    from cohort_session_content_api import router as cohort_session_content_router
-    app.include_router(cohort_session_content_router, prefix="/api")
-    logger.info("Cohort session content router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load cohort session content router: {e}")
-
-try:
-    from admin_dashboard_router import router as admin_dashboard_router
-    app.include_router(admin_dashboard_router, prefix="/api")
-    logger.info("Admin dashboard router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load admin dashboard router: {e}")
-
-try:
-    from manager_dashboard_router import router as manager_dashboard_router
-    app.include_router(manager_dashboard_router, prefix="/api")
-    logger.info("Manager dashboard router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load manager dashboard router: {e}")
-
-try:
-    from presenter_dashboard_router import router as presenter_dashboard_router
-    app.include_router(presenter_dashboard_router, prefix="/api")
-    logger.info("Presenter dashboard router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load presenter dashboard router: {e}")
-
-try:
-    from mentor_dashboard_router import router as mentor_dashboard_router
-    app.include_router(mentor_dashboard_router, prefix="/api")
-    logger.info("Mentor dashboard router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load mentor dashboard router: {e}")
-
-try:
-    from admin_management_router import router as admin_management_router
-    app.include_router(admin_management_router, prefix="/api")
-    logger.info("Admin management router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load admin management router: {e}")
-
-try:
-    from admin_members_router import router as admin_members_router
-    app.include_router(admin_members_router, prefix="/api")
-    logger.info("Admin members router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load admin members router: {e}")
-
-try:
-    from feedback_api import router as feedback_router
-    app.include_router(feedback_router, prefix="/api")
-    logger.info("Feedback router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load feedback router: {e}")
-
-try:
-    from badge_api import router as badge_router
-    app.include_router(badge_router)
-    logger.info("Badge router loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to load badge router: {e}")
+
+# Import and include the modular routers, in the order declared in the registry
+startup_profiler.checkpoint("core modules")
+include_routers(app)
 
 # Fallback router to ensure module update endpoint exists
 from fastapi import APIRouter
@@ -988,9 +576,60 @@ async def startup_event():
         logger.info("Session cleanup task started successfully")
     except Exception as e:
         logger.error(f"Failed to start session cleanup task: {str(e)}")
-    
+
+    # Backfill the calendar busy interval table, and resync it where raw SQL writes made it drift
+    try:
+        from calendar_blocking_service import CalendarBlockingService
+        db = next(get_db())
+        try:
+            CalendarBlockingService.reconcile_busy_intervals(db)
+        finally:
+            db.close()
+    except Exception as e:
+        logger.error(f"Failed to reconcile calendar busy intervals: {str(e)}")
+
+    # Counters may have drifted while disabled or through raw SQL writes
+    try:
+        import listing_counters
+        if listing_counters.COUNTERS_ENABLED:
+            db = next(get_db())
+            try:
+                listing_counters.rebuild(db)
+                db.commit()
+            finally:
+                db.close()
+    except Exception as e:
+        logger.error(f"Failed to rebuild listing counters: {str(e)}")
+
+    # The search index is built off the request path; endpoints use SQL filters until it is ready
+    try:
+        from search_index import search_index
+        search_index.start_background_build()
+        logger.info("Search index build started")
+    except Exception as e:
+        logger.error(f"Failed to start search index build: {str(e)}")
+
+    # Notification fan-out runs on the job queue workers instead of in requests
+    try:
+        from job_queue import job_queue
+        job_queue.start()
+    except Exception as e:
+        logger.error(f"Failed to start job queue: {str(e)}")
+
+    startup_profiler.checkpoint("startup tasks")
+    startup_profiler.log_report()
     logger.info("LMS API started successfully")
 
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Let running background jobs finish; unfinished ones are picked up again on restart"""
+    try:
+        from job_queue import job_queue
+        job_queue.stop()
+    except Exception as e:
+        logger.error(f"Failed to stop job queue: {str(e)}")
+
 async def session_cleanup_task():
     """Background task to cleanup expired sessions"""
     while True:
@@ -32,6 +32,9 @@ from auth import (
     get_current_admin_or_presenter, get_current_mentor, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from schemas import ChangePasswordRequest
+from course_tree_cache import course_tree_cache
+from listing_counters import with_counts
+from dashboard_stats import dashboard_cache, query_upcoming_sessions, still_upcoming
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -316,15 +319,12 @@ async def get_mentors(
             )
         
         total = query.count()
-        mentors = query.offset((page - 1) * limit).limit(limit).all()
+        rows = with_counts(
+            db, query.order_by(Mentor.id), Mentor.id, "mentor", ["cohorts", "courses", "sessions"]
+        ).offset((page - 1) * limit).limit(limit).all()
         
         mentor_list = []
-        for mentor in mentors:
-            # Get assignments
-            cohorts = db.query(MentorCohort).filter(MentorCohort.mentor_id == mentor.id).count()
-            courses = db.query(MentorCourse).filter(MentorCourse.mentor_id == mentor.id).count()
-            sessions = db.query(MentorSession).filter(MentorSession.mentor_id == mentor.id).count()
-            
+        for mentor, cohorts, courses, sessions in rows:
             mentor_list.append({
                 "id": mentor.id,
                 "username": mentor.username,
@@ -677,6 +677,25 @@ async def assign_mentor_resources(
 
 # ==================== MENTOR DASHBOARD ====================
 
+def _load_mentor_stats(db: Session, mentor_id: int):
+    """Assignment counts and upcoming sessions of one mentor"""
+    cohort_ids = [cohort_id for cohort_id, in db.query(MentorCohort.cohort_id).filter(
+        MentorCohort.mentor_id == mentor_id
+    ).all()]
+    
+    # Get students from assigned cohorts
+    total_students = db.query(User).filter(
+        User.cohort_id.in_(cohort_ids)
+    ).count() if cohort_ids else 0
+    
+    return {
+        "total_cohorts": len(cohort_ids),
+        "total_courses": db.query(MentorCourse).filter(MentorCourse.mentor_id == mentor_id).count(),
+        "total_sessions": db.query(MentorSession).filter(MentorSession.mentor_id == mentor_id).count(),
+        "total_students": total_students,
+        "upcoming_sessions": query_upcoming_sessions(db, mentor_id=mentor_id)
+    }
+
 @router.get("/mentor/dashboard")
 async def get_mentor_dashboard(
     current_mentor: Mentor = Depends(get_current_mentor),
@@ -684,60 +703,9 @@ async def get_mentor_dashboard(
 ):
     """Mentor dashboard overview with upcoming sessions"""
     try:
-        from database import Session as SessionModel
-        
-        # Get assigned sessions count
-        total_sessions = db.query(MentorSession).filter(
-            MentorSession.mentor_id == current_mentor.id
-        ).count()
-        
-        # Get assigned courses count
-        total_courses = db.query(MentorCourse).filter(
-            MentorCourse.mentor_id == current_mentor.id
-        ).count()
-        
-        # Get assigned cohorts count
-        total_cohorts = db.query(MentorCohort).filter(
-            MentorCohort.mentor_id == current_mentor.id
-        ).count()
-        
-        # Get students from assigned cohorts
-        cohort_ids = [c.cohort_id for c in db.query(MentorCohort).filter(
-            MentorCohort.mentor_id == current_mentor.id
-        ).all()]
-        
-        total_students = 0
-        if cohort_ids:
-            total_students = db.query(User).filter(
-                User.cohort_id.in_(cohort_ids)
-            ).count()
-        
-        # Get upcoming sessions for mentor
-        current_time = datetime.now()
-        upcoming_sessions = db.query(SessionModel).join(MentorSession).join(Module).join(Course).filter(
-            MentorSession.mentor_id == current_mentor.id,
-            SessionModel.scheduled_time.isnot(None),
-            SessionModel.scheduled_time > current_time
-        ).order_by(SessionModel.scheduled_time).limit(10).all()
-        
-        sessions_data = []
-        for session in upcoming_sessions:
-            module = db.query(Module).filter(Module.id == session.module_id).first()
-            course = db.query(Course).filter(Course.id == module.course_id).first() if module else None
-            
-            sessions_data.append({
-                "id": session.id,
-                "title": session.title,
-                "course_title": course.title if course else "Unknown Course",
-                "module_title": module.title if module else "Unknown Module",
-                "scheduled_date": session.scheduled_time.strftime("%Y-%m-%d") if session.scheduled_time else None,
-                "scheduled_time": session.scheduled_time.strftime("%H:%M") if session.scheduled_time else None,
-                "scheduled_datetime": session.scheduled_time,
-                "duration_minutes": session.duration_minutes,
-                "zoom_link": session.zoom_link,
-                "session_number": session.session_number,
-                "week_number": module.week_number if module else None
-            })
+        mentor_id = current_mentor.id
+        stats = dashboard_cache.get(("mentor", mentor_id), lambda: _load_mentor_stats(db, mentor_id))
+        sessions_data = still_upcoming(stats["upcoming_sessions"])
         
         return {
             "mentor": {
@@ -747,10 +715,10 @@ async def get_mentor_dashboard(
                 "full_name": current_mentor.full_name
             },
             "stats": {
-                "total_cohorts": total_cohorts,
-                "total_courses": total_courses,
-                "total_sessions": total_sessions,
-                "total_students": total_students
+                "total_cohorts": stats["total_cohorts"],
+                "total_courses": stats["total_courses"],
+                "total_sessions": stats["total_sessions"],
+                "total_students": stats["total_students"]
             },
             "upcoming_sessions": sessions_data,
             "total_upcoming": len(sessions_data)
@@ -1190,84 +1158,43 @@ async def get_mentor_course_modules(
         if not has_access:
             raise HTTPException(status_code=403, detail="You don't have access to this course")
         
-        # Determine if it's a global or cohort course
-        modules = db.query(Module).filter(Module.course_id == course_id).order_by(Module.week_number).all()
+        # Determine if it's a global or cohort course (structure from the course tree cache)
+        tree = course_tree_cache.get_tree(db, course_id, "regular")
         is_cohort = False
         
-        if not modules:
-            modules = db.query(CohortCourseModule).filter(CohortCourseModule.course_id == course_id).order_by(CohortCourseModule.week_number).all()
+        if not tree["modules"]:
+            tree = course_tree_cache.get_tree(db, course_id, "cohort_specific")
             is_cohort = True
+        
+        # Sessions assigned to this mentor, in one query
+        # (cohort_id marks cohort sessions so IDs overlapping with global sessions don't mix)
+        assigned_session_ids = {ms.session_id for ms in db.query(MentorSession.session_id).filter(
+            MentorSession.mentor_id == current_mentor.id,
+            MentorSession.cohort_id.isnot(None) if is_cohort else MentorSession.cohort_id.is_(None)
+        ).all()}
+        
         module_list = []
-        for module in modules:
+        for module in tree["modules"]:
             # Only count sessions that are assigned to this mentor
-            if is_cohort:
-                # Use a specific join to avoid confusion with global sessions if IDs overlap
-                assigned_sessions = db.query(CohortCourseSession).join(
-                    MentorSession, 
-                    and_(
-                        MentorSession.session_id == CohortCourseSession.id,
-                        MentorSession.cohort_id.isnot(None) # Marker for cohort sessions
-                    )
-                ).filter(
-                    and_(
-                        CohortCourseSession.module_id == module.id,
-                        MentorSession.mentor_id == current_mentor.id
-                    )
-                ).all()
-            else:
-                assigned_sessions = db.query(SessionModel).join(
-                    MentorSession, 
-                    and_(
-                        MentorSession.session_id == SessionModel.id,
-                        MentorSession.cohort_id.is_(None) # Marker for global sessions
-                    )
-                ).filter(
-                    and_(
-                        SessionModel.module_id == module.id,
-                        MentorSession.mentor_id == current_mentor.id
-                    )
-                ).all()
+            assigned_sessions = [s for s in module["sessions"] if s["id"] in assigned_session_ids]
             
             # Get statistics only for assigned sessions
-            total_resources = 0
-            if is_cohort:
-                from cohort_specific_models import CohortSessionContent, CohortCourseResource
-                for s in assigned_sessions:
-                    total_resources += db.query(CohortCourseResource).filter(CohortCourseResource.session_id == s.id).count()
-                    total_resources += db.query(CohortSessionContent).filter(CohortSessionContent.session_id == s.id).count()
-            else:
-                for s in assigned_sessions:
-                    total_resources += db.query(Resource).filter(Resource.session_id == s.id).count()
-                    total_resources += db.query(SessionContent).filter(SessionContent.session_id == s.id).count()
-            
-            total_quizzes = sum([
-                db.query(Quiz).filter(Quiz.session_id == s.id).count() if Quiz else 0
-                for s in assigned_sessions
-            ])
-            
-            # Get total sessions count for this module (all sessions, not just assigned)
-            if is_cohort:
-                total_sessions_in_module = db.query(CohortCourseSession).filter(
-                    CohortCourseSession.module_id == module.id
-                ).count()
-            else:
-                total_sessions_in_module = db.query(SessionModel).filter(
-                    SessionModel.module_id == module.id
-                ).count()
+            total_resources = sum(len(s["resource_ids"]) + len(s["contents"]) for s in assigned_sessions)
+            total_quizzes = sum(len(s["quiz_ids"]) for s in assigned_sessions) if Quiz else 0
             
             # Only add modules that have at least one assigned session (per user requirement)
             if len(assigned_sessions) > 0:
                 module_list.append({
-                    "id": module.id,
-                    "week_number": module.week_number,
-                    "title": module.title,
-                    "description": module.description,
-                    "sessions_count": total_sessions_in_module,
+                    "id": module["id"],
+                    "week_number": module["week_number"],
+                    "title": module["title"],
+                    "description": module["description"],
+                    "sessions_count": len(module["sessions"]),
                     "assigned_sessions_count": len(assigned_sessions),
                     "resources_count": total_resources,
                     "quizzes_count": total_quizzes,
                     "is_cohort_specific": is_cohort,
-                    "created_at": module.created_at
+                    "created_at": module["created_at"]
                 })
         
         return {"modules": module_list}
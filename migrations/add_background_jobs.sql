@@ -0,0 +1,23 @@
+-- Migration: Add the background_jobs table used by the durable job queue
+-- Run this SQL script on databases created before the table was added to the models
+
+CREATE TABLE IF NOT EXISTS background_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job_type VARCHAR(100) NOT NULL,
+    payload JSON NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    idempotency_key VARCHAR(255) NULL UNIQUE,
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    run_after DATETIME NOT NULL,
+    locked_by VARCHAR(100) NULL,
+    locked_at DATETIME NULL,
+    progress JSON NULL,
+    last_error TEXT NULL,
+    created_at DATETIME NULL,
+    updated_at DATETIME NULL,
+    finished_at DATETIME NULL,
+    INDEX ix_background_jobs_id (id),
+    INDEX ix_background_jobs_status_run_after (status, run_after),
+    INDEX ix_background_jobs_type_status (job_type, status)
+);
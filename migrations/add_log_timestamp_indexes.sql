@@ -0,0 +1,7 @@
+-- Migration: Add (timestamp, id) indexes used by the streaming log export
+-- Run this SQL script on databases created before the indexes were added to the models
+
+CREATE INDEX ix_admin_logs_timestamp_id ON admin_logs(timestamp, id);
+CREATE INDEX ix_presenter_logs_timestamp_id ON presenter_logs(timestamp, id);
+CREATE INDEX ix_mentor_logs_timestamp_id ON mentor_logs(timestamp, id);
+CREATE INDEX ix_student_logs_timestamp_id ON student_logs(timestamp, id);
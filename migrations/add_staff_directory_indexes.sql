@@ -0,0 +1,7 @@
+-- Migration: Add (created_at, id) indexes used by the staff directory
+-- Run this SQL script on databases created before the indexes were added to the models
+
+CREATE INDEX ix_admins_created_at_id ON admins(created_at, id);
+CREATE INDEX ix_presenters_created_at_id ON presenters(created_at, id);
+CREATE INDEX ix_managers_created_at_id ON managers(created_at, id);
+CREATE INDEX ix_mentors_created_at_id ON mentors(created_at, id);
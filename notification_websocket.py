@@ -1,24 +1,38 @@
 from fastapi import WebSocket, WebSocketDisconnect, Depends, HTTPException, Query
 from fastapi.routing import APIRouter
 from sqlalchemy.orm import Session
-from typing import Dict, List
+from typing import Dict, List, Optional
+import os
 import json
 import asyncio
 import logging
 from datetime import datetime
 from database import get_db, Notification, NotificationPreference, User, Admin, Presenter, Mentor, Manager
-from auth import verify_token
+from websocket_db import run_in_session, authenticate_websocket_token
+from websocket_outbound import SocketChannel
+from live_stats import live_stats
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Live operations stats are pushed to connected admins and managers this often
+LIVE_STATS_PUSH_SECONDS = float(os.getenv("LIVE_STATS_PUSH_SECONDS", "5"))
+LIVE_STATS_ROLES = ("Admin", "Manager")
+
 class NotificationManager:
     def __init__(self):
         self.active_connections: Dict[int, WebSocket] = {}
         self.user_connections: Dict[int, List[WebSocket]] = {}
+        # Role of each socket's user, taken from their token
+        self.socket_roles: Dict[WebSocket, str] = {}
+        # Sockets that receive the periodic live stats
+        self.live_stats_sockets: set = set()
+        self._live_stats_task: Optional[asyncio.Task] = None
+        # Outbound queues of every socket; sends never await the network
+        self.channel = SocketChannel("notifications", on_evict=self._on_evict)
 
-    async def connect(self, websocket: WebSocket, user_id: int):
+    async def connect(self, websocket: WebSocket, user_id: int, role: str = None):
         await websocket.accept()
         
         if user_id not in self.user_connections:
@@ -26,10 +40,22 @@ class NotificationManager:
         
         self.user_connections[user_id].append(websocket)
         self.active_connections[id(websocket)] = websocket
+        self.channel.attach(websocket, user_id)
+        self.socket_roles[websocket] = role
+        live_stats.socket_opened(role, user_id)
+        
+        if role in LIVE_STATS_ROLES:
+            self.live_stats_sockets.add(websocket)
+            if self._live_stats_task is None or self._live_stats_task.done():
+                self._live_stats_task = asyncio.create_task(self._push_live_stats())
         
         logger.info(f"User {user_id} connected to notifications WebSocket")
 
     def disconnect(self, websocket: WebSocket, user_id: int):
+        self.channel.detach(websocket)
+        self.live_stats_sockets.discard(websocket)
+        if websocket in self.socket_roles:
+            live_stats.socket_closed(self.socket_roles.pop(websocket), user_id)
         if id(websocket) in self.active_connections:
             del self.active_connections[id(websocket)]
         
@@ -42,60 +68,38 @@ class NotificationManager:
         
         logger.info(f"User {user_id} disconnected from notifications WebSocket")
 
+    async def _on_evict(self, websocket: WebSocket, user_id: int):
+        self.disconnect(websocket, user_id)
+
+    def send_to_socket(self, websocket: WebSocket, message: dict):
+        """Queue a reply on one socket, behind anything already queued for it"""
+        self.channel.send((websocket,), message)
+
     async def send_personal_message(self, message: dict, user_id: int):
-        if user_id in self.user_connections:
-            disconnected_connections = []
-            for connection in self.user_connections[user_id]:
-                try:
-                    await connection.send_text(json.dumps(message))
-                except:
-                    disconnected_connections.append(connection)
-            
-            # Clean up disconnected connections
-            for conn in disconnected_connections:
-                self.disconnect(conn, user_id)
+        self.channel.send(self.user_connections.get(user_id, ()), message)
 
     async def broadcast_message(self, message: dict):
-        disconnected_connections = []
-        for connection in self.active_connections.values():
+        self.channel.send(self.active_connections.values(), message)
+
+    async def _push_live_stats(self):
+        """Send every subscribed socket the same live stats snapshot at a fixed cadence"""
+        while self.live_stats_sockets:
             try:
-                await connection.send_text(json.dumps(message))
-            except:
-                disconnected_connections.append(connection)
-        
-        # Clean up disconnected connections
-        for conn in disconnected_connections:
-            if id(conn) in self.active_connections:
-                del self.active_connections[id(conn)]
+                self.channel.send(self.live_stats_sockets, {
+                    "type": "live_stats",
+                    "data": await live_stats.snapshot()
+                })
+            except Exception as e:
+                logger.error(f"Error pushing live stats: {str(e)}")
+            await asyncio.sleep(LIVE_STATS_PUSH_SECONDS)
+        self._live_stats_task = None
 
 notification_manager = NotificationManager()
 
-async def get_current_user_from_token(token: str, db: Session):
-    """Get current user from WebSocket token"""
+async def get_current_user_from_token(token: str):
+    """Get current user (id, username, email, role) from WebSocket token"""
     try:
-        payload = verify_token(token)
-        username = payload.get("sub")
-        role = payload.get("role")
-        user_id = payload.get("user_id")
-        
-        if not username or not role or not user_id:
-            return None
-        
-        # Check different user tables based on role
-        if role == "Student":
-            user = db.query(User).filter(User.username == username, User.id == user_id).first()
-        elif role == "Admin":
-            user = db.query(Admin).filter(Admin.username == username, Admin.id == user_id).first()
-        elif role == "Presenter":
-            user = db.query(Presenter).filter(Presenter.username == username, Presenter.id == user_id).first()
-        elif role == "Mentor":
-            user = db.query(Mentor).filter(Mentor.username == username, Mentor.id == user_id).first()
-        elif role == "Manager":
-            user = db.query(Manager).filter(Manager.username == username, Manager.id == user_id).first()
-        else:
-            return None
-        
-        return user
+        return await authenticate_websocket_token(token, check_user_id=True)
     except Exception as e:
         logger.error(f"Token verification failed: {str(e)}")
         return None
@@ -103,85 +107,94 @@ async def get_current_user_from_token(token: str, db: Session):
 @router.websocket("/ws/notifications")
 async def websocket_notifications_endpoint(
     websocket: WebSocket,
-    token: str = Query(...),
-    db: Session = Depends(get_db)
+    token: str = Query(...)
 ):
     """WebSocket endpoint for real-time notifications"""
-    user = await get_current_user_from_token(token, db)
+    # No session is held for the connection; database work runs in short
+    # sessions on the WebSocket executor (see websocket_db)
+    user = await get_current_user_from_token(token)
     
     if not user:
         await websocket.close(code=1008, reason="Invalid authentication")
         return
     
-    user_id = user.id
+    user_id = user["id"]
     
     try:
-        await notification_manager.connect(websocket, user_id)
+        await notification_manager.connect(websocket, user_id, user["role"])
         
         # Send connection confirmation
-        await websocket.send_text(json.dumps({
+        notification_manager.send_to_socket(websocket, {
             "type": "connection_established",
             "message": "Connected to notification service",
             "user_id": user_id,
             "timestamp": datetime.now().isoformat()
-        }))
+        })
         
         # Send any pending notifications
-        await send_pending_notifications(user_id, db)
+        await send_pending_notifications(user_id)
         
         while True:
             try:
                 # Wait for messages from client
                 data = await websocket.receive_text()
+                notification_manager.channel.touch(websocket)
                 message = json.loads(data)
                 
                 # Handle different message types
                 message_type = message.get("type")
                 
                 if message_type == "ping":
-                    await websocket.send_text(json.dumps({
+                    notification_manager.send_to_socket(websocket, {
                         "type": "pong",
                         "timestamp": datetime.now().isoformat()
-                    }))
+                    })
                 
                 elif message_type == "mark_read":
                     notification_id = message.get("notificationId")
                     if notification_id:
-                        await mark_notification_as_read(notification_id, user_id, db)
+                        await mark_notification_as_read(notification_id, user_id)
                 
                 elif message_type == "get_history":
                     limit = message.get("limit", 50)
-                    history = await get_notification_history(user_id, limit, db)
-                    await websocket.send_text(json.dumps({
+                    history = await get_notification_history(user_id, limit)
+                    notification_manager.send_to_socket(websocket, {
                         "type": "notification_history",
                         "notifications": history,
                         "timestamp": datetime.now().isoformat()
-                    }))
+                    })
+                
+                elif message_type == "get_live_stats":
+                    if user["role"] in LIVE_STATS_ROLES:
+                        notification_manager.send_to_socket(websocket, {
+                            "type": "live_stats",
+                            "data": await live_stats.snapshot()
+                        })
                 
-                elif message_type == "send_notification" and hasattr(user, 'username'):
+                elif message_type == "send_notification":
                     # Only allow admins/presenters to send notifications
-                    admin_check = db.query(Admin).filter(Admin.id == user_id).first()
-                    presenter_check = db.query(Presenter).filter(Presenter.id == user_id).first()
-                    
-                    if admin_check or presenter_check:
+                    if user["role"] in ("Admin", "Presenter"):
                         notification_data = message.get("data", {})
-                        await create_and_send_notification(notification_data, user_id, db)
+                        await create_and_send_notification(notification_data, user_id)
                 
             except WebSocketDisconnect:
                 break
             except json.JSONDecodeError:
-                await websocket.send_text(json.dumps({
+                notification_manager.send_to_socket(websocket, {
                     "type": "error",
                     "message": "Invalid JSON format",
                     "timestamp": datetime.now().isoformat()
-                }))
+                })
             except Exception as e:
+                if websocket not in notification_manager.channel.sockets:
+                    # Evicted or closed underneath us
+                    break
                 logger.error(f"WebSocket message handling error: {str(e)}")
-                await websocket.send_text(json.dumps({
+                notification_manager.send_to_socket(websocket, {
                     "type": "error",
                     "message": "Message processing failed",
                     "timestamp": datetime.now().isoformat()
-                }))
+                })
     
     except WebSocketDisconnect:
         pass
@@ -190,41 +203,58 @@ async def websocket_notifications_endpoint(
     finally:
         notification_manager.disconnect(websocket, user_id)
 
-async def send_pending_notifications(user_id: int, db: Session):
+def _notification_payload(n: Notification, priority: str = None) -> dict:
+    return {
+        "id": n.id,
+        "title": n.title,
+        "message": n.message,
+        "notification_type": n.type,
+        "priority": priority or getattr(n, 'priority', 'medium'),
+        "timestamp": n.created_at.isoformat(),
+        "read": n.is_read
+    }
+
+def _load_notifications(db: Session, user_id: int, limit: int, unread_only: bool) -> List[dict]:
+    query = db.query(Notification).filter(Notification.user_id == user_id)
+    if unread_only:
+        query = query.filter(Notification.is_read == False)
+    return [_notification_payload(n) for n in query.order_by(Notification.created_at.desc()).limit(limit).all()]
+
+def _mark_read(db: Session, notification_id: int, user_id: int) -> bool:
+    return db.query(Notification).filter(
+        Notification.id == notification_id,
+        Notification.user_id == user_id
+    ).update({Notification.is_read: True}, synchronize_session=False) > 0
+
+def _create_notification(db: Session, notification_data: dict) -> dict:
+    notification = Notification(
+        user_id=notification_data.get("user_id"),
+        title=notification_data.get("title", "New Notification"),
+        message=notification_data.get("message", ""),
+        type=notification_data.get("type", "INFO")
+    )
+    db.add(notification)
+    db.flush()
+    db.refresh(notification)
+    payload = _notification_payload(notification, notification_data.get("priority", "medium"))
+    payload["read"] = False
+    return payload
+
+async def send_pending_notifications(user_id: int):
     """Send any unread notifications to the user"""
     try:
-        notifications = db.query(Notification).filter(
-            Notification.user_id == user_id,
-            Notification.is_read == False
-        ).order_by(Notification.created_at.desc()).limit(10).all()
+        notifications = await run_in_session(_load_notifications, user_id, 10, True)
         
         for notification in notifications:
-            await notification_manager.send_personal_message({
-                "type": "notification",
-                "id": notification.id,
-                "title": notification.title,
-                "message": notification.message,
-                "notification_type": notification.notification_type,
-                "priority": getattr(notification, 'priority', 'medium'),
-                "timestamp": notification.created_at.isoformat(),
-                "read": notification.is_read
-            }, user_id)
+            await notification_manager.send_personal_message({"type": "notification", **notification}, user_id)
     
     except Exception as e:
         logger.error(f"Error sending pending notifications: {str(e)}")
 
-async def mark_notification_as_read(notification_id: int, user_id: int, db: Session):
+async def mark_notification_as_read(notification_id: int, user_id: int):
     """Mark a notification as read"""
     try:
-        notification = db.query(Notification).filter(
-            Notification.id == notification_id,
-            Notification.user_id == user_id
-        ).first()
-        
-        if notification:
-            notification.is_read = True
-            db.commit()
-            
+        if await run_in_session(_mark_read, notification_id, user_id):
             await notification_manager.send_personal_message({
                 "type": "notification_marked_read",
                 "notification_id": notification_id,
@@ -234,59 +264,33 @@ async def mark_notification_as_read(notification_id: int, user_id: int, db: Sess
     except Exception as e:
         logger.error(f"Error marking notification as read: {str(e)}")
 
-async def get_notification_history(user_id: int, limit: int, db: Session):
+async def get_notification_history(user_id: int, limit: int):
     """Get notification history for a user"""
     try:
-        notifications = db.query(Notification).filter(
-            Notification.user_id == user_id
-        ).order_by(Notification.created_at.desc()).limit(limit).all()
-        
-        return [{
-            "id": n.id,
-            "title": n.title,
-            "message": n.message,
-            "notification_type": n.notification_type,
-            "priority": getattr(n, 'priority', 'medium'),
-            "timestamp": n.created_at.isoformat(),
-            "read": n.is_read
-        } for n in notifications]
+        return await run_in_session(_load_notifications, user_id, limit, False)
     
     except Exception as e:
         logger.error(f"Error getting notification history: {str(e)}")
         return []
 
-async def create_and_send_notification(notification_data: dict, sender_id: int, db: Session):
+async def create_and_send_notification(notification_data: dict, sender_id: int):
     """Create and send a new notification"""
     try:
-        # Create notification in database
-        notification = Notification(
-            user_id=notification_data.get("user_id"),
-            title=notification_data.get("title", "New Notification"),
-            message=notification_data.get("message", ""),
-            notification_type=notification_data.get("type", "INFO"),
-            is_global=notification_data.get("is_global", False)
-        )
-        
-        db.add(notification)
-        db.commit()
-        db.refresh(notification)
-        
-        # Send to specific user or broadcast
-        message = {
-            "type": "notification",
-            "id": notification.id,
-            "title": notification.title,
-            "message": notification.message,
-            "notification_type": notification.notification_type,
-            "priority": notification_data.get("priority", "medium"),
-            "timestamp": notification.created_at.isoformat(),
-            "read": False
-        }
-        
-        if notification.is_global:
-            await notification_manager.broadcast_message(message)
-        elif notification.user_id:
-            await notification_manager.send_personal_message(message, notification.user_id)
+        # Global notifications are only pushed; notification rows always belong to one user
+        if notification_data.get("is_global", False):
+            await notification_manager.broadcast_message({
+                "type": "notification",
+                "title": notification_data.get("title", "New Notification"),
+                "message": notification_data.get("message", ""),
+                "notification_type": notification_data.get("type", "INFO"),
+                "priority": notification_data.get("priority", "medium"),
+                "timestamp": datetime.now().isoformat(),
+                "read": False
+            })
+        elif notification_data.get("user_id"):
+            # Create notification in database
+            created = await run_in_session(_create_notification, notification_data)
+            await notification_manager.send_personal_message({"type": "notification", **created}, notification_data["user_id"])
     
     except Exception as e:
         logger.error(f"Error creating and sending notification: {str(e)}")
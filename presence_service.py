@@ -0,0 +1,143 @@
+import os
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from chat_models import ChatParticipant
+
+logger = logging.getLogger(__name__)
+
+# Presence changes are collected and sent as one diff per recipient this often
+WS_PRESENCE_FLUSH_SECONDS = float(os.getenv("WS_PRESENCE_FLUSH_SECONDS", "1"))
+
+
+def load_presence_scope(db: Session, user_id: int, role: str) -> Tuple[List[int], List[int]]:
+    """Chats the user actively participates in and the cohorts they belong to"""
+    from database import UserCohort, MentorCohort, PresenterCohort
+    chat_ids = [chat_id for chat_id, in db.query(ChatParticipant.chat_id).filter(
+        ChatParticipant.user_id == user_id,
+        ChatParticipant.user_type == role,
+        ChatParticipant.is_active == True
+    ).all()]
+    if role == "Student":
+        query = db.query(UserCohort.cohort_id).filter(UserCohort.user_id == user_id)
+    elif role == "Mentor":
+        query = db.query(MentorCohort.cohort_id).filter(MentorCohort.mentor_id == user_id)
+    elif role == "Presenter":
+        query = db.query(PresenterCohort.cohort_id).filter(PresenterCohort.presenter_id == user_id)
+    else:
+        # Admins and managers are not cohort members; they see whoever shares a chat
+        query = None
+    cohort_ids = [cohort_id for cohort_id, in query.all()] if query is not None else []
+    return chat_ids, cohort_ids
+
+
+class PresenceService:
+    """Online users indexed by chat and cohort, with status changes delivered as diffs.
+
+    A user's status is only sent to online users who share a chat or cohort with them.
+    Changes are collected for WS_PRESENCE_FLUSH_SECONDS and each recipient gets a single
+    ``presence_diff`` message listing who came online and who went offline. A user who
+    reconnects within the window produces no message at all.
+    """
+
+    def __init__(self, publish: Callable[[Iterable[int], dict], None]):
+        # publish(user_ids, message) queues one message on every socket of those users
+        self.publish = publish
+        self.online: Set[int] = set()
+        self.user_chats: Dict[int, Set[int]] = {}
+        self.user_cohorts: Dict[int, Set[int]] = {}
+        self.chat_members: Dict[int, Set[int]] = {}
+        self.cohort_members: Dict[int, Set[int]] = {}
+        # {user_id: (online before this window, chats, cohorts)}
+        self._pending: Dict[int, Tuple[bool, Set[int], Set[int]]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def user_online(self, user_id: int, chat_ids: Iterable[int], cohort_ids: Iterable[int]):
+        if user_id in self.online:
+            return
+        self._record(user_id)
+        self.online.add(user_id)
+        self.user_chats[user_id] = set(chat_ids)
+        self.user_cohorts[user_id] = set(cohort_ids)
+        for chat_id in self.user_chats[user_id]:
+            self.chat_members.setdefault(chat_id, set()).add(user_id)
+        for cohort_id in self.user_cohorts[user_id]:
+            self.cohort_members.setdefault(cohort_id, set()).add(user_id)
+
+    def user_offline(self, user_id: int):
+        if user_id not in self.online:
+            return
+        self._record(user_id)
+        self.online.discard(user_id)
+        for chat_id in self.user_chats.pop(user_id, ()):
+            self._discard(self.chat_members, chat_id, user_id)
+        for cohort_id in self.user_cohorts.pop(user_id, ()):
+            self._discard(self.cohort_members, cohort_id, user_id)
+
+    def visible_online(self, user_id: int) -> List[int]:
+        """Online users that share a chat or cohort with the given user"""
+        return sorted(self._audience(user_id, self.user_chats.get(user_id, ()), self.user_cohorts.get(user_id, ())))
+
+    def online_in_cohort(self, cohort_id: int) -> List[int]:
+        return sorted(self.cohort_members.get(cohort_id, ()))
+
+    def _record(self, user_id: int):
+        # Keep the state from before the window and every scope the user had during it
+        was_online, chats, cohorts = self._pending.get(user_id, (user_id in self.online, set(), set()))
+        chats |= self.user_chats.get(user_id, set())
+        cohorts |= self.user_cohorts.get(user_id, set())
+        self._pending[user_id] = (was_online, chats, cohorts)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    @staticmethod
+    def _discard(index: Dict[int, Set[int]], key: int, user_id: int):
+        members = index.get(key)
+        if members is not None:
+            members.discard(user_id)
+            if not members:
+                del index[key]
+
+    def _audience(self, user_id: int, chat_ids: Iterable[int], cohort_ids: Iterable[int]) -> Set[int]:
+        audience: Set[int] = set()
+        for chat_id in chat_ids:
+            audience |= self.chat_members.get(chat_id, set())
+        for cohort_id in cohort_ids:
+            audience |= self.cohort_members.get(cohort_id, set())
+        audience.discard(user_id)
+        return audience
+
+    async def _flush_later(self):
+        await asyncio.sleep(WS_PRESENCE_FLUSH_SECONDS)
+        self._flush_task = None
+        self.flush()
+
+    def flush(self):
+        """Send every recipient one diff of the changes visible to them"""
+        pending, self._pending = self._pending, {}
+        diffs: Dict[int, Tuple[List[int], List[int]]] = {}
+        for user_id, (was_online, chats, cohorts) in pending.items():
+            is_online = user_id in self.online
+            if is_online == was_online:
+                continue
+            chats = chats | self.user_chats.get(user_id, set())
+            cohorts = cohorts | self.user_cohorts.get(user_id, set())
+            for recipient in self._audience(user_id, chats, cohorts):
+                diff = diffs.setdefault(recipient, ([], []))
+                diff[0 if is_online else 1].append(user_id)
+
+        # Recipients that see the same changes share one serialized message
+        groups: Dict[Tuple[Tuple[int, ...], Tuple[int, ...]], List[int]] = {}
+        for recipient, (came_online, went_offline) in diffs.items():
+            groups.setdefault((tuple(sorted(came_online)), tuple(sorted(went_offline))), []).append(recipient)
+        for (came_online, went_offline), recipients in groups.items():
+            self.publish(recipients, {
+                "type": "presence_diff",
+                "online": list(came_online),
+                "offline": list(went_offline)
+            })
+        if groups:
+            logger.debug(f"Presence flush: {len(pending)} changes, {len(diffs)} recipients, {len(groups)} messages")
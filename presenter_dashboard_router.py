@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy import func, or_
 from database import (
     get_db, User, Admin, Presenter, Course, Module, Session as SessionModel, 
     Enrollment, Cohort, UserCohort, CohortCourse, PresenterCohort, Resource, 
@@ -8,12 +9,107 @@ from database import (
 from assignment_quiz_models import Quiz, Assignment
 from cohort_specific_models import CohortSpecificCourse, CohortCourseSession, CohortCourseModule, CohortCourseResource
 from auth import get_current_presenter
+from dashboard_stats import (
+    UPCOMING_SESSION_LIMIT, dashboard_cache, get_global_stats, query_upcoming_sessions,
+    query_upcoming_cohort_sessions, still_upcoming
+)
 from datetime import datetime, timedelta
 import logging
 
 router = APIRouter(prefix="/presenter", tags=["presenter_dashboard"])
 logger = logging.getLogger(__name__)
 
+def _load_presenter_overview(db: Session, presenter_id: int):
+    """Aggregate stats and upcoming sessions of a presenter's cohorts"""
+    assigned_cohort_ids = [cohort_id for cohort_id, in db.query(PresenterCohort.cohort_id).filter(
+        PresenterCohort.presenter_id == presenter_id
+    ).all()]
+    if not assigned_cohort_ids:
+        return None
+    
+    # Global courses assigned to presenter's cohorts
+    global_course_ids = list({course_id for course_id, in db.query(CohortCourse.course_id).filter(
+        CohortCourse.cohort_id.in_(assigned_cohort_ids)
+    ).all()})
+    
+    # Upcoming sessions of global and cohort-specific courses, merged and limited
+    upcoming_sessions = query_upcoming_sessions(db, course_ids=global_course_ids, is_cohort_specific=False)
+    upcoming_sessions += query_upcoming_cohort_sessions(db, assigned_cohort_ids, is_cohort_specific=True)
+    upcoming_sessions.sort(key=lambda s: s["scheduled_datetime"])
+    
+    # Students in assigned cohorts (Checking both UserCohort and User.cohort_id)
+    in_assigned_cohorts = or_(UserCohort.cohort_id.in_(assigned_cohort_ids), User.cohort_id.in_(assigned_cohort_ids))
+    total_students = db.query(func.count(func.distinct(User.id))).outerjoin(UserCohort, User.id == UserCohort.user_id).filter(
+        in_assigned_cohorts,
+        User.role == "Student"
+    ).scalar() or 0
+    
+    # Course counts (Global assigned to cohorts + CohortSpecific)
+    cohort_specific_courses_count = db.query(CohortSpecificCourse).filter(
+        CohortSpecificCourse.cohort_id.in_(assigned_cohort_ids)
+    ).count()
+    total_courses = len(global_course_ids) + cohort_specific_courses_count
+    
+    # Modules, sessions, resources and quizzes (Combined)
+    total_modules = db.query(Module).filter(Module.course_id.in_(global_course_ids)).count() if global_course_ids else 0
+    total_modules += db.query(CohortCourseModule).join(CohortSpecificCourse).filter(
+        CohortSpecificCourse.cohort_id.in_(assigned_cohort_ids)
+    ).count()
+    
+    global_sessions = db.query(SessionModel.id).join(Module).filter(Module.course_id.in_(global_course_ids))
+    cohort_sessions = db.query(CohortCourseSession.id).join(CohortCourseModule).join(CohortSpecificCourse).filter(
+        CohortSpecificCourse.cohort_id.in_(assigned_cohort_ids)
+    )
+    total_sessions = global_sessions.count() if global_course_ids else 0
+    total_sessions += cohort_sessions.count()
+    
+    total_resources = db.query(Resource).filter(Resource.session_id.in_(global_sessions)).count() if global_course_ids else 0
+    total_resources += db.query(CohortCourseResource).filter(CohortCourseResource.session_id.in_(cohort_sessions)).count()
+    
+    total_quizzes = db.query(Quiz).filter(
+        Quiz.session_type == "global",
+        Quiz.session_id.in_(global_sessions)
+    ).count() if global_course_ids else 0
+    total_quizzes += db.query(Quiz).filter(
+        Quiz.session_type == "cohort",
+        Quiz.session_id.in_(cohort_sessions)
+    ).count()
+    
+    # Enrollment stats
+    total_enrollments = db.query(Enrollment).filter(Enrollment.cohort_id.in_(assigned_cohort_ids)).count()
+    if total_enrollments == 0:
+        total_enrollments = total_students # Student count as proxy if enrollment empty
+        
+    active_enrollments = db.query(Enrollment).filter(Enrollment.cohort_id.in_(assigned_cohort_ids), Enrollment.progress > 0).count()
+    if active_enrollments == 0:
+        # Check progress tables if enrollment doesn't track it
+        active_enrollments = db.query(func.count(func.distinct(StudentModuleStatus.student_id))).outerjoin(UserCohort, StudentModuleStatus.student_id == UserCohort.user_id).outerjoin(User, StudentModuleStatus.student_id == User.id).filter(
+            in_assigned_cohorts
+        ).scalar() or 0
+    
+    # Performance rates
+    avg_attendance = db.query(func.avg(StudentSessionStatus.progress_percentage)).outerjoin(UserCohort, StudentSessionStatus.student_id == UserCohort.user_id).outerjoin(User, StudentSessionStatus.student_id == User.id).filter(
+        in_assigned_cohorts
+    ).scalar() or 0
+    
+    avg_completion = db.query(func.avg(StudentModuleStatus.progress_percentage)).outerjoin(UserCohort, StudentModuleStatus.student_id == UserCohort.user_id).outerjoin(User, StudentModuleStatus.student_id == User.id).filter(
+        in_assigned_cohorts
+    ).scalar() or 0
+    
+    return {
+        "total_students": total_students,
+        "total_courses": total_courses,
+        "total_modules": total_modules,
+        "total_sessions": total_sessions,
+        "total_resources": total_resources,
+        "total_quizzes": total_quizzes,
+        "total_enrollments": total_enrollments,
+        "active_enrollments": active_enrollments,
+        "attendance_rate": round(float(avg_attendance), 2),
+        "completion_rate": round(float(avg_completion), 2),
+        "upcoming_sessions": upcoming_sessions
+    }
+
 @router.get("/dashboard")
 async def get_presenter_dashboard(
     current_presenter: Presenter = Depends(get_current_presenter),
@@ -21,188 +117,45 @@ async def get_presenter_dashboard(
 ):
     """Presenter dashboard with filtered data based on assigned cohorts and upcoming sessions"""
     try:
-        # Get cohorts assigned to this presenter
-        presenter_cohorts = db.query(PresenterCohort).filter(
-            PresenterCohort.presenter_id == current_presenter.id
-        ).all()
-        
-        assigned_cohort_ids = [pc.cohort_id for pc in presenter_cohorts]
+        presenter_id = current_presenter.id
+        overview = dashboard_cache.get(("presenter", presenter_id, "overview"), lambda: _load_presenter_overview(db, presenter_id))
+        total_admins = get_global_stats(db)["total_admins"]
         
-        # Get upcoming sessions for presenter's cohorts
-        current_time = datetime.now()
-        upcoming_sessions = []
-        
-        if assigned_cohort_ids:
-            # 1. Get global courses assigned to presenter's cohorts
-            cohort_courses = db.query(CohortCourse).filter(
-                CohortCourse.cohort_id.in_(assigned_cohort_ids)
-            ).all()
-            global_course_ids = [cc.course_id for cc in cohort_courses]
-            
-            # 2. Get sessions for global courses
-            if global_course_ids:
-                global_sessions = db.query(SessionModel).join(
-                    Module, SessionModel.module_id == Module.id
-                ).filter(
-                    Module.course_id.in_(global_course_ids),
-                    SessionModel.scheduled_time.isnot(None),
-                    SessionModel.scheduled_time > current_time
-                ).all()
-                upcoming_sessions.extend(global_sessions)
-            
-            # 3. Get sessions for cohort-specific courses
-            from cohort_specific_models import CohortCourseSession, CohortCourseModule
-            cohort_specific_sessions = db.query(CohortCourseSession).join(
-                CohortCourseModule, CohortCourseSession.module_id == CohortCourseModule.id
-            ).join(
-                CohortSpecificCourse, CohortCourseModule.course_id == CohortSpecificCourse.id
-            ).filter(
-                CohortSpecificCourse.cohort_id.in_(assigned_cohort_ids),
-                CohortCourseSession.scheduled_time.isnot(None),
-                CohortCourseSession.scheduled_time > current_time
-            ).all()
-            upcoming_sessions.extend(cohort_specific_sessions)
-
-        # Sort combined sessions and limit
-        upcoming_sessions.sort(key=lambda s: s.scheduled_time)
-        upcoming_sessions = upcoming_sessions[:10]
-        
-        sessions_data = []
-        for session in upcoming_sessions:
-            # Handle both global and cohort-specific sessions
-            is_cohort_specific = hasattr(session, 'module') and hasattr(session.module, 'course') and isinstance(session.module.course, CohortSpecificCourse)
-            
-            if is_cohort_specific:
-                module = session.module
-                course = module.course
-            else:
-                module = db.query(Module).filter(Module.id == session.module_id).first()
-                course = db.query(Course).filter(Course.id == module.course_id).first() if module else None
-            
-            sessions_data.append({
-                "id": session.id,
-                "title": session.title,
-                "course_title": course.title if course else "Unknown Course",
-                "module_title": module.title if module else "Unknown Module",
-                "scheduled_date": session.scheduled_time.strftime("%Y-%m-%d") if session.scheduled_time else None,
-                "scheduled_time": session.scheduled_time.strftime("%H:%M") if session.scheduled_time else None,
-                "scheduled_datetime": session.scheduled_time,
-                "duration_minutes": session.duration_minutes,
-                "zoom_link": getattr(session, 'zoom_link', None),
-                "session_number": session.session_number,
-                "week_number": module.week_number if module else None,
-                "is_cohort_specific": is_cohort_specific
-            })
-        
-        if not assigned_cohort_ids:
+        if overview is None:
             # Fast return for unassigned presenters
             return {
-                "users": {"total_students": 0, "total_admins": db.query(Admin).count(), "growth_rate": 0},
+                "users": {"total_students": 0, "total_admins": total_admins, "growth_rate": 0},
                 "courses": {"total_courses": 0, "total_modules": 0, "total_sessions": 0, "completed_sessions": 0},
                 "engagement": {"total_enrollments": 0, "active_enrollments": 0, "engagement_rate": 0, "total_resources": 0},
                 "performance": {"attendance_rate": 0, "completion_rate": 0, "average_quiz_score": 0},
                 "upcoming_sessions": [], "total_upcoming": 0
             }
         
-        # --- AGGREGATE STATS ---
-        
-        # Students in assigned cohorts (Checking both UserCohort and User.cohort_id)
-        total_students = db.query(func.count(func.distinct(User.id))).outerjoin(UserCohort, User.id == UserCohort.user_id).filter(
-            or_(
-                UserCohort.cohort_id.in_(assigned_cohort_ids),
-                User.cohort_id.in_(assigned_cohort_ids)
-            ),
-            User.role == "Student"
-        ).scalar() or 0
-        
-        # Course counts (Global assigned to cohorts + CohortSpecific)
-        global_courses_count = db.query(func.count(func.distinct(CohortCourse.course_id))).filter(
-            CohortCourse.cohort_id.in_(assigned_cohort_ids)
-        ).scalar() or 0
-        
-        cohort_specific_courses_count = db.query(CohortSpecificCourse).filter(
-            CohortSpecificCourse.cohort_id.in_(assigned_cohort_ids)
-        ).count()
-        
-        total_courses = global_courses_count + cohort_specific_courses_count
-        
-        # Modules and Sessions (Combined)
-        total_modules = db.query(Module).filter(Module.course_id.in_(global_course_ids)).count() if global_course_ids else 0
-        total_modules += db.query(CohortCourseModule).join(CohortSpecificCourse).filter(
-            CohortSpecificCourse.cohort_id.in_(assigned_cohort_ids)
-        ).count()
-        
-        total_sessions = db.query(SessionModel).join(Module).filter(Module.course_id.in_(global_course_ids)).count() if global_course_ids else 0
-        total_sessions += db.query(CohortCourseSession).join(CohortCourseModule).join(CohortSpecificCourse).filter(
-            CohortSpecificCourse.cohort_id.in_(assigned_cohort_ids)
-        ).count()
-        
-        # Resource counts
-        total_resources = db.query(Resource).join(SessionModel).join(Module).filter(Module.course_id.in_(global_course_ids)).count() if global_course_ids else 0
-        total_resources += db.query(CohortCourseResource).join(CohortCourseSession).join(CohortCourseModule).join(CohortSpecificCourse).filter(
-            CohortSpecificCourse.cohort_id.in_(assigned_cohort_ids)
-        ).count()
-        
-        # Quiz counts
-        # 1. Global sessions quizzes
-        global_sessions_ids = [s.id for s in db.query(SessionModel.id).join(Module).filter(Module.course_id.in_(global_course_ids)).all()] if global_course_ids else []
-        total_quizzes = db.query(Quiz).filter(
-            Quiz.session_type == "global",
-            Quiz.session_id.in_(global_sessions_ids)
-        ).count() if global_sessions_ids else 0
-        
-        # 2. Cohort specific sessions quizzes
-        cohort_sessions_ids = [s.id for s in db.query(CohortCourseSession.id).join(CohortCourseModule).join(CohortSpecificCourse).filter(
-            CohortSpecificCourse.cohort_id.in_(assigned_cohort_ids)
-        ).all()]
-        total_quizzes += db.query(Quiz).filter(
-            Quiz.session_type == "cohort",
-            Quiz.session_id.in_(cohort_sessions_ids)
-        ).count() if cohort_sessions_ids else 0
-        
-        # Enrollment stats
-        total_enrollments = db.query(Enrollment).filter(Enrollment.cohort_id.in_(assigned_cohort_ids)).count()
-        if total_enrollments == 0:
-            total_enrollments = total_students # Student count as proxy if enrollment empty
-            
-        active_enrollments = db.query(Enrollment).filter(Enrollment.cohort_id.in_(assigned_cohort_ids), Enrollment.progress > 0).count()
-        if active_enrollments == 0:
-            # Check progress tables if enrollment doesn't track it
-            active_enrollments = db.query(func.count(func.distinct(StudentModuleStatus.student_id))).outerjoin(UserCohort, StudentModuleStatus.student_id == UserCohort.user_id).outerjoin(User, StudentModuleStatus.student_id == User.id).filter(
-                or_(UserCohort.cohort_id.in_(assigned_cohort_ids), User.cohort_id.in_(assigned_cohort_ids))
-            ).scalar() or 0
-        
-        # Performance rates
-        avg_attendance = db.query(func.avg(StudentSessionStatus.progress_percentage)).outerjoin(UserCohort, StudentSessionStatus.student_id == UserCohort.user_id).outerjoin(User, StudentSessionStatus.student_id == User.id).filter(
-            or_(UserCohort.cohort_id.in_(assigned_cohort_ids), User.cohort_id.in_(assigned_cohort_ids))
-        ).scalar() or 0
-        
-        avg_completion = db.query(func.avg(StudentModuleStatus.progress_percentage)).outerjoin(UserCohort, StudentModuleStatus.student_id == UserCohort.user_id).outerjoin(User, StudentModuleStatus.student_id == User.id).filter(
-            or_(UserCohort.cohort_id.in_(assigned_cohort_ids), User.cohort_id.in_(assigned_cohort_ids))
-        ).scalar() or 0
-        
+        sessions_data = still_upcoming(overview["upcoming_sessions"])[:UPCOMING_SESSION_LIMIT]
+        total_enrollments = overview["total_enrollments"]
+        active_enrollments = overview["active_enrollments"]
         return {
             "users": {
-                "total_students": total_students,
-                "total_admins": db.query(Admin).count(),
+                "total_students": overview["total_students"],
+                "total_admins": total_admins,
                 "growth_rate": 0
             },
             "courses": {
-                "total_courses": total_courses,
-                "total_modules": total_modules,
-                "total_sessions": total_sessions,
-                "completed_sessions": total_sessions
+                "total_courses": overview["total_courses"],
+                "total_modules": overview["total_modules"],
+                "total_sessions": overview["total_sessions"],
+                "completed_sessions": overview["total_sessions"]
             },
             "engagement": {
                 "total_enrollments": total_enrollments,
                 "active_enrollments": active_enrollments,
                 "engagement_rate": (active_enrollments / total_enrollments * 100) if total_enrollments > 0 else 0,
-                "total_resources": total_resources,
-                "total_quizzes": total_quizzes
+                "total_resources": overview["total_resources"],
+                "total_quizzes": overview["total_quizzes"]
             },
             "performance": {
-                "attendance_rate": round(float(avg_attendance), 2),
-                "completion_rate": round(float(avg_completion), 2),
+                "attendance_rate": overview["attendance_rate"],
+                "completion_rate": overview["completion_rate"],
                 "average_quiz_score": 0,
                 "target_attendance": 80.0,
                 "target_completion": 90.0
@@ -214,6 +167,40 @@ async def get_presenter_dashboard(
         logger.error(f"Presenter dashboard error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch dashboard data: {str(e)}")
 
+def _load_presenter_github_stats(db: Session, presenter_id: int):
+    assigned_cohort_ids = [cohort_id for cohort_id, in db.query(PresenterCohort.cohort_id).filter(
+        PresenterCohort.presenter_id == presenter_id
+    ).all()]
+    
+    if not assigned_cohort_ids:
+        return {"total_students": 0, "students_with_github": 0, "percentage": 0}
+
+    # Filter students by assigned cohorts (checking both mapping table and direct field)
+    student_query = db.query(func.count(func.distinct(User.id))).outerjoin(UserCohort, User.id == UserCohort.user_id).filter(
+        or_(
+            UserCohort.cohort_id.in_(assigned_cohort_ids),
+            User.cohort_id.in_(assigned_cohort_ids)
+        ),
+        User.role == "Student"
+    )
+    
+    total_students = student_query.scalar() or 0
+    
+    # Count students with GitHub links
+    students_with_github = student_query.filter(
+        User.github_link.isnot(None),
+        User.github_link != ""
+    ).scalar() or 0
+    
+    # Calculate percentage
+    percentage = round((students_with_github / total_students * 100), 1) if total_students > 0 else 0
+    
+    return {
+        "total_students": total_students,
+        "students_with_github": students_with_github,
+        "percentage": percentage
+    }
+
 @router.get("/github-stats")
 async def get_presenter_github_stats(
     current_presenter: Presenter = Depends(get_current_presenter),
@@ -221,41 +208,8 @@ async def get_presenter_github_stats(
 ):
     """Get GitHub link submission statistics for students in presenter's cohorts"""
     try:
-        # Get cohorts assigned to this presenter
-        presenter_cohorts = db.query(PresenterCohort).filter(
-            PresenterCohort.presenter_id == current_presenter.id
-        ).all()
-        assigned_cohort_ids = [pc.cohort_id for pc in presenter_cohorts]
-        
-        if not assigned_cohort_ids:
-            return {"total_students": 0, "students_with_github": 0, "percentage": 0}
-
-        from sqlalchemy import or_
-        # Filter students by assigned cohorts (checking both mapping table and direct field)
-        student_query = db.query(User).outerjoin(UserCohort, User.id == UserCohort.user_id).filter(
-            or_(
-                UserCohort.cohort_id.in_(assigned_cohort_ids),
-                User.cohort_id.in_(assigned_cohort_ids)
-            ),
-            User.role == "Student"
-        )
-        
-        total_students = student_query.count()
-        
-        # Count students with GitHub links
-        students_with_github = student_query.filter(
-            User.github_link.isnot(None),
-            User.github_link != ""
-        ).count()
-        
-        # Calculate percentage
-        percentage = round((students_with_github / total_students * 100), 1) if total_students > 0 else 0
-        
-        return {
-            "total_students": total_students,
-            "students_with_github": students_with_github,
-            "percentage": percentage
-        }
+        presenter_id = current_presenter.id
+        return dashboard_cache.get(("presenter", presenter_id, "github"), lambda: _load_presenter_github_stats(db, presenter_id))
     except Exception as e:
         logger.error(f"Presenter GitHub stats error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch GitHub statistics")
@@ -7,6 +7,8 @@ from database import get_db, User, Presenter, Cohort, UserCohort, PresenterCohor
 from auth import get_current_presenter
 from typing import Optional
 from email_utils import send_course_added_notification
+from course_tree_cache import course_tree_cache
+from search_index import search_index
 import logging
 import os
 
@@ -59,13 +61,14 @@ async def get_presenter_users(
         
         # Apply search filter
         if search:
-            query = query.filter(
+            query = query.filter(search_index.filter_clause(
+                "user", User.id, search,
                 or_(
                     User.username.contains(search),
                     User.email.contains(search),
                     User.college.contains(search)
                 )
-            )
+            ))
         
         # Apply role filter
         if role:
@@ -474,26 +477,18 @@ async def get_presenter_cohort_course_modules(
         ).first()
         
         if cohort_course:
-            # Get cohort-specific modules
-            cohort_modules = db.query(CohortCourseModule).filter(
-                CohortCourseModule.course_id == course_id
-            ).order_by(CohortCourseModule.week_number).all()
+            # Get cohort-specific modules from the course tree cache
+            tree = course_tree_cache.get_tree(db, course_id, "cohort_specific")
             
-            for module in cohort_modules:
-                # Get session count for cohort modules
-                from cohort_specific_models import CohortCourseSession
-                session_count = db.query(CohortCourseSession).filter(
-                    CohortCourseSession.module_id == module.id
-                ).count()
-                
+            for module in tree["modules"]:
                 modules.append({
-                    "id": module.id,
-                    "title": module.title,
-                    "description": module.description,
-                    "week_number": module.week_number,
-                    "start_date": module.start_date,
-                    "end_date": module.end_date,
-                    "sessions_count": session_count,
+                    "id": module["id"],
+                    "title": module["title"],
+                    "description": module["description"],
+                    "week_number": module["week_number"],
+                    "start_date": module["start_date"],
+                    "end_date": module["end_date"],
+                    "sessions_count": len(module["sessions"]),
                     "is_cohort_specific": True
                 })
         else:
@@ -504,26 +499,18 @@ async def get_presenter_cohort_course_modules(
             ).first()
             
             if assignment:
-                # Get global course modules
-                global_modules = db.query(Module).filter(
-                    Module.course_id == course_id
-                ).order_by(Module.week_number).all()
+                # Get global course modules from the course tree cache
+                tree = course_tree_cache.get_tree(db, course_id, "regular")
                 
-                for module in global_modules:
-                    # Get session count for global modules
-                    from database import Session as DBSession
-                    session_count = db.query(DBSession).filter(
-                        DBSession.module_id == module.id
-                    ).count()
-                    
+                for module in tree["modules"]:
                     modules.append({
-                        "id": module.id,
-                        "title": module.title,
-                        "description": module.description,
-                        "week_number": module.week_number,
-                        "start_date": module.start_date,
-                        "end_date": module.end_date,
-                        "sessions_count": session_count,
+                        "id": module["id"],
+                        "title": module["title"],
+                        "description": module["description"],
+                        "week_number": module["week_number"],
+                        "start_date": module["start_date"],
+                        "end_date": module["end_date"],
+                        "sessions_count": len(module["sessions"]),
                         "is_cohort_specific": False
                     })
             else:
@@ -568,31 +555,25 @@ async def get_presenter_cohort_module_sessions(
         ).first()
         
         if cohort_course:
-            # Verify module belongs to this course
-            module = db.query(CohortCourseModule).filter(
-                CohortCourseModule.id == module_id,
-                CohortCourseModule.course_id == course_id
-            ).first()
+            # Verify module belongs to this course (course tree cache)
+            tree = course_tree_cache.get_tree(db, course_id, "cohort_specific")
+            module = next((m for m in tree["modules"] if m["id"] == module_id), None)
             
             if not module:
                 raise HTTPException(status_code=404, detail="Module not found in course")
             
             # Get cohort-specific sessions
-            cohort_sessions = db.query(CohortCourseSession).filter(
-                CohortCourseSession.module_id == module_id
-            ).order_by(CohortCourseSession.session_number).all()
-            
-            for session in cohort_sessions:
+            for session in module["sessions"]:
                 sessions.append({
-                    "id": session.id,
-                    "title": session.title,
-                    "description": session.description,
-                    "session_number": session.session_number,
-                    "scheduled_time": session.scheduled_time,
-                    "duration_minutes": session.duration_minutes,
-                    "zoom_link": session.zoom_link,
-                    "recording_url": session.recording_url,
-                    "syllabus_content": session.syllabus_content,
+                    "id": session["id"],
+                    "title": session["title"],
+                    "description": session["description"],
+                    "session_number": session["session_number"],
+                    "scheduled_time": session["scheduled_time"],
+                    "duration_minutes": session["duration_minutes"],
+                    "zoom_link": session["zoom_link"],
+                    "recording_url": session["recording_url"],
+                    "syllabus_content": session["syllabus_content"],
                     "is_cohort_specific": True
                 })
         else:
@@ -603,31 +584,25 @@ async def get_presenter_cohort_module_sessions(
             ).first()
             
             if assignment:
-                # Verify module belongs to this course
-                module = db.query(Module).filter(
-                    Module.id == module_id,
-                    Module.course_id == course_id
-                ).first()
+                # Verify module belongs to this course (course tree cache)
+                tree = course_tree_cache.get_tree(db, course_id, "regular")
+                module = next((m for m in tree["modules"] if m["id"] == module_id), None)
                 
                 if not module:
                     raise HTTPException(status_code=404, detail="Module not found in course")
                 
                 # Get global course sessions
-                global_sessions = db.query(DBSession).filter(
-                    DBSession.module_id == module_id
-                ).order_by(DBSession.session_number).all()
-                
-                for session in global_sessions:
+                for session in module["sessions"]:
                     sessions.append({
-                        "id": session.id,
-                        "title": session.title,
-                        "description": session.description,
-                        "session_number": session.session_number,
-                        "scheduled_time": session.scheduled_time,
-                        "duration_minutes": session.duration_minutes,
-                        "zoom_link": session.zoom_link,
-                        "recording_url": session.recording_url,
-                        "syllabus_content": session.syllabus_content,
+                        "id": session["id"],
+                        "title": session["title"],
+                        "description": session["description"],
+                        "session_number": session["session_number"],
+                        "scheduled_time": session["scheduled_time"],
+                        "duration_minutes": session["duration_minutes"],
+                        "zoom_link": session["zoom_link"],
+                        "recording_url": session["recording_url"],
+                        "syllabus_content": session["syllabus_content"],
                         "is_cohort_specific": False
                     })
             else:
@@ -963,13 +938,14 @@ async def get_cohort_users(
         
         # Apply search filter
         if search:
-            query = query.filter(
+            query = query.filter(search_index.filter_clause(
+                "user", User.id, search,
                 or_(
                     User.username.contains(search),
                     User.email.contains(search),
                     User.college.contains(search)
                 )
-            )
+            ))
         
         # Apply role filter
         if role:
@@ -0,0 +1,338 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple, NamedTuple, Iterable
+
+from pydantic import BaseModel
+from sqlalchemy import event, bindparam
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from assignment_quiz_models import Quiz, QuizQuestion, QuizAttempt, QuizAnswer, QuizResult, QuestionType, QuizStatus
+from job_queue import enqueue, job_handler, JobContext
+
+logger = logging.getLogger(__name__)
+
+# Short answers are left ungraded at submission and graded by a background job
+QUIZ_ASYNC_SUBJECTIVE_GRADING = os.getenv("QUIZ_ASYNC_SUBJECTIVE_GRADING", "false").lower() == "true"
+
+# Key under which quizzes with edited questions are collected until the transaction commits
+_PENDING_KEY = "quiz_answer_key_invalidations"
+
+_answers = QuizAnswer.__table__
+_results = QuizResult.__table__
+
+
+def letter_grade(percentage: float) -> str:
+    return "A+" if percentage >= 90 else "A" if percentage >= 80 else "B+" if percentage >= 70 else "B" if percentage >= 60 else "C" if percentage >= 50 else "F"
+
+
+def _normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+
+class KeyEntry(NamedTuple):
+    question_id: int
+    question_type: QuestionType
+    expected: Any  # Option index for MCQ, normalized text otherwise; None when unparseable
+    marks: int
+
+
+class GradedAnswer(NamedTuple):
+    question_id: int
+    answer_text: Optional[str]
+    selected_option: Optional[int]
+    is_correct: Optional[bool]  # None while a subjective answer waits for grading
+    marks_obtained: float
+
+
+class AnswerKey:
+    """A quiz's questions reduced to what grading needs, with the expected answers parsed once"""
+
+    def __init__(self, quiz_id: int, total_marks: int, questions: Iterable[QuizQuestion]):
+        self.quiz_id = quiz_id
+        self.total_marks = total_marks
+        self.entries: Dict[int, KeyEntry] = {}
+        for question in questions:
+            if question.question_type == QuestionType.MCQ:
+                try:
+                    expected = int(question.correct_answer)
+                except (TypeError, ValueError):
+                    logger.warning(f"Quiz question {question.id} has a non-numeric MCQ answer key")
+                    expected = None
+            elif question.question_type == QuestionType.TRUE_FALSE:
+                expected = (question.correct_answer or "").lower().strip()
+            else:
+                expected = _normalize(question.correct_answer)
+            self.entries[question.id] = KeyEntry(question.id, question.question_type, expected, question.marks or 0)
+
+    def grade(self, question_id: int, selected_option: Optional[int], answer_text: Optional[str],
+              subjective: bool = False) -> Optional[Tuple[Optional[bool], float]]:
+        """(is_correct, marks) for one answer; None for a question that is not in the quiz.
+
+        Short answers are only compared to the key when ``subjective`` is set; otherwise they
+        score nothing, or stay ungraded (is_correct None) when async grading is enabled.
+        """
+        entry = self.entries.get(question_id)
+        if entry is None:
+            return None
+        if entry.question_type == QuestionType.MCQ:
+            is_correct = selected_option is not None and entry.expected is not None and selected_option == entry.expected
+        elif entry.question_type == QuestionType.TRUE_FALSE:
+            is_correct = bool(answer_text) and answer_text.lower().strip() == entry.expected
+        elif subjective:
+            is_correct = bool(entry.expected) and _normalize(answer_text) == entry.expected
+        elif QUIZ_ASYNC_SUBJECTIVE_GRADING:
+            return None, 0
+        else:
+            is_correct = False
+        return is_correct, entry.marks if is_correct else 0
+
+    def grade_answers(self, answers: Iterable[Any]) -> List[GradedAnswer]:
+        """Grade submitted answers (objects with question_id, selected_option and answer_text)"""
+        graded = []
+        for answer in answers:
+            outcome = self.grade(answer.question_id, answer.selected_option, answer.answer_text)
+            if outcome is None:
+                continue
+            graded.append(GradedAnswer(answer.question_id, answer.answer_text, answer.selected_option, *outcome))
+        return graded
+
+    def percentage(self, marks_obtained: float) -> float:
+        return (marks_obtained / self.total_marks) * 100 if self.total_marks else 0
+
+
+class AnswerKeyCache:
+    """Compiled answer keys by quiz, validated against the quiz's updated_at.
+
+    Question edits bump the quiz's updated_at and drop the key in this process on commit,
+    so other processes notice the change on their next lookup of the quiz row.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self._keys: "OrderedDict[int, Tuple[Any, AnswerKey]]" = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, quiz: Quiz) -> AnswerKey:
+        stamp = (quiz.updated_at, quiz.total_marks)
+        with self._lock:
+            cached = self._keys.get(quiz.id)
+            if cached is not None and cached[0] == stamp:
+                self._keys.move_to_end(quiz.id)
+                return cached[1]
+        key = AnswerKey(quiz.id, quiz.total_marks, db.query(QuizQuestion).filter(QuizQuestion.quiz_id == quiz.id).all())
+        with self._lock:
+            self._keys[quiz.id] = (stamp, key)
+            self._keys.move_to_end(quiz.id)
+            while len(self._keys) > self._max_entries:
+                self._keys.popitem(last=False)
+        return key
+
+    def invalidate(self, quiz_ids: Iterable[int]):
+        with self._lock:
+            for quiz_id in quiz_ids:
+                self._keys.pop(quiz_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+
+# Global answer key cache instance
+answer_keys = AnswerKeyCache()
+
+
+def touch_quiz(db: Session, quiz_id: int):
+    """Mark a quiz's answer key as changed for every process"""
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    if quiz:
+        quiz.updated_at = datetime.utcnow()
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_key_changes(session, flush_context):
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, QuizQuestion) and instance.quiz_id is not None:
+            session.info.setdefault(_PENDING_KEY, set()).add(instance.quiz_id)
+
+
+@event.listens_for(SessionLocal, "after_bulk_update")
+@event.listens_for(SessionLocal, "after_bulk_delete")
+def _collect_bulk_key_change(context):
+    if context.mapper.local_table.name == "quiz_questions":
+        # The affected quizzes are unknown; drop every key
+        context.session.info.setdefault(_PENDING_KEY, set()).add(None)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_key_invalidations(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if None in pending:
+        answer_keys.clear()
+    else:
+        answer_keys.invalidate(pending)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_key_invalidations(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def record_submission(db: Session, attempt: QuizAttempt, key: AnswerKey, answers: Iterable[Any]) -> QuizResult:
+    """Grade a submission, insert its answers in one statement and add its result.
+
+    The caller commits. With async subjective grading enabled, attempts with short answers
+    get a provisional result and a grading job.
+    """
+    graded = key.grade_answers(answers)
+    if graded:
+        db.execute(_answers.insert(), [{
+            "attempt_id": attempt.id,
+            "question_id": answer.question_id,
+            "answer_text": answer.answer_text,
+            "selected_option": answer.selected_option,
+            "is_correct": answer.is_correct,
+            "marks_obtained": answer.marks_obtained,
+        } for answer in graded])
+    marks_obtained = sum(answer.marks_obtained for answer in graded)
+    percentage = key.percentage(marks_obtained)
+    pending_subjective = any(answer.is_correct is None for answer in graded)
+    result = QuizResult(
+        quiz_id=key.quiz_id,
+        attempt_id=attempt.id,
+        student_id=attempt.student_id,
+        total_marks=key.total_marks,
+        marks_obtained=marks_obtained,
+        percentage=percentage,
+        grade=letter_grade(percentage),
+        auto_evaluated=not pending_subjective
+    )
+    db.add(result)
+    if pending_subjective:
+        enqueue(db, "quiz_subjective_grading", {"attempt_id": attempt.id},
+                idempotency_key=f"quiz-subjective:{attempt.id}")
+    return result
+
+
+def regrade_quiz(db: Session, quiz: Quiz, key: Optional[AnswerKey] = None) -> Dict[str, int]:
+    """Recompute every completed attempt of a quiz against its current answer key.
+
+    Answers are read in one query, graded in memory and only the rows whose outcome
+    changed are written back, each table with a single executemany UPDATE. Results
+    missing for a completed attempt are created. The caller commits.
+    """
+    key = key or answer_keys.get(db, quiz)
+    rows = db.query(
+        _answers.c.id, _answers.c.attempt_id, _answers.c.question_id, _answers.c.selected_option,
+        _answers.c.answer_text, _answers.c.is_correct, _answers.c.marks_obtained
+    ).join(QuizAttempt, QuizAttempt.id == _answers.c.attempt_id).filter(
+        QuizAttempt.quiz_id == quiz.id,
+        QuizAttempt.status == QuizStatus.COMPLETED
+    ).all()
+
+    answer_updates = []
+    totals: Dict[int, float] = {}
+    pending_attempts = set()
+    for row in rows:
+        outcome = key.grade(row.question_id, row.selected_option, row.answer_text,
+                            subjective=QUIZ_ASYNC_SUBJECTIVE_GRADING)
+        if outcome is None:
+            # The question was removed from the quiz; the answer no longer counts
+            outcome = (row.is_correct, 0)
+        is_correct, marks = outcome
+        totals[row.attempt_id] = totals.get(row.attempt_id, 0) + marks
+        if is_correct is None:
+            pending_attempts.add(row.attempt_id)
+        if is_correct != row.is_correct or marks != (row.marks_obtained or 0):
+            answer_updates.append({"b_id": row.id, "b_is_correct": is_correct, "b_marks": marks})
+
+    if answer_updates:
+        db.execute(
+            _answers.update().where(_answers.c.id == bindparam("b_id")).values(
+                is_correct=bindparam("b_is_correct"), marks_obtained=bindparam("b_marks")
+            ),
+            answer_updates
+        )
+
+    attempts = db.query(QuizAttempt.id, QuizAttempt.student_id).filter(
+        QuizAttempt.quiz_id == quiz.id,
+        QuizAttempt.status == QuizStatus.COMPLETED
+    ).all()
+    results = {row.attempt_id: row for row in db.query(
+        _results.c.id, _results.c.attempt_id, _results.c.marks_obtained, _results.c.total_marks,
+        _results.c.auto_evaluated
+    ).filter(_results.c.quiz_id == quiz.id).all()}
+
+    now = datetime.utcnow()
+    result_updates, result_inserts = [], []
+    for attempt in attempts:
+        marks = totals.get(attempt.id, 0)
+        percentage = key.percentage(marks)
+        values = {
+            "total_marks": key.total_marks,
+            "marks_obtained": marks,
+            "percentage": percentage,
+            "grade": letter_grade(percentage),
+            "auto_evaluated": attempt.id not in pending_attempts,
+            "evaluated_at": now,
+        }
+        existing = results.get(attempt.id)
+        if existing is None:
+            result_inserts.append(dict(values, quiz_id=quiz.id, attempt_id=attempt.id, student_id=attempt.student_id))
+        elif (existing.marks_obtained, existing.total_marks, existing.auto_evaluated) != (
+                marks, key.total_marks, values["auto_evaluated"]):
+            result_updates.append({"b_id": existing.id, **{f"b_{name}": value for name, value in values.items()}})
+
+    if result_updates:
+        db.execute(
+            _results.update().where(_results.c.id == bindparam("b_id")).values(
+                **{name: bindparam(f"b_{name}") for name in (
+                    "total_marks", "marks_obtained", "percentage", "grade", "auto_evaluated", "evaluated_at"
+                )}
+            ),
+            result_updates
+        )
+    if result_inserts:
+        db.execute(_results.insert(), result_inserts)
+
+    return {
+        "attempts": len(attempts),
+        "answers_changed": len(answer_updates),
+        "results_updated": len(result_updates),
+        "results_created": len(result_inserts),
+    }
+
+
+class SubjectiveGradingPayload(BaseModel):
+    attempt_id: int
+
+
+@job_handler("quiz_subjective_grading", payload_model=SubjectiveGradingPayload)
+def grade_subjective_answers(db: Session, payload: SubjectiveGradingPayload, ctx: JobContext):
+    """Grade an attempt's ungraded short answers against the key and finalize its result"""
+    attempt = db.query(QuizAttempt).filter(QuizAttempt.id == payload.attempt_id).first()
+    if not attempt:
+        return
+    quiz = db.query(Quiz).filter(Quiz.id == attempt.quiz_id).first()
+    if not quiz:
+        return
+    key = answer_keys.get(db, quiz)
+    answers = db.query(QuizAnswer).filter(QuizAnswer.attempt_id == attempt.id).all()
+    for answer in answers:
+        if answer.is_correct is None:
+            outcome = key.grade(answer.question_id, answer.selected_option, answer.answer_text, subjective=True)
+            answer.is_correct, answer.marks_obtained = outcome if outcome else (False, 0)
+    marks = sum(answer.marks_obtained or 0 for answer in answers)
+    percentage = key.percentage(marks)
+    result = db.query(QuizResult).filter(QuizResult.attempt_id == attempt.id).first()
+    if result:
+        result.marks_obtained = marks
+        result.percentage = percentage
+        result.grade = letter_grade(percentage)
+        result.auto_evaluated = True
+        result.evaluated_at = datetime.utcnow()
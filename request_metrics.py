@@ -0,0 +1,240 @@
+import os
+import time
+import logging
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+
+from database import engine
+from auth import get_current_admin
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Per-route latency and SQL statement metrics for every HTTP request
+REQUEST_METRICS_ENABLED = os.getenv("REQUEST_METRICS_ENABLED", "true").lower() == "true"
+# Debug mode: add a Server-Timing header with total, database and statement figures
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+# Requests slower than this, or issuing more statements than this, are logged with their top statements
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+SLOW_REQUEST_STATEMENTS = int(os.getenv("SLOW_REQUEST_STATEMENTS", "100"))
+SLOW_REQUEST_TOP_STATEMENTS = int(os.getenv("SLOW_REQUEST_TOP_STATEMENTS", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Requests that matched no route share one label so unknown paths cannot grow the metrics
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestStats:
+    """SQL statements issued while serving one request"""
+
+    __slots__ = ("statements", "db_seconds", "by_statement")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        # statement text -> [executions, seconds]
+        self.by_statement: Dict[str, List[float]] = {}
+
+    def record(self, statement: str, seconds: float):
+        self.statements += 1
+        self.db_seconds += seconds
+        entry = self.by_statement.get(statement)
+        if entry is None:
+            self.by_statement[statement] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def top_statements(self, limit: int) -> List[Tuple[str, int, float]]:
+        ranked = sorted(self.by_statement.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [(statement, int(count), seconds) for statement, (count, seconds) in ranked]
+
+
+# Set for the duration of a request; run_in_threadpool copies it into worker threads
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("request_metrics_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("request_metrics_start")
+    if starts:
+        stats.record(statement, time.perf_counter() - starts.pop())
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Latency and statement histograms per (method, route), kept in process memory"""
+
+    def __init__(self):
+        self.latency: Dict[Tuple[str, str], _Histogram] = {}
+        self.statements: Dict[Tuple[str, str], _Histogram] = {}
+        self.db_seconds: Dict[Tuple[str, str], float] = {}
+        self.responses: Dict[Tuple[str, str, str], int] = {}
+        self.slow_requests = 0
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        if key not in self.latency:
+            self.latency[key] = _Histogram(LATENCY_BUCKETS)
+            self.statements[key] = _Histogram(STATEMENT_BUCKETS)
+            self.db_seconds[key] = 0.0
+        self.latency[key].observe(seconds)
+        self.statements[key].observe(stats.statements)
+        self.db_seconds[key] += stats.db_seconds
+        status_key = (method, route, str(status))
+        self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        self._render_histogram(lines, "http_request_duration_seconds", "Request latency by route", self.latency)
+        self._render_histogram(lines, "http_request_db_statements", "SQL statements issued per request", self.statements)
+
+        lines.append("# HELP http_request_db_seconds_total Time spent executing SQL statements")
+        lines.append("# TYPE http_request_db_seconds_total counter")
+        for (method, route), seconds in sorted(self.db_seconds.items()):
+            lines.append(f"http_request_db_seconds_total{_labels(method=method, route=route)} {seconds:.6f}")
+
+        lines.append("# HELP http_requests_total Requests by route and status code")
+        lines.append("# TYPE http_requests_total counter")
+        for (method, route, status), total in sorted(self.responses.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {total}")
+
+        lines.append("# HELP http_slow_requests_total Requests logged as slow")
+        lines.append("# TYPE http_slow_requests_total counter")
+        lines.append(f"http_slow_requests_total {self.slow_requests}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histogram(lines: List[str], name: str, help_text: str, histograms: Dict[Tuple[str, str], _Histogram]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (method, route), histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(method=method, route=route, le=_number(bound))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {histogram.count}")
+            lines.append(f"{name}_sum{_labels(method=method, route=route)} {_number(histogram.total)}")
+            lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.count}")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+# Global registry
+metrics = MetricsRegistry()
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing each HTTP request and counting the SQL it issues.
+
+    Written as plain ASGI rather than BaseHTTPMiddleware so the request context (and with
+    it the statement counter) reaches the endpoint and its threadpool workers, and so
+    streaming responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REQUEST_METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(time.perf_counter() - start, stats).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            seconds = time.perf_counter() - start
+            route = _route_label(scope)
+            metrics.observe(scope["method"], route, status, seconds, stats)
+            if seconds * 1000 >= SLOW_REQUEST_MS or stats.statements > SLOW_REQUEST_STATEMENTS:
+                metrics.slow_requests += 1
+                _log_slow_request(scope["method"], route, scope.get("path"), status, seconds, stats)
+
+
+def _server_timing(seconds: float, stats: RequestStats) -> str:
+    return (
+        f'app;dur={seconds * 1000:.1f}, '
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} statements"'
+    )
+
+
+def _log_slow_request(method: str, route: str, path: str, status: int, seconds: float, stats: RequestStats):
+    top = "".join(
+        f"\n    {count}x {total * 1000:.1f}ms  {' '.join(statement.split())[:300]}"
+        for statement, count, total in stats.top_statements(SLOW_REQUEST_TOP_STATEMENTS)
+    )
+    logger.warning(
+        f"Slow request {method} {path} (route {route}) -> {status} in {seconds * 1000:.0f}ms, "
+        f"{stats.statements} statements, {stats.db_seconds * 1000:.0f}ms in database{top}"
+    )
+
+
+@router.get("/admin/metrics", response_class=PlainTextResponse)
+async def get_request_metrics(current_admin = Depends(get_current_admin)):
+    """Per-route latency and SQL statement metrics in Prometheus text format (Admin only)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
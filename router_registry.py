@@ -0,0 +1,110 @@
+import logging
+import importlib
+from typing import NamedTuple, Optional
+
+from fastapi import FastAPI
+
+from startup_profiler import startup_profiler
+
+logger = logging.getLogger(__name__)
+
+
+class RouterSpec(NamedTuple):
+    """A module exposing ``router`` and the prefix it is mounted under"""
+    name: str
+    module: str
+    prefix: Optional[str] = None
+    # Fail startup instead of serving without the router
+    required: bool = False
+
+
+# In registration order: where two routers declare the same path, the first one serves it.
+# Routers without a prefix carry their full path (/api/chat, /api/ws, ...) themselves.
+ROUTERS = (
+    RouterSpec("calendar events", "calendar_events_api", "/api/calendar"),
+    RouterSpec("migration", "migration_endpoint", "/api"),
+    RouterSpec("user", "routers.user_router", "/api"),
+    RouterSpec("secure video", "routers.video_stream_router", required=True),
+    RouterSpec("analytics", "routers.analytics_router", "/api"),
+    RouterSpec("admin", "routers.admin_router", "/api"),
+    RouterSpec("global course", "global_course_api", "/api"),
+    RouterSpec("cohort-specific course", "cohort_specific_course_api", "/api"),
+    RouterSpec("cohort course modules", "cohort_course_modules_api", "/api"),
+    RouterSpec("cohort attendance", "cohort_attendance_api", "/api"),
+    RouterSpec("course", "routers.course_router", "/api"),
+    RouterSpec("module", "routers.module_router", "/api"),
+    RouterSpec("session", "routers.session_router", "/api"),
+    RouterSpec("resource", "routers.resource_router", "/api"),
+    RouterSpec("auth", "routers.auth_router", "/api"),
+    RouterSpec("password reset", "routers.password_reset_router", "/api"),
+    RouterSpec("secure auth", "secure_auth_router"),
+    RouterSpec("dashboard", "routers.dashboard_router", "/api"),
+    RouterSpec("role login", "role_login_endpoints", "/api"),
+    RouterSpec("email", "email_endpoints", "/api"),
+    RouterSpec("mentor", "mentor_endpoints", "/api"),
+    RouterSpec("email campaigns", "email_campaigns", "/api"),
+    RouterSpec("user reports", "user_reports_router", "/api/admin/user-reports"),
+    RouterSpec("notifications", "notifications_endpoints", "/api"),
+    RouterSpec("session blocking", "session_blocking_api", "/api"),
+    RouterSpec("calendar blocking", "calendar_blocking_api", "/api"),
+    RouterSpec("SMTP", "smtp_endpoints", "/api"),
+    RouterSpec("presenter users", "presenter_users_endpoints", "/api"),
+    RouterSpec("presenter cohort assignment", "presenter_cohort_assignment", "/api"),
+    RouterSpec("email template", "email_template_endpoints", "/api"),
+    RouterSpec("default email templates", "default_email_templates", "/api"),
+    RouterSpec("cohort", "cohort_router", "/api"),
+    RouterSpec("cohort course", "cohort_course_router", "/api"),
+    RouterSpec("cohort chat", "cohort_chat_endpoints"),
+    RouterSpec("chat", "chat_endpoints"),
+    RouterSpec("chat websocket", "chat_websocket"),
+    RouterSpec("notification websocket", "notification_websocket"),
+    RouterSpec("system settings", "system_settings_endpoints", "/api"),
+    RouterSpec("approval", "approval_endpoints", "/api"),
+    RouterSpec("search", "search_api"),
+    RouterSpec("background jobs", "job_queue_api", "/api"),
+    RouterSpec("live stats", "live_stats_endpoints", "/api"),
+    RouterSpec("request metrics", "request_metrics", "/api"),
+    RouterSpec("enhanced session content", "enhanced_session_content_api"),
+    RouterSpec("session meeting", "session_meeting_api", "/api"),
+    RouterSpec("meeting session", "meeting_session_api", "/api"),
+    RouterSpec("simple session content", "simple_session_content", "/api"),
+    RouterSpec("assignment quiz", "assignment_quiz_api", "/api"),
+    RouterSpec("student dashboard", "student_dashboard_endpoints"),
+    RouterSpec("enhanced analytics", "enhanced_analytics_endpoints", "/api"),
+    RouterSpec("file server", "routers.file_router"),
+    RouterSpec("file link", "file_link_api", "/api"),
+    RouterSpec("file link session content", "file_link_session_content", "/api"),
+    RouterSpec("resource analytics", "resource_analytics_endpoints"),
+    RouterSpec("debug", "debug_session_content"),
+    RouterSpec("debug meeting content", "debug_meeting_content", "/api"),
+    RouterSpec("cohort session content", "cohort_session_content_api", "/api"),
+    RouterSpec("admin dashboard", "admin_dashboard_router", "/api"),
+    RouterSpec("manager dashboard", "manager_dashboard_router", "/api"),
+    RouterSpec("presenter dashboard", "presenter_dashboard_router", "/api"),
+    RouterSpec("mentor dashboard", "mentor_dashboard_router", "/api"),
+    RouterSpec("admin management", "admin_management_router", "/api"),
+    RouterSpec("admin members", "admin_members_router", "/api"),
+    RouterSpec("feedback", "feedback_api", "/api"),
+    RouterSpec("badge", "badge_api"),
+)
+
+
+def include_routers(app: FastAPI, specs=ROUTERS):
+    """Import each router module, timing it with the startup profiler, and mount its router.
+
+    A module that fails to import is logged and skipped unless the spec is required.
+    """
+    for spec in specs:
+        try:
+            with startup_profiler.measure(spec.module):
+                module = importlib.import_module(spec.module)
+        except ImportError as e:
+            if spec.required:
+                raise
+            logger.error(f"Failed to load {spec.name} router: {e}")
+            continue
+        if spec.prefix:
+            app.include_router(module.router, prefix=spec.prefix)
+        else:
+            app.include_router(module.router)
+        logger.info(f"{spec.name[0].upper()}{spec.name[1:]} router loaded successfully")
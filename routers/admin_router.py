@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import Optional
@@ -7,10 +8,10 @@ from resource_analytics_models import ResourceView
 from auth import get_current_admin_or_presenter, verify_password, get_password_hash
 from schemas import AdminCreate, PresenterCreate, ChangePasswordRequest
 from utils.user_utils import check_email_exists, validate_email_zerobounce, normalize_email
+from log_export import LogFilters, stream_logs_csv
+from dashboard_stats import get_global_stats
 
 import logging
-import csv
-import io
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/admin", tags=["admin_management"])
@@ -761,182 +762,22 @@ async def export_all_logs(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     search: Optional[str] = None,
-    current_admin = Depends(get_current_admin_or_presenter),
-    db: Session = Depends(get_db)
+    gzip: bool = False,
+    current_admin = Depends(get_current_admin_or_presenter)
 ):
-    """Export all system logs as CSV"""
-    try:
-        all_logs = []
-        
-        # Get admin logs
-        admin_query = db.query(AdminLog)
-        if action_type:
-            admin_query = admin_query.filter(AdminLog.action_type == action_type)
-        if resource_type:
-            admin_query = admin_query.filter(AdminLog.resource_type == resource_type)
-        if date_from:
-            admin_query = admin_query.filter(AdminLog.timestamp >= date_from)
-        if date_to:
-            admin_query = admin_query.filter(AdminLog.timestamp <= date_to)
-        if search:
-            admin_query = admin_query.filter(
-                or_(
-                    AdminLog.admin_username.contains(search),
-                    AdminLog.details.contains(search)
-                )
-            )
-        
-        if not user_type or user_type == "Admin":
-            admin_logs = admin_query.all()
-            for log in admin_logs:
-                all_logs.append({
-                    "id": f"admin_{log.id}",
-                    "user_type": "Admin",
-                    "user_id": log.admin_id,
-                    "username": log.admin_username,
-                    "action_type": log.action_type,
-                    "resource_type": log.resource_type,
-                    "resource_id": log.resource_id,
-                    "details": log.details,
-                    "ip_address": log.ip_address,
-                    "timestamp": log.timestamp.isoformat() + "Z" if log.timestamp else None
-                })
-        
-        # Get presenter logs
-        presenter_query = db.query(PresenterLog)
-        if action_type:
-            presenter_query = presenter_query.filter(PresenterLog.action_type == action_type)
-        if resource_type:
-            presenter_query = presenter_query.filter(PresenterLog.resource_type == resource_type)
-        if date_from:
-            presenter_query = presenter_query.filter(PresenterLog.timestamp >= date_from)
-        if date_to:
-            presenter_query = presenter_query.filter(PresenterLog.timestamp <= date_to)
-        if search:
-            presenter_query = presenter_query.filter(
-                or_(
-                    PresenterLog.presenter_username.contains(search),
-                    PresenterLog.details.contains(search)
-                )
-            )
-        
-        if not user_type or user_type == "Presenter":
-            presenter_logs = presenter_query.all()
-            for log in presenter_logs:
-                all_logs.append({
-                    "id": f"presenter_{log.id}",
-                    "user_type": "Presenter",
-                    "user_id": log.presenter_id,
-                    "username": log.presenter_username,
-                    "action_type": log.action_type,
-                    "resource_type": log.resource_type,
-                    "resource_id": log.resource_id,
-                    "details": log.details,
-                    "ip_address": log.ip_address,
-                    "timestamp": log.timestamp.isoformat() + "Z" if log.timestamp else None
-                })
-        
-        # Get mentor logs
-        mentor_query = db.query(MentorLog)
-        if action_type:
-            mentor_query = mentor_query.filter(MentorLog.action_type == action_type)
-        if resource_type:
-            mentor_query = mentor_query.filter(MentorLog.resource_type == resource_type)
-        if date_from:
-            mentor_query = mentor_query.filter(MentorLog.timestamp >= date_from)
-        if date_to:
-            mentor_query = mentor_query.filter(MentorLog.timestamp <= date_to)
-        if search:
-            mentor_query = mentor_query.filter(
-                or_(
-                    MentorLog.mentor_username.contains(search),
-                    MentorLog.details.contains(search)
-                )
-            )
-        
-        if not user_type or user_type == "Mentor":
-            mentor_logs = mentor_query.all()
-            for log in mentor_logs:
-                all_logs.append({
-                    "id": f"mentor_{log.id}",
-                    "user_type": "Mentor",
-                    "user_id": log.mentor_id,
-                    "username": log.mentor_username,
-                    "action_type": log.action_type,
-                    "resource_type": log.resource_type,
-                    "resource_id": log.resource_id,
-                    "details": log.details,
-                    "ip_address": log.ip_address,
-                    "timestamp": log.timestamp.isoformat() + "Z" if log.timestamp else None
-                })
-        
-        # Get student logs
-        student_query = db.query(StudentLog)
-        if action_type:
-            student_query = student_query.filter(StudentLog.action_type == action_type)
-        if resource_type:
-            student_query = student_query.filter(StudentLog.resource_type == resource_type)
-        if date_from:
-            student_query = student_query.filter(StudentLog.timestamp >= date_from)
-        if date_to:
-            student_query = student_query.filter(StudentLog.timestamp <= date_to)
-        if search:
-            student_query = student_query.filter(
-                or_(
-                    StudentLog.student_username.contains(search),
-                    StudentLog.details.contains(search)
-                )
-            )
-        
-        if not user_type or user_type == "Student":
-            student_logs = student_query.all()
-            for log in student_logs:
-                all_logs.append({
-                    "id": f"student_{log.id}",
-                    "user_type": "Student",
-                    "user_id": log.student_id,
-                    "username": log.student_username,
-                    "action_type": log.action_type,
-                    "resource_type": log.resource_type,
-                    "resource_id": log.resource_id,
-                    "details": log.details,
-                    "ip_address": log.ip_address,
-                    "timestamp": log.timestamp.isoformat() + "Z" if log.timestamp else None
-                })
-        
-        # Sort by timestamp (most recent first)
-        all_logs.sort(key=lambda x: x['timestamp'], reverse=True)
-        
-        # Create CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Timestamp', 'User Type', 'Username', 'Action', 'Resource Type', 'Resource ID', 'Details'])
-        
-        # Write data
-        for log in all_logs:
-            writer.writerow([
-                log['timestamp'],
-                log['user_type'],
-                log['username'],
-                log['action_type'],
-                log['resource_type'],
-                log['resource_id'],
-                log['details']
-            ])
-        
-        csv_content = output.getvalue()
-        output.close()
-        
-        return Response(
-            content=csv_content,
-            media_type="text/csv",
-            headers={"Content-Disposition": "inline; filename=system_activity_logs.csv"}
+    """Export all system logs as CSV, streamed newest first (gzip-compressed with gzip=true)"""
+    filters = LogFilters(action_type, resource_type, user_type, date_from, date_to, search)
+    if gzip:
+        return StreamingResponse(
+            stream_logs_csv(filters, compress=True),
+            media_type="application/gzip",
+            headers={"Content-Disposition": "attachment; filename=system_activity_logs.csv.gz"}
         )
-    except Exception as e:
-        logger.error(f"Export logs error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to export logs")
+    return StreamingResponse(
+        stream_logs_csv(filters),
+        media_type="text/csv",
+        headers={"Content-Disposition": "inline; filename=system_activity_logs.csv"}
+    )
 
 @router.get("/github-stats")
 async def get_github_stats(
@@ -945,17 +786,9 @@ async def get_github_stats(
 ):
     """Get GitHub link submission statistics"""
     try:
-        from database import User
-        
-        # Count total students (users with role='Student')
-        total_students = db.query(User).filter(User.role == "Student").count()
-        
-        # Count students with GitHub links (non-null and non-empty)
-        students_with_github = db.query(User).filter(
-            User.role == "Student",
-            User.github_link.isnot(None),
-            User.github_link != ""
-        ).count()
+        stats = get_global_stats(db)
+        total_students = stats["total_students"]
+        students_with_github = stats["students_with_github"]
         
         # Calculate percentage
         percentage = round((students_with_github / total_students * 100), 1) if total_students > 0 else 0
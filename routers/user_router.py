@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
@@ -6,16 +6,21 @@ from typing import Optional
 from database import get_db, User, Admin, Presenter, Manager, Mentor
 from auth import get_current_admin_or_presenter, get_password_hash
 from schemas import UserCreate, UserUpdate, EmailAnalysisResult, DuplicateAnalysisResponse
-from utils.user_utils import check_email_exists, validate_email_zerobounce, normalize_email
+from utils.user_utils import check_email_exists, find_existing_emails, validate_email_zerobounce, normalize_email
+from user_import_service import prepare_import_rows, run_user_import, user_import_jobs
 
 import logging
 import csv
 import io
 import os
-import pandas as pd
 from datetime import datetime
+from lazy_imports import lazy_module
 
 logger = logging.getLogger(__name__)
+
+# Only spreadsheet uploads need pandas
+pd = lazy_module("pandas")
+
 router = APIRouter(prefix="/admin", tags=["user_management"])
 
 # Import logging functions
@@ -68,6 +73,9 @@ async def analyze_emails_endpoint(
         results = []
         duplicates_found = 0
         invalid_found = 0
+        
+        # Check DB for all emails at once
+        existing = find_existing_emails([str(email) for email in emails], db)
 
         for email in emails:
             email_str = str(email).strip()
@@ -75,8 +83,7 @@ async def analyze_emails_endpoint(
             if not normalized_email:
                 continue
                 
-            # Check DB
-            db_check = check_email_exists(normalized_email, db)
+            db_check = {"exists": normalized_email in existing, "role": existing.get(normalized_email)}
             
             # ZeroBounce Check
             zb_check = validate_email_zerobounce(normalized_email)
@@ -109,8 +116,8 @@ async def analyze_emails_endpoint(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/users/bulk-upload")
-
 async def bulk_upload_users(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_admin = Depends(get_current_admin_or_presenter),
     db: Session = Depends(get_db)
@@ -171,129 +178,32 @@ async def bulk_upload_users(
                 detail=f"Missing required columns: {', '.join(missing_columns)}. Available columns: {', '.join(available_columns)}"
             )
         
-        success_count = 0
-        error_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                # Skip empty rows
-                if pd.isna(row['username']) or pd.isna(row['email']) or pd.isna(row['password']):
-                    errors.append(f"Row {index + 2}: Missing required data (username, email, or password)")
-                    error_count += 1
-                    continue
-                
-                username = str(row['username']).strip()
-                email = str(row['email']).strip()
-                password = str(row['password']).strip()
-                
-                # Basic validation
-                if not username or not email or not password:
-                    errors.append(f"Row {index + 2}: Empty username, email, or password")
-                    error_count += 1
-                    continue
-                
-                # Check if email already exists (allow duplicate usernames)
-                normalized_email = normalize_email(email)
-                db_check = check_email_exists(normalized_email, db)
-                if db_check["exists"]:
-                    errors.append(f"Row {index + 2}: Email '{email}' already exists (Role: {db_check['role']})")
-                    error_count += 1
-                    continue
-                
-                # ZeroBounce validation
-                zb_check = validate_email_zerobounce(normalized_email)
-                if not zb_check["valid"]:
-                    errors.append(f"Row {index + 2}: Email validation failed for '{email}': {zb_check['message']}")
-                    error_count += 1
-                    continue
-
-                
-                # Create user
-                hashed_password = get_password_hash(password)
-                
-                user = User(
-                    username=username,
-                    email=email,
-                    password_hash=hashed_password,
-                    role=str(row.get('role', 'Student')) if pd.notna(row.get('role')) else 'Student',
-                    college=str(row.get('college', '')) if pd.notna(row.get('college')) else None,
-                    department=str(row.get('department', '')) if pd.notna(row.get('department')) else None,
-                    year=str(row.get('year', '')) if pd.notna(row.get('year')) else None,
-                    user_type=str(row.get('user_type', 'Student')) if pd.notna(row.get('user_type')) else 'Student',
-                    github_link=str(row.get('github_link', '')) if pd.notna(row.get('github_link')) else None
-                )
-                
-                db.add(user)
-                db.flush()  # Get the user ID
-                
-                # Send welcome email using template
-                try:
-                    from notification_service import NotificationService
-                    from database import EmailTemplate
-                    
-                    service = NotificationService(db)
-                    
-                    # Get the User Registration Welcome Email template
-                    template = db.query(EmailTemplate).filter(
-                        EmailTemplate.name == "User Registration Welcome Email"
-                    ).first()
-                    
-                    if template and template.is_active:
-                        # Format template with user data
-                        template_context = {
-                            "username": user.username,
-                            "email": user.email,
-                            "password": password,
-                            "college": user.college or "Not specified",
-                            "department": user.department or "Not specified",
-                            "year": user.year or "Not specified"
-                        }
-                        
-                        formatted_subject = template.subject.format(**template_context)
-                        # Convert newlines to HTML breaks for proper email formatting
-                        formatted_body = template.body.format(**template_context).replace('\n', '<br>')
-                        
-                        service.send_email_notification(
-                            user_id=user.id,
-                            email=user.email,
-                            subject=formatted_subject,
-                            body=formatted_body
-                        )
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to send welcome email to {user.email}: {str(e)}")
-                
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing row {index + 2}: {str(e)}")
-                errors.append(f"Row {index + 2}: {str(e)}")
-                error_count += 1
-                continue
-        
-        if success_count > 0:
-            db.commit()
-            logger.info(f"Bulk upload completed: {success_count} success, {error_count} errors")
-            
-            # Log the bulk upload action
-            if hasattr(current_admin, 'username'):
-                log_admin_action(
-                    admin_id=current_admin.id,
-                    admin_username=current_admin.username,
-                    action_type="BULK_IMPORT",
-                    resource_type="USER",
-                    resource_id=None,
-                    details=f"Bulk imported {success_count} users ({error_count} errors)"
-                )
+        # Validate, normalize and de-duplicate the whole roster up front
+        rows, errors = prepare_import_rows(df, db)
+        
+        # External validation, hashing, inserts and welcome emails run as a background job
+        admin_id = current_admin.id if hasattr(current_admin, 'username') else None
+        admin_username = current_admin.username if hasattr(current_admin, 'username') else None
+        job = user_import_jobs.create(
+            total_rows=len(df),
+            queued_rows=len(rows),
+            errors=errors,
+            created_by=admin_id
+        )
+        if rows:
+            background_tasks.add_task(run_user_import, job["job_id"], rows, admin_id, admin_username)
         else:
-            db.rollback()
-            logger.warning("No users were created due to errors")
+            user_import_jobs.update(job["job_id"], status="completed", finished_at=datetime.utcnow())
+        
+        logger.info(f"Bulk upload job {job['job_id']} queued: {len(rows)} rows, {len(errors)} errors")
         
         return {
-            "message": f"Bulk upload completed. {success_count} users created successfully, {error_count} errors.",
-            "success_count": success_count,
-            "error_count": error_count,
+            "message": f"Bulk upload accepted. {len(rows)} users queued for creation, {len(errors)} errors.",
+            "job_id": job["job_id"],
+            "status_url": f"/admin/users/bulk-upload/{job['job_id']}",
+            "total_rows": len(df),
+            "queued_count": len(rows),
+            "error_count": len(errors),
             "errors": errors[:20]  # Return first 20 errors
         }
         
@@ -304,6 +214,17 @@ async def bulk_upload_users(
         logger.error(f"Bulk upload error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to process bulk upload: {str(e)}")
 
+@router.get("/users/bulk-upload/{job_id}")
+async def get_bulk_upload_status(
+    job_id: str,
+    current_admin = Depends(get_current_admin_or_presenter)
+):
+    """Get progress and results of a bulk upload job"""
+    job = user_import_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Bulk upload job not found")
+    return job
+
 @router.post("/users")
 async def create_user(user_data: UserCreate, current_admin = Depends(get_current_admin_or_presenter), db: Session = Depends(get_db)):
     try:
@@ -353,16 +274,14 @@ async def create_user(user_data: UserCreate, current_admin = Depends(get_current
         # Send welcome email using template
         try:
             from notification_service import NotificationService
-            from database import EmailTemplate
+            from email_template_engine import email_template_engine
             
             service = NotificationService(db)
             
             # Get the User Registration Welcome Email template
-            template = db.query(EmailTemplate).filter(
-                EmailTemplate.name == "User Registration Welcome Email"
-            ).first()
+            template = email_template_engine.get(db, "User Registration Welcome Email")
             
-            if template and template.is_active:
+            if template:
                 # Format template with user data
                 template_context = {
                     "username": user.username,
@@ -373,9 +292,7 @@ async def create_user(user_data: UserCreate, current_admin = Depends(get_current
                     "year": user.year or "Not specified"
                 }
                 
-                formatted_subject = template.subject.format(**template_context)
-                # Convert newlines to HTML breaks for proper email formatting
-                formatted_body = template.body.format(**template_context).replace('\n', '<br>')
+                formatted_subject, formatted_body = template.render(template_context)
                 
                 email_log = service.send_email_notification(
                     user_id=user.id,
@@ -0,0 +1,106 @@
+import time
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import get_db
+from auth import get_current_user_info
+from chat_models import ChatParticipant, Message
+from search_index import search_index, create_fulltext_indexes, FIELD_SOURCES, MESSAGES
+
+router = APIRouter(prefix="/api/search", tags=["Search"])
+logger = logging.getLogger(__name__)
+
+STAFF_ROLES = {"Admin", "Presenter", "Manager", "Mentor"}
+
+
+@router.get("")
+async def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    types: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+    current_user = Depends(get_current_user_info),
+    db: Session = Depends(get_db)
+):
+    """Type-ahead search across users, staff, cohorts, courses, sessions, chats and messages.
+
+    ``types`` is a comma separated list of kinds; by default every kind the caller may see
+    is searched. Kinds whose index is still being built are listed under ``pending``.
+    """
+    started = time.perf_counter()
+    is_staff = current_user["role"] in STAFF_ROLES
+    allowed = (set(FIELD_SOURCES) if is_staff else set()) | {MESSAGES}
+    requested = [kind.strip() for kind in types.split(",") if kind.strip()] if types else sorted(allowed)
+    unknown = [kind for kind in requested if kind not in FIELD_SOURCES and kind != MESSAGES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(unknown)}")
+    denied = [kind for kind in requested if kind not in allowed]
+    if denied:
+        raise HTTPException(status_code=403, detail=f"Not allowed to search: {', '.join(denied)}")
+
+    # Index walks hold the index lock; keep them off the event loop
+    results, pending = await run_in_threadpool(_search_kinds, db, current_user, requested, q, limit)
+
+    return {
+        "query": q,
+        "results": results,
+        "pending": pending,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def _search_kinds(db: Session, current_user: dict, kinds, term: str, limit: int):
+    """Matches per kind, and the kinds whose index is not built yet"""
+    results = {}
+    pending = []
+    for kind in kinds:
+        if kind == MESSAGES:
+            matches = _search_messages(db, current_user, term, limit)
+        else:
+            matches = search_index.search(kind, term, limit)
+        if matches is None:
+            pending.append(kind)
+        else:
+            results[kind] = matches
+    return results, pending
+
+
+def _search_messages(db: Session, current_user: dict, term: str, limit: int):
+    """Newest messages matching every word of ``term`` in chats the user belongs to"""
+    chat_ids = [chat_id for chat_id, in db.query(ChatParticipant.chat_id).filter(
+        ChatParticipant.user_id == current_user["id"],
+        ChatParticipant.user_type == current_user["role"],
+        ChatParticipant.is_active == True
+    ).all()]
+    matches = search_index.search_messages(term, chat_ids, limit)
+    if not matches:
+        return matches
+    messages = {message.id: message for message in db.query(Message).filter(
+        Message.id.in_([message_id for message_id, _ in matches])
+    ).all()}
+    return [{
+        "id": message.id,
+        "chat_id": message.chat_id,
+        "sender_id": message.sender_id,
+        "sender_type": message.sender_type,
+        "content": message.content,
+        "created_at": message.created_at
+    } for message in (messages.get(message_id) for message_id, _ in matches) if message]
+
+
+@router.post("/fulltext-indexes")
+async def create_search_fulltext_indexes(current_user = Depends(get_current_user_info)):
+    """Create MySQL FULLTEXT indexes for the searched columns (admin only)"""
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    try:
+        created = create_fulltext_indexes()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to create FULLTEXT indexes: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to create FULLTEXT indexes: {str(e)}")
+    return {"created": created}
@@ -0,0 +1,549 @@
+import os
+import re
+import heapq
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Iterator
+
+from sqlalchemy import event, false, text
+from sqlalchemy.orm import Session, Query
+
+from database import (
+    SessionLocal, engine, User, Admin, Presenter, Mentor, Manager, Cohort, Course,
+    Session as SessionModel
+)
+from cohort_specific_models import CohortSpecificCourse, CohortCourseSession
+from chat_models import Chat, Message
+
+logger = logging.getLogger(__name__)
+
+# Key under which pending index updates are collected until the transaction commits
+_PENDING_KEY = "search_index_changes"
+
+# Searchable kinds -> (model, indexed fields). Fields are matched as case-insensitive substrings.
+FIELD_SOURCES = {
+    "user": (User, ("username", "email", "college")),
+    "admin": (Admin, ("username", "email")),
+    "presenter": (Presenter, ("username", "email")),
+    "mentor": (Mentor, ("username", "email", "full_name")),
+    "manager": (Manager, ("username", "email")),
+    "cohort": (Cohort, ("name", "description", "instructor_name")),
+    "course": (Course, ("title",)),
+    "cohort_course": (CohortSpecificCourse, ("title",)),
+    "session": (SessionModel, ("title",)),
+    "cohort_session": (CohortCourseSession, ("title",)),
+    "chat": (Chat, ("name",)),
+}
+MESSAGES = "message"
+MESSAGE_FIELDS = ("chat_id", "content")
+
+_MODEL_KINDS = {model: kind for kind, (model, _) in FIELD_SOURCES.items()}
+
+# Above this many matches an id filter stops being cheaper than letting the database scan
+MAX_IN_IDS = 2000
+
+# Rebuild a kind in the background once its index is this old (catches raw SQL writes)
+SEARCH_INDEX_REBUILD_MINUTES = int(os.getenv("SEARCH_INDEX_REBUILD_MINUTES", "60"))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _trigrams(value: str) -> Iterable[str]:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def _grams(value: str) -> Iterable[str]:
+    """Every substring of one to three characters, so type-ahead terms of any length have postings"""
+    return {value[i:i + size] for size in (1, 2, 3) for i in range(len(value) - size + 1)}
+
+
+class TrigramIndex:
+    """Substring index over a few short text fields per document.
+
+    Every one to three character substring has a postings list: longer terms walk the list
+    of their rarest trigram, shorter ones their own. Postings are append-only arrays of
+    internal document numbers, so they are sorted and newest-first iteration is a reverse
+    walk. Updates tombstone the old document and append a new one; the index is compacted
+    once a quarter of it is dead.
+    """
+
+    def __init__(self, field_names: Tuple[str, ...]):
+        self.field_names = field_names
+        self._docs: List[Optional[Tuple[int, Tuple[str, ...], Tuple[str, ...]]]] = []
+        self._by_id: Dict[int, int] = {}
+        self._postings: Dict[str, array] = {}
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def add(self, doc_id: int, values: Tuple[Optional[str], ...]):
+        self.remove(doc_id)
+        display = tuple(value or "" for value in values)
+        lowered = tuple(value.lower() for value in display)
+        number = len(self._docs)
+        self._docs.append((doc_id, display, lowered))
+        self._by_id[doc_id] = number
+        grams = set()
+        for value in lowered:
+            grams.update(_grams(value))
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("i")
+            postings.append(number)
+
+    def remove(self, doc_id: int):
+        number = self._by_id.pop(doc_id, None)
+        if number is None:
+            return
+        self._docs[number] = None
+        self._dead += 1
+        if self._dead > 1000 and self._dead * 4 > len(self._docs):
+            self._compact()
+
+    def _compact(self):
+        live = [doc for doc in self._docs if doc is not None]
+        self._docs, self._by_id, self._postings, self._dead = [], {}, {}, 0
+        for doc_id, display, _ in live:
+            self.add(doc_id, display)
+
+    def search(self, term: str, fields: Optional[Iterable[str]] = None) -> Iterator[Tuple[int, Tuple[str, ...]]]:
+        """Yield (doc_id, field values) of documents containing ``term``, newest first"""
+        term = term.lower()
+        positions = range(len(self.field_names)) if fields is None else [
+            self.field_names.index(field) for field in fields
+        ]
+        if len(term) >= 3:
+            candidates = None
+            for gram in _trigrams(term):
+                postings = self._postings.get(gram)
+                if postings is None:
+                    return
+                if candidates is None or len(postings) < len(candidates):
+                    candidates = postings
+            numbers = reversed(candidates)
+        elif term:
+            postings = self._postings.get(term)
+            if postings is None:
+                return
+            numbers = reversed(postings)
+        else:
+            # An empty term matches every document, so the walk stops at the caller's limit
+            numbers = range(len(self._docs) - 1, -1, -1)
+        for number in numbers:
+            doc = self._docs[number]
+            if doc is not None and any(term in doc[2][i] for i in positions):
+                yield doc[0], doc[1]
+
+
+class TokenIndex:
+    """Word index over chat messages; the last query word matches as a prefix (type-ahead)"""
+
+    def __init__(self):
+        self._message_ids = array("i")
+        self._chat_ids = array("i")
+        self._alive = bytearray()
+        self._by_id: Dict[int, int] = {}
+        self._postings: Dict[str, array] = {}
+        self._vocabulary: List[str] = []
+        self._new_words: set = set()
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def add(self, message_id: int, chat_id: int, content: Optional[str]):
+        self.remove(message_id)
+        number = len(self._message_ids)
+        self._message_ids.append(message_id)
+        self._chat_ids.append(chat_id)
+        self._alive.append(1)
+        self._by_id[message_id] = number
+        for word in set(_TOKEN_RE.findall((content or "").lower())):
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = array("i")
+                self._new_words.add(word)
+            postings.append(number)
+
+    def remove(self, message_id: int):
+        number = self._by_id.pop(message_id, None)
+        if number is None:
+            return
+        self._alive[number] = 0
+        self._dead += 1
+        if self._dead > 1000 and self._dead * 4 > len(self._alive):
+            self._compact()
+
+    def _compact(self):
+        """Renumber the live messages and drop dead numbers (and words left without postings)"""
+        renumbered = array("i", [-1]) * len(self._alive)
+        message_ids, chat_ids = array("i"), array("i")
+        for number, alive in enumerate(self._alive):
+            if alive:
+                renumbered[number] = len(message_ids)
+                message_ids.append(self._message_ids[number])
+                chat_ids.append(self._chat_ids[number])
+        postings = {}
+        for word, numbers in self._postings.items():
+            # The mapping is increasing, so the postings stay sorted
+            live = array("i", (renumbered[number] for number in numbers if renumbered[number] >= 0))
+            if live:
+                postings[word] = live
+        self._message_ids, self._chat_ids = message_ids, chat_ids
+        self._alive = bytearray(b"\x01") * len(message_ids)
+        self._by_id = {message_id: number for number, message_id in enumerate(message_ids)}
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+        self._new_words = set()
+        self._dead = 0
+
+    def _expand(self, prefix: str, limit: int = 200) -> List[array]:
+        if len(self._new_words) > 1000:
+            self._vocabulary = sorted(set(self._vocabulary) | self._new_words)
+            self._new_words = set()
+        words = []
+        start = bisect_left(self._vocabulary, prefix)
+        for word in self._vocabulary[start:start + limit]:
+            if not word.startswith(prefix):
+                break
+            words.append(word)
+        words.extend(word for word in self._new_words if word.startswith(prefix))
+        return [self._postings[word] for word in words]
+
+    def search(self, query: str, chat_ids: Optional[set] = None) -> Iterator[Tuple[int, int]]:
+        """Yield (message_id, chat_id) of messages containing every query word, newest first"""
+        words = _TOKEN_RE.findall(query.lower())
+        if not words:
+            return
+        prefix_last = not query[-1:].isspace()
+        groups = []
+        for position, word in enumerate(words):
+            if prefix_last and position == len(words) - 1:
+                group = self._expand(word)
+            else:
+                postings = self._postings.get(word)
+                group = [postings] if postings is not None else []
+            if not group:
+                return
+            groups.append(group)
+
+        # Walk the rarest word's postings and probe the others with binary search
+        groups.sort(key=lambda group: sum(len(postings) for postings in group))
+        driver, others = groups[0], groups[1:]
+        numbers = heapq.merge(*[reversed(postings) for postings in driver], reverse=True)
+        previous = None
+        for number in numbers:
+            if number == previous or not self._alive[number]:
+                continue
+            previous = number
+            chat_id = self._chat_ids[number]
+            if chat_ids is not None and chat_id not in chat_ids:
+                continue
+            if all(any(_contains(postings, number) for postings in group) for group in others):
+                yield self._message_ids[number], chat_id
+
+
+def _contains(postings: array, number: int) -> bool:
+    position = bisect_left(postings, number)
+    return position < len(postings) and postings[position] == number
+
+
+class SearchIndex:
+    """In-process search over users, staff, cohorts, course/session titles, chats and messages.
+
+    Indexes are built in a background thread at startup and kept current by commit hooks.
+    Until a kind is ready, callers fall back to their database query. A kind is rebuilt in
+    the background once it is older than the rebuild interval, as safety net for writes
+    made outside the ORM.
+    """
+
+    def __init__(self, rebuild_interval: timedelta = timedelta(hours=1)):
+        self._indexes: Dict[str, Any] = {}
+        self._built_at: Dict[str, datetime] = {}
+        self._rebuild_interval = rebuild_interval
+        # Changes committed while a kind is being (re)built, replayed onto the new index
+        self._building: Dict[str, List[Tuple]] = {}
+        self._build_again: set = set()
+        self._lock = threading.RLock()
+
+    # Building --------------------------------------------------------------------
+    def start_background_build(self, kinds: Optional[Iterable[str]] = None):
+        kinds = list(kinds) if kinds is not None else list(FIELD_SOURCES) + [MESSAGES]
+        thread = threading.Thread(target=self._build_all, args=(kinds,), name="search-index-build", daemon=True)
+        thread.start()
+        return thread
+
+    def _build_all(self, kinds: List[str]):
+        for kind in kinds:
+            try:
+                self.build(kind)
+            except Exception as e:
+                logger.error(f"Failed to build search index for {kind}: {str(e)}")
+
+    def build(self, kind: str):
+        """(Re)build one kind from the database, keeping the old index in service meanwhile"""
+        with self._lock:
+            if kind in self._building:
+                # The running build may have read rows from before the change; go again after it
+                self._build_again.add(kind)
+                return
+            self._building[kind] = []
+        db = SessionLocal()
+        try:
+            if kind == MESSAGES:
+                index = TokenIndex()
+                query = db.query(Message.id, Message.chat_id, Message.content).order_by(Message.id)
+                for row in query.yield_per(10000):
+                    index.add(row.id, row.chat_id, row.content)
+            else:
+                model, fields = FIELD_SOURCES[kind]
+                index = TrigramIndex(fields)
+                columns = [model.id] + [getattr(model, field) for field in fields]
+                for row in db.query(*columns).order_by(model.id).yield_per(10000):
+                    index.add(row[0], tuple(row[1:]))
+        except Exception:
+            with self._lock:
+                self._building.pop(kind, None)
+            raise
+        finally:
+            db.close()
+
+        with self._lock:
+            for change in self._building.pop(kind, []):
+                self._apply(index, kind, change)
+            self._indexes[kind] = index
+            self._built_at[kind] = datetime.utcnow()
+            again = kind in self._build_again
+            self._build_again.discard(kind)
+        logger.info(f"Search index for {kind} built with {len(index)} documents")
+        if again:
+            self.build(kind)
+
+    def ready(self, kind: str) -> bool:
+        return kind in self._indexes
+
+    # Updates ---------------------------------------------------------------------
+    def apply_changes(self, changes: Iterable[Tuple]):
+        """Apply (kind, doc_id, values) changes; values is None for deletions"""
+        with self._lock:
+            for change in changes:
+                kind = change[0]
+                if kind in self._building:
+                    self._building[kind].append(change)
+                index = self._indexes.get(kind)
+                if index is not None:
+                    self._apply(index, kind, change)
+
+    @staticmethod
+    def _apply(index, kind: str, change: Tuple):
+        _, doc_id, values = change
+        if values is None:
+            index.remove(doc_id)
+        elif kind == MESSAGES:
+            index.add(doc_id, *values)
+        else:
+            index.add(doc_id, values)
+
+    def rebuild_in_background(self, kinds: Iterable[str]):
+        self.start_background_build(kinds)
+
+    def _index(self, kind: str):
+        """The index of ``kind`` if ready (caller holds the lock); schedules a rebuild when stale"""
+        index = self._indexes.get(kind)
+        if index is not None and kind not in self._building:
+            now = datetime.utcnow()
+            if now - self._built_at[kind] > self._rebuild_interval:
+                # Counts as fresh until the rebuild lands so only one is started
+                self._built_at[kind] = now
+                self.rebuild_in_background([kind])
+        return index
+
+    # Queries ---------------------------------------------------------------------
+    def search(self, kind: str, term: str, limit: int = 10,
+               fields: Optional[Iterable[str]] = None) -> Optional[List[Dict[str, Any]]]:
+        """Newest matching documents of one kind with their indexed fields, or None if not ready"""
+        term = (term or "").strip()
+        with self._lock:
+            if kind == MESSAGES:
+                return None
+            index = self._index(kind)
+            if index is None:
+                return None
+            results = []
+            for doc_id, values in index.search(term, fields):
+                results.append(dict(zip(("id",) + index.field_names, (doc_id,) + values)))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def match_ids(self, kind: str, term: str, fields: Optional[Iterable[str]] = None,
+                  limit: Optional[int] = None) -> Optional[List[int]]:
+        """Ids of matching documents (up to ``limit``), or None if the index is not ready"""
+        term = (term or "").strip()
+        with self._lock:
+            if kind == MESSAGES:
+                return None
+            index = self._index(kind)
+            if index is None:
+                return None
+            ids = []
+            for doc_id, _ in index.search(term, fields):
+                ids.append(doc_id)
+                if limit is not None and len(ids) >= limit:
+                    break
+            return ids
+
+    def search_messages(self, term: str, chat_ids: Optional[Iterable[int]] = None,
+                        limit: int = 20) -> Optional[List[Tuple[int, int]]]:
+        """(message_id, chat_id) of the newest messages matching every word, or None if not ready"""
+        allowed = set(chat_ids) if chat_ids is not None else None
+        with self._lock:
+            index = self._index(MESSAGES)
+            if index is None:
+                return None
+            results = []
+            for match in index.search(term or "", allowed):
+                results.append(match)
+                if len(results) >= limit:
+                    break
+            return results
+
+    def message_chat_ids(self, term: str, chat_ids: Iterable[int]) -> Optional[set]:
+        """Which of the given chats have a message matching ``term``, or None if not ready"""
+        allowed = set(chat_ids)
+        found = set()
+        with self._lock:
+            index = self._index(MESSAGES)
+            if index is None:
+                return None
+            for _, chat_id in index.search(term or "", allowed):
+                found.add(chat_id)
+                # Later matches can only repeat chats already found
+                allowed.discard(chat_id)
+                if not allowed:
+                    break
+            return found
+
+    def filter_clause(self, kind: str, id_column, term: str, fallback,
+                      fields: Optional[Iterable[str]] = None):
+        """SQL filter for a search term: an id list from the index, else the ``fallback`` clause"""
+        ids = self.match_ids(kind, term, fields, limit=MAX_IN_IDS + 1)
+        if ids is None or len(ids) > MAX_IN_IDS:
+            return fallback
+        if not ids:
+            return false()
+        return id_column.in_(ids)
+
+
+# Global search index instance
+search_index = SearchIndex(timedelta(minutes=SEARCH_INDEX_REBUILD_MINUTES))
+
+
+def create_fulltext_indexes() -> List[str]:
+    """Create MySQL FULLTEXT indexes for the searched columns; returns the indexes created"""
+    if engine.dialect.name != "mysql":
+        raise ValueError(f"FULLTEXT indexes are not supported on {engine.dialect.name}")
+    wanted = {
+        "ft_users_search": ("users", "username, email, college"),
+        "ft_cohorts_search": ("cohorts", "name, description, instructor_name"),
+        "ft_courses_title": ("courses", "title"),
+        "ft_sessions_title": ("sessions", "title"),
+        "ft_messages_content": ("messages", "content"),
+    }
+    created = []
+    with engine.begin() as connection:
+        existing = {row[0] for row in connection.execute(text(
+            "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE()"
+        ))}
+        for name, (table, columns) in wanted.items():
+            if name in existing:
+                continue
+            connection.execute(text(f"ALTER TABLE {table} ADD FULLTEXT INDEX {name} ({columns})"))
+            created.append(name)
+    return created
+
+
+def _values(instance, kind: str):
+    if kind == MESSAGES:
+        return (instance.chat_id, instance.content)
+    return tuple(getattr(instance, field) for field in FIELD_SOURCES[kind][1])
+
+
+def _kind_of(instance) -> Optional[str]:
+    if isinstance(instance, Message):
+        return MESSAGES
+    return _MODEL_KINDS.get(type(instance))
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_search_changes(session, flush_context):
+    """Capture the indexed values of written rows while they are still loaded"""
+    pending = None
+    for instance in list(session.new) + list(session.dirty):
+        kind = _kind_of(instance)
+        if kind and instance.id is not None:
+            pending = pending if pending is not None else session.info.setdefault(_PENDING_KEY, [])
+            pending.append((kind, instance.id, _values(instance, kind)))
+    for instance in session.deleted:
+        kind = _kind_of(instance)
+        if kind and instance.id is not None:
+            pending = pending if pending is not None else session.info.setdefault(_PENDING_KEY, [])
+            pending.append((kind, instance.id, None))
+
+
+def _bulk_kind(context) -> Optional[str]:
+    model = context.mapper.class_
+    return MESSAGES if model is Message else _MODEL_KINDS.get(model)
+
+
+def _collect_bulk_update(context):
+    """Rebuild a kind after a bulk UPDATE only if it wrote one of the indexed columns"""
+    kind = _bulk_kind(context)
+    if not kind:
+        return
+    values = context.values.items() if hasattr(context.values, "items") else context.values
+    columns = {key if isinstance(key, str) else getattr(key, "key", None) for key, _ in values}
+    fields = MESSAGE_FIELDS if kind == MESSAGES else FIELD_SOURCES[kind][1]
+    if columns.intersection(fields):
+        context.session.info.setdefault(_PENDING_KEY, []).append((kind, None, "rebuild"))
+
+
+def _capture_bulk_delete(query, context):
+    """Read the ids a bulk DELETE is about to remove; the rows are gone by after_bulk_delete"""
+    kind = _bulk_kind(context)
+    if kind:
+        model = context.mapper.class_
+        context.search_index_ids = [row[0] for row in query.with_entities(model.id)]
+
+
+def _collect_bulk_delete(context):
+    kind = _bulk_kind(context)
+    ids = getattr(context, "search_index_ids", None)
+    if kind and ids:
+        context.session.info.setdefault(_PENDING_KEY, []).extend((kind, doc_id, None) for doc_id in ids)
+
+
+event.listen(SessionLocal, "after_bulk_update", _collect_bulk_update)
+event.listen(Query, "before_compile_delete", _capture_bulk_delete)
+event.listen(SessionLocal, "after_bulk_delete", _collect_bulk_delete)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_search_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    rebuild = {kind for kind, doc_id, values in pending if doc_id is None}
+    search_index.apply_changes(change for change in pending if change[0] not in rebuild)
+    if rebuild:
+        search_index.rebuild_in_background(rebuild)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_search_changes(session):
+    session.info.pop(_PENDING_KEY, None)
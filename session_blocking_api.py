@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timedelta
 from pydantic import BaseModel
 from typing import Optional
 from database import get_db
@@ -11,6 +11,7 @@ from session_blocking_service import (
     delete_session_with_blocking,
     get_session_conflicts
 )
+from calendar_blocking_service import CalendarBlockingService
 
 router = APIRouter(prefix="/sessions", tags=["Sessions with Blocking"])
 
@@ -195,7 +196,28 @@ async def bulk_schedule_sessions(
         elif db.query(Manager).filter(Manager.id == current_user.id).first():
             user_type = "Manager"
         
-        for session_data in sessions:
+        # Check every scheduled slot against the calendar and against each other in one pass
+        scheduled = []
+        for position, session_data in enumerate(sessions):
+            if session_data.get('scheduled_time'):
+                start = datetime.fromisoformat(session_data['scheduled_time'])
+                scheduled.append((position, start, start + timedelta(minutes=session_data.get('duration_minutes') or 120)))
+        batch_results = CalendarBlockingService.check_batch_conflicts(db, [(start, end) for _, start, end in scheduled])
+        rejected = set()
+        for (position, start, end), check in zip(scheduled, batch_results):
+            # Within the batch the earlier submitted session wins the slot
+            earlier = [scheduled[j][0] for j in check["batch_conflicts"] if scheduled[j][0] < position and scheduled[j][0] not in rejected]
+            if check["conflicts"] or earlier:
+                rejected.add(position)
+                conflicts.append({
+                    "title": sessions[position]['title'],
+                    "scheduled_time": sessions[position].get('scheduled_time'),
+                    "error": f"Time slot conflict: {start} - {end} is already blocked"
+                })
+        
+        for position, session_data in enumerate(sessions):
+            if position in rejected:
+                continue
             try:
                 session = create_session_with_blocking(
                     db=db,
@@ -204,11 +226,12 @@ async def bulk_schedule_sessions(
                     title=session_data['title'],
                     description=session_data.get('description'),
                     scheduled_time=datetime.fromisoformat(session_data['scheduled_time']) if session_data.get('scheduled_time') else None,
-                    duration_minutes=session_data.get('duration_minutes', 120),
+                    duration_minutes=session_data.get('duration_minutes') or 120,
                     zoom_link=session_data.get('zoom_link'),
                     syllabus_content=session_data.get('syllabus_content'),
                     created_by=current_user.id,
-                    user_type=user_type
+                    user_type=user_type,
+                    check_conflicts=False
                 )
                 
                 results.append({
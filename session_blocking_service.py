@@ -9,12 +9,13 @@ logger = logging.getLogger(__name__)
 def create_session_with_blocking(db: Session, module_id: int, session_number: int, title: str,
                                description: str = None, scheduled_time: datetime = None,
                                duration_minutes: int = 120, zoom_link: str = None,
-                               syllabus_content: str = None, created_by: int = None, user_type: str = "Admin"):
+                               syllabus_content: str = None, created_by: int = None, user_type: str = "Admin",
+                               check_conflicts: bool = True):
     """Create session with automatic calendar blocking"""
     
     try:
-        # Check for time conflicts if scheduled
-        if scheduled_time:
+        # Check for time conflicts if scheduled (bulk callers check the whole batch up front)
+        if scheduled_time and check_conflicts:
             end_time = scheduled_time + timedelta(minutes=duration_minutes)
             if CalendarBlockingService.check_time_conflict(db, scheduled_time, end_time):
                 raise ValueError(f"Time slot conflict: {scheduled_time} - {end_time} is already blocked")
@@ -36,7 +37,7 @@ def create_session_with_blocking(db: Session, module_id: int, session_number: in
         
         # Auto-create calendar block if scheduled
         if scheduled_time:
-            CalendarBlockingService.create_session_block(db, session, created_by, user_type)
+            CalendarBlockingService.create_session_block(db, session, created_by, user_type, check_conflicts)
             logger.info(f"Auto-created calendar block for session: {title}")
         
         db.commit()
@@ -61,8 +62,13 @@ def update_session_with_blocking(db: Session, session_id: int, title: str = None
         
         # Check for conflicts if rescheduling
         if scheduled_time and scheduled_time != original_time:
-            end_time = scheduled_time + timedelta(minutes=duration_minutes or session.duration_minutes)
-            if CalendarBlockingService.check_time_conflict(db, scheduled_time, end_time):
+            end_time = scheduled_time + timedelta(minutes=duration_minutes or session.duration_minutes or 120)
+            # Neither the session nor its own block may conflict with the new slot
+            excluded = [("session", session_id)]
+            block = CalendarBlockingService.find_session_block(db, original_time) if original_time else None
+            if block:
+                excluded.append(("event", block.id))
+            if CalendarBlockingService.check_time_conflict(db, scheduled_time, end_time, exclude_sources=excluded):
                 raise ValueError(f"Time slot conflict: {scheduled_time} - {end_time} is already blocked")
         
         # Update session
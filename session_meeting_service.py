@@ -60,7 +60,11 @@ def update_session_meeting(db: Session, meeting_id: int, title: str = None, meet
         # Check for conflicts if rescheduling
         if scheduled_time and scheduled_time != original_time:
             end_time = scheduled_time + timedelta(minutes=duration_minutes or meeting.duration_minutes)
-            if CalendarBlockingService.check_time_conflict(db, scheduled_time, end_time):
+            # The meeting and its own calendar block never conflict with the new time
+            own_sources = [("meeting", meeting_id)] + [
+                ("event", row.id) for row in db.query(CalendarEvent.id).filter(CalendarEvent.session_meeting_id == meeting_id).all()
+            ]
+            if CalendarBlockingService.check_time_conflict(db, scheduled_time, end_time, exclude_sources=own_sources):
                 raise ValueError(f"Time slot conflict: {scheduled_time} - {end_time} is already blocked")
         
         # Update meeting
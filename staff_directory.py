@@ -0,0 +1,134 @@
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+
+from sqlalchemy import select, union_all, literal, func, or_, and_
+from sqlalchemy.orm import Session
+
+from database import Admin, Presenter, Manager, Mentor
+
+logger = logging.getLogger(__name__)
+
+# Role name -> staff table
+STAFF_MODELS = {
+    "Admin": Admin,
+    "Presenter": Presenter,
+    "Manager": Manager,
+    "Mentor": Mentor,
+}
+
+
+def encode_cursor(created_at: datetime, role: str, member_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), role, member_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str, int]:
+    created_at, role, member_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    return datetime.fromisoformat(created_at), role, int(member_id)
+
+
+def _prefix_match(model, search: str):
+    # A literal 'x%' pattern lets the unique username/email indexes serve the search,
+    # unlike contains() ('%x%')
+    pattern = search.replace("/", "//").replace("%", "/%").replace("_", "/_") + "%"
+    return or_(model.username.like(pattern, escape="/"), model.email.like(pattern, escape="/"))
+
+
+def _branch(model, role: str, search: str, after: Optional[Tuple[datetime, str, int]], size: int):
+    """Newest-first slice of one staff table, served from its (created_at, id) index"""
+    query = select(
+        literal(role).label("role"),
+        model.id.label("id"),
+        model.username.label("username"),
+        model.email.label("email"),
+        model.created_at.label("created_at"),
+    )
+    if search:
+        query = query.where(_prefix_match(model, search))
+    if after:
+        created_at, after_role, after_id = after
+        # Rows sort by (created_at desc, role desc, id desc); the role is constant per table
+        if role < after_role:
+            query = query.where(model.created_at <= created_at)
+        elif role == after_role:
+            query = query.where(or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < after_id)
+            ))
+        else:
+            query = query.where(model.created_at < created_at)
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(size).subquery()
+
+
+def list_staff(db: Session, limit: int = 50, page: int = 1, cursor: Optional[str] = None,
+               search: str = "", role: str = "", with_total: bool = True) -> Dict[str, Any]:
+    """One page of admins, presenters, managers and mentors, newest first.
+
+    Each table contributes at most one page worth of rows through its index and the
+    slices are merged with UNION ALL, so the cost of a page does not grow with the
+    number of staff. Pass the returned ``next_cursor`` for keyset pagination; ``page``
+    is still accepted and costs ``page * limit`` rows per table.
+    """
+    roles = [role] if role else list(STAFF_MODELS)
+    roles = [r for r in roles if r in STAFF_MODELS]
+    search = (search or "").strip()
+    after = decode_cursor(cursor) if cursor else None
+    offset = 0 if after else (max(page, 1) - 1) * limit
+    size = offset + limit + 1  # One extra row tells whether another page exists
+
+    users: List[Dict[str, Any]] = []
+    next_cursor = None
+    if roles:
+        branches = [_branch(STAFF_MODELS[r], r, search, after, size) for r in roles]
+        merged = union_all(*[select(*branch.c) for branch in branches]).subquery()
+        rows = db.execute(
+            select(merged).order_by(
+                merged.c.created_at.desc(), merged.c.role.desc(), merged.c.id.desc()
+            ).offset(offset).limit(limit + 1)
+        ).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last.created_at, last.role, last.id)
+        users = [{
+            "id": row.id,
+            "username": row.username,
+            "email": row.email,
+            "role": row.role,
+            "college": None,
+            "department": None,
+            "year": None,
+            "user_type": row.role,
+            "active": True,
+            "created_at": row.created_at
+        } for row in rows]
+
+    result = {
+        "users": users,
+        "page": page,
+        "limit": limit,
+        "next_cursor": next_cursor,
+    }
+    if with_total:
+        result["total"] = count_staff(db, search, roles)
+    return result
+
+
+def count_staff(db: Session, search: str = "", roles: Optional[List[str]] = None) -> int:
+    """Number of staff matching a search, summed across tables in one statement"""
+    counts = []
+    for role in roles if roles is not None else list(STAFF_MODELS):
+        model = STAFF_MODELS[role]
+        query = select(func.count(model.id))
+        if search:
+            query = query.where(_prefix_match(model, search))
+        counts.append(query.scalar_subquery())
+    if not counts:
+        return 0
+    total = counts[0]
+    for count in counts[1:]:
+        total = total + count
+    return db.execute(select(total)).scalar() or 0
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import logging
+from contextlib import contextmanager
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Log every measured step at startup instead of only the totals and the slowest steps
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "false").lower() == "true"
+STARTUP_PROFILE_TOP = int(os.getenv("STARTUP_PROFILE_TOP", "5"))
+
+_MB = 1024 * 1024
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes; None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class StartupStep(NamedTuple):
+    name: str
+    seconds: float
+    rss_delta: Optional[int]
+    modules_loaded: int
+
+
+class StartupProfiler:
+    """Import time, RSS growth and number of modules loaded by each step of worker boot.
+
+    ``measure(name)`` wraps one step (importing a router module); ``checkpoint(name)``
+    records everything since the previous step. Modules imported lazily after startup are
+    recorded and logged as they happen, so their cost stays visible.
+    """
+
+    def __init__(self):
+        self.steps: List[StartupStep] = []
+        self.started = time.perf_counter()
+        self.start_rss = current_rss()
+        self.finished = False
+        self._mark = (self.started, self.start_rss, len(sys.modules))
+
+    def _record(self, name: str, since) -> StartupStep:
+        started, rss, modules = since
+        now_rss = current_rss()
+        step = StartupStep(
+            name,
+            time.perf_counter() - started,
+            now_rss - rss if now_rss is not None and rss is not None else None,
+            len(sys.modules) - modules
+        )
+        self.steps.append(step)
+        self._mark = (time.perf_counter(), now_rss, len(sys.modules))
+        return step
+
+    @contextmanager
+    def measure(self, name: str):
+        since = (time.perf_counter(), current_rss(), len(sys.modules))
+        try:
+            yield
+        finally:
+            step = self._record(name, since)
+            if self.finished:
+                logger.info(f"Loaded {_describe(step)} after startup")
+
+    def checkpoint(self, name: str):
+        self._record(name, self._mark)
+
+    def log_report(self):
+        """Log boot time and RSS, with the slowest steps (every step when STARTUP_PROFILE is set)"""
+        self.finished = True
+        rss = current_rss()
+        steps = self.steps if STARTUP_PROFILE else sorted(self.steps, key=lambda s: s.seconds, reverse=True)[:STARTUP_PROFILE_TOP]
+        lines = "".join(f"\n    {_describe(step)}" for step in steps)
+        logger.info(
+            f"Startup took {time.perf_counter() - self.started:.2f}s, RSS {_megabytes(rss)}, "
+            f"{len(sys.modules)} modules loaded; {'steps' if STARTUP_PROFILE else 'slowest steps'}:{lines}"
+        )
+
+
+def _megabytes(value: Optional[int], sign: bool = False) -> str:
+    if value is None:
+        return "n/a"
+    return f"{value / _MB:{'+' if sign else ''}.1f}MB"
+
+
+def _describe(step: StartupStep) -> str:
+    return f"{step.name}: {step.seconds * 1000:.0f}ms, {_megabytes(step.rss_delta, sign=True)} RSS, {step.modules_loaded} modules"
+
+
+# Global instance; created when main.py starts importing
+startup_profiler = StartupProfiler()
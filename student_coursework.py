@@ -0,0 +1,103 @@
+import logging
+from typing import List, Iterable, Any
+
+from sqlalchemy import func, literal
+from sqlalchemy.orm import Session, Query
+
+from database import Course, Module, Session as SessionModel
+from cohort_specific_models import CohortSpecificCourse, CohortCourseModule, CohortCourseSession
+from assignment_quiz_models import (
+    Assignment, AssignmentSubmission, AssignmentGrade, Quiz, QuizAttempt, QuizResult
+)
+
+logger = logging.getLogger(__name__)
+
+# Course type -> (session type stored on assignments/quizzes, course, module, session models)
+COURSE_TREES = {
+    "regular": ("global", Course, Module, SessionModel),
+    "cohort_specific": ("cohort", CohortSpecificCourse, CohortCourseModule, CohortCourseSession),
+}
+
+
+def _first_per(db: Session, model, group_column, student_id: int):
+    """Lowest id of the student's rows per group, standing in for the old ``.first()`` lookups"""
+    return db.query(
+        group_column.label("key"), func.min(model.id).label("id")
+    ).filter(model.student_id == student_id).group_by(group_column).subquery()
+
+
+def _course_rows(db: Session, item_model, child_model, child_first, leaf_model, leaf_first,
+                 regular_course_ids: Iterable[int], cohort_course_ids: Iterable[int]) -> List[Any]:
+    """Active items of the given courses outer-joined to the student's child and leaf rows.
+
+    One statement per course type: the item is joined up its session, module and course,
+    and down to the student's first child (submission/attempt) and that child's first
+    leaf (grade/result).
+    """
+    rows = []
+    for course_type, course_ids in (("regular", regular_course_ids), ("cohort_specific", cohort_course_ids)):
+        course_ids = list(course_ids)
+        if not course_ids:
+            continue
+        session_type, course_model, module_model, session_model = COURSE_TREES[course_type]
+        query: Query = db.query(
+            item_model,
+            child_model,
+            leaf_model,
+            session_model.title.label("session_title"),
+            module_model.title.label("module_title"),
+            course_model.title.label("course_title"),
+            literal(course_type).label("course_type"),
+        ).join(
+            session_model, session_model.id == item_model.session_id
+        ).join(
+            module_model, module_model.id == session_model.module_id
+        ).outerjoin(
+            course_model, course_model.id == module_model.course_id
+        ).outerjoin(
+            child_first, child_first.c.key == item_model.id
+        ).outerjoin(
+            child_model, child_model.id == child_first.c.id
+        ).outerjoin(
+            leaf_first, leaf_first.c.key == child_model.id
+        ).outerjoin(
+            leaf_model, leaf_model.id == leaf_first.c.id
+        ).filter(
+            module_model.course_id.in_(course_ids),
+            item_model.session_type == session_type,
+            item_model.is_active == True
+        )
+        rows.extend(query.order_by(item_model.id).all())
+    return rows
+
+
+def student_assignments(db: Session, student_id: int, regular_course_ids: Iterable[int],
+                        cohort_course_ids: Iterable[int]) -> List[Any]:
+    """Active assignments of the given courses with the student's submission and grade.
+
+    Rows carry ``Assignment``, ``AssignmentSubmission`` and ``AssignmentGrade`` (None when
+    missing) plus ``session_title``, ``module_title``, ``course_title`` and ``course_type``.
+    """
+    return _course_rows(
+        db,
+        Assignment,
+        AssignmentSubmission, _first_per(db, AssignmentSubmission, AssignmentSubmission.assignment_id, student_id),
+        AssignmentGrade, _first_per(db, AssignmentGrade, AssignmentGrade.submission_id, student_id),
+        regular_course_ids, cohort_course_ids
+    )
+
+
+def student_quizzes(db: Session, student_id: int, regular_course_ids: Iterable[int],
+                    cohort_course_ids: Iterable[int]) -> List[Any]:
+    """Active quizzes of the given courses with the student's attempt and its result.
+
+    Rows carry ``Quiz``, ``QuizAttempt`` and ``QuizResult`` (None when missing) plus
+    ``session_title``, ``module_title``, ``course_title`` and ``course_type``.
+    """
+    return _course_rows(
+        db,
+        Quiz,
+        QuizAttempt, _first_per(db, QuizAttempt, QuizAttempt.quiz_id, student_id),
+        QuizResult, _first_per(db, QuizResult, QuizResult.attempt_id, student_id),
+        regular_course_ids, cohort_course_ids
+    )
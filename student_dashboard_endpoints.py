@@ -6,6 +6,8 @@ from resource_analytics_models import ResourceView
 from assignment_quiz_models import Assignment, AssignmentSubmission, QuizResult, QuizStatus
 from auth import get_current_user, get_current_user_any_role
 from email_utils import send_course_enrollment_confirmation
+from entitlement_service import get_student_entitlements
+from course_tree_cache import course_tree_cache, iter_tree_sessions
 import logging
 from datetime import datetime
 
@@ -17,21 +19,28 @@ def get_student_enrollment_status(db: Session, student_id: int, course_id: int =
     """Helper function to get student enrollment status - ENROLLMENT + COHORT ACCESS REQUIRED"""
     from cohort_specific_models import CohortSpecificCourse, CohortSpecificEnrollment
     
+    # Id sets come from the shared resolver (memoized per request and cached per user)
+    entitlements = get_student_entitlements(db, student_id)
+    
     # Get direct enrollments for regular courses
-    direct_enrollments = db.query(Enrollment).filter(
-        Enrollment.student_id == student_id
-    )
-    if course_id:
-        direct_enrollments = direct_enrollments.filter(Enrollment.course_id == course_id)
-    direct_enrollments = direct_enrollments.all()
+    direct_enrollments = []
+    if entitlements["enrolled_regular_course_ids"]:
+        direct_enrollments = db.query(Enrollment).filter(
+            Enrollment.student_id == student_id
+        )
+        if course_id:
+            direct_enrollments = direct_enrollments.filter(Enrollment.course_id == course_id)
+        direct_enrollments = direct_enrollments.all()
     
     # Get cohort-specific enrollments
-    cohort_enrollments = db.query(CohortSpecificEnrollment).filter(
-        CohortSpecificEnrollment.student_id == student_id
-    )
-    if course_id:
-        cohort_enrollments = cohort_enrollments.filter(CohortSpecificEnrollment.course_id == course_id)
-    cohort_enrollments = cohort_enrollments.all()
+    cohort_enrollments = []
+    if entitlements["enrolled_cohort_specific_course_ids"]:
+        cohort_enrollments = db.query(CohortSpecificEnrollment).filter(
+            CohortSpecificEnrollment.student_id == student_id
+        )
+        if course_id:
+            cohort_enrollments = cohort_enrollments.filter(CohortSpecificEnrollment.course_id == course_id)
+        cohort_enrollments = cohort_enrollments.all()
     
     # Get user's cohorts for access checking
     user_cohorts = db.query(UserCohort).filter(
@@ -39,83 +48,24 @@ def get_student_enrollment_status(db: Session, student_id: int, course_id: int =
         UserCohort.is_active == True
     ).all()
     
-    # Get user object to check direct cohort_id
-    user = db.query(User).filter(User.id == student_id).first()
-    user_cohort_id = user.cohort_id if user else None
-    
-    # Get available cohort courses (for browse page)
+    # Get available cohort courses (for browse page), across UserCohort and User.cohort_id in one query each
     cohort_courses = []
     cohort_specific_courses = []
-    cohort_assigned_course_ids = set()
-    
-    # Track which cohort IDs we've already processed
-    processed_cohort_ids = set()
-    
-    # Combine cohort IDs from UserCohort and User table
-    all_cohort_ids = [uc.cohort_id for uc in user_cohorts]
-    if user_cohort_id and user_cohort_id not in all_cohort_ids:
-        all_cohort_ids.append(user_cohort_id)
-        
-    for cid in all_cohort_ids:
-        if cid in processed_cohort_ids:
-            continue
-        processed_cohort_ids.add(cid)
-        
-        # Get regular courses assigned to cohort from legacy table
-        # Filter by approval_status
-        cohort_course_assignments = db.query(CohortCourse).join(Course).filter(
-            CohortCourse.cohort_id == cid,
+    if entitlements["cohort_ids"]:
+        cohort_courses = db.query(CohortCourse).join(Course).filter(
+            CohortCourse.cohort_id.in_(entitlements["cohort_ids"]),
             Course.approval_status == 'approved'
         ).all()
-        cohort_courses.extend(cohort_course_assignments)
-        
-        # Get cohort-specific courses
-        cohort_specific = db.query(CohortSpecificCourse).filter(
-            CohortSpecificCourse.cohort_id == cid,
-            CohortSpecificCourse.is_active == True
-        ).all()
-        cohort_specific_courses.extend(cohort_specific)
-
-    # 3. Add Courses from Unified CourseAssignment table (Comprehensive)
-    from database import CourseAssignment
-    from sqlalchemy import or_, and_
-    
-    ca_filters = [
-        CourseAssignment.assignment_type == 'all',
-        and_(CourseAssignment.assignment_type == 'individual', CourseAssignment.user_id == student_id)
-    ]
-    
-    if user_cohort_id:
-        ca_filters.append(and_(CourseAssignment.assignment_type == 'cohort', CourseAssignment.cohort_id == user_cohort_id))
-    
-    # Get any other cohorts the user is in
-    additional_cohort_ids = [uc.cohort_id for uc in user_cohorts if uc.cohort_id != user_cohort_id]
-    if additional_cohort_ids:
-        ca_filters.append(and_(CourseAssignment.assignment_type == 'cohort', CourseAssignment.cohort_id.in_(additional_cohort_ids)))
-    
-    if user and hasattr(user, 'college') and user.college:
-        ca_filters.append(and_(CourseAssignment.assignment_type == 'college', CourseAssignment.college == user.college))
-    
-    # Filter unified assignments by course approval status
-    unified_assignments = db.query(CourseAssignment).join(Course).filter(
-        Course.approval_status == 'approved',
-        or_(*ca_filters)
-    ).all()
-    for ua in unified_assignments:
-        cohort_assigned_course_ids.add(ua.course_id)
-        
-    # Also include legacy CohortCourse associations (already filtered by approval_status above)
-    for cid in all_cohort_ids:
-        cc_assignments = db.query(CohortCourse).join(Course).filter(
-            CohortCourse.cohort_id == cid,
-            Course.approval_status == 'approved'
+    if entitlements["cohort_specific_course_ids"]:
+        cohort_specific_courses = db.query(CohortSpecificCourse).filter(
+            CohortSpecificCourse.id.in_(entitlements["cohort_specific_course_ids"])
         ).all()
-        for cc in cc_assignments:
-            cohort_assigned_course_ids.add(cc.course_id)
     
     # Combined sets for return
-    enrolled_regular_course_ids = {e.course_id for e in direct_enrollments}
-    enrolled_cohort_course_ids = {c.id for c in cohort_specific_courses}
+    enrolled_regular_course_ids = set(entitlements["enrolled_regular_course_ids"])
+    if course_id:
+        enrolled_regular_course_ids &= {course_id}
+    enrolled_cohort_course_ids = set(entitlements["cohort_specific_course_ids"])
     
     return {
         "direct_enrollments": direct_enrollments,
@@ -124,20 +74,21 @@ def get_student_enrollment_status(db: Session, student_id: int, course_id: int =
         "cohort_courses": cohort_courses,
         "cohort_specific_courses": cohort_specific_courses,
         "enrolled_regular_course_ids": enrolled_regular_course_ids,
-        "enrolled_cohort_course_ids": enrolled_cohort_course_ids
+        "enrolled_cohort_course_ids": enrolled_cohort_course_ids,
+        "cohort_assigned_course_ids": set(entitlements["assigned_regular_course_ids"])
     }
 
-def calculate_course_progress(db: Session, student_id: int, course_id: int, course_type: str = "regular"):
+def calculate_course_progress(db: Session, student_id: int, course_id: int, course_type: str = "regular", tree: dict = None, session_progress: dict = None):
     """
     Calculate overall progress for a course by aggregating progress of all its sessions hierarchically.
     Returns (progress_pct, total_resources, completed_resources, course_status, total_sessions, attended_sessions, total_modules)
     """
     try:
-        if course_type == "cohort_specific":
-            from cohort_specific_models import CohortCourseModule, CohortCourseSession
-            modules = db.query(CohortCourseModule).order_by(CohortCourseModule.week_number).filter(CohortCourseModule.course_id == course_id).all()
-        else:
-            modules = db.query(Module).order_by(Module.week_number).filter(Module.course_id == course_id).all()
+        if tree is None:
+            tree = course_tree_cache.get_tree(db, course_id, course_type)
+        if session_progress is None:
+            session_progress = calculate_student_tree_progress(db, student_id, tree)
+        modules = tree["modules"]
         
         if not modules:
             return 0, 0, 0, "Not Started", 0, 0, 0
@@ -151,20 +102,14 @@ def calculate_course_progress(db: Session, student_id: int, course_id: int, cour
         all_completed = True
         
         for module in modules:
-            if course_type == "cohort_specific":
-                sessions = db.query(CohortCourseSession).order_by(CohortCourseSession.session_number).filter(CohortCourseSession.module_id == module.id).all()
-                s_type = "cohort"
-            else:
-                sessions = db.query(SessionModel).order_by(SessionModel.session_number).filter(SessionModel.module_id == module.id).all()
-                s_type = "global"
-            
+            sessions = module["sessions"]
             if not sessions:
                 continue
                 
             module_session_progress_sum = 0
             for session in sessions:
                 total_sessions_count += 1
-                progress_pct, status, s_total, s_completed = calculate_student_session_progress(db, student_id, session.id, s_type)
+                progress_pct, status, s_total, s_completed = session_progress[session["id"]]
                 module_session_progress_sum += progress_pct
                 total_resources += s_total
                 completed_resources += s_completed
@@ -195,6 +140,124 @@ def calculate_course_progress(db: Session, student_id: int, course_id: int, cour
         logger.error(f"Error calculating course progress: {str(e)}")
         return 0, 0, 0, "Not Started", 0, 0, 0
 
+def calculate_student_tree_progress(db: Session, student_id: int, tree: dict):
+    """
+    Per-student overlay on a cached course tree: progress of every session in the course,
+    computed with one query per item kind instead of per session/resource.
+    Returns {session_id: (completion_percentage, current_status, total_items, completed_items)}
+    """
+    from resource_analytics_models import ResourceView
+    from assignment_quiz_tables import QuizAttempt, QuizStatus, AssignmentSubmission, AssignmentStatus
+    
+    session_type = tree["session_type"]
+    sessions = [session for _, session in iter_tree_sessions(tree)]
+    if not sessions:
+        return {}
+    
+    session_ids = [s["id"] for s in sessions]
+    status_records = {r.session_id: r for r in db.query(StudentSessionStatus).filter(
+        StudentSessionStatus.student_id == student_id,
+        StudentSessionStatus.session_id.in_(session_ids),
+        StudentSessionStatus.session_type == session_type
+    ).all()}
+    
+    viewable_ids = set()
+    quiz_ids = set()
+    assignment_ids = set()
+    for s in sessions:
+        viewable_ids.update(s["resource_ids"])
+        viewable_ids.update(c["id"] for c in s["contents"] if c["content_type"] in ["MATERIAL", "RESOURCE", "VIDEO"])
+        quiz_ids.update(s["quiz_ids"])
+        assignment_ids.update(s["assignment_ids"])
+    
+    viewed_ids = set()
+    if viewable_ids:
+        viewed_ids = {row.resource_id for row in db.query(ResourceView.resource_id).filter(
+            ResourceView.student_id == student_id,
+            ResourceView.resource_id.in_(viewable_ids),
+            ResourceView.resource_type == ("COHORT_RESOURCE" if session_type == "cohort" else "RESOURCE")
+        ).distinct().all()}
+    completed_quiz_ids = set()
+    if quiz_ids:
+        completed_quiz_ids = {row.quiz_id for row in db.query(QuizAttempt.quiz_id).filter(
+            QuizAttempt.quiz_id.in_(quiz_ids),
+            QuizAttempt.student_id == student_id,
+            QuizAttempt.status == QuizStatus.COMPLETED
+        ).distinct().all()}
+    submitted_assignment_ids = set()
+    if assignment_ids:
+        submitted_assignment_ids = {row.assignment_id for row in db.query(AssignmentSubmission.assignment_id).filter(
+            AssignmentSubmission.assignment_id.in_(assignment_ids),
+            AssignmentSubmission.student_id == student_id,
+            AssignmentSubmission.status.in_([AssignmentStatus.SUBMITTED, AssignmentStatus.EVALUATED])
+        ).distinct().all()}
+    
+    results = {}
+    should_commit = False
+    for s in sessions:
+        status_record = status_records.get(s["id"])
+        current_status = status_record.status if status_record else "Not Started"
+        
+        # Filter out meeting links from session contents for progress calculation
+        trackable_contents = [c for c in s["contents"] if c["content_type"] != "MEETING_LINK"]
+        total_items = len(s["resource_ids"]) + len(trackable_contents) + len(s["quiz_ids"]) + len(s["assignment_ids"])
+        if total_items == 0:
+            # If "Started" manually but no resources, keep it Started
+            results[s["id"]] = (0, current_status, 0, 0)
+            continue
+        
+        completed_items = sum(1 for rid in s["resource_ids"] if rid in viewed_ids)
+        for content in trackable_contents:
+            if content["content_type"] in ["MATERIAL", "RESOURCE", "VIDEO"]:
+                if content["id"] in viewed_ids:
+                    completed_items += 1
+            elif current_status != "Not Started" and current_status != "Staff View":
+                # Other trackable types
+                completed_items += 1
+        completed_items += sum(1 for qid in s["quiz_ids"] if qid in completed_quiz_ids)
+        completed_items += sum(1 for aid in s["assignment_ids"] if aid in submitted_assignment_ids)
+        
+        completion_percentage = (completed_items / total_items) * 100
+        if completion_percentage >= 99.9: # Use threshold for floats
+            target_status = "Completed"
+        elif completion_percentage > 0 or current_status == "Started":
+            target_status = "Started"
+        else:
+            target_status = "Not Started"
+        
+        # Update status record if changed (committed once for the whole course)
+        if not status_record and target_status != "Not Started":
+            db.add(StudentSessionStatus(
+                student_id=student_id,
+                session_id=s["id"],
+                session_type=session_type,
+                status=target_status,
+                started_at=datetime.utcnow() if target_status == "Started" else None,
+                completed_at=datetime.utcnow() if target_status == "Completed" else None,
+                progress_percentage=completion_percentage
+            ))
+            should_commit = True
+        elif status_record:
+            if status_record.status != target_status:
+                status_record.status = target_status
+                if target_status == "Completed" and not status_record.completed_at:
+                    status_record.completed_at = datetime.utcnow()
+                should_commit = True
+            if abs((status_record.progress_percentage or 0) - completion_percentage) > 0.1:
+                status_record.progress_percentage = completion_percentage
+                should_commit = True
+        
+        results[s["id"]] = (round(completion_percentage), target_status, total_items, completed_items)
+    
+    if should_commit:
+        try:
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Calculate progress error: {str(e)}")
+    
+    return results
+
 def calculate_student_session_progress(db: Session, student_id: int, session_id: int, session_type: str = "global"):
     """
     Calculate progress for a single session based on resource completion.
@@ -550,6 +613,42 @@ async def get_student_my_cohort(
         raise HTTPException(status_code=500, detail="Failed to fetch cohort information")
 
 
+def _collect_upcoming_sessions(tree: dict, course_title: str, current_time: datetime, upcoming_sessions: list):
+    """Append a course's future sessions to upcoming_sessions; returns (total_sessions, next_session)"""
+    total_sessions = 0
+    next_session = None
+    for _, session in iter_tree_sessions(tree):
+        total_sessions += 1
+        scheduled_time = session["scheduled_time"]
+        
+        # Find next upcoming session
+        if scheduled_time and scheduled_time > current_time:
+            if not next_session or (next_session.get("scheduled_time") and scheduled_time < next_session["scheduled_time"]):
+                next_session = {
+                    "id": session["id"],
+                    "title": session["title"],
+                    "scheduled_time": scheduled_time
+                }
+            
+            upcoming_sessions.append({
+                "id": session["id"],
+                "title": session["title"],
+                "course_title": course_title,
+                "scheduled_date": scheduled_time.strftime("%Y-%m-%d"),
+                "scheduled_time": scheduled_time.strftime("%H:%M"),
+                "scheduled_datetime": scheduled_time,
+                "duration_minutes": session["duration_minutes"],
+                "zoom_link": session["zoom_link"]
+            })
+        elif not scheduled_time and not next_session:
+            next_session = {
+                "id": session["id"],
+                "title": session["title"],
+                "scheduled_time": None,
+                "status": "unscheduled"
+            }
+    return total_sessions, next_session
+
 @router.get("/student/dashboard")
 async def get_student_dashboard(
     current_user: User = Depends(get_current_user),
@@ -567,6 +666,7 @@ async def get_student_dashboard(
         # Get student's enrollment status using helper function
         enrollment_status = get_student_enrollment_status(db, current_user.id)
         direct_enrollments = enrollment_status["direct_enrollments"]
+        enrollments_by_course = {e.course_id: e for e in direct_enrollments}
         cohort_enrollments = enrollment_status["cohort_enrollments"]
         user_cohorts = enrollment_status["user_cohorts"]
         cohort_courses = enrollment_status["cohort_courses"]
@@ -613,47 +713,14 @@ async def get_student_dashboard(
                 progress = enrollment.progress if enrollment else 0
                 is_directly_enrolled = course.id in direct_enrolled_course_ids
                 
-                # Get modules and sessions for this course
-                modules = db.query(Module).filter(Module.course_id == course.id).all()
-                total_sessions = 0
-                next_session = None
+                # Structure from the course tree cache; upcoming sessions derived in memory
+                tree = course_tree_cache.get_tree(db, course.id, "regular")
+                total_sessions, next_session = _collect_upcoming_sessions(tree, course.title, current_time, upcoming_sessions)
                 
-                for module in modules:
-                    sessions = db.query(SessionModel).filter(SessionModel.module_id == module.id).all()
-                    total_sessions += len(sessions)
-                    
-                    # Find next upcoming session
-                    for session in sessions:
-                        if session.scheduled_time and session.scheduled_time > current_time:
-                            if not next_session or (next_session.get("scheduled_time") and session.scheduled_time < next_session["scheduled_time"]):
-                                next_session = {
-                                    "id": session.id,
-                                    "title": session.title,
-                                    "scheduled_time": session.scheduled_time
-                                }
-                            
-                            upcoming_sessions.append({
-                                "id": session.id,
-                                "title": session.title,
-                                "course_title": course.title,
-                                "scheduled_date": session.scheduled_time.strftime("%Y-%m-%d") if session.scheduled_time else None,
-                                "scheduled_time": session.scheduled_time.strftime("%H:%M") if session.scheduled_time else None,
-                                "scheduled_datetime": session.scheduled_time,
-                                "duration_minutes": session.duration_minutes,
-                                "zoom_link": session.zoom_link
-                            })
-                        elif not session.scheduled_time and not next_session:
-                            next_session = {
-                                "id": session.id,
-                                "title": session.title,
-                                "scheduled_time": None,
-                                "status": "unscheduled"
-                            }
-                
-                progress_pct, total_res, completed_res, course_status, total_sessions_count, attended_sessions_count, total_modules_count = calculate_course_progress(db, current_user.id, course.id, "regular")
+                progress_pct, total_res, completed_res, course_status, total_sessions_count, attended_sessions_count, total_modules_count = calculate_course_progress(db, current_user.id, course.id, "regular", tree=tree)
                 
                 # Fetch enrollment record safely for payment info
-                enrollment_obj = db.query(Enrollment).filter(Enrollment.student_id == current_user.id, Enrollment.course_id == course.id).first()
+                enrollment_obj = enrollments_by_course.get(course.id)
                 
                 # Determine accurate payment status if no enrollment record exists
                 payment_status = 'not_required'
@@ -711,49 +778,17 @@ async def get_student_dashboard(
             from cohort_specific_models import CohortCourseModule, CohortCourseSession
             
             for cohort_course in enrolled_cohort_courses:
-                # Get modules and sessions for cohort-specific course
-                modules = db.query(CohortCourseModule).filter(CohortCourseModule.course_id == cohort_course.id).all()
-                total_sessions = 0
-                next_session = None
                 current_time = datetime.now()
                 
                 # Find enrollment for progress
                 enrollment = next((e for e in cohort_enrollments if e.course_id == cohort_course.id), None)
                 progress = enrollment.progress if enrollment else 0
                 
-                for module in modules:
-                    sessions = db.query(CohortCourseSession).filter(CohortCourseSession.module_id == module.id).all()
-                    total_sessions += len(sessions)
-                    
-                    # Find next upcoming session
-                    for session in sessions:
-                        if session.scheduled_time and session.scheduled_time > current_time:
-                            if not next_session or (next_session.get("scheduled_time") and session.scheduled_time < next_session["scheduled_time"]):
-                                next_session = {
-                                    "id": session.id,
-                                    "title": session.title,
-                                    "scheduled_time": session.scheduled_time
-                                }
-                            
-                            upcoming_sessions.append({
-                                "id": session.id,
-                                "title": session.title,
-                                "course_title": cohort_course.title,
-                                "scheduled_date": session.scheduled_time.strftime("%Y-%m-%d") if session.scheduled_time else None,
-                                "scheduled_time": session.scheduled_time.strftime("%H:%M") if session.scheduled_time else None,
-                                "scheduled_datetime": session.scheduled_time,
-                                "duration_minutes": session.duration_minutes,
-                                "zoom_link": session.zoom_link
-                            })
-                        elif not session.scheduled_time and not next_session:
-                            next_session = {
-                                "id": session.id,
-                                "title": session.title,
-                                "scheduled_time": None,
-                                "status": "unscheduled"
-                            }
+                # Structure from the course tree cache; upcoming sessions derived in memory
+                tree = course_tree_cache.get_tree(db, cohort_course.id, "cohort_specific")
+                total_sessions, next_session = _collect_upcoming_sessions(tree, cohort_course.title, current_time, upcoming_sessions)
                 
-                progress_pct, total_res, completed_res, course_status, total_sessions_count, attended_sessions_count, total_modules_count = calculate_course_progress(db, current_user.id, cohort_course.id, "cohort_specific")
+                progress_pct, total_res, completed_res, course_status, total_sessions_count, attended_sessions_count, total_modules_count = calculate_course_progress(db, current_user.id, cohort_course.id, "cohort_specific", tree=tree)
 
                 enrolled_courses.append({
                     "id": cohort_course.id,
@@ -777,102 +812,60 @@ async def get_student_dashboard(
                     "course_type": "cohort_specific"
                 })
         
-        # Get assignments for all courses (regular and cohort-specific)
+        # Get assignments for all courses (regular and cohort-specific) with one query per item kind
+        from cohort_specific_models import CohortSpecificCourse
+        from assignment_quiz_models import AssignmentGrade
+        course_sources = []
         if enrolled_regular_course_ids:
-            courses = db.query(Course).filter(Course.id.in_(enrolled_regular_course_ids)).all()
-            for course in courses:
-                modules = db.query(Module).filter(Module.course_id == course.id).all()
-                for module in modules:
-                    sessions = db.query(SessionModel).filter(SessionModel.module_id == module.id).all()
-                    for session in sessions:
-                        assignments = db.query(Assignment).filter(
-                            Assignment.session_id == session.id, 
-                            Assignment.session_type == "global",
-                            Assignment.is_active == True
-                        ).all()
-                        for assignment in assignments:
-                            submission = db.query(AssignmentSubmission).filter(
-                                AssignmentSubmission.assignment_id == assignment.id,
-                                AssignmentSubmission.student_id == current_user.id
-                            ).first()
-                            
-                            grade = None
-                            if submission:
-                                from assignment_quiz_models import AssignmentGrade
-                                grade_record = db.query(AssignmentGrade).filter(
-                                    AssignmentGrade.submission_id == submission.id
-                                ).first()
-                                if grade_record:
-                                    grade = {
-                                        "marks_obtained": grade_record.marks_obtained,
-                                        "total_marks": grade_record.total_marks,
-                                        "percentage": grade_record.percentage
-                                    }
-                            
-                            recent_assignments.append({
-                                "id": assignment.id,
-                                "title": assignment.title,
-                                "course_title": course.title,
-                                "due_date": assignment.due_date,
-                                "total_marks": assignment.total_marks,
-                                "submitted": submission is not None,
-                                "submission_id": submission.id if submission else None,
-                                "score": grade["percentage"] if grade else None,
-                                "marks_obtained": grade["marks_obtained"] if grade else None
-                            })
-        
-        # Get assignments for cohort-specific courses
+            course_sources.append(("regular", db.query(Course).filter(Course.id.in_(enrolled_regular_course_ids)).all()))
         if enrolled_cohort_course_ids:
-            from cohort_specific_models import CohortSpecificCourse, CohortCourseModule, CohortCourseSession
-            
-            cohort_courses = db.query(CohortSpecificCourse).filter(
+            course_sources.append(("cohort_specific", db.query(CohortSpecificCourse).filter(
                 CohortSpecificCourse.id.in_(enrolled_cohort_course_ids)
+            ).all()))
+        
+        for course_type, courses in course_sources:
+            session_course_titles = {}
+            for course in courses:
+                for _, session in iter_tree_sessions(course_tree_cache.get_tree(db, course.id, course_type)):
+                    session_course_titles[session["id"]] = course.title
+            if not session_course_titles:
+                continue
+            
+            assignments = db.query(Assignment).filter(
+                Assignment.session_id.in_(session_course_titles.keys()),
+                Assignment.session_type == ("cohort" if course_type == "cohort_specific" else "global"),
+                Assignment.is_active == True
             ).all()
+            if not assignments:
+                continue
             
-            for course in cohort_courses:
-                modules = db.query(CohortCourseModule).filter(
-                    CohortCourseModule.course_id == course.id
-                ).all()
-                for module in modules:
-                    sessions = db.query(CohortCourseSession).filter(
-                        CohortCourseSession.module_id == module.id
-                    ).all()
-                    for session in sessions:
-                        assignments = db.query(Assignment).filter(
-                            Assignment.session_id == session.id,
-                            Assignment.session_type == "cohort",
-                            Assignment.is_active == True
-                        ).all()
-                        for assignment in assignments:
-                            submission = db.query(AssignmentSubmission).filter(
-                                AssignmentSubmission.assignment_id == assignment.id,
-                                AssignmentSubmission.student_id == current_user.id
-                            ).first()
-                            
-                            grade = None
-                            if submission:
-                                from assignment_quiz_models import AssignmentGrade
-                                grade_record = db.query(AssignmentGrade).filter(
-                                    AssignmentGrade.submission_id == submission.id
-                                ).first()
-                                if grade_record:
-                                    grade = {
-                                        "marks_obtained": grade_record.marks_obtained,
-                                        "total_marks": grade_record.total_marks,
-                                        "percentage": grade_record.percentage
-                                    }
-                            
-                            recent_assignments.append({
-                                "id": assignment.id,
-                                "title": assignment.title,
-                                "course_title": course.title,
-                                "due_date": assignment.due_date,
-                                "total_marks": assignment.total_marks,
-                                "submitted": submission is not None,
-                                "submission_id": submission.id if submission else None,
-                                "score": grade["percentage"] if grade else None,
-                                "marks_obtained": grade["marks_obtained"] if grade else None
-                            })
+            submissions = {}
+            for submission in db.query(AssignmentSubmission).filter(
+                AssignmentSubmission.assignment_id.in_([a.id for a in assignments]),
+                AssignmentSubmission.student_id == current_user.id
+            ).order_by(AssignmentSubmission.id).all():
+                submissions.setdefault(submission.assignment_id, submission)
+            grades = {}
+            if submissions:
+                for grade_record in db.query(AssignmentGrade).filter(
+                    AssignmentGrade.submission_id.in_([sub.id for sub in submissions.values()])
+                ).order_by(AssignmentGrade.id).all():
+                    grades.setdefault(grade_record.submission_id, grade_record)
+            
+            for assignment in assignments:
+                submission = submissions.get(assignment.id)
+                grade_record = grades.get(submission.id) if submission else None
+                recent_assignments.append({
+                    "id": assignment.id,
+                    "title": assignment.title,
+                    "course_title": session_course_titles[assignment.session_id],
+                    "due_date": assignment.due_date,
+                    "total_marks": assignment.total_marks,
+                    "submitted": submission is not None,
+                    "submission_id": submission.id if submission else None,
+                    "score": grade_record.percentage if grade_record else None,
+                    "marks_obtained": grade_record.marks_obtained if grade_record else None
+                })
         
         # Sort assignments by due date
         recent_assignments.sort(key=lambda x: x["due_date"])
@@ -952,23 +945,9 @@ async def get_student_courses(
             Course.approval_status == 'approved'
         ).all()
 
-        # Get all course assignments
+        # Course IDs assigned to the user through the unified CourseAssignment table
         from database import CourseAssignment
-        assignments = db.query(CourseAssignment).all()
-        
-        # Course ID -> is_assigned mapping
-        assigned_courses = set()
-        for assignment in assignments:
-            if assignment.assignment_type == 'all':
-                assigned_courses.add(assignment.course_id)
-            elif assignment.assignment_type == 'individual' and assignment.user_id == current_user.id:
-                assigned_courses.add(assignment.course_id)
-            elif assignment.assignment_type == 'college' and assignment.college == current_user.college:
-                assigned_courses.add(assignment.course_id)
-            elif assignment.assignment_type == 'cohort':
-                user_cohort_ids = [uc.cohort_id for uc in user_cohorts]
-                if assignment.cohort_id in user_cohort_ids:
-                    assigned_courses.add(assignment.course_id)
+        assigned_courses = get_student_entitlements(db, current_user.id)["course_assignment_course_ids"]
         
         courses = []
         
@@ -1032,8 +1011,8 @@ async def get_student_courses(
                 "amount": amount,
                 "payment_status": payment_status,
                 "price": amount if assignment_mode == 'paid' else (course.default_price if course.payment_type == 'paid' else 0),
-                "modules_count": db.query(Module).filter(Module.course_id == course.id).count(),
-                "total_sessions": db.query(SessionModel).join(Module).filter(Module.course_id == course.id).count()
+                "modules_count": len(course_tree_cache.get_tree(db, course.id)["modules"]),
+                "total_sessions": sum(1 for _ in iter_tree_sessions(course_tree_cache.get_tree(db, course.id)))
             })
         
         # Cohort courses are not shown in Browse page per requirement
@@ -1085,40 +1064,14 @@ async def enroll_in_course(
         
         # Check access permissions (Unified access check)
         from database import CourseAssignment
-        has_access = False
+        entitlements = get_student_entitlements(db, current_user.id)
         
         if regular_course:
-            # Check legacy CohortCourse assignment
-            for uc in user_cohorts:
-                cohort_course_assignment = db.query(CohortCourse).filter(
-                    CohortCourse.cohort_id == uc.cohort_id,
-                    CohortCourse.course_id == course_id
-                ).first()
-                if cohort_course_assignment:
-                    has_access = True
-                    break
-            
-            # Check unified CourseAssignment (Comprehensive)
-            if not has_access:
-                user = db.query(User).filter(User.id == current_user.id).first()
-                ca_filters = [
-                    CourseAssignment.course_id == course_id,
-                    or_(
-                        CourseAssignment.assignment_type == 'all',
-                        and_(CourseAssignment.assignment_type == 'individual', CourseAssignment.user_id == current_user.id),
-                        and_(CourseAssignment.assignment_type == 'cohort', CourseAssignment.cohort_id.in_([uc.cohort_id for uc in user_cohorts])),
-                        and_(CourseAssignment.assignment_type == 'college', CourseAssignment.college == (user.college if user else None))
-                    )
-                ]
-                assignment = db.query(CourseAssignment).filter(*ca_filters).first()
-                if assignment:
-                    has_access = True
+            # Legacy CohortCourse assignment or unified CourseAssignment (Comprehensive)
+            has_access = course_id in entitlements["assigned_regular_course_ids"]
         else:
             # Check if cohort-specific course belongs to user's cohort
-            for uc in user_cohorts:
-                if cohort_course.cohort_id == uc.cohort_id:
-                    has_access = True
-                    break
+            has_access = cohort_course.cohort_id in entitlements["cohort_ids"]
         
         if not has_access:
             raise HTTPException(status_code=403, detail="This course is not available for enrollment. Please contact your coordinator.")
@@ -1235,6 +1188,7 @@ async def get_enrolled_courses(
         # Get student's enrollment status using helper function
         enrollment_status = get_student_enrollment_status(db, current_user.id)
         direct_enrollments = enrollment_status["direct_enrollments"]
+        enrollments_by_course = {e.course_id: e for e in direct_enrollments}
         cohort_enrollments = enrollment_status["cohort_enrollments"]
         enrolled_regular_course_ids = enrollment_status["enrolled_regular_course_ids"]
         enrolled_cohort_course_ids = enrollment_status["enrolled_cohort_course_ids"]
@@ -1249,7 +1203,7 @@ async def get_enrolled_courses(
                 progress_pct, total_res, completed_res, course_status, total_sessions_count, attended_sessions_count, total_modules_count = calculate_course_progress(db, current_user.id, course.id, "regular")
                 
                 # Fetch enrollment record safely for payment info
-                enrollment_obj = db.query(Enrollment).filter(Enrollment.student_id == current_user.id, Enrollment.course_id == course.id).first()
+                enrollment_obj = enrollments_by_course.get(course.id)
                 
                 # Determine accurate payment status if no enrollment record exists
                 payment_status = 'not_required'
@@ -1391,134 +1345,48 @@ async def get_student_course_modules(
         
         result = []
         
-        # Check if it's a regular course
+        # Regular course or cohort-specific course; structure comes from the course tree cache
         if course_id in enrolled_regular_course_ids and not is_cohort_course:
-            # Get modules for regular course
-            modules = db.query(Module).filter(
-                Module.course_id == course_id
-            ).order_by(Module.week_number).all()
-            
-            for module in modules:
-                # Get sessions for this module
-                sessions = db.query(SessionModel).filter(
-                    SessionModel.module_id == module.id
-                ).order_by(SessionModel.session_number).all()
-                
-                # Get session data with resources and attendance
-                session_data = []
-                module_progress_sum = 0
-                
-                for s in sessions:
-                    # Get resources for this session
-                    resources = db.query(Resource).filter(Resource.session_id == s.id).all()
-                    session_contents = db.query(SessionContent).filter(SessionContent.session_id == s.id).all()
-                    
-                    # Calculate progress
-                    progress_pct, status, total_count, completed_count = calculate_student_session_progress(db, student_id, s.id)
-                    module_progress_sum += progress_pct
-                    
-                    session_data.append({
-                        "id": s.id,
-                        "session_number": s.session_number,
-                        "title": s.title,
-                        "description": s.description,
-                        "scheduled_time": s.scheduled_time,
-                        "duration_minutes": s.duration_minutes,
-                        "attended": status == "Completed",
-                        "status": status,
-                        "progress": progress_pct,
-                        "resources_count": total_count,
-                        "completed_resources": completed_count
-                    })
-                
-                # Calculate module status
-                module_status = "Not Started"
-                if sessions:
-                    avg_progress = module_progress_sum / len(sessions)
-                    if avg_progress >= 100:
-                        module_status = "Completed"
-                    elif avg_progress > 0 or any(s["status"] == "Started" for s in session_data):
-                        module_status = "Started"
-                        
-                    # Check/Update StudentModuleStatus
-                    mod_status_record = db.query(StudentModuleStatus).filter(
-                        StudentModuleStatus.student_id == student_id,
-                        StudentModuleStatus.module_id == module.id
-                    ).first()
-                    
-                    if not mod_status_record:
-                        if module_status != "Not Started":
-                            mod_status_record = StudentModuleStatus(
-                                student_id=student_id,
-                                module_id=module.id,
-                                status=module_status,
-                                started_at=datetime.utcnow() if module_status == "Started" else None,
-                                completed_at=datetime.utcnow() if module_status == "Completed" else None
-                            )
-                            db.add(mod_status_record)
-                            db.commit()
-                    else:
-                        if mod_status_record.status != module_status:
-                            mod_status_record.status = module_status
-                            if module_status == "Completed":
-                                mod_status_record.completed_at = datetime.utcnow()
-                            db.commit()
-                else:
-                    avg_progress = 0
-
-                result.append({
-                    "id": module.id,
-                    "week_number": module.week_number,
-                    "title": module.title,
-                    "description": module.description,
-                    "start_date": module.start_date,
-                    "end_date": module.end_date,
-                    "status": module_status,
-                    "progress": round(avg_progress),
-                    "sessions_count": len(sessions),
-                    "sessions": session_data
-                })
-        
-        # Check if it's a cohort-specific course
+            course_type, module_type = "regular", "global"
         elif has_cohort_access:
-            # Get modules for cohort-specific course
-            modules = db.query(CohortCourseModule).filter(
-                CohortCourseModule.course_id == course_id
-            ).order_by(CohortCourseModule.week_number).all()
+            course_type, module_type = "cohort_specific", "cohort"
+        else:
+            course_type = None
+        
+        if course_type:
+            tree = course_tree_cache.get_tree(db, course_id, course_type)
+            session_progress = calculate_student_tree_progress(db, student_id, tree)
             
-            for module in modules:
-                # Get sessions for this cohort module
-                sessions = db.query(CohortCourseSession).filter(
-                    CohortCourseSession.module_id == module.id
-                ).order_by(CohortCourseSession.session_number).all()
+            # Existing module status records for the whole course in one query
+            module_status_query = db.query(StudentModuleStatus).filter(
+                StudentModuleStatus.student_id == student_id,
+                StudentModuleStatus.module_id.in_([m["id"] for m in tree["modules"]] or [0])
+            )
+            if module_type == "cohort":
+                module_status_query = module_status_query.filter(StudentModuleStatus.module_type == "cohort")
+            module_status_records = {}
+            for record in module_status_query.all():
+                module_status_records.setdefault(record.module_id, record)
+            should_commit = False
+            
+            for module in tree["modules"]:
+                sessions = module["sessions"]
                 
-                # Get session data with resources and attendance
+                # Get session data with progress overlay
                 session_data = []
                 module_progress_sum = 0
                 
                 for s in sessions:
-                    # Get cohort session content
-                    from cohort_specific_models import CohortSessionContent
-                    session_contents = db.query(CohortSessionContent).filter(
-                        CohortSessionContent.session_id == s.id
-                    ).all()
-                    
-                    # Calculate progress
-                    progress_pct, status, total_count, completed_count = calculate_student_session_progress(
-                        db, 
-                        student_id, 
-                        s.id,
-                        session_type="cohort"
-                    )
+                    progress_pct, status, total_count, completed_count = session_progress[s["id"]]
                     module_progress_sum += progress_pct
                     
                     session_data.append({
-                        "id": s.id,
-                        "session_number": s.session_number,
-                        "title": s.title,
-                        "description": s.description,
-                        "scheduled_time": s.scheduled_time,
-                        "duration_minutes": s.duration_minutes,
+                        "id": s["id"],
+                        "session_number": s["session_number"],
+                        "title": s["title"],
+                        "description": s["description"],
+                        "scheduled_time": s["scheduled_time"],
+                        "duration_minutes": s["duration_minutes"],
                         "attended": status == "Completed",
                         "status": status,
                         "progress": progress_pct,
@@ -1536,44 +1404,40 @@ async def get_student_course_modules(
                     elif avg_progress > 0 or any(s["status"] == "Started" for s in session_data):
                         module_status = "Started"
                     
-                    # Update StudentModuleStatus for cohort module
-                    mod_status_record = db.query(StudentModuleStatus).filter(
-                        StudentModuleStatus.student_id == student_id,
-                        StudentModuleStatus.module_id == module.id,
-                        StudentModuleStatus.module_type == "cohort"
-                    ).first()
-                    
+                    # Check/Update StudentModuleStatus
+                    mod_status_record = module_status_records.get(module["id"])
                     if not mod_status_record:
                         if module_status != "Not Started":
-                            mod_status_record = StudentModuleStatus(
+                            db.add(StudentModuleStatus(
                                 student_id=student_id,
-                                module_id=module.id,
-                                module_type="cohort",
+                                module_id=module["id"],
+                                module_type=module_type,
                                 status=module_status,
                                 started_at=datetime.utcnow() if module_status == "Started" else None,
                                 completed_at=datetime.utcnow() if module_status == "Completed" else None
-                            )
-                            db.add(mod_status_record)
-                            db.commit()
-                    else:
-                        if mod_status_record.status != module_status:
-                            mod_status_record.status = module_status
-                            if module_status == "Completed":
-                                mod_status_record.completed_at = datetime.utcnow()
-                            db.commit()
+                            ))
+                            should_commit = True
+                    elif mod_status_record.status != module_status:
+                        mod_status_record.status = module_status
+                        if module_status == "Completed":
+                            mod_status_record.completed_at = datetime.utcnow()
+                        should_commit = True
                 
                 result.append({
-                    "id": module.id,
-                    "week_number": module.week_number,
-                    "title": module.title,
-                    "description": module.description,
-                    "start_date": module.start_date,
-                    "end_date": module.end_date,
+                    "id": module["id"],
+                    "week_number": module["week_number"],
+                    "title": module["title"],
+                    "description": module["description"],
+                    "start_date": module["start_date"],
+                    "end_date": module["end_date"],
                     "status": module_status,
                     "progress": round(avg_progress),
                     "sessions_count": len(sessions),
                     "sessions": session_data
                 })
+            
+            if should_commit:
+                db.commit()
         
         return {"modules": result}
     except HTTPException:
@@ -1901,128 +1765,45 @@ async def get_student_assignments(
 ):
     """Get all assignments for student's enrolled courses"""
     try:
-        from cohort_specific_models import CohortSpecificCourse, CohortCourseModule, CohortCourseSession, CohortSpecificEnrollment
+        from student_coursework import student_assignments
         
-        assignments = []
+        entitlements = get_student_entitlements(db, current_user.id)
         
-        # Get student's enrollment status
-        enrollment_status = get_student_enrollment_status(db, current_user.id)
-        enrolled_regular_course_ids = enrollment_status["enrolled_regular_course_ids"]
-        enrolled_cohort_course_ids = enrollment_status["enrolled_cohort_course_ids"]
-        
-        # Fetch assignments from global courses
-        if enrolled_regular_course_ids:
-            courses = db.query(Course).filter(Course.id.in_(enrolled_regular_course_ids)).all()
-            
-            for course in courses:
-                modules = db.query(Module).filter(Module.course_id == course.id).all()
-                for module in modules:
-                    sessions = db.query(SessionModel).filter(SessionModel.module_id == module.id).all()
-                    for session in sessions:
-                        course_assignments = db.query(Assignment).filter(
-                            Assignment.session_id == session.id,
-                            Assignment.session_type == "global",
-                            Assignment.is_active == True
-                        ).all()
-                        
-                        for assignment in course_assignments:
-                            submission = db.query(AssignmentSubmission).filter(
-                                AssignmentSubmission.assignment_id == assignment.id,
-                                AssignmentSubmission.student_id == current_user.id
-                            ).first()
-                            
-                            grade = None
-                            if submission:
-                                from assignment_quiz_models import AssignmentGrade
-                                grade_record = db.query(AssignmentGrade).filter(
-                                    AssignmentGrade.submission_id == submission.id
-                                ).first()
-                                if grade_record:
-                                    grade = {
-                                        "marks_obtained": grade_record.marks_obtained,
-                                        "total_marks": grade_record.total_marks,
-                                        "percentage": grade_record.percentage,
-                                        "feedback": grade_record.feedback
-                                    }
-                            
-                            assignments.append({
-                                "id": assignment.id,
-                                "title": assignment.title,
-                                "description": assignment.description,
-                                "course_title": course.title,
-                                "session_title": session.title,
-                                "module_title": module.title,
-                                "due_date": assignment.due_date,
-                                "total_marks": assignment.total_marks,
-                                "submission_type": assignment.submission_type.value if assignment.submission_type else "FILE",
-                                "submitted": submission is not None,
-                                "submission_id": submission.id if submission else None,
-                                "submitted_at": submission.submitted_at if submission else None,
-                                "status": submission.status.value if submission else "PENDING",
-                                "grade": grade,
-                                "session_type": "global",
-                                "created_at": assignment.created_at
-                            })
-        
-        # Fetch assignments from cohort-specific courses
-        if enrolled_cohort_course_ids:
-            cohort_courses = db.query(CohortSpecificCourse).filter(
-                CohortSpecificCourse.id.in_(enrolled_cohort_course_ids)
-            ).all()
-            
-            for course in cohort_courses:
-                modules = db.query(CohortCourseModule).filter(
-                    CohortCourseModule.course_id == course.id
-                ).all()
-                for module in modules:
-                    sessions = db.query(CohortCourseSession).filter(
-                        CohortCourseSession.module_id == module.id
-                    ).all()
-                    for session in sessions:
-                        course_assignments = db.query(Assignment).filter(
-                            Assignment.session_id == session.id,
-                            Assignment.session_type == "cohort",
-                            Assignment.is_active == True
-                        ).all()
-                        
-                        for assignment in course_assignments:
-                            submission = db.query(AssignmentSubmission).filter(
-                                AssignmentSubmission.assignment_id == assignment.id,
-                                AssignmentSubmission.student_id == current_user.id
-                            ).first()
-                            
-                            grade = None
-                            if submission:
-                                from assignment_quiz_models import AssignmentGrade
-                                grade_record = db.query(AssignmentGrade).filter(
-                                    AssignmentGrade.submission_id == submission.id
-                                ).first()
-                                if grade_record:
-                                    grade = {
-                                        "marks_obtained": grade_record.marks_obtained,
-                                        "total_marks": grade_record.total_marks,
-                                        "percentage": grade_record.percentage,
-                                        "feedback": grade_record.feedback
-                                    }
-                            
-                            assignments.append({
-                                "id": assignment.id,
-                                "title": assignment.title,
-                                "description": assignment.description,
-                                "course_title": course.title,
-                                "session_title": session.title,
-                                "module_title": module.title,
-                                "due_date": assignment.due_date,
-                                "total_marks": assignment.total_marks,
-                                "submission_type": assignment.submission_type.value if assignment.submission_type else "FILE",
-                                "submitted": submission is not None,
-                                "submission_id": submission.id if submission else None,
-                                "submitted_at": submission.submitted_at if submission else None,
-                                "status": submission.status.value if submission else "PENDING",
-                                "grade": grade,
-                                "session_type": "cohort",
-                                "created_at": assignment.created_at
-                            })
+        assignments = []
+        for row in student_assignments(
+            db, current_user.id,
+            entitlements["enrolled_regular_course_ids"],
+            entitlements["cohort_specific_course_ids"]
+        ):
+            if row.course_title is None:
+                continue  # Course row no longer exists
+            assignment, submission, grade_record = row.Assignment, row.AssignmentSubmission, row.AssignmentGrade
+            grade = None
+            if grade_record:
+                grade = {
+                    "marks_obtained": grade_record.marks_obtained,
+                    "total_marks": grade_record.total_marks,
+                    "percentage": grade_record.percentage,
+                    "feedback": grade_record.feedback
+                }
+            assignments.append({
+                "id": assignment.id,
+                "title": assignment.title,
+                "description": assignment.description,
+                "course_title": row.course_title,
+                "session_title": row.session_title,
+                "module_title": row.module_title,
+                "due_date": assignment.due_date,
+                "total_marks": assignment.total_marks,
+                "submission_type": assignment.submission_type.value if assignment.submission_type else "FILE",
+                "submitted": submission is not None,
+                "submission_id": submission.id if submission else None,
+                "submitted_at": submission.submitted_at if submission else None,
+                "status": submission.status.value if submission else "PENDING",
+                "grade": grade,
+                "session_type": assignment.session_type,
+                "created_at": assignment.created_at
+            })
         
         # Sort by due date
         assignments.sort(key=lambda x: x["due_date"])
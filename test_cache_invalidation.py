@@ -0,0 +1,340 @@
+import sys
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# database.py creates its engine on import; point it at a throwaway SQLite file first
+if "database" not in sys.modules:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test_lms.db")
+
+from sqlalchemy import text
+
+from database import (
+    Base, engine, SessionLocal, User, Admin, Course, Module, Enrollment, CalendarEvent,
+    CalendarBusyInterval, Session as SessionModel
+)
+import chat_models
+import assignment_quiz_models  # noqa: F401 - course trees read quizzes and assignments
+from entitlement_service import entitlement_resolver, _PENDING_KEY as ENTITLEMENT_PENDING_KEY
+from course_tree_cache import course_tree_cache
+from dashboard_stats import dashboard_cache, get_global_stats
+from search_index import SearchIndex, TrigramIndex, search_index
+from calendar_blocking_service import CalendarBlockingService
+from calendar_feed_service import calendar_feed
+
+# Models declared outside database.py are not part of its create_all at import time
+Base.metadata.create_all(bind=engine)
+chat_models.Base.metadata.create_all(bind=engine)
+
+_counter = iter(range(1, 1000000))
+
+
+def make_user(db, **values):
+    number = next(_counter)
+    user = User(
+        username=values.pop("username", f"student{number}"),
+        email=values.pop("email", f"student{number}@example.com"),
+        password_hash="x", college="Test College", department="CS", year="1", user_type="Student",
+        **values
+    )
+    db.add(user)
+    db.flush()
+    return user
+
+
+def make_course(db):
+    course = Course(title=f"Course {next(_counter)}")
+    db.add(course)
+    db.flush()
+    return course
+
+
+class SessionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.other = SessionLocal()
+
+    def tearDown(self):
+        self.db.rollback()
+        self.other.rollback()
+        self.db.close()
+        self.other.close()
+
+
+class TestEntitlementInvalidation(SessionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user(self.db)
+        self.course = make_course(self.db)
+        self.db.commit()
+        entitlement_resolver.invalidate_all()
+
+    def test_enrollment_commit_invalidates_student(self):
+        before = entitlement_resolver.resolve(self.db, self.user.id)
+        self.assertNotIn(self.course.id, before["accessible_regular_course_ids"])
+
+        self.other.add(Enrollment(student_id=self.user.id, course_id=self.course.id))
+        self.other.flush()
+        # Not visible to other sessions yet, so the shared entry must survive the flush
+        self.assertIsNotNone(entitlement_resolver._get_cached(self.user.id))
+
+        self.other.commit()
+        self.assertIsNone(entitlement_resolver._get_cached(self.user.id))
+        after = entitlement_resolver.resolve(SessionLocal(), self.user.id)
+        self.assertIn(self.course.id, after["accessible_regular_course_ids"])
+
+    def test_rollback_discards_pending_invalidation(self):
+        entitlement_resolver.resolve(self.db, self.user.id)
+        self.other.add(Enrollment(student_id=self.user.id, course_id=self.course.id))
+        self.other.flush()
+        self.assertIn(ENTITLEMENT_PENDING_KEY, self.other.info)
+
+        self.other.rollback()
+        self.assertNotIn(ENTITLEMENT_PENDING_KEY, self.other.info)
+        self.assertIsNotNone(entitlement_resolver._get_cached(self.user.id))
+
+    def test_bulk_update_invalidates_everyone(self):
+        entitlement_resolver.resolve(self.db, self.user.id)
+        self.other.query(User).filter(User.id == self.user.id).update(
+            {User.college: "Other College"}, synchronize_session=False
+        )
+        self.other.commit()
+        self.assertIsNone(entitlement_resolver._get_cached(self.user.id))
+
+
+class TestCourseTreeInvalidation(SessionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = make_course(self.db)
+        self.module = Module(course_id=self.course.id, week_number=1, title="Week 1")
+        self.db.add(self.module)
+        self.db.commit()
+        course_tree_cache.get_tree(self.db, self.course.id)
+
+    def _cached(self):
+        return ("regular", self.course.id) in course_tree_cache._trees
+
+    def test_session_commit_drops_course_tree(self):
+        self.other.add(SessionModel(module_id=self.module.id, session_number=1, title="Intro"))
+        self.other.flush()
+        self.assertTrue(self._cached())
+
+        self.other.commit()
+        self.assertFalse(self._cached())
+        tree = course_tree_cache.get_tree(self.db, self.course.id)
+        self.assertEqual([s["title"] for s in tree["modules"][0]["sessions"]], ["Intro"])
+
+    def test_rollback_keeps_course_tree(self):
+        self.other.add(SessionModel(module_id=self.module.id, session_number=1, title="Intro"))
+        self.other.flush()
+        self.other.rollback()
+        self.assertTrue(self._cached())
+
+    def test_bulk_update_drops_every_tree(self):
+        self.other.query(Module).filter(Module.id == self.module.id).update(
+            {Module.title: "Renamed"}, synchronize_session=False
+        )
+        self.other.commit()
+        self.assertFalse(self._cached())
+
+
+class TestDashboardInvalidation(SessionTestCase):
+    def setUp(self):
+        super().setUp()
+        dashboard_cache.invalidate_all()
+
+    def test_commit_refreshes_counts(self):
+        admins = get_global_stats(self.db)["total_admins"]
+        number = next(_counter)
+        self.other.add(Admin(username=f"admin{number}", email=f"admin{number}@example.com", password_hash="x"))
+        self.other.flush()
+        self.assertEqual(get_global_stats(self.db)["total_admins"], admins)
+
+        self.other.commit()
+        self.assertEqual(get_global_stats(SessionLocal())["total_admins"], admins + 1)
+
+    def test_rollback_keeps_entries(self):
+        get_global_stats(self.db)
+        generation = dashboard_cache._generation
+        make_course(self.other)
+        self.other.rollback()
+        self.assertEqual(dashboard_cache._generation, generation)
+        self.assertIn(("global",), dashboard_cache._entries)
+
+
+class TestSearchIndexInvalidation(SessionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.users = [make_user(self.db, username=f"searchable{next(_counter)}") for _ in range(3)]
+        self.db.commit()
+        search_index.build("user")
+
+    def _matches(self):
+        return set(search_index.match_ids("user", "searchable"))
+
+    def test_commit_and_rollback(self):
+        added = make_user(self.other, username=f"searchable{next(_counter)}")
+        self.assertNotIn(added.id, self._matches())
+        self.other.commit()
+        self.assertIn(added.id, self._matches())
+
+        discarded = make_user(self.other, username=f"searchable{next(_counter)}")
+        discarded_id = discarded.id
+        self.other.rollback()
+        self.assertNotIn(discarded_id, self._matches())
+
+    def test_bulk_update_rebuilds_only_for_indexed_columns(self):
+        user_id = self.users[0].id
+        with patch.object(search_index, "rebuild_in_background") as rebuild:
+            self.other.query(User).filter(User.id == user_id).update(
+                {User.cohort_id: None, User.department: "Maths"}, synchronize_session=False
+            )
+            self.other.commit()
+            rebuild.assert_not_called()
+
+            self.other.query(User).filter(User.id == user_id).update(
+                {"username": f"renamed{next(_counter)}"}, synchronize_session=False
+            )
+            self.other.commit()
+            rebuild.assert_called_once_with({"user"})
+
+    def test_bulk_delete_removes_ids(self):
+        doomed = self.users[1].id
+        with patch.object(search_index, "rebuild_in_background") as rebuild:
+            self.other.query(User).filter(User.id == doomed).delete(synchronize_session=False)
+            self.other.commit()
+            rebuild.assert_not_called()
+        self.assertNotIn(doomed, self._matches())
+        self.assertIn(self.users[0].id, self._matches())
+
+    def test_stale_index_is_rebuilt_once(self):
+        index = SearchIndex(rebuild_interval=timedelta(minutes=5))
+        index.build("user")
+        index._built_at["user"] -= timedelta(minutes=10)
+        with patch.object(index, "rebuild_in_background") as rebuild:
+            index.match_ids("user", "searchable")
+            index.match_ids("user", "searchable")
+        rebuild.assert_called_once_with(["user"])
+
+
+class TestShortSearchTerms(unittest.TestCase):
+    def test_short_terms_are_served_from_postings(self):
+        index = TrigramIndex(("username", "email"))
+        index.add(1, ("alice", "alice@example.com"))
+        index.add(2, ("bob7", "bob@example.org"))
+        index.add(3, ("carol", "c7@example.com"))
+        for term in ("7", "ob", "l", "zz", ""):
+            expected = [doc_id for doc_id in (3, 2, 1)
+                        if any(term in value for value in index._docs[index._by_id[doc_id]][2])]
+            self.assertEqual([doc_id for doc_id, _ in index.search(term)], expected, term)
+        self.assertEqual([doc_id for doc_id, _ in index.search("7", fields=("username",))], [2])
+        self.assertIn("7", index._postings)
+
+
+class TestBusyIntervalSync(SessionTestCase):
+    def _interval(self, event_id):
+        return self.db.query(CalendarBusyInterval).filter(
+            CalendarBusyInterval.source_type == "event",
+            CalendarBusyInterval.source_id == event_id
+        ).first()
+
+    def _event(self, db, start):
+        calendar_event = CalendarEvent(title="Exam", start_datetime=start, end_datetime=start + timedelta(hours=1))
+        db.add(calendar_event)
+        db.flush()
+        return calendar_event
+
+    def test_orm_writes_keep_intervals_in_step(self):
+        start = datetime(2031, 1, 6, 10, 0)
+        calendar_event = self._event(self.db, start)
+        self.db.commit()
+        self.assertEqual(self._interval(calendar_event.id).start_datetime, start)
+        self.assertTrue(CalendarBlockingService.check_time_conflict(self.db, start, start + timedelta(minutes=30)))
+
+        calendar_event.start_datetime = start + timedelta(days=1)
+        calendar_event.end_datetime = start + timedelta(days=1, hours=1)
+        self.db.commit()
+        self.assertFalse(CalendarBlockingService.check_time_conflict(self.db, start, start + timedelta(minutes=30)))
+
+        event_id = calendar_event.id
+        self.db.delete(calendar_event)
+        self.db.commit()
+        self.assertIsNone(self._interval(event_id))
+
+    def test_rollback_discards_interval(self):
+        calendar_event = self._event(self.other, datetime(2031, 2, 3, 10, 0))
+        event_id = calendar_event.id
+        self.other.rollback()
+        self.assertIsNone(self._interval(event_id))
+
+    def test_bulk_delete_prunes_intervals(self):
+        calendar_event = self._event(self.db, datetime(2031, 3, 3, 10, 0))
+        self.db.commit()
+        event_id = calendar_event.id
+        self.db.query(CalendarEvent).filter(CalendarEvent.id == event_id).delete(synchronize_session=False)
+        self.db.commit()
+        self.assertIsNone(self._interval(event_id))
+
+    def test_raw_sql_writes_are_synced_and_reconciled(self):
+        calendar_event = self._event(self.db, datetime(2031, 4, 7, 10, 0))
+        self.db.commit()
+        event_id = calendar_event.id
+
+        self.db.execute(text("DELETE FROM calendar_events WHERE id = :id"), {"id": event_id})
+        self.db.expunge(calendar_event)
+        CalendarBlockingService.sync_event_intervals(self.db, [event_id])
+        self.db.commit()
+        self.assertIsNone(self._interval(event_id))
+
+        # Drift left behind by a raw write that skipped the sync is repaired by reconcile
+        calendar_event = self._event(self.db, datetime(2031, 4, 8, 10, 0))
+        self.db.commit()
+        self.db.execute(CalendarBusyInterval.__table__.delete().where(
+            CalendarBusyInterval.source_id == calendar_event.id
+        ))
+        self.db.commit()
+        self.assertIn("event", CalendarBlockingService.reconcile_busy_intervals(self.db))
+        self.assertIsNotNone(self._interval(calendar_event.id))
+        self.assertEqual(CalendarBlockingService.reconcile_busy_intervals(self.db), [])
+
+
+
+class TestCalendarFeedEtag(SessionTestCase):
+    def test_etag_survives_rebuild_and_follows_edits(self):
+        window = (datetime(2032, 5, 1), datetime(2032, 5, 31, 23, 59))
+        calendar_event = CalendarEvent(title="Demo day", start_datetime=datetime(2032, 5, 10, 9, 0),
+                                       end_datetime=datetime(2032, 5, 10, 10, 0))
+        self.db.add(calendar_event)
+        self.db.commit()
+
+        calendar_feed.get_ics(self.db, "Admin", 1, *window)
+        # Backdate the cached chunks: nine minutes old is still within the TTL, eleven is past it
+        generated = datetime.utcnow() - timedelta(minutes=9)
+        for chunk in calendar_feed._chunks.values():
+            chunk["timestamp"] = generated
+            chunk["ics"].clear()
+        etag, render = calendar_feed.get_ics(self.db, "Admin", 1, *window)
+        stamp = f"DTSTAMP:{generated.strftime('%Y%m%dT%H%M%SZ')}"
+        self.assertIn(stamp, render())
+        for chunk in calendar_feed._chunks.values():
+            chunk["timestamp"] = datetime.utcnow() - timedelta(minutes=11)
+
+        # The reload restamps the events but keeps the ETag
+        reloaded, render = calendar_feed.get_ics(self.db, "Admin", 1, *window)
+        self.assertEqual(reloaded, etag)
+        self.assertIn("SUMMARY:Demo day", render())
+        self.assertNotIn(stamp, render())
+
+        calendar_event.title = "Demo day (moved)"
+        self.db.commit()
+        edited, _ = calendar_feed.get_ics(self.db, "Admin", 1, *window)
+        self.assertNotEqual(edited, etag)
+
+
+if __name__ == "__main__":
+    unittest.main()
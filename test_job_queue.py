@@ -0,0 +1,193 @@
+import sys
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# database.py creates its engine on import; point it at a throwaway SQLite file first
+if "database" not in sys.modules:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test_lms.db")
+
+from database import SessionLocal, BackgroundJob
+from job_queue import JobQueue, JobContext, enqueue, job_handler, JOB_LOCK_TIMEOUT_SECONDS
+
+calls = []
+failures = []
+
+
+@job_handler("test.record")
+def record(db, payload, ctx):
+    calls.append((payload["value"], ctx.attempt))
+
+
+@job_handler("test.flaky", max_attempts=2, on_failure=lambda db, payload, error: failures.append(str(error)))
+def flaky(db, payload, ctx):
+    raise RuntimeError("boom")
+
+
+@job_handler("test.resumable")
+def resumable(db, payload, ctx):
+    """Handles items after the checkpointed cursor and fails once half way through"""
+    for item in range(ctx.progress.get("after", -1) + 1, payload["items"]):
+        calls.append(item)
+        ctx.checkpoint(after=item)
+        if item == 2 and ctx.attempt == 1:
+            raise RuntimeError("interrupted")
+
+
+@job_handler("test.stolen")
+def stolen(db, payload, ctx):
+    # Another worker took the job over, as recover_stale_jobs and a new claim would
+    other = SessionLocal()
+    other.query(BackgroundJob).filter(BackgroundJob.id == ctx.job_id).update(
+        {BackgroundJob.locked_by: "other-worker"}, synchronize_session=False
+    )
+    other.commit()
+    other.close()
+    ctx.checkpoint(step=1)
+    calls.append("continued")
+
+
+class JobQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.db.query(BackgroundJob).delete(synchronize_session=False)
+        self.db.commit()
+        self.queue = JobQueue()
+        calls.clear()
+        failures.clear()
+
+    def tearDown(self):
+        self.db.close()
+
+    def enqueue(self, job_type, payload=None, **kwargs):
+        job_id = enqueue(self.db, job_type, payload or {}, **kwargs)
+        self.db.commit()
+        return job_id
+
+    def job(self, job_id):
+        self.db.expire_all()
+        return self.db.query(BackgroundJob).filter(BackgroundJob.id == job_id).one()
+
+    def make_due(self, job_id):
+        self.db.query(BackgroundJob).filter(BackgroundJob.id == job_id).update(
+            {BackgroundJob.run_after: datetime.utcnow()}, synchronize_session=False
+        )
+        self.db.commit()
+
+
+class TestClaim(JobQueueTestCase):
+    def test_claim_locks_job_once(self):
+        job_id = self.enqueue("test.record", {"value": 1})
+        claimed = self.queue._claim()
+        self.assertEqual(claimed["id"], job_id)
+        self.assertEqual(claimed["status"], "running")
+        self.assertEqual(claimed["attempts"], 1)
+        self.assertTrue(claimed["locked_by"].startswith(self.queue.worker_id))
+        self.assertIsNone(self.queue._claim())
+
+        self.queue.run_job(claimed)
+        self.assertEqual(calls, [(1, 1)])
+        job = self.job(job_id)
+        self.assertEqual(job.status, "completed")
+        self.assertIsNone(job.locked_by)
+
+    def test_delayed_job_is_not_claimed_early(self):
+        self.enqueue("test.record", {"value": 1}, delay_seconds=60)
+        self.assertIsNone(self.queue._claim())
+
+    def test_idempotency_key_returns_existing_job(self):
+        first = self.enqueue("test.record", {"value": 1}, idempotency_key="test-key")
+        second = self.enqueue("test.record", {"value": 2}, idempotency_key="test-key")
+        self.assertEqual(first, second)
+        self.assertEqual(self.db.query(BackgroundJob).count(), 1)
+
+
+class TestRetry(JobQueueTestCase):
+    def test_failure_is_retried_with_backoff_then_failed(self):
+        job_id = self.enqueue("test.flaky")
+        self.queue.run_job(self.queue._claim())
+        job = self.job(job_id)
+        self.assertEqual(job.status, "queued")
+        self.assertIn("boom", job.last_error)
+        self.assertGreater(job.run_after, datetime.utcnow())
+        self.assertIsNone(self.queue._claim())
+        self.assertEqual(failures, [])
+
+        self.make_due(job_id)
+        self.queue.run_job(self.queue._claim())
+        job = self.job(job_id)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(failures, ["boom"])
+
+
+class TestStaleRecovery(JobQueueTestCase):
+    def _expire_lock(self, job_id):
+        self.db.query(BackgroundJob).filter(BackgroundJob.id == job_id).update(
+            {BackgroundJob.locked_at: datetime.utcnow() - timedelta(seconds=JOB_LOCK_TIMEOUT_SECONDS + 60)},
+            synchronize_session=False
+        )
+        self.db.commit()
+
+    def test_stale_job_is_requeued(self):
+        job_id = self.enqueue("test.record", {"value": 1})
+        self.queue._claim()
+        self.assertEqual(self.queue.recover_stale_jobs(), 0)
+
+        self._expire_lock(job_id)
+        self.assertEqual(self.queue.recover_stale_jobs(), 1)
+        job = self.job(job_id)
+        self.assertEqual(job.status, "queued")
+        self.assertIsNone(job.locked_by)
+
+    def test_stale_job_without_attempts_left_fails(self):
+        job_id = self.enqueue("test.record", {"value": 1}, max_attempts=1)
+        self.queue._claim()
+        self._expire_lock(job_id)
+        self.queue.recover_stale_jobs()
+        self.assertEqual(self.job(job_id).status, "failed")
+
+    def test_checkpoint_renews_lock(self):
+        job_id = self.enqueue("test.record", {"value": 1})
+        claimed = self.queue._claim()
+        self._expire_lock(job_id)
+        handler_db = SessionLocal()
+        JobContext(handler_db, job_id, claimed["attempts"], None, claimed["locked_by"]).checkpoint(step=1)
+        handler_db.close()
+        # The heartbeat keeps a long-running job from being recovered as stale
+        self.assertEqual(self.queue.recover_stale_jobs(), 0)
+        job = self.job(job_id)
+        self.assertEqual(job.status, "running")
+        self.assertEqual(job.progress, {"step": 1})
+
+    def test_worker_that_lost_its_lock_stops(self):
+        job_id = self.enqueue("test.stolen")
+        self.queue.run_job(self.queue._claim())
+        self.assertEqual(calls, [])
+        job = self.job(job_id)
+        # Left to the worker that holds the lock now
+        self.assertEqual(job.status, "running")
+        self.assertEqual(job.locked_by, "other-worker")
+        self.assertIsNone(job.progress)
+
+
+class TestCheckpointResume(JobQueueTestCase):
+    def test_retry_resumes_after_checkpoint(self):
+        job_id = self.enqueue("test.resumable", {"items": 5})
+        self.queue.run_job(self.queue._claim())
+        job = self.job(job_id)
+        self.assertEqual(job.status, "queued")
+        self.assertEqual(job.progress, {"after": 2})
+
+        self.make_due(job_id)
+        self.queue.run_job(self.queue._claim())
+        self.assertEqual(calls, [0, 1, 2, 3, 4])
+        self.assertEqual(self.job(job_id).status, "completed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import sys
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# database.py creates its engine on import; point it at a throwaway SQLite file first
+if "database" not in sys.modules:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test_lms.db")
+
+import pandas as pd
+
+from database import Base, engine, SessionLocal, User
+from user_import_service import prepare_import_rows
+
+Base.metadata.create_all(bind=engine)
+
+
+def roster_row(username, email):
+    return {"username": username, "email": email, "password": "secret", "college": "College",
+            "department": "CSE", "year": "2"}
+
+
+class TestPrepareImportRows(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.db.query(User).delete(synchronize_session=False)
+        self.db.add(User(
+            username="Taken", email="taken@example.com", password_hash="x", role="Student",
+            college="College", department="CSE", year="2", user_type="Student", created_at=datetime.utcnow()
+        ))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_taken_and_repeated_usernames_are_row_errors(self):
+        df = pd.DataFrame([
+            roster_row("taken", "first@example.com"),
+            roster_row("fresh", "second@example.com"),
+            roster_row("FRESH", "third@example.com"),
+            roster_row("other", "fourth@example.com"),
+        ])
+        rows, errors = prepare_import_rows(df, self.db)
+        self.assertEqual([row["username"] for row in rows], ["fresh", "other"])
+        self.assertEqual(errors, [
+            "Row 2: Username 'taken' already exists",
+            "Row 4: Username 'FRESH' already exists (duplicate in file)",
+        ])
+
+    def test_taken_email_is_reported_once(self):
+        df = pd.DataFrame([roster_row("taken", "Taken@example.com")])
+        rows, errors = prepare_import_rows(df, self.db)
+        self.assertEqual(rows, [])
+        self.assertEqual(errors, ["Row 2: Email 'Taken@example.com' already exists (Role: Student)"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, User
+from utils.user_utils import find_existing_emails, find_existing_usernames, validate_email_zerobounce
+from utils.password_hashing import hash_passwords
+from logging_utils import log_admin_action
+from identity_directory import identity_directory
+from search_index import search_index
+from lazy_imports import lazy_module
+
+logger = logging.getLogger(__name__)
+
+# Only spreadsheet imports need pandas; loaded on first use
+pd = lazy_module("pandas")
+
+REQUIRED_COLUMNS = ['username', 'email', 'password']
+# Columns that are NOT NULL on users and have no default
+REQUIRED_PROFILE_COLUMNS = ['college', 'department', 'year']
+OPTIONAL_COLUMNS = ['role', 'user_type', 'github_link']
+
+WELCOME_TEMPLATE_NAME = "User Registration Welcome Email"
+
+
+class UserImportJobs:
+    """In-memory registry of bulk user import jobs and their progress.
+
+    Jobs run as FastAPI background tasks in the process that took the upload, and their
+    status lives only in that process, so the API must run as a single worker process
+    (status polls served by another worker get a 404). Imports are not moved to the
+    job_queue because the rows carry plain-text passwords for the welcome emails, which
+    must not be written to the background_jobs table.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._retention = timedelta(hours=24)
+        self._lock = threading.Lock()
+
+    def create(self, total_rows: int, queued_rows: int, errors: List[str], created_by: Optional[int]) -> Dict[str, Any]:
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",  # queued, validating, hashing, inserting, emailing, completed, failed
+            "total_rows": total_rows,
+            "queued_count": queued_rows,
+            "processed_count": 0,
+            "success_count": 0,
+            "error_count": len(errors),
+            "emails_sent": 0,
+            "errors": list(errors),
+            "created_by": created_by,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+            "finished_at": None,
+        }
+        with self._lock:
+            self._prune()
+            self._jobs[job["job_id"]] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job)
+        snapshot["errors"] = snapshot["errors"][:100]
+        return snapshot
+
+    def update(self, job_id: str, **changes):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(changes)
+            job["updated_at"] = datetime.utcnow()
+
+    def add_errors(self, job_id: str, errors: List[str]):
+        if not errors:
+            return
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["errors"].extend(errors)
+            job["error_count"] += len(errors)
+            job["updated_at"] = datetime.utcnow()
+
+    def _prune(self):
+        # Caller must hold the lock
+        cutoff = datetime.utcnow() - self._retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job["updated_at"] < cutoff]:
+            del self._jobs[job_id]
+
+
+# Global job registry
+user_import_jobs = UserImportJobs()
+
+
+def prepare_import_rows(df: pd.DataFrame, db: Session) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Validate and normalize an uploaded roster with column-wise pandas operations.
+
+    Returns the rows that can be imported and the per-row error messages, using one
+    IN query per role table to find emails that already exist and one on users for
+    usernames that are already taken.
+    """
+    errors: List[Tuple[int, str]] = []
+    df = df.copy()
+    df.columns = df.columns.str.lower().str.strip()
+    df["_row"] = df.index + 2  # Spreadsheet row number (header is row 1)
+
+    for column in REQUIRED_COLUMNS + REQUIRED_PROFILE_COLUMNS + OPTIONAL_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+        present = df[column].notna()
+        df[column] = df[column].where(~present, df[column].astype(str).str.strip())
+        df.loc[present & (df[column] == ""), column] = None
+
+    missing = df[REQUIRED_COLUMNS].isna().any(axis=1)
+    for row in df.loc[missing, "_row"]:
+        errors.append((row, f"Row {row}: Missing required data (username, email, or password)"))
+    df = df[~missing]
+
+    missing_profile = df[REQUIRED_PROFILE_COLUMNS].isna().any(axis=1)
+    for row in df.loc[missing_profile, "_row"]:
+        errors.append((row, f"Row {row}: Missing required data (college, department, or year)"))
+    df = df[~missing_profile]
+
+    df["normalized_email"] = df["email"].str.lower()
+
+    existing = find_existing_emails(df["normalized_email"].unique().tolist(), db)
+    exists = df["normalized_email"].isin(existing.keys())
+    for row, email, normalized in df.loc[exists, ["_row", "email", "normalized_email"]].itertuples(index=False):
+        errors.append((row, f"Row {row}: Email '{email}' already exists (Role: {existing[normalized]})"))
+    df = df[~exists]
+
+    # The first occurrence of an email in the file wins
+    duplicated = df["normalized_email"].duplicated(keep="first")
+    for row, email in df.loc[duplicated, ["_row", "email"]].itertuples(index=False):
+        errors.append((row, f"Row {row}: Email '{email}' already exists (duplicate in file)"))
+    df = df[~duplicated]
+
+    # users.username is unique; one clash would fail the whole multi-row insert
+    df["normalized_username"] = df["username"].str.lower()
+    taken = df["normalized_username"].isin(find_existing_usernames(df["normalized_username"].unique().tolist(), db))
+    for row, username in df.loc[taken, ["_row", "username"]].itertuples(index=False):
+        errors.append((row, f"Row {row}: Username '{username}' already exists"))
+    df = df[~taken]
+
+    duplicated = df["normalized_username"].duplicated(keep="first")
+    for row, username in df.loc[duplicated, ["_row", "username"]].itertuples(index=False):
+        errors.append((row, f"Row {row}: Username '{username}' already exists (duplicate in file)"))
+    df = df[~duplicated]
+
+    df["role"] = df["role"].fillna("Student")
+    df["user_type"] = df["user_type"].fillna("Student")
+    df = df.astype(object).where(df.notna(), None)
+
+    rows = df[["_row", "username", "email", "normalized_email", "password", "role", "college",
+               "department", "year", "user_type", "github_link"]].to_dict("records")
+    return rows, [message for _, message in sorted(errors)]
+
+
+def run_user_import(job_id: str, rows: List[Dict[str, Any]], admin_id: Optional[int] = None,
+                    admin_username: Optional[str] = None, validation_workers: int = 8):
+    """Background part of a bulk import: external validation, hashing, insert and welcome emails"""
+    db = SessionLocal()
+    try:
+        # External email validation is network bound; run it concurrently
+        user_import_jobs.update(job_id, status="validating")
+        with ThreadPoolExecutor(max_workers=validation_workers) as executor:
+            checks = list(executor.map(validate_email_zerobounce, [row["normalized_email"] for row in rows]))
+        valid_rows, errors = [], []
+        for row, check in zip(rows, checks):
+            if check["valid"]:
+                valid_rows.append(row)
+            else:
+                errors.append(f"Row {row['_row']}: Email validation failed for '{row['email']}': {check['message']}")
+        user_import_jobs.add_errors(job_id, errors)
+
+        # Another import may have created some of these emails (or usernames) since the upload was checked
+        existing = find_existing_emails([row["normalized_email"] for row in valid_rows], db)
+        if existing:
+            user_import_jobs.add_errors(job_id, [
+                f"Row {row['_row']}: Email '{row['email']}' already exists (Role: {existing[row['normalized_email']]})"
+                for row in valid_rows if row["normalized_email"] in existing
+            ])
+            valid_rows = [row for row in valid_rows if row["normalized_email"] not in existing]
+        taken = find_existing_usernames([row["username"] for row in valid_rows], db)
+        if taken:
+            user_import_jobs.add_errors(job_id, [
+                f"Row {row['_row']}: Username '{row['username']}' already exists"
+                for row in valid_rows if row["username"].lower() in taken
+            ])
+            valid_rows = [row for row in valid_rows if row["username"].lower() not in taken]
+
+        user_import_jobs.update(job_id, status="hashing", processed_count=len(rows) - len(valid_rows))
+        hashed = hash_passwords([row["password"] for row in valid_rows])
+
+        user_import_jobs.update(job_id, status="inserting")
+        created = _insert_users(db, valid_rows, hashed)
+        user_import_jobs.update(
+            job_id, status="emailing", success_count=len(created), processed_count=len(rows)
+        )
+
+        if created and admin_id and admin_username:
+            job = user_import_jobs.get(job_id)
+            log_admin_action(
+                admin_id=admin_id,
+                admin_username=admin_username,
+                action_type="BULK_IMPORT",
+                resource_type="USER",
+                resource_id=None,
+                details=f"Bulk imported {len(created)} users ({job['error_count'] if job else 0} errors)"
+            )
+
+        _send_welcome_emails(db, job_id, created)
+        user_import_jobs.update(job_id, status="completed", finished_at=datetime.utcnow())
+        logger.info(f"Bulk import job {job_id} completed: {len(created)} users created")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Bulk import job {job_id} failed: {str(e)}")
+        user_import_jobs.add_errors(job_id, [f"Import failed: {str(e)}"])
+        user_import_jobs.update(job_id, status="failed", finished_at=datetime.utcnow())
+    finally:
+        db.close()
+
+
+def _insert_users(db: Session, rows: List[Dict[str, Any]], hashed_passwords: List[str],
+                  chunk_size: int = 500) -> List[Tuple[int, Dict[str, Any]]]:
+    """Insert users with multi-row INSERTs and return (user_id, row) pairs"""
+    if not rows:
+        return []
+    now = datetime.utcnow()
+    table = User.__table__
+    for start in range(0, len(rows), chunk_size):
+        db.execute(table.insert(), [{
+            "username": row["username"],
+            "email": row["email"],
+            "password_hash": hashed,
+            "role": row["role"],
+            "college": row["college"],
+            "department": row["department"],
+            "year": row["year"],
+            "user_type": row["user_type"],
+            "github_link": row["github_link"],
+            "employment_type": "Full-time",
+            "created_at": now,
+        } for row, hashed in zip(rows[start:start + chunk_size], hashed_passwords[start:start + chunk_size])])
+    db.commit()
+    # Core inserts bypass the ORM listeners; drop any cached misses for the new ids
+    identity_directory.invalidate_role("Student")
+
+    ids: Dict[str, int] = {}
+    emails = [row["normalized_email"] for row in rows]
+    for start in range(0, len(emails), 1000):
+        for user_id, email in db.query(User.id, func.lower(User.email)).filter(
+            func.lower(User.email).in_(emails[start:start + 1000])
+        ).all():
+            ids[email] = user_id
+    created = [(ids[row["normalized_email"]], row) for row in rows if row["normalized_email"] in ids]
+    search_index.apply_changes([
+        ("user", user_id, (row["username"], row["email"], row["college"])) for user_id, row in created
+    ])
+    return created
+
+
+def _send_welcome_emails(db: Session, job_id: str, created: List[Tuple[int, Dict[str, Any]]]):
+    """Send the registration welcome email to every imported user, updating job progress"""
+    if not created:
+        return
+    from notification_service import NotificationService
+    from email_template_engine import email_template_engine
+
+    template = email_template_engine.get(db, WELCOME_TEMPLATE_NAME)
+    if not template:
+        return
+
+    service = NotificationService(db)
+    sent = 0
+    for user_id, row in created:
+        try:
+            # Format template with user data
+            template_context = {
+                "username": row["username"],
+                "email": row["email"],
+                "password": row["password"],
+                "college": row["college"] or "Not specified",
+                "department": row["department"] or "Not specified",
+                "year": row["year"] or "Not specified"
+            }
+            formatted_subject, formatted_body = template.render(template_context)
+            service.send_email_notification(
+                user_id=user_id,
+                email=row["email"],
+                subject=formatted_subject,
+                body=formatted_body
+            )
+            sent += 1
+        except Exception as e:
+            logger.warning(f"Failed to send welcome email to {row['email']}: {str(e)}")
+        user_import_jobs.update(job_id, emails_sent=sent)
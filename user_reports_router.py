@@ -4,16 +4,28 @@ from sqlalchemy import func, or_, and_
 from typing import List, Optional
 from datetime import datetime, timedelta
 import io
-import pandas as pd
 from database import get_db, User, Cohort, Enrollment, Attendance, Session as SessionModel, Module, Course, AdminLog, StudentLog, StudentSessionStatus, CohortCourse
 from cohort_specific_models import CohortCourseSession, CohortAttendance, CohortSpecificCourse, CohortSpecificEnrollment
 from assignment_quiz_models import Assignment, AssignmentSubmission, AssignmentGrade, Quiz, QuizAttempt, QuizResult
 from auth import get_current_user_any_role
+from search_index import search_index
+from lazy_imports import lazy_module
 import logging
 
 router = APIRouter(tags=["user_reports"])
 logger = logging.getLogger(__name__)
 
+# Only the Excel export needs pandas
+pd = lazy_module("pandas")
+
+def _user_search(search: str):
+    """Username/email filter served from the search index once it is built"""
+    return search_index.filter_clause(
+        "user", User.id, search,
+        or_(User.username.ilike(f"%{search}%"), User.email.ilike(f"%{search}%")),
+        fields=("username", "email")
+    )
+
 def calculate_live_progress(db: Session, student_id: int, course_id: int, course_type: str = "global"):
     """Calculate course progress by averaging session progress percentages"""
     try:
@@ -71,11 +83,7 @@ async def get_report_users(
         query = db.query(User)
         
         if search:
-            search_filter = or_(
-                User.username.ilike(f"%{search}%"),
-                User.email.ilike(f"%{search}%")
-            )
-            query = query.filter(search_filter)
+            query = query.filter(_user_search(search))
             
         if role:
             query = query.filter(User.role == role)
@@ -126,7 +134,7 @@ async def get_consolidated_stats(
         # Reusing user search logic
         query = db.query(User)
         if search:
-            query = query.filter(or_(User.username.ilike(f"%{search}%"), User.email.ilike(f"%{search}%")))
+            query = query.filter(_user_search(search))
         if role:
             query = query.filter(User.role == role)
         if cohort_id:
@@ -518,7 +526,7 @@ async def export_all_reports(
 ):
     try:
         query = db.query(User)
-        if search: query = query.filter(or_(User.username.ilike(f"%{search}%"), User.email.ilike(f"%{search}%")))
+        if search: query = query.filter(_user_search(search))
         if role: query = query.filter(User.role == role)
         if cohort_id: query = query.filter(User.cohort_id == cohort_id)
         
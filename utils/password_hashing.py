@@ -0,0 +1,38 @@
+"""Password hashing for bulk operations.
+
+Kept free of application imports so process pool workers can load it cheaply.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+# Must match auth.pwd_context
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_pool = None
+
+
+def _hash_chunk(passwords: List[str]) -> List[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def hash_passwords(passwords: List[str], chunk_size: int = 25) -> List[str]:
+    """Hash many passwords in parallel on a process pool, preserving order"""
+    global _pool
+    if not passwords:
+        return []
+    chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+    try:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 2)
+        return [hashed for chunk in _pool.map(_hash_chunk, chunks) for hashed in chunk]
+    except Exception as e:
+        # A broken pool must not fail the import; hash in-process instead
+        logger.warning(f"Process pool hashing failed, falling back to in-process hashing: {str(e)}")
+        _pool = None
+        return _hash_chunk(passwords)
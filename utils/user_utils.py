@@ -2,10 +2,6 @@ import os
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from database import User, Admin, Presenter, Manager
-try:
-    from zerobouncesdk import ZeroBounce
-except ImportError:
-    ZeroBounce = None
 from dotenv import load_dotenv
 
 
@@ -14,9 +10,20 @@ import logging
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-# Initialize ZeroBounce SDK
+# ZeroBounce SDK, created on the first validation since it pulls in requests
 ZEROBOUNCE_API_KEY = os.getenv("ZEROBOUNCE_API_KEY")
-zb_sdk = ZeroBounce(ZEROBOUNCE_API_KEY) if ZEROBOUNCE_API_KEY and ZeroBounce else None
+_zb_sdk = None
+
+
+def _zerobounce_sdk():
+    global _zb_sdk
+    if _zb_sdk is None and ZEROBOUNCE_API_KEY:
+        try:
+            from zerobouncesdk import ZeroBounce
+        except ImportError:
+            return None
+        _zb_sdk = ZeroBounce(ZEROBOUNCE_API_KEY)
+    return _zb_sdk
 
 
 def normalize_email(email: str) -> str:
@@ -51,11 +58,33 @@ def check_email_exists(email: str, db: Session) -> dict:
     
     return {"exists": False, "role": None}
 
+def find_existing_emails(emails, db: Session, chunk_size: int = 1000) -> dict:
+    """
+    Bulk version of check_email_exists.
+    Returns {normalized_email: role} for every given email already present in a role table,
+    using one IN query per role table (per chunk of emails).
+    """
+    pending = {normalize_email(email) for email in emails if email}
+    pending.discard("")
+    found = {}
+    
+    # Same precedence as check_email_exists: Admin, Presenter, Manager, then Users
+    for model, role in ((Admin, "Admin"), (Presenter, "Presenter"), (Manager, "Manager"), (User, None)):
+        remaining = sorted(pending - found.keys())
+        for start in range(0, len(remaining), chunk_size):
+            chunk = remaining[start:start + chunk_size]
+            columns = [func.lower(model.email)] + ([User.role] if role is None else [])
+            for row in db.query(*columns).filter(func.lower(model.email).in_(chunk)).all():
+                found.setdefault(row[0], role or row[1])
+    
+    return found
+
 def validate_email_zerobounce(email: str) -> dict:
     """
     Validate email using ZeroBounce SDK.
     Returns a dictionary with validation results.
     """
+    zb_sdk = _zerobounce_sdk()
     if not zb_sdk:
         logger.warning("ZeroBounce API key not found. Skipping validation.")
         return {"status": "skipped", "message": "API key not configured", "valid": True}
@@ -73,3 +102,16 @@ def validate_email_zerobounce(email: str) -> dict:
     except Exception as e:
         logger.error(f"ZeroBounce validation error for {email}: {str(e)}")
         return {"status": "error", "message": str(e), "valid": True} # Default to True on error to not block users
+
+def find_existing_usernames(usernames, db: Session, chunk_size: int = 1000) -> set:
+    """
+    Return the lower-cased usernames (of the given ones) already taken in the users table.
+    Compared case-insensitively, like the unique index under MySQL's default collation.
+    """
+    pending = sorted({str(username).strip().lower() for username in usernames if username})
+    found = set()
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        for (username,) in db.query(func.lower(User.username)).filter(func.lower(User.username).in_(chunk)).all():
+            found.add(username)
+    return found
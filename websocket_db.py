@@ -0,0 +1,75 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Dict, Any, TypeVar
+
+from jose import JWTError, jwt
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# WebSocket handlers never hold a pooled connection between messages; their database work
+# runs here, one short session per call, so at most this many connections serve sockets
+WS_DB_WORKERS = int(os.getenv("WS_DB_WORKERS", "4"))
+
+_executor = ThreadPoolExecutor(max_workers=WS_DB_WORKERS, thread_name_prefix="ws-db")
+
+T = TypeVar("T")
+
+
+def _in_session(work: Callable[..., T], *args) -> T:
+    db = SessionLocal()
+    try:
+        result = work(db, *args)
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_in_session(work: Callable[..., T], *args) -> T:
+    """Run ``work(db, *args)`` in a fresh session on the WebSocket DB executor.
+
+    The session is committed when ``work`` returns and closed either way, so the
+    connection goes back to the pool as soon as the unit of work is done. Return plain
+    values rather than ORM instances; they are detached once the session closes.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_executor, _in_session, work, *args)
+
+
+def _load_identity(db: Session, username: str, role: str, user_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    from identity_directory import ROLE_MODELS
+    model = ROLE_MODELS.get(role)
+    if model is None:
+        return None
+    query = db.query(model.id, model.username, model.email).filter(model.username == username)
+    if user_id is not None:
+        query = query.filter(model.id == user_id)
+    row = query.first()
+    if not row:
+        return None
+    return {"id": row.id, "username": row.username, "email": row.email, "role": role}
+
+
+async def authenticate_websocket_token(token: str, check_user_id: bool = False) -> Optional[Dict[str, Any]]:
+    """Identity (id, username, email, role) of a WebSocket access token, or None.
+
+    With ``check_user_id`` the account must also match the token's ``user_id`` claim.
+    """
+    from auth import SECRET_KEY, ALGORITHM
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    role = payload.get("role")
+    user_id = payload.get("user_id")
+    if not username or not role or (check_user_id and not user_id):
+        return None
+    return await run_in_session(_load_identity, username, role, user_id if check_user_id else None)
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# Outbound frames buffered per socket before the slow-consumer policy applies
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+# A single frame taking longer than this to write marks the peer as stalled
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+# "disconnect" closes a socket whose queue is full, "drop" discards the new frame instead
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "disconnect").lower()
+WS_HEARTBEAT_SECONDS = float(os.getenv("WS_HEARTBEAT_SECONDS", "30"))
+# Evict sockets that sent nothing for this long; 0 leaves silent clients connected
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "0"))
+
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_GOING_AWAY = 1001
+
+
+def encode(message: Dict[str, Any]) -> str:
+    """Serialize a message once so it can be queued on any number of sockets"""
+    return json.dumps(message)
+
+
+class OutboundSocket:
+    """A WebSocket with a bounded send queue drained by its own writer task.
+
+    Senders never await the network: ``enqueue`` either queues the frame or applies the
+    slow-consumer policy, so one stalled client cannot hold up a broadcast.
+    """
+
+    def __init__(self, channel: "SocketChannel", websocket: WebSocket, user_id: int):
+        self.channel = channel
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self.last_received = time.monotonic()
+        self.last_written = time.monotonic()
+        self.closed = False
+        self._writer = asyncio.create_task(self._write())
+
+    def enqueue(self, text: str) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            self.channel.metrics["messages_dropped"] += 1
+            if WS_SLOW_CONSUMER_POLICY == "disconnect":
+                self.channel.metrics["slow_consumer_disconnects"] += 1
+                self.evict(CLOSE_TRY_AGAIN_LATER, "Slow consumer")
+            return False
+
+    def evict(self, code: int, reason: str):
+        """Close the socket and let the owning manager forget it"""
+        if self.closed:
+            return
+        self.closed = True
+        logger.warning(f"Evicting {self.channel.name} socket of user {self.user_id}: {reason}")
+        asyncio.create_task(self.channel._evict(self, code, reason))
+
+    async def _write(self):
+        while True:
+            text = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(text), WS_SEND_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                self.channel.metrics["send_timeouts"] += 1
+                self.evict(CLOSE_TRY_AGAIN_LATER, "Send timed out")
+                return
+            except Exception:
+                self.channel.metrics["send_failures"] += 1
+                self.evict(CLOSE_GOING_AWAY, "Send failed")
+                return
+            self.last_written = time.monotonic()
+            self.channel.metrics["messages_sent"] += 1
+
+    def stop(self):
+        self.closed = True
+        if not self._writer.done():
+            self._writer.cancel()
+
+
+class SocketChannel:
+    """Outbound queues, heartbeats and metrics for the sockets of one WebSocket manager.
+
+    ``on_evict(websocket, user_id)`` is awaited when a socket is evicted so the manager
+    can drop it from its own bookkeeping; the endpoint's receive loop ends on its own
+    once the close goes through.
+    """
+
+    def __init__(self, name: str, on_evict: Optional[Callable[[WebSocket, int], Awaitable[None]]] = None):
+        self.name = name
+        self.on_evict = on_evict
+        self.sockets: Dict[WebSocket, OutboundSocket] = {}
+        self.metrics: Dict[str, int] = {
+            "messages_sent": 0,
+            "messages_dropped": 0,
+            "send_failures": 0,
+            "send_timeouts": 0,
+            "slow_consumer_disconnects": 0,
+            "dead_peer_evictions": 0,
+            "heartbeats_sent": 0,
+        }
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        _channels[name] = self
+
+    def attach(self, websocket: WebSocket, user_id: int) -> OutboundSocket:
+        outbound = OutboundSocket(self, websocket, user_id)
+        self.sockets[websocket] = outbound
+        if WS_HEARTBEAT_SECONDS > 0 and (self._heartbeat_task is None or self._heartbeat_task.done()):
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        return outbound
+
+    def detach(self, websocket: WebSocket):
+        outbound = self.sockets.pop(websocket, None)
+        if outbound:
+            outbound.stop()
+
+    def touch(self, websocket: WebSocket):
+        """Record that the peer sent something, for the idle timeout"""
+        outbound = self.sockets.get(websocket)
+        if outbound:
+            outbound.last_received = time.monotonic()
+
+    def send(self, websockets: Iterable[WebSocket], message: Dict[str, Any]) -> int:
+        """Queue one message on several sockets, serializing it once; returns how many accepted it"""
+        text = None
+        queued = 0
+        for websocket in websockets:
+            outbound = self.sockets.get(websocket)
+            if outbound is None:
+                continue
+            if text is None:
+                text = encode(message)
+            if outbound.enqueue(text):
+                queued += 1
+        return queued
+
+    async def _evict(self, outbound: OutboundSocket, code: int, reason: str):
+        self.detach(outbound.websocket)
+        try:
+            await asyncio.wait_for(outbound.websocket.close(code=code, reason=reason), WS_SEND_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+        if self.on_evict:
+            try:
+                await self.on_evict(outbound.websocket, outbound.user_id)
+            except Exception as e:
+                logger.error(f"Error cleaning up evicted {self.name} socket: {str(e)}")
+
+    async def _heartbeat(self):
+        while self.sockets:
+            await asyncio.sleep(WS_HEARTBEAT_SECONDS)
+            now = time.monotonic()
+            text = encode({"type": "heartbeat", "timestamp": time.time()})
+            for outbound in list(self.sockets.values()):
+                # The previous heartbeat is still queued: the writer has not completed a
+                # frame for two intervals, so the peer is gone or not reading
+                if outbound.queue.qsize() and now - outbound.last_written > 2 * WS_HEARTBEAT_SECONDS:
+                    self.metrics["dead_peer_evictions"] += 1
+                    outbound.evict(CLOSE_GOING_AWAY, "Heartbeat not delivered")
+                elif WS_IDLE_TIMEOUT_SECONDS and now - outbound.last_received > WS_IDLE_TIMEOUT_SECONDS:
+                    self.metrics["dead_peer_evictions"] += 1
+                    outbound.evict(CLOSE_GOING_AWAY, "Idle timeout")
+                elif outbound.enqueue(text):
+                    self.metrics["heartbeats_sent"] += 1
+        self._heartbeat_task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        depths = [outbound.queue.qsize() for outbound in self.sockets.values()]
+        return {
+            "connections": len(self.sockets),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "queue_capacity": WS_SEND_QUEUE_SIZE,
+            "slow_consumer_policy": WS_SLOW_CONSUMER_POLICY,
+            **self.metrics,
+        }
+
+
+_channels: Dict[str, SocketChannel] = {}
+
+
+def websocket_metrics() -> Dict[str, Dict[str, Any]]:
+    """Metrics of every socket channel, keyed by channel name"""
+    return {name: channel.snapshot() for name, channel in _channels.items()}
+
+
+def websocket_connections() -> Dict[str, int]:
+    """Open sockets per channel, without walking the sockets"""
+    return {name: len(channel.sockets) for name, channel in _channels.items()}
@@ -0,0 +1,135 @@
+"""Load test: hold many idle WebSocket connections open while driving REST traffic.
+
+Before the WebSocket handlers released their sessions, every open socket pinned a pooled
+database connection, so a few dozen sockets were enough to make REST requests time out
+waiting for the pool. Run against a live server:
+
+    python ws_load_test.py --base-url http://localhost:8000 --token <jwt> --user-id 1
+
+The token's user must match --user-id (the chat socket checks it). Prints a JSON report
+with how many sockets stayed open and REST latency percentiles.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return round(values[index] * 1000, 1)
+
+
+async def hold_socket(session, url, opened, failures, stop):
+    try:
+        async with session.ws_connect(url, heartbeat=None) as ws:
+            opened.append(ws)
+            # Stay idle apart from reading whatever the server pushes
+            while not stop.is_set():
+                try:
+                    msg = await asyncio.wait_for(ws.receive(), timeout=1)
+                except asyncio.TimeoutError:
+                    continue
+                if msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    failures.append(f"closed: {ws.close_code}")
+                    return
+    except Exception as e:
+        failures.append(type(e).__name__)
+
+
+async def drive_rest(session, url, headers, latencies, errors, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            async with session.get(url, headers=headers) as response:
+                await response.read()
+                if response.status >= 400:
+                    errors.append(response.status)
+                else:
+                    latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(type(e).__name__)
+
+
+async def run(args):
+    ws_base = args.base_url.replace("http://", "ws://").replace("https://", "wss://")
+    chat_url = f"{ws_base}/ws/chat/{args.user_id}?token={args.token}"
+    notification_url = f"{ws_base}/ws/notifications?token={args.token}"
+    rest_url = f"{args.base_url}{args.rest_path}"
+    headers = {"Authorization": f"Bearer {args.token}"}
+
+    opened, ws_failures = [], []
+    latencies, rest_errors = [], []
+    stop = asyncio.Event()
+
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        rest_workers = [
+            asyncio.create_task(drive_rest(session, rest_url, headers, latencies, rest_errors, stop))
+            for _ in range(args.rest_concurrency)
+        ]
+
+        # Open sockets in batches, alternating between the chat and notification endpoints
+        sockets = []
+        ramp_start = time.perf_counter()
+        for start in range(0, args.sockets, args.batch):
+            for i in range(start, min(start + args.batch, args.sockets)):
+                url = chat_url if i % 2 == 0 else notification_url
+                sockets.append(asyncio.create_task(hold_socket(session, url, opened, ws_failures, stop)))
+            await asyncio.sleep(args.batch_pause)
+        ramp_seconds = time.perf_counter() - ramp_start
+
+        # Measure REST latency only while every socket is being held
+        latencies.clear()
+        rest_errors.clear()
+        await asyncio.sleep(args.duration)
+        stop.set()
+
+        await asyncio.gather(*rest_workers, return_exceptions=True)
+        await asyncio.gather(*sockets, return_exceptions=True)
+
+    report = {
+        "sockets_requested": args.sockets,
+        "sockets_opened": len(opened),
+        "socket_failures": len(ws_failures),
+        "socket_failure_reasons": sorted(set(ws_failures))[:10],
+        "ramp_seconds": round(ramp_seconds, 1),
+        "rest_path": args.rest_path,
+        "rest_requests": len(latencies),
+        "rest_errors": len(rest_errors),
+        "rest_error_reasons": sorted({str(e) for e in rest_errors})[:10],
+        "rest_rps": round(len(latencies) / args.duration, 1),
+        "rest_latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": percentile(latencies, 100),
+        },
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Idle WebSocket + REST load test")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="access token of the user the sockets connect as")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=100, help="sockets opened per batch")
+    parser.add_argument("--batch-pause", type=float, default=0.5, help="seconds between batches")
+    parser.add_argument("--rest-path", default="/api/notifications")
+    parser.add_argument("--rest-concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of REST traffic with all sockets open")
+    parser.add_argument("--request-timeout", type=float, default=30)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()